@@ -3,7 +3,6 @@ from .models import *
 
 # Registrar todos los modelos
 admin.site.register(Consecutivo)
-admin.site.register(ConfiguracionInstituto)
 admin.site.register(Programa)
 admin.site.register(Curso)
 admin.site.register(Grupo)
@@ -18,12 +17,14 @@ admin.site.register(Cobro)
 admin.site.register(DetallePago)
 admin.site.register(Egreso)
 admin.site.register(DetalleEgreso)
+admin.site.register(LibroDiario)
 admin.site.register(Matricula)
 admin.site.register(Asistencia)
 admin.site.register(Calificacion)
 admin.site.register(ObservacionAcademica)
 admin.site.register(Evento)
 admin.site.register(Comunicado)
+admin.site.register(BuzonComunicado)
 admin.site.register(DocumentoInstitucional)
 admin.site.register(DocumentoEstudiante)
 admin.site.register(Incidencia)
@@ -34,4 +35,16 @@ admin.site.register(ConfiguracionReporte)
 admin.site.register(PlantillaReporte)
 admin.site.register(ReporteProgramado)
 admin.site.register(Auditoria)
-admin.site.register(Backup)
\ No newline at end of file
+admin.site.register(Backup)
+admin.site.register(ArchivoHistorico)
+admin.site.register(Tarea)
+
+
+@admin.register(ConfiguracionInstituto)
+class ConfiguracionInstitutoAdmin(admin.ModelAdmin):
+    # Una sola configuración: se crea una vez y no se elimina
+    def has_add_permission(self, request):
+        return not ConfiguracionInstituto.objects.exists()
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,199 @@
+"""
+Archivo histórico de las tablas que solo crecen: auditoría, asistencia y
+seguimientos de incidencias.
+
+`archivar` saca de la tabla las filas anteriores a una fecha de corte y las
+escribe, año por año, en archivos JSONL comprimidos con gzip bajo
+MEDIA_ROOT/archivo/. Cada archivo es una parte de hasta TAMANO_PARTE filas y
+queda registrado en ArchivoHistorico con su rango de fechas y los ids de sus
+llaves principales (estudiante, usuario...). El archivo se escribe antes de
+borrar las filas y el registro y el borrado van en la misma transacción: si
+algo falla las filas siguen en la tabla.
+
+`buscar` recorre solo las partes cuyo rango de fechas y llaves pueden
+contener lo que se busca.
+"""
+import datetime
+import gzip
+import json
+import tempfile
+from collections import namedtuple
+
+from django.core.files import File
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, connections, transaction
+from django.db.models import DateTimeField, Q
+from django.utils import timezone
+
+from .models import ArchivoHistorico, Asistencia, Auditoria, SeguimientoIncidencia
+
+TAMANO_PARTE = 50000
+TAMANO_BLOQUE = 2000
+
+Archivable = namedtuple('Archivable', ['modelo', 'campo_fecha', 'claves', 'filtro'])
+
+ARCHIVABLES = {
+    'auditoria': Archivable(Auditoria, 'fecha', ('usuario_id',), Q()),
+    'asistencia': Archivable(Asistencia, 'fecha', ('estudiante_id', 'grupo_id'), Q()),
+    # Los seguimientos de una incidencia abierta siguen en uso
+    'seguimiento': Archivable(
+        SeguimientoIncidencia, 'fecha', ('incidencia_id', 'usuario_id'),
+        Q(incidencia__estado__in=['resuelta', 'cerrada']),
+    ),
+}
+
+Resultado = namedtuple('Resultado', ['modelo', 'filas', 'partes', 'tamano'])
+
+
+def _es_fecha_hora(archivable):
+    return isinstance(archivable.modelo._meta.get_field(archivable.campo_fecha), DateTimeField)
+
+
+def _limite(archivable, dia):
+    """`dia` en el tipo del campo de fecha: medianoche local para los DateTimeField."""
+    if _es_fecha_hora(archivable):
+        return timezone.make_aware(datetime.datetime.combine(dia, datetime.time.min))
+    return dia
+
+
+def _dia(valor):
+    if isinstance(valor, datetime.datetime):
+        return timezone.localtime(valor).date() if timezone.is_aware(valor) else valor.date()
+    return valor
+
+
+def pendientes(nombre, corte):
+    """Filas de `nombre` anteriores al día `corte` que se pueden archivar."""
+    archivable = ARCHIVABLES[nombre]
+    return archivable.modelo.objects.filter(
+        archivable.filtro, **{f"{archivable.campo_fecha}__lt": _limite(archivable, corte)},
+    )
+
+
+def archivar(nombre, corte, tamano_parte=TAMANO_PARTE):
+    """Archiva las filas de `nombre` anteriores al día `corte`. Devuelve un Resultado."""
+    archivable = ARCHIVABLES[nombre]
+    campo = archivable.campo_fecha
+    queryset = pendientes(nombre, corte)
+    primera = queryset.order_by(campo).values_list(campo, flat=True).first()
+    filas = partes = tamano = 0
+    if primera is None:
+        return Resultado(nombre, filas, partes, tamano)
+
+    for anio in range(_dia(primera).year, corte.year + 1):
+        inicio = _limite(archivable, datetime.date(anio, 1, 1))
+        fin = _limite(archivable, min(datetime.date(anio + 1, 1, 1), corte))
+        del_anio = queryset.filter(**{f"{campo}__gte": inicio, f"{campo}__lt": fin})
+        while registro := _archivar_parte(nombre, anio, del_anio, tamano_parte):
+            filas += registro.filas
+            partes += 1
+            tamano += registro.tamano
+    return Resultado(nombre, filas, partes, tamano)
+
+
+def _archivar_parte(nombre, anio, queryset, tamano_parte):
+    """Mueve a un archivo las primeras `tamano_parte` filas (por id) de `queryset`; None si no queda ninguna."""
+    archivable = ARCHIVABLES[nombre]
+    with transaction.atomic(using=queryset.db), tempfile.TemporaryFile() as temporal:
+        ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:tamano_parte])
+        if not ids:
+            return None
+        parte = queryset.filter(pk__lte=ids[-1])
+
+        claves = {clave: set() for clave in archivable.claves}
+        desde = hasta = None
+        with gzip.GzipFile(fileobj=temporal, mode='wb') as comprimido:
+            for fila in parte.values().iterator(chunk_size=TAMANO_BLOQUE):
+                comprimido.write(json.dumps(fila, cls=DjangoJSONEncoder, ensure_ascii=False).encode() + b'\n')
+                dia = _dia(fila[archivable.campo_fecha])
+                desde = dia if desde is None else min(desde, dia)
+                hasta = dia if hasta is None else max(hasta, dia)
+                for clave, valores in claves.items():
+                    valores.add(fila[clave])
+
+        registro = ArchivoHistorico(
+            modelo=nombre, anio=anio, filas=len(ids), fecha_desde=desde, fecha_hasta=hasta,
+            claves={clave: sorted(valor for valor in valores if valor is not None) for clave, valores in claves.items()},
+            tamano=temporal.tell(),
+        )
+        temporal.seek(0)
+        registro.archivo.save(f"{nombre}/{anio}/{ids[0]}-{ids[-1]}.jsonl.gz", File(temporal), save=False)
+        try:
+            registro.save()
+            # Borrado directo, sin cargar las filas ni enviar señales: archivar no es eliminar
+            parte._raw_delete(parte.db)
+        except Exception:
+            registro.archivo.delete(save=False)
+            raise
+    return registro
+
+
+def leer(registro):
+    """Filas (dicts como los de values(), con fechas en texto ISO) de una parte archivada."""
+    with registro.archivo.open('rb') as crudo, gzip.open(crudo, 'rt', encoding='utf-8') as lineas:
+        for linea in lineas:
+            yield json.loads(linea)
+
+
+def buscar(nombre, desde=None, hasta=None, **filtros):
+    """
+    Filas archivadas de `nombre` con fecha entre `desde` y `hasta` (días,
+    inclusive) cuyos campos son iguales a `filtros`, por ejemplo
+    buscar('asistencia', estudiante_id=5).
+    """
+    archivable = ARCHIVABLES[nombre]
+    campo = archivable.modelo._meta.get_field(archivable.campo_fecha)
+    partes = ArchivoHistorico.objects.filter(modelo=nombre).order_by('fecha_desde', 'id')
+    if desde is not None:
+        partes = partes.filter(fecha_hasta__gte=desde)
+    if hasta is not None:
+        partes = partes.filter(fecha_desde__lte=hasta)
+
+    for registro in partes:
+        # El resumen descarta las partes donde no aparece la llave buscada
+        if any(clave in registro.claves and valor not in set(registro.claves[clave]) for clave, valor in filtros.items()):
+            continue
+        for fila in leer(registro):
+            if any(fila.get(clave) != valor for clave, valor in filtros.items()):
+                continue
+            dia = _dia(campo.to_python(fila[campo.attname]))
+            if (desde is not None and dia < desde) or (hasta is not None and dia > hasta):
+                continue
+            yield fila
+
+
+# ========================================================
+# Tamaño y compactación de las tablas
+# ========================================================
+
+def tamano_tabla(modelo, using='default'):
+    """Bytes de la tabla y sus índices, o None si el motor no lo informa."""
+    conexion = connections[using]
+    tabla = modelo._meta.db_table
+    with conexion.cursor() as cursor:
+        if conexion.vendor == 'postgresql':
+            cursor.execute("SELECT pg_total_relation_size(%s::regclass)", [tabla])
+        elif conexion.vendor == 'sqlite':
+            try:
+                cursor.execute(
+                    "SELECT SUM(pgsize) FROM dbstat WHERE name IN (SELECT name FROM sqlite_master WHERE tbl_name = %s)",
+                    [tabla],
+                )
+            except DatabaseError:
+                # SQLite compilado sin la tabla virtual dbstat
+                return None
+        else:
+            return None
+        fila = cursor.fetchone()
+    return fila[0] if fila else None
+
+
+def compactar(modelos, using='default'):
+    """Devuelve al disco el espacio de las filas archivadas (VACUUM)."""
+    conexion = connections[using]
+    with conexion.cursor() as cursor:
+        if conexion.vendor == 'sqlite':
+            cursor.execute("VACUUM")
+        elif conexion.vendor == 'postgresql':
+            for modelo in modelos:
+                cursor.execute(f"VACUUM FULL ANALYZE {conexion.ops.quote_name(modelo._meta.db_table)}")
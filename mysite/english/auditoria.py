@@ -0,0 +1,334 @@
+"""
+Registro de auditoría de los cambios en los modelos.
+
+El middleware (o `auditar_como` en comandos y tareas) deja en una variable de
+contexto quién está haciendo la petición y desde qué IP. Las señales de
+signals.py toman una copia de cada instancia al cargarla y, al guardarla o
+eliminarla, encolan la copia anterior y la nueva cuando la transacción se
+confirma. Durante la petición solo se copian diccionarios: las diferencias, la
+conversión a JSON y el INSERT los hace un hilo en segundo plano, que escribe
+con bulk_create cada AUDITORIA_TAMANO_LOTE entradas o cada
+AUDITORIA_INTERVALO_MS milisegundos. Al terminar el proceso lo que quede en
+memoria se escribe en el hilo principal.
+
+Los cambios hechos con update() o bulk_create no envían señales y no quedan
+registrados.
+"""
+import atexit
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from functools import partial
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DataError, IntegrityError, connections, transaction
+from django.utils import timezone
+
+from .models import Auditoria
+
+logger = logging.getLogger(__name__)
+
+TAMANO_LOTE = 200
+INTERVALO_MS = 250
+# Si la base de datos falla, el lote se reintenta esperando 0,5 s, 1 s, 2 s...
+# hasta un máximo; en memoria se guardan como mucho MAXIMO_PENDIENTES filas
+REINTENTO_S = 0.5
+REINTENTO_MAXIMO_S = 60
+MAXIMO_PENDIENTES = 50000
+# Tras estos fallos seguidos se escribe fila por fila para descartar las que
+# la base rechaza (por ejemplo un usuario ya eliminado) sin perder las demás
+INTENTOS_POR_LOTE = 5
+# Columnas que se derivan de otras y no aportan al registro
+CAMPOS_NO_AUDITADOS = {'busqueda'}
+IP_LOCAL = '127.0.0.1'
+
+Entrada = namedtuple('Entrada', ['usuario_id', 'ip', 'tipo', 'modelo', 'objeto_id', 'antes', 'despues', 'fecha'])
+
+_contexto = contextvars.ContextVar('auditoria', default=None)
+_codificador = DjangoJSONEncoder()
+_campos = {}
+
+
+class Contexto:
+    """Usuario e IP de las entradas. El usuario de la petición se resuelve solo si hay algo que auditar."""
+    __slots__ = ('_usuario', 'ip')
+
+    def __init__(self, usuario, ip):
+        self._usuario = usuario
+        self.ip = ip
+
+    @property
+    def usuario_id(self):
+        usuario = self._usuario
+        return usuario.pk if usuario is not None and usuario.is_authenticated else None
+
+
+def contexto_actual():
+    return _contexto.get()
+
+
+def ip_de(request):
+    return request.META.get('REMOTE_ADDR') or IP_LOCAL
+
+
+class AuditoriaMiddleware:
+    """Va después de AuthenticationMiddleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _contexto.set(Contexto(request.user, ip_de(request)))
+        try:
+            return self.get_response(request)
+        finally:
+            _contexto.reset(token)
+
+
+@contextmanager
+def auditar_como(usuario, ip=IP_LOCAL):
+    """Para comandos y tareas: registra a nombre de `usuario` y escribe lo pendiente al salir."""
+    token = _contexto.set(Contexto(usuario, ip))
+    try:
+        yield
+    finally:
+        _contexto.reset(token)
+        escritor.vaciar()
+
+
+# ========================================================
+# Entradas
+# ========================================================
+
+def campos_auditados(modelo):
+    campos = _campos.get(modelo)
+    if campos is None:
+        campos = _campos[modelo] = [
+            campo.attname for campo in modelo._meta.concrete_fields
+            if not campo.primary_key and campo.name not in CAMPOS_NO_AUDITADOS
+            and not getattr(campo, 'auto_now', False) and not getattr(campo, 'auto_now_add', False)
+        ]
+    return campos
+
+
+def _json(valor):
+    if valor is None or isinstance(valor, (str, int, float, bool, list, dict)):
+        return valor
+    try:
+        return _codificador.default(valor)
+    except TypeError:
+        # Archivos y demás: su representación en texto (el nombre del archivo)
+        return str(valor)
+
+
+def diferencias(entrada):
+    """(datos_anteriores, datos_nuevos) de la entrada; en una modificación, solo lo que cambió."""
+    campos = campos_auditados(entrada.modelo)
+    antes, despues = entrada.antes, entrada.despues
+    if antes is None or despues is None:
+        estado = antes if despues is None else despues
+        completos = {campo: _json(estado[campo]) for campo in campos if campo in estado}
+        return (None, completos) if antes is None else (completos, None)
+
+    anteriores, nuevos = {}, {}
+    for campo in campos:
+        if campo in antes and campo in despues and antes[campo] != despues[campo]:
+            anteriores[campo] = _json(antes[campo])
+            nuevos[campo] = _json(despues[campo])
+    return anteriores, nuevos
+
+
+def crear_registro(entrada):
+    """Auditoria sin guardar para la entrada, o None si una modificación no cambió nada."""
+    tipo = dict(Auditoria.TIPO_CHOICES)[entrada.tipo]
+    if entrada.antes is None and entrada.despues is None:
+        # Inicio y cierre de sesión: sin datos
+        anteriores = nuevos = None
+        descripcion = tipo
+    else:
+        anteriores, nuevos = diferencias(entrada)
+        if entrada.tipo == 'modificacion' and not nuevos:
+            return None
+        descripcion = f"{tipo} de {entrada.modelo._meta.verbose_name} {entrada.objeto_id}"
+    return Auditoria(
+        usuario_id=entrada.usuario_id, tipo=entrada.tipo, modelo=entrada.modelo.__name__,
+        objeto_id=entrada.objeto_id, descripcion=descripcion, fecha=entrada.fecha, ip=entrada.ip,
+        datos_anteriores=anteriores, datos_nuevos=nuevos,
+    )
+
+
+# ========================================================
+# Escritura en segundo plano
+# ========================================================
+
+class EscritorAuditoria:
+    """
+    Acumula entradas y las escribe por lotes en un hilo propio. Con
+    AUDITORIA_ASINCRONA = False cada entrada se escribe en el momento.
+
+    Si el INSERT falla, los registros quedan en memoria y se reintentan con
+    espera creciente, junto con las entradas que sigan llegando.
+    """
+
+    def __init__(self, alias='default'):
+        self.alias = alias
+        self._pendientes = []
+        self._fallidos = []
+        self._intentos = 0
+        self._reintentar_en = 0
+        self._condicion = threading.Condition()
+        self._escritura = threading.Lock()
+        self._hilo = None
+        self._pid = None
+        self._detenido = False
+
+    @property
+    def tamano_lote(self):
+        return getattr(settings, 'AUDITORIA_TAMANO_LOTE', TAMANO_LOTE)
+
+    @property
+    def intervalo(self):
+        return getattr(settings, 'AUDITORIA_INTERVALO_MS', INTERVALO_MS) / 1000
+
+    def registrar(self, entrada):
+        with self._condicion:
+            self._pendientes.append(entrada)
+            if len(self._pendientes) >= self.tamano_lote:
+                self._condicion.notify()
+        if not getattr(settings, 'AUDITORIA_ASINCRONA', True) or self._detenido:
+            self.vaciar()
+        else:
+            self._asegurar_hilo()
+
+    def pendientes(self):
+        return len(self._pendientes) + len(self._fallidos)
+
+    def en_espera(self):
+        """True mientras no toca reintentar un lote que falló."""
+        return time.monotonic() < self._reintentar_en
+
+    def vaciar(self, forzar=False):
+        """
+        Escribe ahora, en el hilo que llama, todo lo pendiente. Devuelve cuántas
+        filas escribió. Mientras espera para reintentar no hace nada, salvo con
+        `forzar`.
+        """
+        with self._escritura:
+            if self.en_espera() and not forzar:
+                return 0
+            with self._condicion:
+                entradas, self._pendientes = self._pendientes, []
+            registros = self._fallidos
+            for entrada in entradas:
+                try:
+                    registro = crear_registro(entrada)
+                except Exception:
+                    # Reintentar no la arregla
+                    logger.exception("Entrada de auditoría descartada: %s de %s %s",
+                                     entrada.tipo, entrada.modelo.__name__, entrada.objeto_id)
+                    continue
+                if registro is not None:
+                    registros.append(registro)
+            if not registros:
+                return 0
+            if self._intentos >= INTENTOS_POR_LOTE:
+                escritos, restantes, error = self._escribir_uno_a_uno(registros)
+            else:
+                try:
+                    Auditoria.objects.using(self.alias).bulk_create(registros, batch_size=self.tamano_lote)
+                    escritos, restantes, error = len(registros), [], None
+                except Exception as excepcion:
+                    escritos, restantes, error = 0, registros, excepcion
+            if restantes:
+                self._fallo(restantes, error)
+            else:
+                self._fallidos, self._intentos, self._reintentar_en = [], 0, 0
+            return escritos
+
+    def _escribir_uno_a_uno(self, registros):
+        """(escritos, restantes, error): se detiene en el primer error que no sea de la fila."""
+        escritos = 0
+        for posicion, registro in enumerate(registros):
+            try:
+                with transaction.atomic(using=self.alias):
+                    registro.save(using=self.alias, force_insert=True)
+            except (IntegrityError, DataError):
+                logger.exception("Registro de auditoría rechazado por la base de datos: %s", registro.descripcion)
+            except Exception as error:
+                return escritos, registros[posicion:], error
+            else:
+                escritos += 1
+        return escritos, [], None
+
+    def _fallo(self, registros, error):
+        self._intentos += 1
+        espera = min(REINTENTO_S * 2 ** (self._intentos - 1), REINTENTO_MAXIMO_S)
+        self._reintentar_en = time.monotonic() + espera
+        if len(registros) > MAXIMO_PENDIENTES:
+            logger.error("Se descartan %s registros de auditoría para no agotar la memoria",
+                         len(registros) - MAXIMO_PENDIENTES)
+            del registros[:-MAXIMO_PENDIENTES]
+        self._fallidos = registros
+        logger.error("No se pudieron escribir %s registros de auditoría; se reintenta en %s s",
+                     len(registros), espera, exc_info=error)
+
+    def _asegurar_hilo(self):
+        # Tras un fork el hilo del proceso padre no existe en el hijo
+        if self._hilo is not None and self._pid == os.getpid() and self._hilo.is_alive():
+            return
+        with self._condicion:
+            if self._hilo is not None and self._pid == os.getpid() and self._hilo.is_alive():
+                return
+            self._pid = os.getpid()
+            self._hilo = threading.Thread(target=self._trabajar, name='escritor-auditoria', daemon=True)
+            self._hilo.start()
+
+    def _trabajar(self):
+        try:
+            while True:
+                with self._condicion:
+                    self._condicion.wait_for(
+                        lambda: self._detenido or len(self._pendientes) >= self.tamano_lote and not self.en_espera(),
+                        timeout=max(self.intervalo, self._reintentar_en - time.monotonic()),
+                    )
+                    detenido = self._detenido
+                self.vaciar()
+                if detenido:
+                    return
+        finally:
+            connections.close_all()
+
+    def detener(self, espera=5):
+        """Termina el hilo y escribe en el hilo que llama lo que haya quedado."""
+        with self._condicion:
+            self._detenido = True
+            self._condicion.notify()
+        if self._hilo is not None and self._hilo.is_alive() and self._hilo is not threading.current_thread():
+            self._hilo.join(espera)
+        self.vaciar(forzar=True)
+        if self._fallidos:
+            logger.error("Se pierden %s registros de auditoría que no se pudieron escribir", len(self._fallidos))
+
+
+escritor = EscritorAuditoria()
+atexit.register(escritor.detener)
+
+
+def registrar(tipo, instancia, antes=None, despues=None, contexto=None, using='default'):
+    """
+    Encola la entrada cuando se confirme la transacción en curso (en seguida
+    si no hay ninguna). Sin usuario en el contexto no se registra nada.
+    """
+    contexto = contexto or _contexto.get()
+    if contexto is None:
+        return
+    usuario_id = contexto.usuario_id
+    if usuario_id is None:
+        return
+    entrada = Entrada(usuario_id, contexto.ip, tipo, type(instancia), instancia.pk, antes, despues, timezone.now())
+    transaction.on_commit(partial(escritor.registrar, entrada), using=using)
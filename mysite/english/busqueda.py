@@ -0,0 +1,161 @@
+"""
+Búsqueda de estudiantes sin distinguir tildes ni mayúsculas.
+
+Cada estudiante guarda en `busqueda` su identificación y sus nombres
+normalizados (ver `normalizar`). En SQLite esa columna se indexa en una tabla
+FTS5 que se mantiene con triggers, así que también la actualizan los
+bulk_create de la importación; en PostgreSQL se usa un índice de trigramas. En
+otros motores se filtra con LIKE sobre la misma columna.
+"""
+import re
+import unicodedata
+
+from django.db import connections, models
+from django.db.models import Case, IntegerField, Lookup, Value, When
+
+TABLA_FTS = 'english_estudiante_fts'
+
+# Los triggers se pierden si una migración reconstruye la tabla de estudiantes
+# en SQLite; `asegurar_indice_sqlite` los vuelve a crear después de migrar.
+SQL_SQLITE = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA_FTS} USING fts5(
+        busqueda, content='english_estudiante', content_rowid='id', prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_ai AFTER INSERT ON english_estudiante BEGIN
+        INSERT INTO {TABLA_FTS}(rowid, busqueda) VALUES (new.id, new.busqueda);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_ad AFTER DELETE ON english_estudiante BEGIN
+        INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, busqueda) VALUES ('delete', old.id, old.busqueda);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_au AFTER UPDATE OF busqueda ON english_estudiante BEGIN
+        INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, busqueda) VALUES ('delete', old.id, old.busqueda);
+        INSERT INTO {TABLA_FTS}(rowid, busqueda) VALUES (new.id, new.busqueda);
+    END""",
+]
+
+SQL_POSTGRESQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS english_estudiante_busqueda_trgm ON english_estudiante USING gin (busqueda gin_trgm_ops)",
+]
+
+TRIGGERS_SQLITE = {f'{TABLA_FTS}_ai', f'{TABLA_FTS}_ad', f'{TABLA_FTS}_au'}
+
+LIMITE_AUTOCOMPLETAR = 10
+# Puntos, comas y guiones entre dígitos: '1.023.456' y '1023456' son el mismo documento
+SEPARADOR_DIGITOS = re.compile(r'(?<=\d)[.,-](?=\d)')
+
+
+def normalizar(texto):
+    """'Núñez, María-José' -> 'nunez maria jose'; 'C.C. 1.023.456' -> 'c c 1023456'"""
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    return ' '.join(re.findall(r'[a-z0-9]+', SEPARADOR_DIGITOS.sub('', texto)))
+
+
+def asegurar_indice_sqlite(connection):
+    """Crea la tabla FTS5 y sus triggers si faltan y, en ese caso, la reconstruye."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pragma_table_info('english_estudiante') WHERE name = 'busqueda'")
+        if cursor.fetchone() is None:
+            # Base de datos migrada a una versión anterior a la columna
+            return
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'english_estudiante'")
+        if TRIGGERS_SQLITE <= {fila[0] for fila in cursor.fetchall()}:
+            return
+        for sql in SQL_SQLITE:
+            cursor.execute(sql)
+        cursor.execute(f"INSERT INTO {TABLA_FTS}({TABLA_FTS}) VALUES ('rebuild')")
+
+
+def crear_indice(connection):
+    if connection.vendor == 'sqlite':
+        asegurar_indice_sqlite(connection)
+    elif connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            for sql in SQL_POSTGRESQL:
+                cursor.execute(sql)
+
+
+def eliminar_indice(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            for trigger in sorted(TRIGGERS_SQLITE):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLA_FTS}")
+        elif connection.vendor == 'postgresql':
+            cursor.execute("DROP INDEX IF EXISTS english_estudiante_busqueda_trgm")
+
+
+class CampoFTS(models.TextField):
+    """Columna de una tabla FTS5; admite el lookup `coincide` (MATCH)."""
+
+
+@CampoFTS.register_lookup
+class Coincide(Lookup):
+    lookup_name = 'coincide'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", [*lhs_params, *rhs_params]
+
+
+def _consulta_fts(terminos):
+    # Cada término se busca como prefijo y todos deben aparecer
+    return ' '.join(f'"{termino}"*' for termino in terminos)
+
+
+def buscar_estudiantes(queryset, q):
+    """
+    Filtra `queryset` por todos los términos de `q` (como prefijos de palabra en
+    SQLite) y lo ordena por relevancia: primero las identificaciones que
+    empiezan por `q`.
+    """
+    terminos = normalizar(q).split()
+    if not terminos:
+        return queryset.none()
+
+    primero_identificacion = Case(
+        When(identificacion__startswith=q.strip(), then=Value(0)),
+        default=Value(1),
+        output_field=IntegerField(),
+    )
+    vendor = connections[queryset.db].vendor
+    if vendor == 'sqlite':
+        # Se une con la tabla FTS (IndiceBusquedaEstudiante) para que la consulta
+        # parta del índice y calcule la relevancia una sola vez por fila
+        queryset = queryset.filter(indice_busqueda__busqueda__coincide=_consulta_fts(terminos))
+        return queryset.annotate(prioridad=primero_identificacion).order_by('prioridad', 'indice_busqueda__rank')
+
+    for termino in terminos:
+        queryset = queryset.filter(busqueda__contains=termino)
+    queryset = queryset.annotate(prioridad=primero_identificacion)
+    if vendor == 'postgresql':
+        from django.contrib.postgres.search import TrigramSimilarity
+        queryset = queryset.annotate(similitud=TrigramSimilarity('busqueda', ' '.join(terminos)))
+        return queryset.order_by('prioridad', '-similitud')
+    return queryset.order_by('prioridad', *queryset.model._meta.ordering)
+
+
+def autocompletar_estudiantes(queryset, q, limite=LIMITE_AUTOCOMPLETAR):
+    """Los `limite` estudiantes más relevantes para `q`, como lista."""
+    terminos = normalizar(q).split()
+    if not terminos:
+        return []
+    if connections[queryset.db].vendor != 'sqlite':
+        return list(buscar_estudiantes(queryset, q)[:limite])
+
+    # La tabla FTS elige y ordena los ids por sí sola (a igual relevancia, los más
+    # recientes); luego se cargan solo esos estudiantes
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s ORDER BY rank, rowid DESC LIMIT %s",
+            [_consulta_fts(terminos), limite],
+        )
+        ids = [fila[0] for fila in cursor.fetchall()]
+    estudiantes = queryset.in_bulk(ids)
+    ordenados = [estudiantes[pk] for pk in ids if pk in estudiantes]
+    prefijo = q.strip()
+    return sorted(ordenados, key=lambda e: not e.identificacion.startswith(prefijo))
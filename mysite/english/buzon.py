@@ -0,0 +1,135 @@
+"""
+Buzón de comunicados por usuario.
+
+Qué comunicados ve cada usuario depende de `destinatarios`, de los grupos y
+usuarios destino y de la fecha de expiración; calcularlo en cada petición une
+comunicados, matrículas, estudiantes y docentes. En su lugar, al publicar un
+comunicado (tarea 'comunicado') `repartir` inserta una fila de
+BuzonComunicado por destinatario, en lotes, y el buzón de un usuario es una
+consulta por índice sobre sus propias filas, paginada por llave.
+
+Los usuarios no tienen vínculo directo con estudiantes y docentes: se
+reconocen por el correo (el de la cuenta igual, sin mayúsculas, al correo del
+estudiante o al personal o institucional del docente).
+
+El reparto refleja a los destinatarios del momento en que se publica o se
+edita el comunicado; `repartir` se puede volver a ejecutar y solo agrega o
+quita la diferencia. `purgar_vencidos` borra las filas expiradas.
+"""
+from collections import namedtuple
+
+from django.contrib.auth.models import User
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from .models import BuzonComunicado, Docente, Estudiante
+
+TAMANO_LOTE = 1000
+
+# destinatarios -> personas que incluye (con grupos destino, solo las de esos grupos)
+ALCANCE = {
+    'estudiantes': ('estudiantes',),
+    'docentes': ('docentes',),
+    'todos': ('estudiantes', 'docentes'),
+    'personalizado': (),
+}
+
+Reparto = namedtuple('Reparto', ['creadas', 'eliminadas', 'total'])
+
+
+def _correos(queryset, campo):
+    return queryset.exclude(**{f"{campo}__isnull": True}).exclude(**{campo: ''}).values_list(Lower(campo))
+
+
+def destinatarios(comunicado):
+    """Usuarios activos que deben recibir `comunicado`."""
+    usuarios = User.objects.filter(is_active=True)
+    grupos = list(comunicado.grupos_destino.values_list('pk', flat=True))
+    if comunicado.destinatarios == 'todos' and not grupos:
+        return usuarios
+
+    alcance = ALCANCE[comunicado.destinatarios]
+    if comunicado.destinatarios == 'personalizado' and grupos:
+        alcance = ALCANCE['todos']
+
+    filtro = Q(pk__in=comunicado.usuarios_destino.values('pk'))
+    if 'estudiantes' in alcance:
+        estudiantes = Estudiante.objects.filter(estado='activo')
+        if grupos:
+            estudiantes = estudiantes.filter(matricula__grupo__in=grupos, matricula__estado='activa')
+        filtro |= Q(correo__in=_correos(estudiantes, 'correo'))
+    if 'docentes' in alcance:
+        docentes = Docente.objects.filter(activo=True)
+        if grupos:
+            docentes = docentes.filter(grupo__in=grupos)
+        filtro |= Q(correo__in=_correos(docentes, 'correo')) | Q(correo__in=_correos(docentes, 'correo_institucional'))
+    return usuarios.annotate(correo=Lower('email')).filter(filtro)
+
+
+def repartir(comunicado, progreso=None):
+    """
+    Deja en el buzón de cada destinatario una fila de `comunicado` y quita las
+    de quienes dejaron de serlo. Devuelve un Reparto.
+    """
+    deseados = set(destinatarios(comunicado).values_list('pk', flat=True).iterator(chunk_size=TAMANO_LOTE))
+    entregas = BuzonComunicado.objects.filter(comunicado=comunicado)
+    existentes = set(entregas.values_list('usuario_id', flat=True).iterator(chunk_size=TAMANO_LOTE))
+
+    sobrantes = sorted(existentes - deseados)
+    for inicio in range(0, len(sobrantes), TAMANO_LOTE):
+        entregas.filter(usuario_id__in=sobrantes[inicio:inicio + TAMANO_LOTE]).delete()
+    # Si se editaron las fechas del comunicado
+    entregas.filter(
+        ~Q(fecha_publicacion=comunicado.fecha_publicacion) | ~Q(fecha_expiracion=comunicado.fecha_expiracion)
+    ).update(fecha_publicacion=comunicado.fecha_publicacion, fecha_expiracion=comunicado.fecha_expiracion)
+
+    nuevos = sorted(deseados - existentes)
+    for inicio in range(0, len(nuevos), TAMANO_LOTE):
+        # Cada lote es su propia transacción: no bloquea la base durante todo el reparto
+        BuzonComunicado.objects.bulk_create(
+            [
+                BuzonComunicado(
+                    comunicado=comunicado, usuario_id=usuario_id, fecha_publicacion=comunicado.fecha_publicacion,
+                    fecha_expiracion=comunicado.fecha_expiracion,
+                )
+                for usuario_id in nuevos[inicio:inicio + TAMANO_LOTE]
+            ],
+            ignore_conflicts=True,
+        )
+        if progreso is not None:
+            progreso(int(99 * min(inicio + TAMANO_LOTE, len(nuevos)) / len(nuevos)))
+    return Reparto(len(nuevos), len(sobrantes), len(deseados))
+
+
+# ========================================================
+# Consultas del buzón
+# ========================================================
+
+def bandeja(usuario, hoy=None):
+    """Comunicados vigentes de `usuario`, los más recientes primero (orden de Meta, apto para keyset)."""
+    hoy = hoy or timezone.localdate()
+    return BuzonComunicado.objects.filter(usuario=usuario, fecha_expiracion__gte=hoy).select_related(
+        'comunicado__publicado_por'
+    )
+
+
+def no_leidos(usuario, hoy=None):
+    hoy = hoy or timezone.localdate()
+    return BuzonComunicado.objects.filter(
+        usuario=usuario, fecha_lectura__isnull=True, fecha_expiracion__gte=hoy,
+    ).count()
+
+
+def marcar_leido(usuario, comunicado):
+    """Marca la entrega como leída; no hace nada si ya lo estaba o el usuario no la recibió."""
+    return BuzonComunicado.objects.filter(
+        usuario=usuario, comunicado=comunicado, fecha_lectura__isnull=True,
+    ).update(fecha_lectura=timezone.now())
+
+
+def purgar_vencidos(hoy=None):
+    """Borra las entregas de comunicados ya expirados. Devuelve cuántas."""
+    hoy = hoy or timezone.localdate()
+    borradas, _ = BuzonComunicado.objects.filter(fecha_expiracion__lt=hoy).delete()
+    return borradas
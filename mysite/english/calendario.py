@@ -0,0 +1,134 @@
+"""
+Eventos del calendario institucional como JSON para FullCalendar.
+
+La página del calendario ya no incluye los eventos: el calendario pide
+`?start=...&end=...` con la ventana visible (y opcionalmente `tipo`, `grupo` y
+`participante`, repetibles) y se responden solo los eventos que se cruzan con
+ella, usando el índice (fecha_inicio, fecha_fin). Cada evento va con lo mínimo
+(id, título, fechas, tipo y prioridad); la página arma el enlace al detalle a
+partir del id.
+
+El ETag sale de una versión en la caché compartida que las señales cambian
+cuando se guarda o elimina un evento o cambian sus grupos o participantes, más
+la ventana y los filtros: volver a un mes ya visto responde 304 sin consultar
+la base de datos. Los `update()` sobre querysets de eventos no envían señales y
+deben llamar a `invalidar`.
+"""
+import datetime
+import hashlib
+import json
+import uuid
+
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import quote_etag
+
+from .descargas import cabeceras_privadas
+from .models import Evento
+
+CLAVE_VERSION = 'calendario:version'
+# Más que la vista de un año en lista; evita pedir todo el historial de una vez
+MAXIMO_DIAS = 400
+TAMANO_BLOQUE = 500
+CAMPOS = ('id', 'titulo', 'fecha_inicio', 'fecha_fin', 'tipo', 'prioridad')
+
+
+def version():
+    actual = cache.get(CLAVE_VERSION)
+    if actual is None:
+        cache.add(CLAVE_VERSION, uuid.uuid4().hex, None)
+        actual = cache.get(CLAVE_VERSION)
+    return actual
+
+
+def invalidar():
+    """Cambia los ETag de todas las ventanas del calendario."""
+    cache.set(CLAVE_VERSION, uuid.uuid4().hex, None)
+
+
+def _fecha(valor):
+    # En la URL el '+' de la zona horaria llega como espacio si no se codificó
+    valor = (valor or '').strip().replace(' ', '+')
+    fecha = parse_datetime(valor)
+    if fecha is None:
+        dia = parse_date(valor)
+        if dia is None:
+            raise ValueError(f"Fecha inválida: {valor!r}")
+        fecha = datetime.datetime.combine(dia, datetime.time.min)
+    return timezone.make_aware(fecha) if timezone.is_naive(fecha) else fecha
+
+
+def ventana(parametros):
+    """(inicio, fin, filtros) de la petición; ValueError si no son válidos."""
+    inicio, fin = _fecha(parametros.get('start')), _fecha(parametros.get('end'))
+    if fin <= inicio:
+        raise ValueError("La ventana termina antes de empezar")
+    if fin - inicio > datetime.timedelta(days=MAXIMO_DIAS):
+        raise ValueError(f"La ventana supera {MAXIMO_DIAS} días")
+
+    tipos_validos = dict(Evento.TIPO_CHOICES)
+    tipos = sorted(set(parametros.getlist('tipo')))
+    if any(tipo not in tipos_validos for tipo in tipos):
+        raise ValueError("Tipo de evento inválido")
+    filtros = {
+        'tipo': tipos,
+        'grupo': sorted({int(valor) for valor in parametros.getlist('grupo')}),
+        'participante': sorted({int(valor) for valor in parametros.getlist('participante')}),
+    }
+    return inicio, fin, filtros
+
+
+def eventos(inicio, fin, tipo=(), grupo=(), participante=()):
+    """Eventos que se cruzan con [inicio, fin), por fecha de inicio."""
+    queryset = Evento.objects.filter(fecha_inicio__lt=fin, fecha_fin__gt=inicio)
+    if tipo:
+        queryset = queryset.filter(tipo__in=tipo)
+    # Con EXISTS un evento de varios grupos o participantes no se repite
+    if grupo:
+        queryset = queryset.filter(Exists(
+            Evento.grupos.through.objects.filter(evento_id=OuterRef('pk'), grupo_id__in=grupo)
+        ))
+    if participante:
+        queryset = queryset.filter(Exists(
+            Evento.participantes.through.objects.filter(evento_id=OuterRef('pk'), user_id__in=participante)
+        ))
+    return queryset.order_by('fecha_inicio', 'id')
+
+
+def etag(inicio, fin, filtros):
+    clave = json.dumps([version(), inicio.isoformat(), fin.isoformat(), filtros], sort_keys=True)
+    return quote_etag(hashlib.sha256(clave.encode()).hexdigest()[:32])
+
+
+def _json(queryset):
+    yield '['
+    separador = ''
+    for pk, titulo, fecha_inicio, fecha_fin, tipo, prioridad in queryset.values_list(*CAMPOS).iterator(
+        chunk_size=TAMANO_BLOQUE
+    ):
+        evento = {
+            'id': pk, 'title': titulo, 'start': fecha_inicio.isoformat(), 'end': fecha_fin.isoformat(),
+            'tipo': tipo, 'prioridad': prioridad,
+        }
+        yield separador + json.dumps(evento, ensure_ascii=False, separators=(',', ':'))
+        separador = ','
+    yield ']'
+
+
+def respuesta_feed(request):
+    """Respuesta JSON de EventoCalendarioFeedView."""
+    try:
+        inicio, fin, filtros = ventana(request.GET)
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+
+    # La versión se lee antes que los eventos: un cambio entre ambos solo obliga a repetir la consulta
+    actual = etag(inicio, fin, filtros)
+    response = get_conditional_response(request, etag=actual)
+    if response is None:
+        response = StreamingHttpResponse(_json(eventos(inicio, fin, **filtros)), content_type='application/json')
+    return cabeceras_privadas(response, actual)
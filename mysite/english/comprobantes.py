@@ -0,0 +1,364 @@
+"""
+PDF de facturas, recibos de cobro y comprobantes de egreso, con caché.
+
+Cada comprobante se dibuja a partir de un diccionario con exactamente lo que
+aparece en el papel. La huella (sha256) de ese diccionario identifica el PDF en
+la caché y sirve de ETag: si el documento no cambió, no se vuelve a ejecutar
+reportlab y el navegador recibe un 304. La caché guarda además, por objeto, la
+última huella calculada; las señales la borran cuando cambian la factura, el
+cobro, el egreso, sus ítems o pagos, o los nombres del estudiante, y la
+siguiente descarga la recalcula con las dos consultas del detalle.
+
+Para imprimir muchos comprobantes a la vez (`generar_lote`, el comando
+`imprimir_comprobantes`) se cargan con la misma consulta del detalle por
+bloques y se dibujan todos en un PDF de varias páginas o en un ZIP con un PDF
+por comprobante. El diseño de las páginas está en `diseno_pdf`.
+"""
+import datetime
+import hashlib
+import io
+import json
+import tempfile
+import zipfile
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from reportlab.lib.units import cm
+
+from . import consultas, diseno_pdf
+from .descargas import cabeceras_privadas
+from .models import ConfiguracionInstituto
+from .diseno_pdf import campos, espacio, moneda, subtitulo, tabla, titulo, totales
+
+ALIAS_CACHE = 'comprobantes'
+# Cambiarla invalida todos los PDF guardados (por ejemplo al cambiar el diseño)
+VERSION_DISENO = 2
+# Respaldo para los cambios que no pasan por señales (update(), nombres de conceptos)
+DURACION_HUELLA = 60 * 60
+
+
+def _cache():
+    return caches[ALIAS_CACHE if ALIAS_CACHE in settings.CACHES else DEFAULT_CACHE_ALIAS]
+
+
+# ========================================================
+# Contenido de cada comprobante
+# ========================================================
+
+def datos_factura(factura):
+    return {
+        'consecutivo': factura.consecutivo,
+        'estudiante': factura.estudiante.nombre_completo,
+        'fecha_emision': factura.fecha_emision,
+        'fecha_vencimiento': factura.fecha_vencimiento,
+        'items': [(item.concepto.nombre, item.valor_total) for item in factura.items.all()],
+        'subtotal': factura.subtotal,
+        'descuento': factura.descuento,
+        'iva': factura.iva,
+        'total': factura.total,
+        'saldo': factura.saldo,
+    }
+
+
+def datos_cobro(cobro):
+    return {
+        'consecutivo': cobro.consecutivo,
+        'factura': cobro.factura.consecutivo,
+        'estudiante': cobro.factura.estudiante.nombre_completo,
+        'fecha': cobro.fecha,
+        'valor_total': cobro.valor_total,
+        'saldo': cobro.saldo,
+        'pagos': [(pago.get_metodo_pago_display(), pago.valor) for pago in cobro.pagos.all()],
+    }
+
+
+def datos_egreso(egreso):
+    return {
+        'consecutivo': egreso.consecutivo,
+        'concepto': egreso.concepto,
+        'beneficiario': egreso.beneficiario,
+        'fecha': egreso.fecha,
+        'valor_total': egreso.valor_total,
+        'detalles': [
+            (detalle.descripcion, detalle.cantidad, detalle.valor_unitario, detalle.valor_total)
+            for detalle in egreso.detalles.all()
+        ],
+    }
+
+
+# ========================================================
+# Diseño
+# ========================================================
+
+def contenido_factura(datos):
+    return [
+        titulo(f"Factura {datos['consecutivo']}"),
+        campos([
+            ('Estudiante', datos['estudiante']),
+            ('Fecha Emisión', datos['fecha_emision']),
+            ('Fecha Vencimiento', datos['fecha_vencimiento']),
+        ]),
+        espacio(),
+        tabla(['Concepto', 'Valor'], [(concepto, moneda(valor)) for concepto, valor in datos['items']],
+              anchos=[12 * cm, 5 * cm], numericas=(1,)),
+        espacio(),
+        totales([
+            ('Subtotal', datos['subtotal']),
+            ('Descuento', datos['descuento']),
+            ('IVA', datos['iva']),
+            ('TOTAL', datos['total']),
+            ('Saldo', datos['saldo']),
+        ], destacado='TOTAL'),
+    ]
+
+
+def contenido_cobro(datos):
+    return [
+        titulo(f"Recibo de Cobro {datos['consecutivo']}"),
+        campos([
+            ('Factura', datos['factura']),
+            ('Estudiante', datos['estudiante']),
+            ('Fecha', datos['fecha']),
+        ]),
+        espacio(),
+        subtitulo("Detalles de Pagos"),
+        tabla(['Método de pago', 'Valor'], [(metodo, moneda(valor)) for metodo, valor in datos['pagos']],
+              anchos=[12 * cm, 5 * cm], numericas=(1,)),
+        espacio(),
+        totales([('Valor Total', datos['valor_total']), ('Saldo', datos['saldo'])], destacado='Valor Total'),
+    ]
+
+
+def contenido_egreso(datos):
+    return [
+        titulo(f"Comprobante de Egreso {datos['consecutivo']}"),
+        campos([
+            ('Concepto', datos['concepto']),
+            ('Beneficiario', datos['beneficiario']),
+            ('Fecha', datos['fecha']),
+        ]),
+        espacio(),
+        tabla(
+            ['Descripción', 'Cantidad', 'Valor unitario', 'Valor total'],
+            [
+                (descripcion, cantidad, moneda(valor_unitario), moneda(valor_total))
+                for descripcion, cantidad, valor_unitario, valor_total in datos['detalles']
+            ],
+            anchos=[8 * cm, 2 * cm, 3.5 * cm, 3.5 * cm], numericas=(1, 2, 3),
+        ),
+        espacio(),
+        totales([('Valor Total', datos['valor_total'])], destacado='Valor Total'),
+    ]
+
+
+def escribir_pdf(tipo, documentos, destino):
+    """
+    Escribe cada diccionario de `documentos` en el mismo PDF, cada uno desde
+    una página nueva. Devuelve (comprobantes, páginas).
+    """
+    comprobante = COMPROBANTES[tipo]
+    return diseno_pdf.escribir(destino, (
+        (diseno_pdf.encabezado(datos.get('instituto'), comprobante.titulo.format(**datos)), comprobante.contenido(datos))
+        for datos in documentos
+    ))
+
+
+def datos_comprobante(tipo, objeto, instituto=None):
+    """Lo que se imprime de `objeto`, incluido el encabezado del instituto."""
+    datos = COMPROBANTES[tipo].datos(objeto)
+    datos['instituto'] = diseno_pdf.texto_instituto(ConfiguracionInstituto.obtener()) if instituto is None else instituto
+    return datos
+
+
+@dataclass(frozen=True)
+class Comprobante:
+    consulta: object
+    datos: object
+    contenido: object
+    titulo: str
+    prefijo_archivo: str
+
+    def nombre_archivo(self, objeto):
+        return f"{self.prefijo_archivo}_{objeto.consecutivo}.pdf"
+
+
+COMPROBANTES = {
+    'factura': Comprobante(consultas.factura_con_items, datos_factura, contenido_factura,
+                           'Factura {consecutivo}', 'factura'),
+    'cobro': Comprobante(consultas.cobro_con_pagos, datos_cobro, contenido_cobro,
+                         'Recibo de Cobro {consecutivo}', 'recibo'),
+    'egreso': Comprobante(consultas.egreso_con_detalles, datos_egreso, contenido_egreso,
+                          'Comprobante de Egreso {consecutivo}', 'egreso'),
+}
+
+
+# ========================================================
+# Caché
+# ========================================================
+
+@dataclass
+class PDFCacheado:
+    huella: str
+    modificado: object
+    nombre_archivo: str
+    contenido: bytes = None
+
+
+def calcular_huella(datos):
+    texto = json.dumps([VERSION_DISENO, datos], cls=DjangoJSONEncoder, sort_keys=True)
+    return hashlib.sha256(texto.encode()).hexdigest()
+
+
+def _clave_huella(tipo, pk):
+    return f"comprobante:{tipo}:{pk}"
+
+
+def _clave_pdf(tipo, pk, huella):
+    return f"comprobante:{tipo}:{pk}:{huella}"
+
+
+def invalidar(tipo, *pks):
+    """Olvida la última huella de los comprobantes; el PDF se conserva por si no cambió."""
+    if pks:
+        _cache().delete_many([_clave_huella(tipo, pk) for pk in pks])
+
+
+def obtener_pdf(tipo, pk, con_contenido=True):
+    """
+    PDF del comprobante `tipo` con llave `pk`. Si `con_contenido` es False y la
+    huella está en caché no se consulta la base de datos (para responder 304).
+    """
+    comprobante = COMPROBANTES[tipo]
+    cache = _cache()
+    guardado = cache.get(_clave_huella(tipo, pk))
+    if guardado is not None:
+        huella, modificado, nombre_archivo = guardado
+        if not con_contenido:
+            return PDFCacheado(huella, modificado, nombre_archivo)
+        entrada = cache.get(_clave_pdf(tipo, pk, huella))
+        if entrada is not None:
+            return PDFCacheado(huella, modificado, nombre_archivo, entrada[0])
+
+    consulta = comprobante.consulta()
+    try:
+        objeto = consulta.get(pk=pk)
+    except consulta.model.DoesNotExist:
+        raise Http404
+    datos = datos_comprobante(tipo, objeto)
+    huella = calcular_huella(datos)
+    nombre_archivo = comprobante.nombre_archivo(objeto)
+
+    # Con la misma huella el PDF guardado sigue sirviendo y conserva su fecha
+    entrada = cache.get(_clave_pdf(tipo, pk, huella))
+    if entrada is None:
+        destino = io.BytesIO()
+        escribir_pdf(tipo, [datos], destino)
+        entrada = (destino.getvalue(), timezone.now())
+        cache.set(_clave_pdf(tipo, pk, huella), entrada, None)
+    contenido, modificado = entrada
+    cache.set(_clave_huella(tipo, pk), (huella, modificado, nombre_archivo), DURACION_HUELLA)
+    return PDFCacheado(huella, modificado, nombre_archivo, contenido)
+
+
+def respuesta_pdf(request, tipo, pk):
+    """Descarga del comprobante con ETag y Last-Modified; responde 304 si el navegador ya lo tiene."""
+    condicional = 'HTTP_IF_NONE_MATCH' in request.META or 'HTTP_IF_MODIFIED_SINCE' in request.META
+    pdf = obtener_pdf(tipo, pk, con_contenido=not condicional)
+    etag = quote_etag(pdf.huella)
+    ultima_modificacion = int(pdf.modificado.timestamp())
+
+    response = get_conditional_response(request, etag=etag, last_modified=ultima_modificacion)
+    if response is None:
+        if pdf.contenido is None:
+            pdf = obtener_pdf(tipo, pk)
+            etag = quote_etag(pdf.huella)
+            ultima_modificacion = int(pdf.modificado.timestamp())
+        response = HttpResponse(pdf.contenido, content_type='application/pdf')
+        response['Content-Disposition'] = f'attachment; filename="{pdf.nombre_archivo}"'
+    return cabeceras_privadas(response, etag, ultima_modificacion)
+
+
+# ========================================================
+# Impresión por lotes
+# ========================================================
+
+# Comprobantes que se cargan (con sus hijos) por consulta
+TAMANO_LOTE = 500
+# Por encima de esta cantidad la vista genera el lote como tarea en segundo plano
+LIMITE_EN_LINEA = 300
+
+# Campo de cada filtro por tipo de comprobante
+FILTROS = {
+    'factura': {'fecha': 'fecha_emision', 'periodo': 'periodo_id', 'estado': 'estado'},
+    'cobro': {'fecha': 'fecha', 'periodo': 'periodo_academico_id', 'estado': 'estado'},
+    'egreso': {'fecha': 'fecha'},
+}
+
+FORMATOS_LOTE = {
+    'pdf': 'application/pdf',
+    'zip': 'application/zip',
+}
+
+
+def filtrar_lote(tipo, periodo=None, estado=None, desde=None, hasta=None):
+    """Comprobantes de `tipo` que cumplen los filtros; ValueError si alguno no aplica o no es válido."""
+    campos = FILTROS[tipo]
+    filtro = {}
+    for nombre, valor in (('periodo', periodo), ('estado', estado)):
+        if valor:
+            if nombre not in campos:
+                raise ValueError(f"Los comprobantes de {tipo} no se filtran por {nombre}")
+            filtro[campos[nombre]] = valor
+    if desde:
+        filtro[f"{campos['fecha']}__gte"] = datetime.date.fromisoformat(str(desde))
+    if hasta:
+        filtro[f"{campos['fecha']}__lte"] = datetime.date.fromisoformat(str(hasta))
+    return COMPROBANTES[tipo].consulta().filter(**filtro).order_by(campos['fecha'], 'pk')
+
+
+def documentos_lote(tipo, queryset):
+    """(nombre_archivo, datos) de cada comprobante; los hijos se traen por bloques de TAMANO_LOTE."""
+    comprobante = COMPROBANTES[tipo]
+    instituto = diseno_pdf.texto_instituto(ConfiguracionInstituto.obtener())
+    for objeto in queryset.iterator(chunk_size=TAMANO_LOTE):
+        yield comprobante.nombre_archivo(objeto), datos_comprobante(tipo, objeto, instituto)
+
+
+def pdfs_individuales(tipo, documentos):
+    """(nombre_archivo, bytes) con un PDF por comprobante. No consulta la base de datos."""
+    for nombre, datos in documentos:
+        contenido = io.BytesIO()
+        escribir_pdf(tipo, [datos], contenido)
+        yield nombre, contenido.getvalue()
+
+
+def escribir_zip(archivos, destino):
+    """Guarda los (nombre, bytes) en un ZIP y devuelve cuántos fueron."""
+    cantidad = 0
+    # Los PDF ya van comprimidos; volver a comprimirlos solo cuesta tiempo
+    with zipfile.ZipFile(destino, 'w', zipfile.ZIP_STORED) as archivo_zip:
+        for nombre, contenido in archivos:
+            archivo_zip.writestr(nombre, contenido)
+            cantidad += 1
+    return cantidad
+
+
+def generar_lote(tipo, queryset, formato):
+    """
+    Dibuja los comprobantes de `queryset` en un archivo temporal. Devuelve
+    (nombre_archivo, archivo abierto al inicio, cantidad).
+    """
+    documentos = documentos_lote(tipo, queryset)
+    archivo = tempfile.TemporaryFile()
+    if formato == 'zip':
+        cantidad = escribir_zip(pdfs_individuales(tipo, documentos), archivo)
+    else:
+        cantidad, _ = escribir_pdf(tipo, (datos for _, datos in documentos), archivo)
+    archivo.seek(0)
+    return f"{COMPROBANTES[tipo].prefijo_archivo}s.{formato}", archivo, cantidad
@@ -0,0 +1,166 @@
+"""
+Querysets de los listados y de las páginas de detalle.
+
+El __str__ de casi todos los modelos recorre llaves foráneas (la matrícula
+muestra al estudiante, el recibo a la factura y a su estudiante, el grupo a su
+curso), así que cada función trae esas relaciones en la misma consulta con
+select_related o prefetch_related. Los listados difieren las columnas de texto
+libre del estudiante relacionado, que ninguno muestra; las páginas de detalle
+las cargan todas. Las vistas y las pruebas de número de consultas usan estas
+mismas funciones.
+"""
+from django.db.models import Prefetch
+
+from .models import (
+    Acudiente, Asistencia, Auditoria, Backup, Calificacion, Cobro, Comunicado, Curso,
+    DocumentoEstudiante, DocumentoInstitucional, Egreso, Estudiante, Factura, Grupo,
+    Incidencia, ItemFactura, Matricula, ObservacionAcademica, ReporteEconomico,
+    ReporteProgramado,
+)
+
+
+# Columnas del estudiante sin límite de tamaño que los listados no muestran
+COLUMNAS_PESADAS_ESTUDIANTE = ['direccion', 'alergias', 'condiciones_especiales', 'busqueda']
+
+
+def sin_columnas_pesadas(relacion):
+    """Campos que se difieren del estudiante en `relacion` en los listados."""
+    return [f"{relacion}__{campo}" for campo in COLUMNAS_PESADAS_ESTUDIANTE]
+
+
+# ========================================================
+# Personas
+# ========================================================
+
+def estudiantes():
+    return Estudiante.objects.select_related('programa_actual', 'grupo_actual__curso')
+
+
+def acudientes():
+    return Acudiente.objects.select_related('estudiante').defer(*sin_columnas_pesadas('estudiante'))
+
+
+# ========================================================
+# Académico
+# ========================================================
+
+def cursos():
+    return Curso.objects.select_related('programa')
+
+
+def grupos():
+    return Grupo.objects.select_related('curso', 'docente')
+
+
+def matriculas():
+    return Matricula.objects.select_related(
+        'estudiante', 'programa', 'grupo__curso', 'periodo',
+    ).defer(*sin_columnas_pesadas('estudiante'))
+
+
+def matricula_detalle():
+    return matriculas().defer(None)
+
+
+def asistencias():
+    return Asistencia.objects.select_related(
+        'estudiante', 'grupo__curso',
+    ).defer(*sin_columnas_pesadas('estudiante'))
+
+
+def calificaciones():
+    return Calificacion.objects.select_related(
+        'estudiante', 'curso', 'grupo__curso', 'periodo', 'docente',
+    ).defer(*sin_columnas_pesadas('estudiante'))
+
+
+def observaciones():
+    return ObservacionAcademica.objects.select_related(
+        'estudiante', 'grupo__curso', 'docente',
+    ).defer(*sin_columnas_pesadas('estudiante'))
+
+
+# ========================================================
+# Financiero
+# ========================================================
+
+def facturas():
+    return Factura.objects.select_related('estudiante', 'periodo').defer(*sin_columnas_pesadas('estudiante'))
+
+
+def factura_con_items():
+    """Factura con sus ítems y el concepto de cada uno (detalle y PDF)."""
+    return facturas().defer(None).prefetch_related(
+        Prefetch('items', queryset=ItemFactura.objects.select_related('concepto')),
+    )
+
+
+def cobros():
+    return Cobro.objects.select_related(
+        'factura__estudiante', 'periodo_academico',
+    ).defer(*sin_columnas_pesadas('factura__estudiante'))
+
+
+def cobro_con_pagos():
+    return cobros().defer(None).prefetch_related('pagos')
+
+
+def egresos():
+    return Egreso.objects.select_related('aprobado_por')
+
+
+def egreso_con_detalles():
+    return egresos().prefetch_related('detalles')
+
+
+# ========================================================
+# Institucional y soporte
+# ========================================================
+
+def comunicados():
+    return Comunicado.objects.select_related('publicado_por')
+
+
+def documentos_institucionales():
+    return DocumentoInstitucional.objects.select_related('publicado_por')
+
+
+def documentos_estudiante():
+    return DocumentoEstudiante.objects.select_related(
+        'estudiante', 'subido_por',
+    ).defer(*sin_columnas_pesadas('estudiante'))
+
+
+def incidencias():
+    return Incidencia.objects.select_related(
+        'estudiante', 'grupo__curso', 'docente', 'reportado_por', 'responsable',
+    ).defer(*sin_columnas_pesadas('estudiante'))
+
+
+def incidencia_detalle():
+    return incidencias().defer(None)
+
+
+def seguimientos(incidencia):
+    # Por el manager inverso cada seguimiento ya conoce su incidencia
+    return incidencia.seguimientos.select_related('usuario')
+
+
+# ========================================================
+# Reportes y auditoría
+# ========================================================
+
+def reportes():
+    return ReporteEconomico.objects.select_related('generado_por')
+
+
+def reportes_programados():
+    return ReporteProgramado.objects.select_related('configuracion', 'creado_por')
+
+
+def auditorias():
+    return Auditoria.objects.select_related('usuario')
+
+
+def backups():
+    return Backup.objects.select_related('realizado_por')
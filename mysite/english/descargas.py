@@ -0,0 +1,158 @@
+"""
+Descarga de archivos de MEDIA_ROOT (documentos, copias de seguridad,
+resultados de tareas) después de que la vista comprobó los permisos.
+
+DESCARGAS_BACKEND elige quién envía los bytes:
+
+- 'django': el propio proceso, con soporte de Range (reanudar descargas y
+  saltar dentro de un PDF) e If-Range;
+- 'x-sendfile' (Apache mod_xsendfile, lighttpd) y 'x-accel-redirect' (nginx):
+  Django solo responde con las cabeceras y el servidor web envía el archivo,
+  Range incluido, sin ocupar un proceso de la aplicación. Para nginx,
+  DESCARGAS_ACCEL_PREFIJO es la location `internal` que apunta a MEDIA_ROOT.
+
+En todos los modos se responden aquí las peticiones condicionales (ETag a
+partir del tamaño y la fecha del archivo, Last-Modified): 304 si el navegador
+ya lo tiene.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe, quote_etag
+from django.utils.cache import get_conditional_response
+
+TAMANO_BLOQUE = 64 * 1024
+RANGO = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def cabeceras_privadas(response, etag, ultima_modificacion=None):
+    """
+    ETag, Last-Modified (segundos desde la época) y Cache-Control de una
+    respuesta que requiere sesión: el navegador la guarda pero debe
+    revalidarla cada vez.
+    """
+    response['ETag'] = etag
+    if ultima_modificacion is not None:
+        response['Last-Modified'] = http_date(ultima_modificacion)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _etag(estado):
+    return quote_etag(f"{estado.st_mtime_ns:x}-{estado.st_size:x}")
+
+
+def rango_solicitado(request, tamano, etag, modificado):
+    """
+    (inicio, fin) inclusivo del Range de la petición; None para enviar el
+    archivo completo (sin Range, con varios rangos o con un If-Range que ya no
+    corresponde) y ValueError si el rango no se puede satisfacer.
+    """
+    cabecera = request.META.get('HTTP_RANGE', '').strip()
+    coincidencia = RANGO.match(cabecera)
+    if not coincidencia or not any(coincidencia.groups()):
+        return None
+
+    si_rango = request.META.get('HTTP_IF_RANGE', '').strip()
+    if si_rango:
+        fecha = parse_http_date_safe(si_rango)
+        vigente = si_rango == etag if fecha is None else fecha == int(modificado)
+        if not vigente:
+            return None
+
+    inicio, fin = coincidencia.groups()
+    if not inicio:
+        # bytes=-N: los últimos N bytes
+        longitud = int(fin)
+        if longitud == 0 or tamano == 0:
+            raise ValueError("Rango vacío")
+        return max(tamano - longitud, 0), tamano - 1
+    inicio = int(inicio)
+    fin = min(int(fin), tamano - 1) if fin else tamano - 1
+    if inicio >= tamano or fin < inicio:
+        raise ValueError("Rango fuera del archivo")
+    return inicio, fin
+
+
+def _tramo(ruta, inicio, fin):
+    with open(ruta, 'rb') as archivo:
+        archivo.seek(inicio)
+        restante = fin - inicio + 1
+        while restante > 0:
+            bloque = archivo.read(min(TAMANO_BLOQUE, restante))
+            if not bloque:
+                break
+            restante -= len(bloque)
+            yield bloque
+
+
+# ========================================================
+# Backends
+# ========================================================
+
+def _servir_django(request, archivo, ruta, estado, etag):
+    try:
+        rango = rango_solicitado(request, estado.st_size, etag, estado.st_mtime)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f"bytes */{estado.st_size}"
+        return response
+
+    if rango is None:
+        # Completo: FileResponse usa wsgi.file_wrapper (sendfile) si el servidor lo ofrece
+        response = FileResponse(open(ruta, 'rb'))
+    else:
+        inicio, fin = rango
+        response = StreamingHttpResponse(_tramo(ruta, inicio, fin), status=206)
+        response['Content-Length'] = fin - inicio + 1
+        response['Content-Range'] = f"bytes {inicio}-{fin}/{estado.st_size}"
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def _servir_x_sendfile(request, archivo, ruta, estado, etag):
+    response = HttpResponse()
+    response['X-Sendfile'] = ruta
+    return response
+
+
+def _servir_x_accel(request, archivo, ruta, estado, etag):
+    response = HttpResponse()
+    prefijo = getattr(settings, 'DESCARGAS_ACCEL_PREFIJO', '/protegido/')
+    response['X-Accel-Redirect'] = quote(f"{prefijo.rstrip('/')}/{archivo.name}")
+    return response
+
+
+BACKENDS = {
+    'django': _servir_django,
+    'x-sendfile': _servir_x_sendfile,
+    'x-accel-redirect': _servir_x_accel,
+}
+
+
+def respuesta_archivo(request, archivo, nombre=None, as_attachment=True):
+    """Respuesta para descargar `archivo` (un FieldFile en el almacenamiento local)."""
+    if not archivo:
+        raise Http404("No hay archivo")
+    ruta = archivo.path
+    try:
+        estado = os.stat(ruta)
+    except FileNotFoundError:
+        raise Http404("El archivo no existe")
+    etag = _etag(estado)
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(estado.st_mtime))
+    if response is None:
+        backend = BACKENDS[getattr(settings, 'DESCARGAS_BACKEND', 'django')]
+        response = backend(request, archivo, ruta, estado, etag)
+        if response.status_code != 416:
+            nombre = nombre or os.path.basename(archivo.name)
+            # Un .tar.gz se descarga tal cual, no como un tar que el navegador descomprime
+            tipo, codificacion = mimetypes.guess_type(nombre)
+            response['Content-Type'] = tipo if tipo and not codificacion else 'application/octet-stream'
+            response['Content-Disposition'] = content_disposition_header(as_attachment, nombre)
+    return cabeceras_privadas(response, etag, estado.st_mtime)
@@ -0,0 +1,153 @@
+"""
+Diseño común de los PDF (comprobantes y reportes económicos) con platypus.
+
+Cada documento es una lista de flowables armada con las funciones de este
+módulo: título, campos, tablas y totales. Platypus pasa a la página siguiente
+cuando el contenido no cabe y las tablas repiten su fila de encabezados en cada
+página. Todas las páginas llevan el título del documento y su número de página
+dentro del documento, también cuando se imprimen varios en un mismo PDF.
+"""
+from django.utils.html import escape
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import cm
+from reportlab.platypus import (
+    BaseDocTemplate, Flowable, Frame, PageBreak, PageTemplate, Paragraph, Spacer, Table, TableStyle,
+)
+
+ESTILOS = getSampleStyleSheet()
+ESTILO_CELDA = ParagraphStyle('celda', parent=ESTILOS['BodyText'], fontSize=9, leading=11)
+MARGEN = 2 * cm
+
+ESTILO_TABLA = [
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#dde4ee')),
+    ('LINEBELOW', (0, 0), (-1, 0), 0.75, colors.HexColor('#1f3a5f')),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f5f7fa')]),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+]
+
+
+def moneda(valor):
+    return f"${valor:,.2f}"
+
+
+def texto_instituto(configuracion):
+    """'Instituto · NIT 900123' para el encabezado de las páginas."""
+    partes = [configuracion.nombre_instituto, f"NIT {configuracion.nit}" if configuracion.nit else '']
+    return " · ".join(parte for parte in partes if parte)
+
+
+def encabezado(instituto, titulo_documento):
+    return " · ".join(parte for parte in (instituto, titulo_documento) if parte)
+
+
+def _parrafo(texto, estilo=ESTILO_CELDA):
+    return Paragraph(escape(str(texto)), estilo)
+
+
+# ========================================================
+# Bloques del documento
+# ========================================================
+
+def titulo(texto):
+    return Paragraph(escape(texto), ESTILOS['Title'])
+
+
+def subtitulo(texto):
+    return Paragraph(escape(texto), ESTILOS['Heading2'])
+
+
+def campos(pares):
+    """Etiqueta y valor, uno por fila (estudiante, fechas, período...)."""
+    filas = [[_parrafo(etiqueta, ESTILOS['Heading5']), _parrafo(valor)] for etiqueta, valor in pares]
+    return Table(filas, colWidths=[4.5 * cm, None], hAlign='LEFT', style=[
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 1),
+        ('TOPPADDING', (0, 0), (-1, -1), 1),
+    ])
+
+
+def tabla(encabezados, filas, anchos=None, numericas=(), ajustar=(0,)):
+    """
+    Tabla con encabezados que se repiten en cada página. Las columnas de
+    `ajustar` pasan a varias líneas si el texto no cabe; las de `numericas` se
+    alinean a la derecha.
+    """
+    datos = [list(encabezados)]
+    for fila in filas:
+        datos.append([_parrafo(valor) if i in ajustar else valor for i, valor in enumerate(fila)])
+    estilo = list(ESTILO_TABLA)
+    for columna in numericas:
+        estilo.append(('ALIGN', (columna, 0), (columna, -1), 'RIGHT'))
+    return Table(datos, colWidths=anchos, repeatRows=1, hAlign='LEFT', style=TableStyle(estilo))
+
+
+def totales(pares, destacado=None):
+    """Totales alineados a la derecha; la fila `destacado` (una etiqueta) va en negrita."""
+    filas = [[etiqueta, moneda(valor)] for etiqueta, valor in pares]
+    estilo = [('ALIGN', (0, 0), (-1, -1), 'RIGHT'), ('FONTSIZE', (0, 0), (-1, -1), 10)]
+    for i, (etiqueta, _) in enumerate(pares):
+        if etiqueta == destacado:
+            estilo += [('FONTNAME', (0, i), (-1, i), 'Helvetica-Bold'), ('LINEABOVE', (0, i), (-1, i), 0.75, colors.black)]
+    return Table(filas, colWidths=[4 * cm, 4 * cm], hAlign='RIGHT', style=estilo)
+
+
+def espacio(alto=0.4 * cm):
+    return Spacer(1, alto)
+
+
+# ========================================================
+# Armado
+# ========================================================
+
+class InicioDocumento(Flowable):
+    """Marca sin tamaño: desde su página, el encabezado muestra `titulo` y la numeración vuelve a 1."""
+
+    def __init__(self, titulo):
+        super().__init__()
+        self.titulo = titulo
+
+    def wrap(self, ancho, alto):
+        return 0, 0
+
+    def draw(self):
+        self.canv._documento_actual = (self.titulo, self.canv.getPageNumber())
+
+
+def _encabezado_y_pie(lienzo, doc):
+    # Se dibuja al terminar la página, cuando la marca del documento ya se leyó
+    titulo_documento, primera = getattr(lienzo, '_documento_actual', ('', 1))
+    ancho, alto = doc.pagesize
+    lienzo.saveState()
+    lienzo.setFont('Helvetica', 8)
+    lienzo.setFillColor(colors.grey)
+    lienzo.drawString(MARGEN, alto - MARGEN / 2, titulo_documento)
+    lienzo.drawRightString(ancho - MARGEN, MARGEN / 2, f"Página {lienzo.getPageNumber() - primera + 1}")
+    lienzo.restoreState()
+
+
+def escribir(destino, documentos, titulo_pdf=''):
+    """
+    Escribe en `destino` cada (titulo, flowables) de `documentos`, empezando
+    cada uno en una página nueva. Devuelve (documentos, páginas).
+    """
+    historia = []
+    cantidad = 0
+    for titulo_documento, contenido in documentos:
+        if cantidad:
+            historia.append(PageBreak())
+        historia.append(InicioDocumento(titulo_documento))
+        historia.extend(contenido)
+        cantidad += 1
+
+    doc = BaseDocTemplate(
+        destino, pagesize=letter, title=titulo_pdf,
+        leftMargin=MARGEN, rightMargin=MARGEN, topMargin=MARGEN, bottomMargin=MARGEN,
+    )
+    marco = Frame(doc.leftMargin, doc.bottomMargin, doc.width, doc.height, id='contenido')
+    doc.addPageTemplates([PageTemplate(id='pagina', frames=[marco], onPageEnd=_encabezado_y_pie)])
+    doc.build(historia or [Spacer(1, 0)])
+    return cantidad, doc.page
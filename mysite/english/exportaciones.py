@@ -0,0 +1,168 @@
+"""
+Exportación de datos sin cargar la tabla completa en memoria.
+
+Las filas se leen con values_list e iterator(). CSV y JSONL se envían con
+StreamingHttpResponse a medida que se leen; para Excel se escriben en un libro
+de openpyxl en modo solo escritura sobre un temporal que luego se entrega con
+FileResponse.
+"""
+import csv
+import datetime
+import json
+import tempfile
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Case, Q, Value, When
+from django.db.models.functions import ExtractYear
+from django.http import FileResponse, StreamingHttpResponse
+from openpyxl import Workbook
+
+from .models import Estudiante
+
+TAMANO_LOTE = 2000
+
+FORMATOS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+ENCABEZADOS_ESTUDIANTES = [
+    'ID', 'Identificación', 'Nombres', 'Apellidos', 'Fecha Nacimiento', 'Edad',
+    'Estado', 'Programa', 'Grupo', 'Dirección', 'Teléfono', 'Correo'
+]
+
+
+def edad_en_sql(campo='fecha_nacimiento', hoy=None):
+    """Expresión que calcula la edad en años cumplidos dentro de la consulta."""
+    hoy = hoy or datetime.date.today()
+    cumple_despues = (
+        Q(**{f'{campo}__month__gt': hoy.month}) |
+        Q(**{f'{campo}__month': hoy.month, f'{campo}__day__gt': hoy.day})
+    )
+    return (
+        Value(hoy.year) - ExtractYear(campo) -
+        Case(When(cumple_despues, then=Value(1)), default=Value(0))
+    )
+
+
+def filas_estudiantes(queryset=None):
+    queryset = Estudiante.objects.all() if queryset is None else queryset
+    estados = dict(Estudiante.ESTADO_CHOICES)
+    filas = queryset.annotate(edad_calculada=edad_en_sql()).values_list(
+        'id', 'identificacion', 'primer_nombre', 'segundo_nombre', 'primer_apellido', 'segundo_apellido',
+        'fecha_nacimiento', 'edad_calculada', 'estado', 'programa_actual__nombre', 'grupo_actual__codigo',
+        'direccion', 'telefono_principal', 'correo',
+    ).iterator(chunk_size=TAMANO_LOTE)
+    for (pk, identificacion, primer_nombre, segundo_nombre, primer_apellido, segundo_apellido,
+         fecha_nacimiento, edad, estado, programa, grupo, direccion, telefono, correo) in filas:
+        yield [
+            pk,
+            identificacion,
+            f"{primer_nombre} {segundo_nombre or ''}",
+            f"{primer_apellido} {segundo_apellido or ''}",
+            fecha_nacimiento,
+            edad,
+            estados.get(estado, estado),
+            programa or '',
+            grupo or '',
+            direccion,
+            telefono,
+            correo,
+        ]
+
+
+def exportar_xlsx(titulo, encabezados, filas):
+    """
+    Escribe las filas en un libro en modo solo escritura y devuelve un archivo
+    temporal abierto, posicionado al inicio, listo para FileResponse.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(titulo)
+    ws.append(encabezados)
+    for fila in filas:
+        ws.append(fila)
+
+    archivo = tempfile.TemporaryFile()
+    wb.save(archivo)
+    archivo.seek(0)
+    return archivo
+
+
+class Columna:
+    """
+    Columna de una exportación. `campo` es una ruta de values_list (por ejemplo
+    'factura__estudiante__identificacion'); las llaves foráneas se resuelven con
+    JOIN en la misma consulta. Si se indican `opciones`, se exporta el texto de
+    la opción en lugar del valor guardado.
+    """
+
+    def __init__(self, encabezado, campo, opciones=None):
+        self.encabezado = encabezado
+        self.campo = campo
+        self.opciones = dict(opciones) if opciones else None
+
+    def formatear(self, valor):
+        if self.opciones is not None:
+            return self.opciones.get(valor, valor)
+        return valor
+
+
+def filas_columnas(queryset, columnas):
+    filas = queryset.values_list(*[c.campo for c in columnas]).iterator(chunk_size=TAMANO_LOTE)
+    for fila in filas:
+        yield [columna.formatear(valor) for columna, valor in zip(columnas, fila)]
+
+
+class _Eco:
+    """Objeto tipo archivo que devuelve lo escrito, para usar csv.writer en streaming."""
+
+    def write(self, valor):
+        return valor
+
+
+def _lineas_csv(encabezados, filas):
+    writer = csv.writer(_Eco())
+    yield writer.writerow(encabezados)
+    for fila in filas:
+        yield writer.writerow(fila)
+
+
+def _lineas_jsonl(encabezados, filas):
+    for fila in filas:
+        yield json.dumps(dict(zip(encabezados, fila)), cls=DjangoJSONEncoder, ensure_ascii=False) + "\n"
+
+
+def respuesta_exportacion(queryset, columnas, formato, nombre):
+    encabezados = [c.encabezado for c in columnas]
+    filas = filas_columnas(queryset, columnas)
+    nombre_archivo = f"{nombre}.{formato}"
+
+    if formato == 'xlsx':
+        archivo = exportar_xlsx(nombre[:31], encabezados, filas)
+        return FileResponse(archivo, as_attachment=True, filename=nombre_archivo, content_type=FORMATOS[formato])
+
+    lineas = _lineas_csv(encabezados, filas) if formato == 'csv' else _lineas_jsonl(encabezados, filas)
+    response = StreamingHttpResponse(lineas, content_type=f"{FORMATOS[formato]}; charset=utf-8")
+    response['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
+    return response
+
+
+class ExportacionMixin:
+    """
+    Permite descargar el resultado filtrado de un ListView con
+    ?exportar=csv|jsonl|xlsx, usando el mismo get_queryset de la vista.
+    """
+    columnas_exportacion = []
+    nombre_exportacion = None
+
+    def get(self, request, *args, **kwargs):
+        formato = request.GET.get('exportar')
+        if formato in FORMATOS and self.columnas_exportacion:
+            return respuesta_exportacion(
+                self.get_queryset(),
+                self.columnas_exportacion,
+                formato,
+                self.nombre_exportacion or self.model._meta.model_name,
+            )
+        return super().get(request, *args, **kwargs)
@@ -0,0 +1,147 @@
+"""
+Facturación masiva por período académico.
+
+Se reservan los consecutivos por bloques, los valores se calculan en memoria a
+partir del concepto y de la configuración del instituto, y las facturas con sus
+ítems se insertan con bulk_create por lotes. Cada reserva se confirma en su
+propia transacción corta antes de armar el lote, para no retener el bloqueo del
+consecutivo mientras los cajeros facturan; cada lote se inserta en otra. Si un
+lote falla quedan facturados los anteriores (repetir el proceso los omite) y se
+pierden los números reservados para ese lote.
+"""
+import datetime
+from decimal import Decimal, ROUND_HALF_UP
+
+from django import forms
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import (
+    ConceptoCobro, ConfiguracionInstituto, Consecutivo, Factura, ItemFactura, Matricula, PeriodoAcademico,
+)
+
+DIAS_VENCIMIENTO = 30
+TAMANO_LOTE = 500
+CENTAVOS = Decimal('0.01')
+
+
+def calcular_valores(concepto, configuracion, porcentaje_descuento=0):
+    """Devuelve (subtotal, descuento, iva, total) de una unidad del concepto."""
+    subtotal = concepto.valor
+    descuento = Decimal(0)
+    if concepto.aplica_descuento and porcentaje_descuento:
+        porcentaje = min(Decimal(str(porcentaje_descuento)), Decimal(str(configuracion.porcentaje_descuento_maximo)))
+        porcentaje = max(porcentaje, Decimal(0))
+        descuento = (subtotal * porcentaje / 100).quantize(CENTAVOS, ROUND_HALF_UP)
+    iva = Decimal(0)
+    if concepto.aplica_iva:
+        iva = ((subtotal - descuento) * Decimal(str(configuracion.iva)) / 100).quantize(CENTAVOS, ROUND_HALF_UP)
+    return subtotal, descuento, iva, subtotal - descuento + iva
+
+
+class FacturacionMasivaForm(forms.Form):
+    """Parámetros de GenerarFacturasMasivasView; se validan antes de encolar la tarea."""
+    periodo_id = forms.ModelChoiceField(PeriodoAcademico.objects.all())
+    concepto_id = forms.ModelChoiceField(ConceptoCobro.objects.all())
+    fecha_vencimiento = forms.DateField(required=False)
+    porcentaje_descuento = forms.DecimalField(required=False, min_value=0, max_digits=5, decimal_places=2)
+
+    def clean_porcentaje_descuento(self):
+        porcentaje = self.cleaned_data['porcentaje_descuento'] or Decimal(0)
+        maximo = ConfiguracionInstituto.obtener().porcentaje_descuento_maximo
+        if porcentaje > maximo:
+            raise forms.ValidationError(f"El descuento no puede pasar del {maximo}%")
+        return porcentaje
+
+    def parametros(self):
+        """Parámetros de la tarea 'facturacion_masiva' (se guardan como JSON)."""
+        datos = self.cleaned_data
+        return {
+            'periodo_id': datos['periodo_id'].pk,
+            'concepto_id': datos['concepto_id'].pk,
+            'fecha_vencimiento': datos['fecha_vencimiento'].isoformat() if datos['fecha_vencimiento'] else None,
+            'porcentaje_descuento': str(datos['porcentaje_descuento']),
+        }
+
+
+def generar_facturas_masivas(periodo, concepto, usuario, fecha_vencimiento=None,
+                             porcentaje_descuento=0, tamano_lote=TAMANO_LOTE):
+    """
+    Factura `concepto` a cada estudiante con matrícula activa en `periodo`.
+    Los estudiantes que ya tienen una factura del concepto en el período se
+    omiten, así que el proceso se puede repetir sin duplicar cobros, también
+    si dos ejecuciones se cruzan: cada lote se vuelve a comprobar con la fila
+    del concepto bloqueada.
+    Devuelve (creadas, omitidas).
+    """
+    configuracion = ConfiguracionInstituto.obtener()
+    fecha_vencimiento = fecha_vencimiento or timezone.localdate() + datetime.timedelta(days=DIAS_VENCIMIENTO)
+    subtotal, descuento, iva, total = calcular_valores(concepto, configuracion, porcentaje_descuento)
+
+    estudiantes = list(
+        Matricula.objects.filter(periodo=periodo, estado='activa')
+        .order_by('estudiante_id').values_list('estudiante_id', flat=True).distinct()
+    )
+    facturados = set(
+        ItemFactura.objects.filter(factura__periodo=periodo, concepto=concepto)
+        .values_list('factura__estudiante_id', flat=True)
+    )
+    pendientes = [estudiante_id for estudiante_id in estudiantes if estudiante_id not in facturados]
+
+    creadas = 0
+    for inicio in range(0, len(pendientes), tamano_lote):
+        lote = pendientes[inicio:inicio + tamano_lote]
+        consecutivos = Consecutivo.reservar_bloque('facturas', len(lote))
+        # Confirmada la reserva, el bloqueo del consecutivo ya se liberó
+        with transaction.atomic():
+            # Otra ejecución del mismo concepto (doble envío, tarea reanudada)
+            # pudo facturar a estos estudiantes después de la primera lectura.
+            # El UPDATE bloquea la fila del concepto hasta el final del lote, así
+            # que entre dos ejecuciones la segunda vuelve a leer ya con el lote
+            # de la primera confirmado. Si sobran números reservados se pierden.
+            ConceptoCobro.objects.filter(pk=concepto.pk).update(valor=F('valor'))
+            ya_facturados = set(
+                ItemFactura.objects.filter(
+                    factura__periodo=periodo, concepto=concepto, factura__estudiante_id__in=lote,
+                ).values_list('factura__estudiante_id', flat=True)
+            )
+            lote = [estudiante_id for estudiante_id in lote if estudiante_id not in ya_facturados]
+            consecutivos = consecutivos[:len(lote)]
+            if not lote:
+                continue
+            facturas = Factura.objects.bulk_create([
+                Factura(
+                    consecutivo=consecutivo,
+                    estudiante_id=estudiante_id,
+                    periodo=periodo,
+                    fecha_vencimiento=fecha_vencimiento,
+                    subtotal=subtotal,
+                    descuento=descuento,
+                    iva=iva,
+                    total=total,
+                    saldo=total,
+                    creada_por=usuario,
+                )
+                for estudiante_id, consecutivo in zip(lote, consecutivos)
+            ])
+            if facturas and facturas[0].pk is None:
+                # Motores que no devuelven las llaves en bulk_create
+                ids = dict(Factura.objects.filter(consecutivo__in=consecutivos).values_list('consecutivo', 'id'))
+                for factura in facturas:
+                    factura.pk = ids[factura.consecutivo]
+            ItemFactura.objects.bulk_create([
+                ItemFactura(
+                    factura_id=factura.pk,
+                    concepto=concepto,
+                    cantidad=1,
+                    valor_unitario=subtotal,
+                    descuento=descuento,
+                    iva=iva,
+                    valor_total=total,
+                )
+                for factura in facturas
+            ])
+            creadas += len(facturas)
+
+    return creadas, len(estudiantes) - creadas
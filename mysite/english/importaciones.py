@@ -0,0 +1,176 @@
+"""
+Importación de estudiantes desde CSV o Excel.
+
+El archivo se recorre fila por fila (openpyxl en modo solo lectura para Excel)
+y las filas válidas se guardan por lotes con bulk_create(update_conflicts=True)
+usando la identificación como llave, de modo que la memoria y el número de
+consultas por lote no dependen del tamaño del archivo.
+"""
+import csv
+import io
+from collections import Counter
+
+from django.core.exceptions import ValidationError
+from openpyxl import load_workbook
+
+from .models import Estudiante, Grupo, Programa
+
+TAMANO_LOTE = 500
+
+CAMPOS_OBLIGATORIOS = [
+    'tipo_identificacion', 'identificacion', 'primer_nombre', 'primer_apellido', 'fecha_nacimiento',
+    'genero', 'direccion', 'barrio', 'ciudad', 'departamento', 'telefono_principal', 'correo', 'fecha_ingreso',
+]
+
+CAMPOS_OPCIONALES = [
+    'segundo_nombre', 'segundo_apellido', 'lugar_nacimiento', 'telefono_alterno', 'estado',
+    'eps', 'grupo_sanguineo', 'alergias', 'condiciones_especiales',
+]
+
+# Campos que no se validan fila por fila porque requieren consultas
+CAMPOS_SIN_VALIDAR = ['programa_actual', 'grupo_actual', 'creado_por', 'foto']
+
+
+class ResultadoImportacion:
+    def __init__(self):
+        self.creados = 0
+        self.actualizados = 0
+        self.errores = []
+
+    def agregar_error(self, fila, mensaje):
+        self.errores.append((fila, mensaje))
+
+    @property
+    def procesados(self):
+        return self.creados + self.actualizados
+
+
+def _normalizar_encabezado(valor):
+    return str(valor or '').strip().lower().replace(' ', '_')
+
+
+def leer_filas(archivo):
+    """Genera (número de fila, dict) para cada fila de datos del archivo."""
+    if archivo.name.lower().endswith('.xlsx'):
+        wb = load_workbook(archivo, read_only=True, data_only=True)
+        try:
+            filas = wb.active.iter_rows(values_only=True)
+            encabezados = [_normalizar_encabezado(valor) for valor in next(filas, [])]
+            for numero, fila in enumerate(filas, start=2):
+                if any(valor not in (None, '') for valor in fila):
+                    yield numero, dict(zip(encabezados, fila))
+        finally:
+            wb.close()
+    else:
+        texto = io.TextIOWrapper(getattr(archivo, 'file', archivo), encoding='utf-8-sig', newline='')
+        lector = csv.reader(texto)
+        encabezados = [_normalizar_encabezado(valor) for valor in next(lector, [])]
+        for numero, fila in enumerate(lector, start=2):
+            if any(fila):
+                yield numero, dict(zip(encabezados, fila))
+
+
+def _codigos(modelo):
+    """{codigo: id}, omitiendo los códigos que no son únicos."""
+    filas = list(modelo.objects.values_list('codigo', 'id'))
+    repetidos = {codigo for codigo, veces in Counter(c for c, _ in filas).items() if veces > 1}
+    return {codigo: pk for codigo, pk in filas if codigo not in repetidos}
+
+
+def importar_estudiantes(archivo, usuario, tamano_lote=TAMANO_LOTE):
+    resultado = ResultadoImportacion()
+    programas = _codigos(Programa)
+    grupos = _codigos(Grupo)
+    lote = {}
+    campos_actualizables = None
+
+    for numero, datos in leer_filas(archivo):
+        if campos_actualizables is None:
+            faltantes = [campo for campo in CAMPOS_OBLIGATORIOS if campo not in datos]
+            if faltantes:
+                resultado.agregar_error(numero, f"Faltan columnas: {', '.join(faltantes)}")
+                break
+            campos_actualizables = _campos_actualizables(datos)
+
+        estudiante = _construir_estudiante(numero, datos, programas, grupos, usuario, resultado)
+        if estudiante is not None:
+            # Si la identificación se repite en el lote gana la última fila
+            lote[estudiante.identificacion] = estudiante
+        if len(lote) >= tamano_lote:
+            _guardar_lote(lote, campos_actualizables, resultado)
+            lote = {}
+
+    if lote:
+        _guardar_lote(lote, campos_actualizables, resultado)
+    return resultado
+
+
+def _construir_estudiante(numero, datos, programas, grupos, usuario, resultado):
+    valores = {}
+    for campo in CAMPOS_OBLIGATORIOS + CAMPOS_OPCIONALES:
+        if campo in datos:
+            valor = datos[campo]
+            if isinstance(valor, float) and valor.is_integer():
+                # Excel guarda identificaciones y teléfonos como números
+                valor = int(valor)
+            if isinstance(valor, int):
+                valor = str(valor)
+            valores[campo] = valor.strip() if isinstance(valor, str) else valor
+    if not valores.get('estado'):
+        valores['estado'] = 'activo'
+
+    errores = []
+    for campo, codigos in (('programa', programas), ('grupo', grupos)):
+        codigo = datos.get(campo)
+        if codigo in (None, ''):
+            continue
+        codigo = str(codigo).strip()
+        if codigo not in codigos:
+            errores.append(f"{campo}: código '{codigo}' no existe o es ambiguo")
+        else:
+            valores[f'{campo}_actual_id'] = codigos[codigo]
+
+    estudiante = Estudiante(creado_por=usuario, **valores)
+    try:
+        estudiante.clean_fields(exclude=CAMPOS_SIN_VALIDAR)
+    except ValidationError as e:
+        errores.extend(
+            f"{campo}: {' '.join(mensajes)}" for campo, mensajes in e.message_dict.items()
+        )
+    if errores:
+        resultado.agregar_error(numero, '; '.join(errores))
+        return None
+    return estudiante
+
+
+def _campos_actualizables(datos):
+    """Solo se sobrescriben en estudiantes existentes las columnas que trae el archivo."""
+    campos = [
+        campo for campo in CAMPOS_OBLIGATORIOS + CAMPOS_OPCIONALES
+        if campo in datos and campo != 'identificacion'
+    ]
+    campos += [f'{campo}_actual' for campo in ('programa', 'grupo') if campo in datos]
+    return campos + ['busqueda', 'fecha_actualizacion']
+
+
+def _guardar_lote(lote, campos_actualizables, resultado):
+    # bulk_create no llama a save(), así que la columna de búsqueda se arma aquí,
+    # completando con lo guardado los nombres que el archivo no trae
+    existentes = {
+        fila['identificacion']: fila
+        for fila in Estudiante.objects.filter(identificacion__in=list(lote)).values(*Estudiante.CAMPOS_BUSQUEDA)
+    }
+    for identificacion, estudiante in lote.items():
+        guardado = existentes.get(identificacion, {})
+        for campo in Estudiante.CAMPOS_BUSQUEDA:
+            if campo in guardado and campo not in campos_actualizables:
+                setattr(estudiante, campo, guardado[campo])
+        estudiante.actualizar_busqueda()
+    Estudiante.objects.bulk_create(
+        list(lote.values()),
+        update_conflicts=True,
+        unique_fields=['identificacion'],
+        update_fields=campos_actualizables,
+    )
+    resultado.actualizados += len(existentes)
+    resultado.creados += len(lote) - len(existentes)
@@ -0,0 +1,71 @@
+import datetime
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from english import archivo
+
+# Consultas con las que se compara la tabla antes y después de archivar
+FILAS_PAGINA = 50
+
+
+class Command(BaseCommand):
+    help = (
+        "Mueve a archivos JSONL comprimidos, por año, las filas de auditoría, asistencia y "
+        "seguimientos de incidencias anteriores al horizonte, e informa el espacio y el tiempo ganados"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modelos', nargs='+', choices=list(archivo.ARCHIVABLES), default=list(archivo.ARCHIVABLES))
+        parser.add_argument('--dias', type=int, default=getattr(settings, 'ARCHIVO_HORIZONTE_DIAS', 730),
+                            help="Se archivan las filas con más de estos días")
+        parser.add_argument('--compactar', action='store_true',
+                            help="Ejecuta VACUUM al terminar para devolver el espacio al disco")
+        parser.add_argument('--simular', action='store_true', help="Solo cuenta las filas que se archivarían")
+
+    def handle(self, *args, **options):
+        corte = timezone.localdate() - datetime.timedelta(days=options['dias'])
+        nombres = options['modelos']
+        if options['simular']:
+            for nombre in nombres:
+                self.stdout.write(f"{nombre}: {archivo.pendientes(nombre, corte).count()} filas anteriores a {corte}")
+            return
+
+        antes = {nombre: self.medir(nombre) for nombre in nombres}
+        resultados = [archivo.archivar(nombre, corte) for nombre in nombres]
+        if options['compactar']:
+            archivo.compactar([archivo.ARCHIVABLES[nombre].modelo for nombre in nombres])
+
+        for resultado in resultados:
+            nombre = resultado.modelo
+            filas_antes, tamano_antes, conteo_antes, pagina_antes = antes[nombre]
+            filas_despues, tamano_despues, conteo_despues, pagina_despues = self.medir(nombre)
+            self.stdout.write(self.style.SUCCESS(
+                f"{nombre}: {resultado.filas} filas anteriores a {corte} en {resultado.partes} archivos "
+                f"({resultado.tamano / 1024:,.0f} KB comprimidos)"
+            ))
+            self.stdout.write(f"  filas en la tabla: {filas_antes} -> {filas_despues}")
+            if tamano_antes is not None:
+                self.stdout.write(
+                    f"  tamaño de la tabla: {tamano_antes / 1024:,.0f} KB -> {tamano_despues / 1024:,.0f} KB "
+                    f"({(tamano_antes - tamano_despues) / 1024:,.0f} KB liberados"
+                    f"{'' if options['compactar'] else ', reutilizables hasta compactar'})"
+                )
+            self.stdout.write(
+                f"  conteo: {conteo_antes * 1000:.1f} ms -> {conteo_despues * 1000:.1f} ms "
+                f"({conteo_antes / max(conteo_despues, 1e-9):.1f}x), "
+                f"primera página: {pagina_antes * 1000:.2f} ms -> {pagina_despues * 1000:.2f} ms"
+            )
+
+    def medir(self, nombre):
+        """(filas, bytes de la tabla, segundos del conteo, segundos de la primera página)."""
+        modelo = archivo.ARCHIVABLES[nombre].modelo
+        inicio = time.perf_counter()
+        filas = modelo.objects.count()
+        conteo = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        list(modelo.objects.all()[:FILAS_PAGINA])
+        pagina = time.perf_counter() - inicio
+        return filas, archivo.tamano_tabla(modelo), conteo, pagina
@@ -0,0 +1,111 @@
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db.models.signals import post_init
+from django.test import override_settings
+
+from english import auditoria
+from english.models import Auditoria, ConceptoCobro
+from english.signals import guardar_estado_inicial
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide cuánto agrega la auditoría a cada guardado, con escritura en segundo plano y en el momento, "
+        "y a la carga de los listados por la copia que se toma de cada instancia"
+    )
+
+    CODIGO_BENCHMARK = 'BENCH-AUD'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escrituras', type=int, default=2000)
+        parser.add_argument('--filas', type=int, default=5000, help="Filas que se cargan en el listado")
+        parser.add_argument('--pagina', type=int, default=50, help="Filas por página del listado")
+
+    def handle(self, *args, **options):
+        usuario, _ = User.objects.get_or_create(username='benchmark_auditoria')
+        concepto = ConceptoCobro.objects.create(
+            codigo=self.CODIGO_BENCHMARK, nombre='Benchmark', tipo='otros', valor=Decimal('0'),
+        )
+        escrituras = options['escrituras']
+        try:
+            base = self.medir(concepto.pk, escrituras, None)
+            self.reportar('sin auditoría', base, base)
+
+            asincrona = self.medir(concepto.pk, escrituras, usuario)
+            self.reportar('en segundo plano', asincrona, base)
+
+            with override_settings(AUDITORIA_ASINCRONA=False):
+                sincrona = self.medir(concepto.pk, escrituras, usuario)
+            self.reportar('en el momento', sincrona, base)
+
+            registros = Auditoria.objects.filter(usuario=usuario).count()
+            self.stdout.write(f"Registros de auditoría escritos: {registros} de {escrituras * 2}")
+
+            self.medir_listado(usuario, options['filas'], options['pagina'])
+        finally:
+            Auditoria.objects.filter(usuario=usuario).delete()
+            ConceptoCobro.objects.filter(codigo__startswith=self.CODIGO_BENCHMARK).delete()
+            usuario.delete()
+
+    def medir(self, pk, escrituras, usuario):
+        """Segundos por guardado de un concepto que cambia en cada escritura."""
+        def guardar():
+            concepto = ConceptoCobro.objects.get(pk=pk)
+            inicio = time.perf_counter()
+            for numero in range(escrituras):
+                concepto.valor = Decimal(numero)
+                concepto.save(update_fields=['valor'])
+            return (time.perf_counter() - inicio) / escrituras
+
+        if usuario is None:
+            return guardar()
+        # Al salir se escribe lo que el hilo no alcanzó; eso queda fuera de la medición
+        with auditoria.auditar_como(usuario):
+            return guardar()
+
+    def medir_listado(self, usuario, filas, pagina):
+        """Carga de páginas del listado sin la señal post_init, con ella fuera de contexto y auditando."""
+        ConceptoCobro.objects.bulk_create(
+            [
+                ConceptoCobro(codigo=f"{self.CODIGO_BENCHMARK}-{numero}", nombre='Benchmark', tipo='otros',
+                              valor=Decimal(numero))
+                for numero in range(filas)
+            ],
+            batch_size=1000,
+        )
+        queryset = ConceptoCobro.objects.filter(codigo__startswith=f"{self.CODIGO_BENCHMARK}-").order_by('pk')
+
+        def cargar():
+            inicio = time.perf_counter()
+            for desde in range(0, filas, pagina):
+                list(queryset[desde:desde + pagina])
+            return (time.perf_counter() - inicio) / filas
+
+        # Las variantes se alternan y se toma la mejor vuelta de cada una: la
+        # diferencia es pequeña frente al ruido
+        uid = f'auditoria_inicial_{ConceptoCobro.__name__}'
+        base = fuera = auditado = float('inf')
+        for _ in range(7):
+            post_init.disconnect(sender=ConceptoCobro, dispatch_uid=uid)
+            try:
+                base = min(base, cargar())
+            finally:
+                post_init.connect(guardar_estado_inicial, sender=ConceptoCobro, dispatch_uid=uid)
+            fuera = min(fuera, cargar())
+            with auditoria.auditar_como(usuario):
+                auditado = min(auditado, cargar())
+
+        self.stdout.write(f"Listado de {filas} filas en páginas de {pagina}:")
+        for nombre, segundos in [('sin post_init', base), ('sin contexto', fuera), ('auditando', auditado)]:
+            self.stdout.write(
+                f"{nombre:>17}: {segundos * 1e6:,.1f} µs por fila, {(segundos - base) * 1e6 * pagina:+,.0f} µs "
+                f"por página"
+            )
+
+    def reportar(self, nombre, segundos, base):
+        self.stdout.write(
+            f"{nombre:>17}: {segundos * 1e6:,.0f} µs por guardado, {(segundos - base) * 1e6:+,.0f} µs por la auditoría"
+        )
@@ -0,0 +1,90 @@
+import datetime
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from english.busqueda import autocompletar_estudiantes, buscar_estudiantes
+from english.models import Estudiante
+
+NOMBRES = ['María', 'José', 'Andrés', 'Sofía', 'Julián', 'Valentina', 'Sebastián', 'Camila', 'Martín', 'Lucía']
+APELLIDOS = ['Núñez', 'Peña', 'Gómez', 'Rodríguez', 'Muñoz', 'Díaz', 'Ramírez', 'Álvarez', 'Castaño', 'Suárez']
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide la búsqueda y el autocompletado de estudiantes. Los estudiantes de prueba "
+        "se crean dentro de una transacción que se revierte al final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cantidad', type=int, default=200000)
+        parser.add_argument('--repeticiones', type=int, default=20)
+        parser.add_argument('--comparar', action='store_true',
+                            help="Mide también los icontains que se usaban antes")
+
+    def handle(self, *args, **options):
+        consultas = ['nu', 'nunez', 'maria nun', 'sofia castano', '1003', 'zzz']
+        try:
+            with transaction.atomic():
+                inicio = time.perf_counter()
+                self.sembrar(options['cantidad'])
+                self.stdout.write(f"{options['cantidad']} estudiantes sembrados en {time.perf_counter() - inicio:.1f}s")
+
+                for q in consultas:
+                    self.medir(f"autocompletar {q!r}", options['repeticiones'],
+                               lambda: autocompletar_estudiantes(Estudiante.objects.all(), q))
+                    self.medir(f"listado {q!r}", options['repeticiones'],
+                               lambda: self.pagina(buscar_estudiantes(Estudiante.objects.all(), q)))
+                    if options['comparar']:
+                        self.medir(f"icontains {q!r}", options['repeticiones'],
+                                   lambda: self.pagina(Estudiante.objects.filter(
+                                       Q(primer_nombre__icontains=q) | Q(primer_apellido__icontains=q) |
+                                       Q(identificacion__icontains=q)
+                                   )))
+                raise Rollback
+        except Rollback:
+            pass
+
+    def sembrar(self, cantidad):
+        azar = random.Random(0)
+        Estudiante.objects.bulk_create(
+            [
+                self.estudiante(i, azar)
+                for i in range(cantidad)
+            ],
+            batch_size=2000,
+        )
+
+    def estudiante(self, i, azar):
+        estudiante = Estudiante(
+            tipo_identificacion='cc', identificacion=f"{1000000 + i}",
+            primer_nombre=azar.choice(NOMBRES), segundo_nombre=azar.choice(NOMBRES),
+            primer_apellido=azar.choice(APELLIDOS), segundo_apellido=azar.choice(APELLIDOS),
+            fecha_nacimiento=datetime.date(2000, 1, 1), genero='otro', direccion='Calle 1', barrio='Centro',
+            ciudad='Cali', departamento='Valle', telefono_principal='3000000000',
+            correo=f"bench{i}@example.com", fecha_ingreso=datetime.date(2024, 1, 1),
+        )
+        estudiante.actualizar_busqueda()
+        return estudiante
+
+    def pagina(self, queryset):
+        # Lo que consulta el listado paginado: el total y la primera página
+        return queryset.count(), list(queryset[:20])
+
+    def medir(self, etiqueta, repeticiones, funcion):
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            funcion()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        self.stdout.write(
+            f"{etiqueta:<28} mediana {statistics.median(tiempos):8.1f} ms, máximo {max(tiempos):8.1f} ms"
+        )
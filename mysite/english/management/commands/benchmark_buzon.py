@@ -0,0 +1,119 @@
+import datetime
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from english import buzon
+from english.models import BuzonComunicado, Comunicado, Estudiante
+
+FILAS_PAGINA = 20
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el reparto de un comunicado a los buzones y la consulta del buzón frente a calcular "
+        "los comunicados de cada usuario al vuelo. Los datos de prueba se revierten al final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--destinatarios', type=int, default=10000)
+        parser.add_argument('--historial', type=int, default=20,
+                            help="Comunicados anteriores repartidos a los mismos destinatarios")
+        parser.add_argument('--repeticiones', type=int, default=50)
+
+    def handle(self, *args, **options):
+        cantidad = options['destinatarios']
+        try:
+            with transaction.atomic():
+                autor = User.objects.create(username='benchmark_buzon')
+                self.sembrar(cantidad)
+                for numero in range(options['historial']):
+                    buzon.repartir(self.comunicado(autor, f"Anterior {numero}", dias=-numero))
+                self.stdout.write(
+                    f"{cantidad} destinatarios, {BuzonComunicado.objects.count()} entregas de "
+                    f"{options['historial']} comunicados anteriores"
+                )
+
+                comunicado = self.comunicado(autor, "Nuevo")
+                inicio = time.perf_counter()
+                reparto = buzon.repartir(comunicado)
+                segundos = time.perf_counter() - inicio
+                self.stdout.write(self.style.SUCCESS(
+                    f"reparto: {reparto.creadas} entregas en {segundos * 1000:,.0f} ms "
+                    f"({reparto.creadas / segundos:,.0f} filas/s)"
+                ))
+                inicio = time.perf_counter()
+                buzon.repartir(comunicado)
+                self.stdout.write(f"repetir el reparto sin cambios: {(time.perf_counter() - inicio) * 1000:,.0f} ms")
+
+                usuarios = list(User.objects.filter(username__startswith='buzon_')[:options['repeticiones']])
+                self.medir("buzón, página", usuarios, lambda usuario: list(buzon.bandeja(usuario)[:FILAS_PAGINA]))
+                self.medir("buzón, no leídos", usuarios, buzon.no_leidos)
+                self.medir("al vuelo, página", usuarios, lambda usuario: list(self.al_vuelo(usuario)[:FILAS_PAGINA]))
+                raise Rollback
+        except Rollback:
+            pass
+
+    def sembrar(self, cantidad):
+        Estudiante.objects.bulk_create(
+            [
+                Estudiante(
+                    tipo_identificacion='cc', identificacion=f"B{i}", primer_nombre='Ana', primer_apellido='Pérez',
+                    fecha_nacimiento=datetime.date(2000, 1, 1), genero='otro', direccion='Calle 1',
+                    barrio='Centro', ciudad='Cali', departamento='Valle', telefono_principal='3000000000',
+                    correo=f"buzon{i}@example.com", fecha_ingreso=datetime.date(2024, 1, 1),
+                )
+                for i in range(cantidad)
+            ],
+            batch_size=2000,
+        )
+        User.objects.bulk_create(
+            [User(username=f"buzon_{i}", email=f"Buzon{i}@example.com") for i in range(cantidad)],
+            batch_size=2000,
+        )
+
+    def comunicado(self, autor, titulo, dias=0):
+        comunicado = Comunicado.objects.create(
+            titulo=titulo, contenido='Contenido', destinatarios='estudiantes', publicado_por=autor,
+            fecha_expiracion=timezone.localdate() + datetime.timedelta(days=30),
+        )
+        if dias:
+            Comunicado.objects.filter(pk=comunicado.pk).update(
+                fecha_publicacion=comunicado.fecha_publicacion + datetime.timedelta(days=dias),
+            )
+            comunicado.refresh_from_db()
+        return comunicado
+
+    def al_vuelo(self, usuario):
+        """Lo que haría cada petición sin buzón: cruzar comunicados, grupos, matrículas y estudiantes."""
+        visibles = (
+            Q(destinatarios='todos', grupos_destino__isnull=True)
+            | Q(usuarios_destino=usuario)
+            | Q(grupos_destino__matricula__estudiante__correo__iexact=usuario.email,
+                grupos_destino__matricula__estado='activa')
+        )
+        if Estudiante.objects.filter(correo__iexact=usuario.email, estado='activo').exists():
+            visibles |= Q(destinatarios='estudiantes', grupos_destino__isnull=True)
+        return Comunicado.objects.filter(visibles, fecha_expiracion__gte=timezone.localdate()).distinct().select_related(
+            'publicado_por'
+        )
+
+    def medir(self, nombre, usuarios, consulta):
+        tiempos = []
+        for usuario in usuarios:
+            inicio = time.perf_counter()
+            consulta(usuario)
+            tiempos.append(time.perf_counter() - inicio)
+        self.stdout.write(
+            f"{nombre:>17}: mediana {statistics.median(tiempos) * 1000:.2f} ms, "
+            f"máximo {max(tiempos) * 1000:.2f} ms por usuario"
+        )
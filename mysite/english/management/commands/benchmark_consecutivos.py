@@ -0,0 +1,55 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from english.models import Consecutivo
+
+
+class Command(BaseCommand):
+    help = "Mide el rendimiento de Consecutivo.obtener_siguiente con varios escritores concurrentes"
+
+    TIPO_BENCHMARK = 'benchmark'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escritores', type=int, nargs='+', default=[1, 8, 32])
+        parser.add_argument('--operaciones', type=int, default=200,
+                            help="Consecutivos que solicita cada escritor")
+        parser.add_argument('--bloque', type=int, default=0,
+                            help="Si es mayor a cero, usa reservar_bloque con ese tamaño")
+
+    def handle(self, *args, **options):
+        try:
+            for escritores in options['escritores']:
+                self.ejecutar(escritores, options['operaciones'], options['bloque'])
+        finally:
+            Consecutivo.objects.filter(tipo=self.TIPO_BENCHMARK).delete()
+
+    def ejecutar(self, escritores, operaciones, bloque):
+        Consecutivo.objects.filter(tipo=self.TIPO_BENCHMARK).delete()
+
+        def escritor():
+            numeros = []
+            try:
+                if bloque:
+                    for _ in range(0, operaciones, bloque):
+                        numeros.extend(Consecutivo.reservar_bloque(self.TIPO_BENCHMARK, bloque))
+                else:
+                    for _ in range(operaciones):
+                        numeros.append(Consecutivo.obtener_siguiente(self.TIPO_BENCHMARK))
+            finally:
+                connection.close()
+            return numeros
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=escritores) as pool:
+            resultados = list(pool.map(lambda _: escritor(), range(escritores)))
+        duracion = time.perf_counter() - inicio
+
+        numeros = [numero for parcial in resultados for numero in parcial]
+        duplicados = len(numeros) - len(set(numeros))
+        self.stdout.write(
+            f"{escritores:>3} escritores: {len(numeros)} consecutivos en {duracion:.2f}s "
+            f"({len(numeros) / duracion:,.0f}/s), duplicados: {duplicados}"
+        )
@@ -0,0 +1,92 @@
+import datetime
+import io
+import resource
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from openpyxl import Workbook
+
+from english.exportaciones import ENCABEZADOS_ESTUDIANTES, exportar_xlsx, filas_estudiantes
+from english.models import Estudiante
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide memoria pico y tiempo al primer byte de la exportación de estudiantes. "
+        "Los estudiantes de prueba se crean dentro de una transacción que se revierte al final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cantidades', type=int, nargs='+', default=[1000, 10000, 100000])
+        parser.add_argument('--comparar', action='store_true',
+                            help="Mide también el libro en memoria que se usaba antes")
+
+    def handle(self, *args, **options):
+        for cantidad in options['cantidades']:
+            try:
+                with transaction.atomic():
+                    self.sembrar(cantidad)
+                    self.medir(f"{cantidad:>7} streaming", self.exportar_streaming)
+                    if options['comparar']:
+                        self.medir(f"{cantidad:>7} en memoria", self.exportar_en_memoria)
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def sembrar(self, cantidad):
+        Estudiante.objects.bulk_create(
+            [
+                Estudiante(
+                    tipo_identificacion='cc', identificacion=f"BENCH{i:08d}", primer_nombre='Nombre',
+                    primer_apellido=f"Apellido{i}", fecha_nacimiento=datetime.date(2000, 1, 1) + datetime.timedelta(days=i % 5000),
+                    genero='otro', direccion='Calle 1', barrio='Centro', ciudad='Cali', departamento='Valle',
+                    telefono_principal='3000000000', correo=f"bench{i}@example.com", fecha_ingreso=datetime.date(2024, 1, 1),
+                )
+                for i in range(cantidad)
+            ],
+            batch_size=1000,
+        )
+
+    def medir(self, etiqueta, exportar):
+        # El tiempo se mide sin tracemalloc, que vuelve lenta la ejecución
+        inicio = time.perf_counter()
+        archivo = exportar()
+        archivo.read(8192)
+        primer_byte = time.perf_counter() - inicio
+        archivo.close()
+
+        tracemalloc.start()
+        exportar().close()
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        self.stdout.write(
+            f"{etiqueta}: primer byte {primer_byte:.2f}s, memoria pico {pico / 1024 / 1024:.1f} MiB "
+            f"(RSS máximo del proceso {rss:.0f} MiB)"
+        )
+
+    def exportar_streaming(self):
+        return exportar_xlsx("Estudiantes", ENCABEZADOS_ESTUDIANTES, filas_estudiantes())
+
+    def exportar_en_memoria(self):
+        wb = Workbook()
+        ws = wb.active
+        ws.append(ENCABEZADOS_ESTUDIANTES)
+        for e in Estudiante.objects.all().select_related('programa_actual', 'grupo_actual'):
+            ws.append([
+                e.id, e.identificacion, f"{e.primer_nombre} {e.segundo_nombre or ''}",
+                f"{e.primer_apellido} {e.segundo_apellido or ''}", e.fecha_nacimiento, e.edad,
+                e.get_estado_display(), e.programa_actual.nombre if e.programa_actual else '',
+                e.grupo_actual.codigo if e.grupo_actual else '', e.direccion, e.telefono_principal, e.correo,
+            ])
+        archivo = io.BytesIO()
+        wb.save(archivo)
+        archivo.seek(0)
+        return archivo
@@ -0,0 +1,47 @@
+import datetime
+import io
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from english.comprobantes import escribir_pdf
+
+
+def factura_de_prueba(lineas):
+    valor = Decimal('125000.50')
+    return {
+        'consecutivo': 'F-000001',
+        'estudiante': 'María José Núñez Peña',
+        'fecha_emision': datetime.date(2024, 2, 1),
+        'fecha_vencimiento': datetime.date(2024, 2, 28),
+        'items': [(f"Concepto de cobro número {i + 1} del período académico", valor) for i in range(lineas)],
+        'subtotal': valor * lineas,
+        'descuento': Decimal(0),
+        'iva': Decimal(0),
+        'total': valor * lineas,
+        'saldo': valor * lineas,
+    }
+
+
+class Command(BaseCommand):
+    help = "Mide cuánto tarda en dibujarse una factura de 10, 100 y 1000 líneas. No usa la base de datos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lineas', type=int, nargs='+', default=[10, 100, 1000])
+        parser.add_argument('--repeticiones', type=int, default=5)
+
+    def handle(self, *args, **options):
+        for lineas in options['lineas']:
+            datos = factura_de_prueba(lineas)
+            tiempos = []
+            for _ in range(options['repeticiones']):
+                destino = io.BytesIO()
+                inicio = time.perf_counter()
+                _, paginas = escribir_pdf('factura', [datos], destino)
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            self.stdout.write(
+                f"{lineas:>5} líneas: {paginas:>3} páginas, {len(destino.getvalue()) / 1024:7.1f} KB, "
+                f"mediana {statistics.median(tiempos):8.1f} ms, máximo {max(tiempos):8.1f} ms"
+            )
@@ -0,0 +1,33 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from english.respaldos import crear_backup
+
+
+class Command(BaseCommand):
+    help = "Crea una copia de seguridad de la base de datos y de MEDIA_ROOT (para programarla con cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--incremental', action='store_true',
+                            help="Solo los archivos de media que cambiaron desde la última copia")
+        parser.add_argument('--usuario', required=True, help="Usuario a cuyo nombre queda la copia")
+        parser.add_argument('--descripcion', default='')
+
+    def handle(self, *args, **options):
+        try:
+            usuario = User.objects.get(username=options['usuario'])
+        except User.DoesNotExist:
+            raise CommandError(f"No existe el usuario {options['usuario']!r}")
+
+        inicio = time.perf_counter()
+        backup = crear_backup(
+            usuario, 'incremental' if options['incremental'] else 'completo', descripcion=options['descripcion'],
+        )
+        segundos = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"Copia {backup.pk} ({backup.tipo}): {len(backup.manifiesto['incluidos'])} de "
+            f"{len(backup.manifiesto['media'])} archivos de media, {backup.tamano / 1024 / 1024:.1f} MB "
+            f"en {segundos:.1f}s -> {backup.archivo.name}"
+        ))
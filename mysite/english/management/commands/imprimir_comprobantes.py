@@ -0,0 +1,80 @@
+import time
+from itertools import islice, repeat
+
+from django.core.management.base import BaseCommand, CommandError
+
+from english.procesos import grupo_de_procesos
+
+# Igual que en procesar_tareas, los procesos hijos importan este módulo antes
+# de configurar Django y los modelos se importan dentro de las funciones.
+
+TAMANO_BLOQUE = 100
+
+
+def _dibujar_bloque(tipo, bloque):
+    from english import comprobantes
+    return list(comprobantes.pdfs_individuales(tipo, bloque))
+
+
+def _bloques(documentos, tamano):
+    while bloque := list(islice(documentos, tamano)):
+        yield bloque
+
+
+class Command(BaseCommand):
+    help = (
+        "Imprime en un solo archivo las facturas, recibos o egresos que cumplen los filtros: "
+        "un PDF de varias páginas o un ZIP con un PDF por comprobante"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('tipo', choices=['factura', 'cobro', 'egreso'])
+        parser.add_argument('salida', help="Ruta del archivo que se genera")
+        parser.add_argument('--periodo', type=int)
+        parser.add_argument('--estado')
+        parser.add_argument('--desde', help="AAAA-MM-DD")
+        parser.add_argument('--hasta', help="AAAA-MM-DD")
+        parser.add_argument('--formato', choices=['pdf', 'zip'], default='pdf')
+        parser.add_argument('--procesos', type=int, default=2,
+                            help="Procesos que dibujan el ZIP; 0 lo dibuja en este mismo proceso")
+
+    def handle(self, *args, **options):
+        from english import comprobantes
+
+        tipo = options['tipo']
+        try:
+            queryset = comprobantes.filtrar_lote(
+                tipo, periodo=options['periodo'], estado=options['estado'],
+                desde=options['desde'], hasta=options['hasta'],
+            )
+        except ValueError as error:
+            raise CommandError(error)
+
+        inicio = time.perf_counter()
+        documentos = comprobantes.documentos_lote(tipo, queryset)
+        with open(options['salida'], 'wb') as salida:
+            if options['formato'] == 'pdf':
+                # Un solo documento: reportlab lo escribe en orden, en este proceso
+                cantidad, paginas = comprobantes.escribir_pdf(tipo, (datos for _, datos in documentos), salida)
+            else:
+                if options['procesos'] == 0:
+                    archivos = comprobantes.pdfs_individuales(tipo, documentos)
+                else:
+                    archivos = self.dibujar_en_grupo(tipo, documentos, options['procesos'])
+                cantidad = comprobantes.escribir_zip(archivos, salida)
+                paginas = None
+        segundos = max(time.perf_counter() - inicio, 1e-9)
+
+        if paginas is None:
+            ritmo = f"{cantidad / segundos:.0f} comprobantes/s"
+        else:
+            ritmo = f"{paginas} páginas, {paginas / segundos:.0f} páginas/s"
+        self.stdout.write(self.style.SUCCESS(
+            f"{cantidad} comprobantes en {segundos:.1f}s ({ritmo}) -> {options['salida']}"
+        ))
+
+    def dibujar_en_grupo(self, tipo, documentos, procesos):
+        # Las consultas se hacen aquí; los procesos solo reciben los datos de cada bloque
+        with grupo_de_procesos(procesos) as grupo:
+            for archivos in grupo.map(_dibujar_bloque, repeat(tipo), _bloques(documentos, TAMANO_BLOQUE)):
+                yield from archivos
@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from english import procesos
+
+# Los procesos hijos importan este módulo antes de configurar Django, por eso
+# la cola de tareas (que importa los modelos) se importa dentro de las funciones.
+
+
+def _ejecutar(pk):
+    from english import tareas
+    return tareas.ejecutar(pk)
+
+
+class Command(BaseCommand):
+    help = "Procesa las tareas en segundo plano guardadas en la base de datos"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--procesos', type=int, default=2,
+                            help="Tamaño del grupo de procesos; 0 ejecuta las tareas en este mismo proceso")
+        parser.add_argument('--intervalo', type=float, default=2.0,
+                            help="Segundos de espera cuando no hay tareas pendientes")
+        parser.add_argument('--una-vez', action='store_true',
+                            help="Termina cuando no quedan tareas pendientes")
+
+    def handle(self, *args, **options):
+        from english import tareas
+        self.tareas = tareas
+        if options['procesos'] == 0:
+            self.procesar_en_linea(options)
+        else:
+            self.procesar_en_grupo(options)
+
+    def procesar_en_linea(self, options):
+        while True:
+            close_old_connections()
+            self.tareas.reanudar_vencidas()
+            reclamadas = self.tareas.reclamar()
+            for pk in reclamadas:
+                self.informar((pk,), self.tareas.ejecutar(pk))
+            if not reclamadas:
+                if options['una_vez']:
+                    return
+                time.sleep(options['intervalo'])
+
+    def procesar_en_grupo(self, options):
+        procesos.atender(
+            options['procesos'], lambda libres: [(pk,) for pk in self.tareas.reclamar(libres)],
+            _ejecutar, self.informar, self.fallo, options['intervalo'], options['una_vez'],
+            antes=self.tareas.reanudar_vencidas,
+        )
+
+    def informar(self, trabajo, estado):
+        estilo = self.style.SUCCESS if estado == 'completada' else self.style.ERROR
+        self.stdout.write(estilo(f"Tarea {trabajo[0]}: {estado}"))
+
+    def fallo(self, trabajo, error):
+        # `ejecutar` atrapa los errores de la tarea: esto es el proceso que murió o no pudo empezar
+        pk, = trabajo
+        estado = self.tareas.devolver(pk, f"{type(error).__name__}: {error}")
+        if estado is not None:
+            self.informar(trabajo, estado)
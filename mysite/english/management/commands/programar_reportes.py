@@ -0,0 +1,68 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from english import procesos
+
+logger = logging.getLogger(__name__)
+
+# Igual que en procesar_tareas, los procesos hijos importan este módulo antes
+# de configurar Django y los modelos se importan dentro de las funciones.
+
+
+def _ejecutar(pk, programado_para):
+    from english import programacion
+    return programacion.ejecutar_programado(pk, programado_para)
+
+
+class Command(BaseCommand):
+    help = "Genera y envía por correo los reportes programados cuando vencen"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--procesos', type=int, default=2,
+                            help="Tamaño del grupo de procesos; 0 genera los reportes en este mismo proceso")
+        parser.add_argument('--intervalo', type=float, default=60.0,
+                            help="Segundos entre consultas de reportes vencidos")
+        parser.add_argument('--una-vez', action='store_true',
+                            help="Termina cuando no quedan reportes vencidos")
+
+    def handle(self, *args, **options):
+        from english import programacion
+        self.programacion = programacion
+
+        if options['procesos'] == 0:
+            self.programar_en_linea(options)
+        else:
+            self.programar_en_grupo(options)
+
+    def programar_en_linea(self, options):
+        while True:
+            close_old_connections()
+            reclamados = self.programacion.reclamar_vencidos(1)
+            for trabajo in reclamados:
+                try:
+                    resultado = self.programacion.ejecutar_programado(*trabajo)
+                except Exception as error:
+                    self.fallo(trabajo, error)
+                else:
+                    self.informar(trabajo, resultado)
+            if not reclamados:
+                if options['una_vez']:
+                    return
+                time.sleep(options['intervalo'])
+
+    def programar_en_grupo(self, options):
+        procesos.atender(
+            options['procesos'], self.programacion.reclamar_vencidos, _ejecutar, self.informar, self.fallo,
+            options['intervalo'], options['una_vez'],
+        )
+
+    def informar(self, trabajo, reporte_id):
+        self.stdout.write(self.style.SUCCESS(f"Reporte programado {trabajo[0]}: enviado el reporte {reporte_id}"))
+
+    def fallo(self, trabajo, error):
+        # La próxima ejecución ya quedó avanzada; el error no detiene al programador
+        logger.error("Falló el reporte programado %s", trabajo[0], exc_info=error)
+        self.stdout.write(self.style.ERROR(f"Reporte programado {trabajo[0]}: falló"))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from english import buzon
+
+
+class Command(BaseCommand):
+    help = "Borra de los buzones los comunicados ya expirados (para programarlo con cron)"
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS(f"{buzon.purgar_vencidos()} entregas vencidas eliminadas"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from english.models import LibroDiario
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el libro diario a partir de los cobros, pagos y egresos registrados"
+
+    def handle(self, *args, **options):
+        filas = LibroDiario.reconstruir()
+        self.stdout.write(self.style.SUCCESS(f"Libro diario reconstruido: {filas} filas"))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from english.models import Backup
+from english.respaldos import RespaldoInvalido, restaurar, verificar
+
+
+class Command(BaseCommand):
+    help = (
+        "Verifica una copia de seguridad (y las copias de las que depende) y la extrae en un directorio: "
+        "la base de datos y los archivos de media quedan listos para reemplazar los del servidor"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('backup', type=int, help="Id de la copia")
+        parser.add_argument('directorio', nargs='?')
+        parser.add_argument('--solo-verificar', action='store_true')
+
+    def handle(self, *args, **options):
+        try:
+            backup = Backup.objects.get(pk=options['backup'])
+        except Backup.DoesNotExist:
+            raise CommandError(f"No existe la copia {options['backup']}")
+        if not options['solo_verificar'] and not options['directorio']:
+            raise CommandError("Indique el directorio de destino o --solo-verificar")
+
+        try:
+            if options['solo_verificar']:
+                cadena = verificar(backup)
+                self.stdout.write(self.style.SUCCESS(f"Copia {backup.pk} íntegra ({len(cadena)} archivos en la cadena)"))
+                return
+            destino = restaurar(backup, options['directorio'])
+        except RespaldoInvalido as error:
+            raise CommandError(str(error))
+
+        self.stdout.write(self.style.SUCCESS(f"Copia {backup.pk} verificada y extraída en {destino}"))
+        if backup.manifiesto['motor'] == 'sqlite':
+            self.stdout.write("  Base de datos: db.sqlite3; media: media/")
+        else:
+            self.stdout.write("  Base de datos: datos/*.jsonl (cargar con loaddata en una base vacía); media: media/")
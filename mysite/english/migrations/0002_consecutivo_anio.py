@@ -0,0 +1,18 @@
+# Generated by Django 5.0.11 on 2026-10-17 00:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('english', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='consecutivo',
+            name='anio',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
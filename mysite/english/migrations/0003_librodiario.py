@@ -0,0 +1,32 @@
+# Generated by Django 5.0.11 on 2026-10-17 00:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('english', '0002_consecutivo_anio'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LibroDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('tipo', models.CharField(choices=[('ingreso', 'Ingreso'), ('pago', 'Pago Recibido'), ('egreso', 'Egreso')], max_length=20)),
+                ('tipo_ingreso', models.CharField(blank=True, choices=[('matricula', 'Matrícula'), ('pension', 'Pensión'), ('material', 'Material'), ('certificado', 'Certificado'), ('otros', 'Otros')], default='', max_length=20)),
+                ('categoria_detallada', models.CharField(blank=True, choices=[('docente', 'Pago Docentes'), ('administrativo', 'Pago Administrativos'), ('arriendo_sede', 'Arriendo Sede'), ('servicios_publicos', 'Servicios Públicos'), ('material_oficina', 'Material de Oficina'), ('material_enseñanza', 'Material de Enseñanza'), ('equipos_computo', 'Equipos de Cómputo'), ('mantenimiento_edificio', 'Mantenimiento Edificio'), ('mantenimiento_equipos', 'Mantenimiento Equipos'), ('publicidad', 'Publicidad y Marketing'), ('capacitacion', 'Capacitación'), ('impuestos', 'Impuestos'), ('seguros', 'Seguros'), ('otros', 'Otros')], default='', max_length=100)),
+                ('metodo_pago', models.CharField(blank=True, choices=[('efectivo', 'Efectivo'), ('transferencia', 'Transferencia'), ('cheque', 'Cheque'), ('tarjeta_credito', 'Tarjeta Crédito'), ('tarjeta_debito', 'Tarjeta Débito'), ('nequi', 'Nequi'), ('daviplata', 'Daviplata'), ('bancolombia', 'Bancolombia'), ('otro', 'Otro')], default='', max_length=20)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('cantidad', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Libro Diario',
+                'verbose_name_plural': 'Libro Diario',
+                'ordering': ['-fecha'],
+                'unique_together': {('fecha', 'tipo', 'tipo_ingreso', 'categoria_detallada', 'metodo_pago')},
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.11 on 2026-10-17 00:41
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('english', '0003_librodiario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='librodiario',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='resumeneconomico',
+            name='desglose',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.AddField(
+            model_name='resumeneconomico',
+            name='fecha_calculo',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.11 on 2026-10-17 00:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('english', '0004_librodiario_fecha_actualizacion_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='factura',
+            name='periodo',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='english.periodoacademico'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.11 on 2026-10-17 00:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('english', '0006_tarea'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reporteprogramado',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['proxima_ejecucion'], name='reporteprog_pendientes_idx'),
+        ),
+    ]
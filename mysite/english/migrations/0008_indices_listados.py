@@ -0,0 +1,75 @@
+# Generated by Django 5.0.11 on 2026-10-17 00:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('english', '0007_reporteprogramado_indice_pendientes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='asistencia',
+            index=models.Index(fields=['grupo', 'fecha'], name='english_asi_grupo_i_166639_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='calificacion',
+            index=models.Index(fields=['grupo', 'periodo'], name='english_cal_grupo_i_179c80_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cobro',
+            index=models.Index(fields=['fecha'], name='english_cob_fecha_2fbf32_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='documentoestudiante',
+            index=models.Index(fields=['estudiante', 'tipo'], name='english_doc_estudia_970b9a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='egreso',
+            index=models.Index(fields=['fecha'], name='english_egr_fecha_56955f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='egreso',
+            index=models.Index(fields=['tipo', 'fecha'], name='english_egr_tipo_44fcba_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='estudiante',
+            index=models.Index(fields=['primer_apellido', 'primer_nombre'], name='english_est_primer__f0e101_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='estudiante',
+            index=models.Index(fields=['estado', 'programa_actual'], name='english_est_estado_7d3c3c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='evento',
+            index=models.Index(fields=['fecha_inicio'], name='english_eve_fecha_i_81e22f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='evento',
+            index=models.Index(fields=['tipo', 'fecha_inicio'], name='english_eve_tipo_5b8122_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='factura',
+            index=models.Index(fields=['estado', 'fecha_emision'], name='english_fac_estado_eeafad_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='factura',
+            index=models.Index(condition=models.Q(('estado', 'pendiente')), fields=['estado', 'fecha_vencimiento'], name='factura_pendientes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='grupo',
+            index=models.Index(fields=['estado', 'fecha_inicio'], name='english_gru_estado_472d95_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incidencia',
+            index=models.Index(fields=['estado', 'fecha_reporte'], name='english_inc_estado_663874_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incidencia',
+            index=models.Index(fields=['tipo', 'fecha_reporte'], name='english_inc_tipo_8abcf0_idx'),
+        ),
+    ]
@@ -0,0 +1,102 @@
+# Generated by Django 5.0.11 on 2026-10-17 00:56
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Copia de english/busqueda.py al escribir la migración: la migración no debe
+# cambiar cuando cambie ese módulo.
+
+CAMPOS_BUSQUEDA = ['identificacion', 'primer_nombre', 'segundo_nombre', 'primer_apellido', 'segundo_apellido']
+TAMANO_LOTE = 2000
+TABLA_FTS = 'english_estudiante_fts'
+
+SQL_SQLITE = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA_FTS} USING fts5(
+        busqueda, content='english_estudiante', content_rowid='id', prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_ai AFTER INSERT ON english_estudiante BEGIN
+        INSERT INTO {TABLA_FTS}(rowid, busqueda) VALUES (new.id, new.busqueda);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_ad AFTER DELETE ON english_estudiante BEGIN
+        INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, busqueda) VALUES ('delete', old.id, old.busqueda);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_au AFTER UPDATE OF busqueda ON english_estudiante BEGIN
+        INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, busqueda) VALUES ('delete', old.id, old.busqueda);
+        INSERT INTO {TABLA_FTS}(rowid, busqueda) VALUES (new.id, new.busqueda);
+    END""",
+    f"INSERT INTO {TABLA_FTS}({TABLA_FTS}) VALUES ('rebuild')",
+]
+
+SQL_POSTGRESQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS english_estudiante_busqueda_trgm ON english_estudiante USING gin (busqueda gin_trgm_ops)",
+]
+
+
+def normalizar(texto):
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    return ' '.join(re.findall(r'[a-z0-9]+', texto))
+
+
+def llenar_busqueda(apps, schema_editor):
+    # Por lotes: con muchos estudiantes no se tienen todos en memoria a la vez
+    Estudiante = apps.get_model('english', 'Estudiante')
+    lote = []
+    for estudiante in Estudiante.objects.only('pk', *CAMPOS_BUSQUEDA).order_by('pk').iterator(chunk_size=TAMANO_LOTE):
+        estudiante.busqueda = normalizar(' '.join(filter(None, (
+            getattr(estudiante, campo) for campo in CAMPOS_BUSQUEDA
+        ))))
+        lote.append(estudiante)
+        if len(lote) == TAMANO_LOTE:
+            Estudiante.objects.bulk_update(lote, ['busqueda'], batch_size=TAMANO_LOTE)
+            lote = []
+    if lote:
+        Estudiante.objects.bulk_update(lote, ['busqueda'], batch_size=TAMANO_LOTE)
+
+
+def crear_indice(apps, schema_editor):
+    sentencias = {'sqlite': SQL_SQLITE, 'postgresql': SQL_POSTGRESQL}.get(schema_editor.connection.vendor, [])
+    for sql in sentencias:
+        schema_editor.execute(sql)
+
+
+def eliminar_indice(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sufijo in ('ai', 'ad', 'au'):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {TABLA_FTS}_{sufijo}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {TABLA_FTS}")
+    elif schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS english_estudiante_busqueda_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('english', '0008_indices_listados'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='estudiante',
+            name='busqueda',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(llenar_busqueda, migrations.RunPython.noop),
+        migrations.RunPython(crear_indice, eliminar_indice),
+        migrations.CreateModel(
+            name='IndiceBusquedaEstudiante',
+            fields=[
+                ('estudiante', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='indice_busqueda', serialize=False, to='english.estudiante')),
+                ('busqueda', models.TextField()),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'english_estudiante_fts',
+                'managed': False,
+            },
+        ),
+    ]
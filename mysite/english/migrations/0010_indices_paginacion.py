@@ -0,0 +1,23 @@
+# Generated by Django 5.0.11 on 2026-10-17 01:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('english', '0009_estudiante_busqueda'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='asistencia',
+            index=models.Index(fields=['fecha', 'estudiante'], name='english_asi_fecha_8e77f0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditoria',
+            index=models.Index(fields=['fecha'], name='english_aud_fecha_cbdce8_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.11 on 2026-10-17 01:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('english', '0010_indices_paginacion'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tarea',
+            name='tipo',
+            field=models.CharField(choices=[('reporte_pdf', 'Reporte Económico PDF'), ('reporte_excel', 'Reporte Económico Excel'), ('exportar_estudiantes', 'Exportación de Estudiantes'), ('facturacion_masiva', 'Facturación Masiva'), ('comprobantes_lote', 'Impresión de Comprobantes'), ('backup', 'Copia de Seguridad')], max_length=30),
+        ),
+    ]
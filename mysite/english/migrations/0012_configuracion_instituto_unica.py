@@ -0,0 +1,29 @@
+# Generated by Django 5.0.11 on 2026-10-17 01:20
+
+from django.db import migrations, models
+
+
+def dejar_una_configuracion(apps, schema_editor):
+    # La aplicación siempre usó la primera fila; esa queda con id=1 y las demás se eliminan
+    ConfiguracionInstituto = apps.get_model('english', 'ConfiguracionInstituto')
+    primera = ConfiguracionInstituto.objects.order_by('pk').first()
+    if primera is None:
+        return
+    ConfiguracionInstituto.objects.exclude(pk=primera.pk).delete()
+    if primera.pk != 1:
+        ConfiguracionInstituto.objects.filter(pk=primera.pk).update(id=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('english', '0011_tarea_comprobantes_lote'),
+    ]
+
+    operations = [
+        migrations.RunPython(dejar_una_configuracion, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='configuracioninstituto',
+            constraint=models.CheckConstraint(check=models.Q(('id', 1)), name='configuracion_instituto_unica'),
+        ),
+    ]
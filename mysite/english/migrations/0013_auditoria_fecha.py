@@ -0,0 +1,19 @@
+# Generated by Django 5.0.11 on 2026-10-17 01:24
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('english', '0012_configuracion_instituto_unica'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='auditoria',
+            name='fecha',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
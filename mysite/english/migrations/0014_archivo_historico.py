@@ -0,0 +1,33 @@
+# Generated by Django 5.0.11 on 2026-10-17 01:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('english', '0013_auditoria_fecha'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivoHistorico',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(choices=[('auditoria', 'Auditoría'), ('asistencia', 'Asistencia'), ('seguimiento', 'Seguimiento de Incidencias')], max_length=20)),
+                ('anio', models.PositiveSmallIntegerField()),
+                ('archivo', models.FileField(upload_to='archivo/')),
+                ('filas', models.PositiveIntegerField()),
+                ('fecha_desde', models.DateField()),
+                ('fecha_hasta', models.DateField()),
+                ('claves', models.JSONField(default=dict)),
+                ('tamano', models.PositiveBigIntegerField(help_text='Bytes del archivo comprimido')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Archivos Históricos',
+                'ordering': ['modelo', 'anio', 'id'],
+                'indexes': [models.Index(fields=['modelo', 'fecha_desde', 'fecha_hasta'], name='english_arc_modelo_2bf930_idx')],
+            },
+        ),
+    ]
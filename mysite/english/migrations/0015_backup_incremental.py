@@ -0,0 +1,39 @@
+# Generated by Django 5.0.11 on 2026-10-17 01:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('english', '0014_archivo_historico'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backup',
+            name='base',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='incrementales', to='english.backup'),
+        ),
+        migrations.AddField(
+            model_name='backup',
+            name='manifiesto',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='backup',
+            name='sha256',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='backup',
+            name='tamano',
+            field=models.PositiveBigIntegerField(default=0, help_text='Bytes del archivo comprimido'),
+        ),
+        migrations.AlterField(
+            model_name='backup',
+            name='tipo',
+            field=models.CharField(choices=[('completo', 'Completo'), ('incremental', 'Incremental'), ('parcial', 'Parcial'), ('automatico', 'Automático')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.11 on 2026-10-17 01:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('english', '0015_backup_incremental'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='evento',
+            name='english_eve_fecha_i_81e22f_idx',
+        ),
+        migrations.AddIndex(
+            model_name='evento',
+            index=models.Index(fields=['fecha_inicio', 'fecha_fin'], name='english_eve_fecha_i_5a3ce7_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.0.11 on 2026-10-17 01:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('english', '0016_evento_ventana_calendario'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tarea',
+            name='tipo',
+            field=models.CharField(choices=[('reporte_pdf', 'Reporte Económico PDF'), ('reporte_excel', 'Reporte Económico Excel'), ('exportar_estudiantes', 'Exportación de Estudiantes'), ('facturacion_masiva', 'Facturación Masiva'), ('comprobantes_lote', 'Impresión de Comprobantes'), ('backup', 'Copia de Seguridad'), ('comunicado', 'Envío de Comunicado')], max_length=30),
+        ),
+        migrations.CreateModel(
+            name='BuzonComunicado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_publicacion', models.DateTimeField()),
+                ('fecha_expiracion', models.DateField()),
+                ('fecha_lectura', models.DateTimeField(blank=True, null=True)),
+                ('comunicado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entregas', to='english.comunicado')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='buzon', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Buzones de comunicados',
+                'ordering': ['-fecha_publicacion', '-id'],
+                'indexes': [models.Index(fields=['usuario', '-fecha_publicacion', '-id'], name='buzon_usuario_idx'), models.Index(condition=models.Q(('fecha_lectura__isnull', True)), fields=['usuario'], name='buzon_no_leidos_idx'), models.Index(fields=['fecha_expiracion'], name='buzon_expiracion_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='buzoncomunicado',
+            constraint=models.UniqueConstraint(fields=('comunicado', 'usuario'), name='buzon_comunicado_unico'),
+        ),
+    ]
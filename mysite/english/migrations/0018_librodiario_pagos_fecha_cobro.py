@@ -0,0 +1,29 @@
+from django.db import migrations
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+
+def pagos_por_fecha_de_cobro(apps, schema_editor):
+    """Vuelve a agrupar los pagos del libro por la fecha de su cobro, la que usan los reportes."""
+    LibroDiario = apps.get_model('english', 'LibroDiario')
+    DetallePago = apps.get_model('english', 'DetallePago')
+    LibroDiario.objects.filter(tipo='pago').delete()
+    filas = DetallePago.objects.values(
+        'metodo_pago', dia=F('cobro__fecha'), tipo_ingreso=F('cobro__tipo_ingreso'),
+    ).annotate(total=Sum('valor'), cantidad=Count('id')).order_by()
+    ahora = timezone.now()
+    LibroDiario.objects.bulk_create(
+        [LibroDiario(tipo='pago', fecha=fila.pop('dia'), fecha_actualizacion=ahora, **fila) for fila in filas],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('english', '0017_buzon_comunicado'),
+    ]
+
+    operations = [
+        migrations.RunPython(pagos_por_fecha_de_cobro, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.11 on 2026-10-17 01:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('english', '0018_librodiario_pagos_fecha_cobro'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tarea',
+            name='intentos',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,50 @@
+import re
+import unicodedata
+
+from django.db import migrations
+from django.db.models import Q
+
+# Copia de english/busqueda.normalizar al escribir la migración: la migración no
+# debe cambiar cuando cambie ese módulo.
+
+CAMPOS_BUSQUEDA = ['identificacion', 'primer_nombre', 'segundo_nombre', 'primer_apellido', 'segundo_apellido']
+TAMANO_LOTE = 2000
+SEPARADOR_DIGITOS = re.compile(r'(?<=\d)[.,-](?=\d)')
+
+
+def normalizar(texto):
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    return ' '.join(re.findall(r'[a-z0-9]+', SEPARADOR_DIGITOS.sub('', texto)))
+
+
+def normalizar_documentos(apps, schema_editor):
+    """Vuelve a normalizar los estudiantes con dígitos separados por puntos, comas o guiones ('1.023.456')."""
+    Estudiante = apps.get_model('english', 'Estudiante')
+    separados = Q()
+    for campo in CAMPOS_BUSQUEDA:
+        separados |= Q(**{f"{campo}__regex": r'[0-9][.,-][0-9]'})
+    lote = []
+    for estudiante in Estudiante.objects.filter(separados).only('pk', *CAMPOS_BUSQUEDA).order_by('pk').iterator(
+        chunk_size=TAMANO_LOTE
+    ):
+        estudiante.busqueda = normalizar(' '.join(filter(None, (
+            getattr(estudiante, campo) for campo in CAMPOS_BUSQUEDA
+        ))))
+        lote.append(estudiante)
+        if len(lote) == TAMANO_LOTE:
+            Estudiante.objects.bulk_update(lote, ['busqueda'], batch_size=TAMANO_LOTE)
+            lote = []
+    if lote:
+        Estudiante.objects.bulk_update(lote, ['busqueda'], batch_size=TAMANO_LOTE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('english', '0019_tarea_intentos'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalizar_documentos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.0.11 on 2026-10-17 02:14
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def latido_desde_inicio(apps, schema_editor):
+    # Las tareas que ya estaban en proceso conservan su plazo desde que se reclamaron
+    Tarea = apps.get_model('english', 'Tarea')
+    Tarea.objects.filter(estado='en_proceso').update(latido=F('fecha_inicio'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('english', '0020_busqueda_documentos_con_puntos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tarea',
+            name='latido',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(latido_desde_inicio, migrations.RunPython.noop),
+    ]
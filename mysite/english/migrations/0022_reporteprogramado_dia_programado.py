@@ -0,0 +1,29 @@
+# Generated by Django 5.0.11 on 2026-10-17 02:23
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def dia_desde_proxima_ejecucion(apps, schema_editor):
+    # Sin otro dato, el día programado es el de la próxima ejecución
+    ReporteProgramado = apps.get_model('english', 'ReporteProgramado')
+    for programado in ReporteProgramado.objects.only('pk', 'proxima_ejecucion'):
+        ReporteProgramado.objects.filter(pk=programado.pk).update(
+            dia_programado=timezone.localtime(programado.proxima_ejecucion).day,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('english', '0021_tarea_latido'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reporteprogramado',
+            name='dia_programado',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(dia_desde_proxima_ejecucion, migrations.RunPython.noop),
+    ]
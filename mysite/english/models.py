@@ -1,9 +1,17 @@
-from django.db import models
+from django.core.cache import cache
+from django.db import connection, models, transaction, IntegrityError
+from django.db.models import F, Case, When, Value, Sum, Count
 from django.contrib.auth.models import User
+from django.utils import timezone
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from django.core.validators import MinValueValidator, MaxValueValidator
+import calendar
+import copy
 import datetime
+import uuid
+
+from .busqueda import CampoFTS, normalizar
 
 ##############################
 # 1. Modelos Base (Core)
@@ -23,18 +31,53 @@ class Consecutivo(models.Model):
     formato = models.CharField(max_length=50, default="{prefijo}{numero:04d}")
     reiniciar_anual = models.BooleanField(default=True)
     
+    anio = models.PositiveIntegerField(null=True, blank=True)
+    
     @classmethod
     def obtener_siguiente(cls, tipo):
-        consecutivo, created = cls.objects.get_or_create(tipo=tipo)
-        if consecutivo.reiniciar_anual and str(consecutivo.ultimo_numero)[:4] != str(datetime.datetime.now().year)[2:]:
-            consecutivo.ultimo_numero = 0
+        return cls.reservar_bloque(tipo, 1)[0]
+    
+    @classmethod
+    def reservar_bloque(cls, tipo, n):
+        """
+        Reserva `n` números contiguos para `tipo` y devuelve la lista de
+        consecutivos ya formateados.
+        
+        El incremento se hace con un único UPDATE usando expresiones F, de modo
+        que la base de datos bloquea la fila durante la transacción y dos
+        cajeros nunca reciben el mismo número.
+        """
+        if n < 1:
+            raise ValueError("La cantidad de consecutivos a reservar debe ser mayor a cero")
+        
+        anio = datetime.date.today().year
+        with transaction.atomic():
+            if not cls._incrementar(tipo, n, anio):
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(tipo=tipo, anio=anio)
+                except IntegrityError:
+                    # Otro proceso creó la fila al mismo tiempo
+                    pass
+                cls._incrementar(tipo, n, anio)
+            consecutivo = cls.objects.get(tipo=tipo)
         
-        consecutivo.ultimo_numero += 1
-        consecutivo.save()
-        return consecutivo.formato.format(
-            prefijo=consecutivo.prefijo or "",
-            numero=consecutivo.ultimo_numero
+        fin = consecutivo.ultimo_numero
+        return [consecutivo.formatear(numero) for numero in range(fin - n + 1, fin + 1)]
+    
+    @classmethod
+    def _incrementar(cls, tipo, n, anio):
+        # Si cambió el año y el consecutivo se reinicia, el bloque empieza en 1
+        return cls.objects.filter(tipo=tipo).update(
+            ultimo_numero=Case(
+                When(reiniciar_anual=True, anio__lt=anio, then=Value(n)),
+                default=F('ultimo_numero') + n,
+            ),
+            anio=anio,
         )
+    
+    def formatear(self, numero):
+        return self.formato.format(prefijo=self.prefijo or "", numero=numero)
 
     def __str__(self):
         return f"Consecutivo {self.get_tipo_display()}"
@@ -54,6 +97,56 @@ class ConfiguracionInstituto(models.Model):
     porcentaje_descuento_maximo = models.DecimalField(max_digits=5, decimal_places=2, default=10.00)
     iva = models.DecimalField(max_digits=5, decimal_places=2, default=19.00)
     
+    # Solo existe una fila, siempre con esta llave
+    PK = 1
+    # Versión en la caché compartida; cada proceso guarda su copia mientras no cambie
+    CLAVE_VERSION = 'configuracion_instituto:version'
+    _copia_local = None
+    
+    class Meta:
+        constraints = [
+            models.CheckConstraint(check=models.Q(id=1), name='configuracion_instituto_unica'),
+        ]
+    
+    def save(self, *args, **kwargs):
+        # Crear otra configuración reemplaza la existente en lugar de fallar
+        self.pk = self.PK
+        kwargs.pop('force_insert', None)
+        super().save(*args, **kwargs)
+        transaction.on_commit(ConfiguracionInstituto.invalidar)
+    
+    def delete(self, *args, **kwargs):
+        resultado = super().delete(*args, **kwargs)
+        transaction.on_commit(ConfiguracionInstituto.invalidar)
+        return resultado
+    
+    @classmethod
+    def invalidar(cls):
+        """Obliga a todos los procesos a volver a leer la configuración."""
+        cache.set(cls.CLAVE_VERSION, uuid.uuid4().hex, None)
+    
+    @classmethod
+    def obtener(cls):
+        """
+        La configuración del instituto, o una sin guardar con los valores por
+        defecto si aún no se ha creado. Consulta la base de datos solo cuando
+        cambió la versión compartida; dentro de una transacción siempre
+        consulta, porque lo leído ahí podría revertirse.
+        """
+        version = cache.get(cls.CLAVE_VERSION)
+        if version is None:
+            cache.add(cls.CLAVE_VERSION, uuid.uuid4().hex, None)
+            version = cache.get(cls.CLAVE_VERSION)
+        
+        copia = cls._copia_local
+        if copia is None or copia[0] != version:
+            configuracion = cls.objects.filter(pk=cls.PK).first() or cls()
+            if connection.in_atomic_block:
+                return configuracion
+            copia = cls._copia_local = (version, configuracion)
+        # Una copia por llamada: quien la modifique no altera la del proceso
+        return copy.copy(copia[1])
+    
     def __str__(self):
         return self.nombre_instituto
 
@@ -142,6 +235,9 @@ class Grupo(models.Model):
     class Meta:
         ordering = ['-fecha_inicio', 'curso']
         unique_together = ('curso', 'codigo')
+        indexes = [
+            models.Index(fields=['estado', 'fecha_inicio']),
+        ]
     
     def __str__(self):
         return f"{self.curso} - Grupo {self.codigo}"
@@ -227,9 +323,18 @@ class Estudiante(models.Model):
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_actualizacion = models.DateTimeField(auto_now=True)
     
+    # Identificación y nombres normalizados para la búsqueda (ver busqueda.py)
+    busqueda = models.TextField(blank=True, default='', editable=False)
+    
+    CAMPOS_BUSQUEDA = ['identificacion', 'primer_nombre', 'segundo_nombre', 'primer_apellido', 'segundo_apellido']
+    
     class Meta:
         ordering = ['primer_apellido', 'primer_nombre']
         verbose_name_plural = "Estudiantes"
+        indexes = [
+            models.Index(fields=['primer_apellido', 'primer_nombre']),
+            models.Index(fields=['estado', 'programa_actual']),
+        ]
     
     @property
     def nombre_completo(self):
@@ -240,9 +345,32 @@ class Estudiante(models.Model):
         today = datetime.date.today()
         return today.year - self.fecha_nacimiento.year - ((today.month, today.day) < (self.fecha_nacimiento.month, self.fecha_nacimiento.day))
     
+    def actualizar_busqueda(self):
+        self.busqueda = normalizar(' '.join(filter(None, (getattr(self, campo) for campo in self.CAMPOS_BUSQUEDA))))
+    
+    def save(self, *args, **kwargs):
+        self.actualizar_busqueda()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and set(update_fields) & set(self.CAMPOS_BUSQUEDA):
+            kwargs['update_fields'] = {*update_fields, 'busqueda'}
+        super().save(*args, **kwargs)
+    
     def __str__(self):
         return f"{self.nombre_completo} ({self.identificacion})"
 
+class IndiceBusquedaEstudiante(models.Model):
+    """Tabla FTS5 de búsqueda de estudiantes (solo SQLite; la crea la migración 0009)."""
+    estudiante = models.OneToOneField(
+        Estudiante, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid',
+        related_name='indice_busqueda',
+    )
+    busqueda = CampoFTS()
+    rank = models.FloatField()
+    
+    class Meta:
+        managed = False
+        db_table = 'english_estudiante_fts'
+
 class Docente(models.Model):
     TIPO_CONTRATO_CHOICES = [
         ('planta', 'Planta'),
@@ -374,11 +502,23 @@ class Factura(models.Model):
     total = models.DecimalField(max_digits=12, decimal_places=2)
     saldo = models.DecimalField(max_digits=12, decimal_places=2)
     observaciones = models.TextField(blank=True, null=True)
+    periodo = models.ForeignKey(PeriodoAcademico, on_delete=models.SET_NULL, null=True, blank=True)
     creada_por = models.ForeignKey(User, on_delete=models.PROTECT, related_name='facturas_creadas')
     
     class Meta:
         ordering = ['-fecha_emision']
         verbose_name_plural = "Facturas"
+        indexes = [
+            models.Index(fields=['estado', 'fecha_emision']),
+            # Facturas pendientes por vencimiento (tableros). Se incluye estado para
+            # que el planificador de SQLite lo prefiera al índice anterior sin
+            # estadísticas y no tenga que ordenar.
+            models.Index(
+                fields=['estado', 'fecha_vencimiento'],
+                condition=models.Q(estado='pendiente'),
+                name='factura_pendientes_idx',
+            ),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.consecutivo:
@@ -434,6 +574,9 @@ class Cobro(models.Model):
     class Meta:
         ordering = ['-fecha']
         verbose_name_plural = "Recibos de Cobro"
+        indexes = [
+            models.Index(fields=['fecha']),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.consecutivo:
@@ -518,6 +661,10 @@ class Egreso(models.Model):
     class Meta:
         ordering = ['-fecha']
         verbose_name_plural = "Comprobantes de Egreso"
+        indexes = [
+            models.Index(fields=['fecha']),
+            models.Index(fields=['tipo', 'fecha']),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.consecutivo:
@@ -540,6 +687,107 @@ class DetalleEgreso(models.Model):
     def __str__(self):
         return f"{self.descripcion} x {self.cantidad}"
 
+class LibroDiario(models.Model):
+    """
+    Totales diarios preagregados de cobros, pagos y egresos.
+    
+    Se mantiene de forma incremental desde las señales de Cobro, DetallePago y
+    Egreso (ver signals.py) y se puede reconstruir con el comando
+    `reconstruir_libro_diario`.
+    """
+    TIPO_CHOICES = [
+        ('ingreso', 'Ingreso'),
+        ('pago', 'Pago Recibido'),
+        ('egreso', 'Egreso'),
+    ]
+    
+    fecha = models.DateField()
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
+    tipo_ingreso = models.CharField(max_length=20, choices=Cobro.TIPO_INGRESO_CHOICES, blank=True, default='')
+    categoria_detallada = models.CharField(max_length=100, choices=Egreso.CATEGORIA_DETALLADA_CHOICES, blank=True, default='')
+    metodo_pago = models.CharField(max_length=20, choices=DetallePago.METODO_PAGO_CHOICES, blank=True, default='')
+    total = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    cantidad = models.IntegerField(default=0)
+    fecha_actualizacion = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['-fecha']
+        verbose_name = "Libro Diario"
+        verbose_name_plural = "Libro Diario"
+        unique_together = ('fecha', 'tipo', 'tipo_ingreso', 'categoria_detallada', 'metodo_pago')
+    
+    @classmethod
+    def registrar(cls, clave, valor, cantidad):
+        """Suma `valor` y `cantidad` (pueden ser negativos) a la fila de `clave`."""
+        cambios = {
+            'total': F('total') + valor,
+            'cantidad': F('cantidad') + cantidad,
+            'fecha_actualizacion': timezone.now(),
+        }
+        if not cls.objects.filter(**clave).update(**cambios):
+            try:
+                with transaction.atomic():
+                    cls.objects.create(total=valor, cantidad=cantidad, **clave)
+            except IntegrityError:
+                cls.objects.filter(**clave).update(**cambios)
+        # Un resumen calculado por otra conexión antes del commit no ve este
+        # movimiento aunque su momento sea posterior a la marca de arriba: la
+        # fila se vuelve a marcar cuando el movimiento ya es visible.
+        transaction.on_commit(lambda: cls.objects.filter(**clave).update(fecha_actualizacion=timezone.now()))
+    
+    @classmethod
+    def modificado_desde(cls, fecha_inicio, fecha_fin, momento):
+        """Indica si algún movimiento del período cambió después de `momento`."""
+        return cls.objects.filter(
+            fecha__range=[fecha_inicio, fecha_fin],
+            fecha_actualizacion__gt=momento,
+        ).exists()
+    
+    @classmethod
+    def reconstruir(cls):
+        """Recalcula todo el libro a partir de Cobro, DetallePago y Egreso."""
+        consultas = [
+            ('ingreso', Cobro.objects.values('tipo_ingreso', dia=F('fecha')).annotate(
+                total=Sum('valor_total'), cantidad=Count('id'))),
+            # Los pagos van con la fecha del cobro, la que usan los reportes
+            ('pago', DetallePago.objects.values(
+                'metodo_pago', dia=F('cobro__fecha'), tipo_ingreso=F('cobro__tipo_ingreso')
+            ).annotate(total=Sum('valor'), cantidad=Count('id'))),
+            ('egreso', Egreso.objects.values(
+                'categoria_detallada', dia=F('fecha'), metodo_pago=F('forma_pago')
+            ).annotate(total=Sum('valor_total'), cantidad=Count('id'))),
+        ]
+        with transaction.atomic():
+            cls.objects.all().delete()
+            filas = [
+                cls(tipo=tipo, fecha=fila.pop('dia'), **fila)
+                for tipo, consulta in consultas
+                for fila in consulta.order_by()
+            ]
+            cls.objects.bulk_create(filas, batch_size=500)
+            transaction.on_commit(lambda: cls.objects.update(fecha_actualizacion=timezone.now()))
+        return len(filas)
+    
+    @classmethod
+    def totales(cls, fecha_inicio, fecha_fin):
+        """Devuelve el total por tipo de movimiento entre dos fechas (inclusive)."""
+        totales = {tipo: 0 for tipo, _ in cls.TIPO_CHOICES}
+        filas = cls.objects.filter(
+            fecha__range=[fecha_inicio, fecha_fin]
+        ).values('tipo').annotate(suma=Sum('total')).order_by()
+        for fila in filas:
+            totales[fila['tipo']] = fila['suma'] or 0
+        return totales
+    
+    @classmethod
+    def totales_mes(cls, fecha):
+        primer_dia = fecha.replace(day=1)
+        ultimo_dia = fecha.replace(day=calendar.monthrange(fecha.year, fecha.month)[1])
+        return cls.totales(primer_dia, ultimo_dia)
+    
+    def __str__(self):
+        return f"{self.fecha} - {self.get_tipo_display()} (${self.total:,.2f})"
+
 ##############################
 # 5. Modelos Académicos (Cont.)
 ##############################
@@ -596,6 +844,47 @@ class Asistencia(models.Model):
         ordering = ['-fecha', 'estudiante']
         verbose_name_plural = "Asistencias"
         unique_together = ('estudiante', 'grupo', 'fecha')
+        indexes = [
+            # Listado por grupo y fecha; la restricción única empieza por estudiante
+            models.Index(fields=['grupo', 'fecha']),
+            # Orden del listado paginado por llave: fecha, estudiante, id
+            models.Index(fields=['fecha', 'estudiante']),
+        ]
+    
+    @classmethod
+    def registrar_masiva(cls, grupo, fecha, usuario, estados=None, estado_defecto='asistio'):
+        """
+        Registra la asistencia de todos los estudiantes matriculados en `grupo`
+        para `fecha` en una sola transacción. `estados` permite indicar el
+        estado de estudiantes puntuales ({estudiante_id: estado}). Si la
+        asistencia ya existía se actualiza, de modo que reenviar el formulario
+        es seguro. Devuelve (creadas, actualizadas).
+        """
+        estados = estados or {}
+        with transaction.atomic():
+            estudiantes = list(
+                grupo.matricula_set.order_by().values_list('estudiante_id', flat=True).distinct()
+            )
+            existentes = set(
+                cls.objects.filter(grupo=grupo, fecha=fecha, estudiante_id__in=estudiantes)
+                .values_list('estudiante_id', flat=True)
+            )
+            cls.objects.bulk_create(
+                [
+                    cls(
+                        estudiante_id=estudiante_id,
+                        grupo=grupo,
+                        fecha=fecha,
+                        estado=estados.get(estudiante_id, estado_defecto),
+                        registrado_por=usuario,
+                    )
+                    for estudiante_id in estudiantes
+                ],
+                update_conflicts=True,
+                unique_fields=['estudiante', 'grupo', 'fecha'],
+                update_fields=['estado', 'registrado_por'],
+            )
+        return len(estudiantes) - len(existentes), len(existentes)
     
     def __str__(self):
         return f"Asistencia {self.estudiante} - {self.fecha}"
@@ -616,6 +905,9 @@ class Calificacion(models.Model):
         ordering = ['periodo', 'curso', 'estudiante']
         verbose_name_plural = "Calificaciones"
         unique_together = ('estudiante', 'curso', 'grupo', 'periodo')
+        indexes = [
+            models.Index(fields=['grupo', 'periodo']),
+        ]
     
     def __str__(self):
         return f"Calificación {self.estudiante} - {self.curso}"
@@ -681,6 +973,11 @@ class Evento(models.Model):
     class Meta:
         ordering = ['-fecha_inicio']
         verbose_name_plural = "Eventos"
+        indexes = [
+            # Cubre el cruce con la ventana del calendario sin leer las filas que no entran
+            models.Index(fields=['fecha_inicio', 'fecha_fin']),
+            models.Index(fields=['tipo', 'fecha_inicio']),
+        ]
     
     def __str__(self):
         return f"{self.titulo} - {self.fecha_inicio}"
@@ -716,6 +1013,34 @@ class Comunicado(models.Model):
     def __str__(self):
         return f"{self.titulo} - {self.fecha_publicacion}"
 
+class BuzonComunicado(models.Model):
+    """Comunicado entregado a un usuario (ver english/buzon.py)."""
+    comunicado = models.ForeignKey(Comunicado, on_delete=models.CASCADE, related_name='entregas')
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='buzon')
+    # Copiadas del comunicado para ordenar y filtrar el buzón sin unir tablas
+    fecha_publicacion = models.DateTimeField()
+    fecha_expiracion = models.DateField()
+    fecha_lectura = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-fecha_publicacion', '-id']
+        verbose_name_plural = "Buzones de comunicados"
+        constraints = [
+            models.UniqueConstraint(fields=['comunicado', 'usuario'], name='buzon_comunicado_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['usuario', '-fecha_publicacion', '-id'], name='buzon_usuario_idx'),
+            models.Index(fields=['usuario'], condition=models.Q(fecha_lectura__isnull=True), name='buzon_no_leidos_idx'),
+            models.Index(fields=['fecha_expiracion'], name='buzon_expiracion_idx'),
+        ]
+    
+    @property
+    def leido(self):
+        return self.fecha_lectura is not None
+    
+    def __str__(self):
+        return f"{self.comunicado_id} -> {self.usuario_id}"
+
 class DocumentoInstitucional(models.Model):
     TIPO_CHOICES = [
         ('manual', 'Manual'),
@@ -765,6 +1090,9 @@ class DocumentoEstudiante(models.Model):
     class Meta:
         ordering = ['estudiante', '-fecha_subida']
         verbose_name_plural = "Documentos de Estudiantes"
+        indexes = [
+            models.Index(fields=['estudiante', 'tipo']),
+        ]
     
     def __str__(self):
         return f"{self.get_tipo_display()} - {self.estudiante}"
@@ -803,6 +1131,10 @@ class Incidencia(models.Model):
     class Meta:
         ordering = ['-fecha_reporte']
         verbose_name_plural = "Incidencias"
+        indexes = [
+            models.Index(fields=['estado', 'fecha_reporte']),
+            models.Index(fields=['tipo', 'fecha_reporte']),
+        ]
     
     def __str__(self):
         return f"Incidencia {self.id} - {self.get_tipo_display()}"
@@ -889,6 +1221,10 @@ class ResumenEconomico(models.Model):
     tarjetas_total = models.DecimalField(max_digits=15, decimal_places=2, default=0)
     billeteras_digitales_total = models.DecimalField(max_digits=15, decimal_places=2, default=0)
     
+    # Desglose completo y momento en que se calculó
+    desglose = models.JSONField(default=dict)
+    fecha_calculo = models.DateTimeField(default=timezone.now)
+    
     class Meta:
         verbose_name = "Resumen Económico"
         verbose_name_plural = "Resúmenes Económicos"
@@ -960,18 +1296,83 @@ class ReporteProgramado(models.Model):
     configuracion = models.ForeignKey(ConfiguracionReporte, on_delete=models.CASCADE)
     frecuencia = models.CharField(max_length=20, choices=FRECUENCIA_CHOICES)
     proxima_ejecucion = models.DateTimeField()
+    # Día del mes de la programación: las frecuencias mensuales vuelven a él
+    # después de un mes más corto (31 de enero -> 29 de febrero -> 31 de marzo)
+    dia_programado = models.PositiveSmallIntegerField(null=True, blank=True, editable=False)
     ultima_ejecucion = models.DateTimeField(null=True, blank=True)
     activo = models.BooleanField(default=True)
     destinatarios = models.TextField()  # Lista de correos separados por coma
     creado_por = models.ForeignKey(User, on_delete=models.PROTECT, related_name='reportes_programados')
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     
+    # Pasos de cada frecuencia: (días, meses)
+    PASOS_FRECUENCIA = {
+        'diario': (1, 0),
+        'semanal': (7, 0),
+        'mensual': (0, 1),
+        'trimestral': (0, 3),
+        'anual': (0, 12),
+    }
+    
     class Meta:
         verbose_name = "Reporte Programado"
         verbose_name_plural = "Reportes Programados"
+        indexes = [
+            # El programador consulta activo=True y proxima_ejecucion <= ahora. SQLite
+            # compara los booleanos sin "= 1" y no aprovecha un índice que empiece
+            # por activo, así que se indexan solo las filas activas.
+            models.Index(
+                fields=['proxima_ejecucion'],
+                condition=models.Q(activo=True),
+                name='reporteprog_pendientes_idx',
+            ),
+        ]
     
     def __str__(self):
         return f"Reporte {self.configuracion} - {self.get_frecuencia_display()}"
+    
+    def save(self, *args, **kwargs):
+        # El programador avanza proxima_ejecucion con update(); por aquí solo pasa
+        # la fecha que elige el usuario al crear o reprogramar
+        if self.pk is None or not ReporteProgramado.objects.filter(
+            pk=self.pk, proxima_ejecucion=self.proxima_ejecucion, dia_programado__isnull=False,
+        ).exists():
+            self.dia_programado = timezone.localtime(self.proxima_ejecucion).day
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'dia_programado'}
+        super().save(*args, **kwargs)
+    
+    @classmethod
+    def desplazar(cls, momento, frecuencia, pasos=1, dia=None):
+        """
+        Suma (o resta, con pasos negativos) períodos de `frecuencia` a una fecha.
+        En las frecuencias por meses el resultado cae en el día `dia` (por
+        defecto el de `momento`), o en el último del mes si este es más corto.
+        """
+        dias, meses = cls.PASOS_FRECUENCIA[frecuencia]
+        if meses:
+            total = momento.year * 12 + momento.month - 1 + meses * pasos
+            anio, mes = divmod(total, 12)
+            dia = min(dia or momento.day, calendar.monthrange(anio, mes + 1)[1])
+            return momento.replace(year=anio, month=mes + 1, day=dia)
+        return momento + datetime.timedelta(days=dias * pasos)
+    
+    def siguiente_ejecucion(self, ahora):
+        """Primera ejecución posterior a `ahora`; las ejecuciones perdidas no se repiten."""
+        # En hora local, para que el día programado sea el que eligió el usuario
+        siguiente = timezone.localtime(self.proxima_ejecucion)
+        siguiente = self.desplazar(siguiente, self.frecuencia, dia=self.dia_programado)
+        while siguiente <= ahora:
+            siguiente = self.desplazar(siguiente, self.frecuencia, dia=self.dia_programado)
+        return siguiente
+    
+    def periodo(self, momento):
+        """Período que cubre la ejecución programada en `momento`: el anterior completo."""
+        fin = timezone.localtime(momento).date()
+        return self.desplazar(fin, self.frecuencia, -1), fin - datetime.timedelta(days=1)
+    
+    def lista_destinatarios(self):
+        return [correo.strip() for correo in self.destinatarios.split(',') if correo.strip()]
 
 ##############################
 # 9. Auditoría y Seguridad
@@ -992,7 +1393,8 @@ class Auditoria(models.Model):
     modelo = models.CharField(max_length=100)
     objeto_id = models.PositiveIntegerField(null=True, blank=True)
     descripcion = models.TextField()
-    fecha = models.DateTimeField(auto_now_add=True)
+    # Hora del cambio, no la de la escritura por lotes (ver auditoria.py)
+    fecha = models.DateTimeField(default=timezone.now, editable=False)
     ip = models.GenericIPAddressField()
     datos_anteriores = models.JSONField(null=True, blank=True)
     datos_nuevos = models.JSONField(null=True, blank=True)
@@ -1000,6 +1402,10 @@ class Auditoria(models.Model):
     class Meta:
         ordering = ['-fecha']
         verbose_name_plural = "Registros de Auditoría"
+        indexes = [
+            # Listado paginado por llave (fecha, id)
+            models.Index(fields=['fecha']),
+        ]
     
     def __str__(self):
         return f"Auditoría {self.id} - {self.usuario} - {self.get_tipo_display()}"
@@ -1011,13 +1417,104 @@ class Backup(models.Model):
     realizado_por = models.ForeignKey(User, on_delete=models.PROTECT, related_name='backups_realizados')
     tipo = models.CharField(max_length=20, choices=[
         ('completo', 'Completo'),
+        ('incremental', 'Incremental'),
         ('parcial', 'Parcial'),
         ('automatico', 'Automático'),
     ])
+    # Un incremental solo trae los archivos de MEDIA_ROOT que cambiaron desde `base`;
+    # el resto se restaura desde la cadena de copias anteriores (ver respaldos.py)
+    base = models.ForeignKey('self', on_delete=models.PROTECT, null=True, blank=True, related_name='incrementales')
+    manifiesto = models.JSONField(null=True, blank=True, editable=False)
+    tamano = models.PositiveBigIntegerField(default=0, help_text="Bytes del archivo comprimido")
+    sha256 = models.CharField(max_length=64, blank=True, editable=False)
     
     class Meta:
         ordering = ['-fecha']
         verbose_name_plural = "Copias de Seguridad"
     
     def __str__(self):
-        return f"Backup {self.fecha} - {self.tipo}"
\ No newline at end of file
+        return f"Backup {self.fecha} - {self.tipo}"
+
+class ArchivoHistorico(models.Model):
+    """
+    Parte de un archivo histórico: filas de un año que se sacaron de su tabla
+    a un JSONL comprimido (ver archivo.py). `claves` guarda, por cada llave
+    foránea del resumen, los ids que aparecen en la parte, para buscar sin
+    abrir los archivos que no los contienen.
+    """
+    MODELO_CHOICES = [
+        ('auditoria', 'Auditoría'),
+        ('asistencia', 'Asistencia'),
+        ('seguimiento', 'Seguimiento de Incidencias'),
+    ]
+    
+    modelo = models.CharField(max_length=20, choices=MODELO_CHOICES)
+    anio = models.PositiveSmallIntegerField()
+    archivo = models.FileField(upload_to='archivo/')
+    filas = models.PositiveIntegerField()
+    fecha_desde = models.DateField()
+    fecha_hasta = models.DateField()
+    claves = models.JSONField(default=dict)
+    tamano = models.PositiveBigIntegerField(help_text="Bytes del archivo comprimido")
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['modelo', 'anio', 'id']
+        verbose_name_plural = "Archivos Históricos"
+        indexes = [
+            models.Index(fields=['modelo', 'fecha_desde', 'fecha_hasta']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_modelo_display()} {self.anio} ({self.filas} filas)"
+
+class Tarea(models.Model):
+    """Operación pesada que se ejecuta en segundo plano con `procesar_tareas`."""
+    TIPO_CHOICES = [
+        ('reporte_pdf', 'Reporte Económico PDF'),
+        ('reporte_excel', 'Reporte Económico Excel'),
+        ('exportar_estudiantes', 'Exportación de Estudiantes'),
+        ('facturacion_masiva', 'Facturación Masiva'),
+        ('comprobantes_lote', 'Impresión de Comprobantes'),
+        ('backup', 'Copia de Seguridad'),
+        ('comunicado', 'Envío de Comunicado'),
+    ]
+    
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('en_proceso', 'En Proceso'),
+        ('completada', 'Completada'),
+        ('fallida', 'Fallida'),
+    ]
+    
+    tipo = models.CharField(max_length=30, choices=TIPO_CHOICES)
+    parametros = models.JSONField(default=dict)
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='pendiente')
+    progreso = models.PositiveSmallIntegerField(default=0)
+    mensaje = models.TextField(blank=True)
+    resultado = models.FileField(upload_to='tareas/', blank=True)
+    creada_por = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tareas')
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    # Lo actualiza el procesador mientras la ejecuta (ver tareas.reanudar_vencidas)
+    latido = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-fecha_creacion']
+        verbose_name_plural = "Tareas"
+        indexes = [
+            models.Index(fields=['estado', 'fecha_creacion']),
+        ]
+    
+    def actualizar_progreso(self, progreso, mensaje=None):
+        cambios = {'progreso': progreso}
+        if mensaje is not None:
+            cambios['mensaje'] = mensaje
+        Tarea.objects.filter(pk=self.pk).update(**cambios)
+        for campo, valor in cambios.items():
+            setattr(self, campo, valor)
+    
+    def __str__(self):
+        return f"Tarea {self.id} - {self.get_tipo_display()} ({self.get_estado_display()})"
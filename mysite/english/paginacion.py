@@ -0,0 +1,293 @@
+"""
+Paginación por llave (keyset) para los listados.
+
+En lugar de OFFSET, cada página pide las filas que van después (o antes) de la
+última fila mostrada según el orden del modelo (Meta.ordering, con el id como
+desempate), así que la página 1 y la página 10.000 cuestan lo mismo. El cursor
+que viaja en la URL es opaco y va firmado. El total no se calcula en cada
+página; si la vista lo pide se muestra un conteo aproximado.
+"""
+import math
+from collections import namedtuple
+
+from django.core import signing
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.core.paginator import EmptyPage
+from django.db import connections
+from django.db.models import Q
+from django.http import Http404
+from django.utils.functional import cached_property
+
+SAL_CURSOR = 'english.paginacion'
+# Hasta aquí se cuenta exacto; más allá el listado muestra "más de N"
+LIMITE_CONTEO = 10000
+
+Conteo = namedtuple('Conteo', ['valor', 'exacto'])
+# ruta: nombre para filter/order_by ('programa__nombre', 'estudiante_id')
+Llave = namedtuple('Llave', ['ruta', 'campo', 'descendente'])
+
+
+def _expandir(modelo, nombre, descendente, prefijo=''):
+    """
+    Llaves de `nombre` en el orden de `modelo`. Como hace Django, una llave
+    foránea se ordena por el orden del modelo relacionado (invertido si va con
+    '-'), y después por su columna para desempatar filas relacionadas iguales.
+    """
+    raiz, _, resto = nombre.partition('__')
+    try:
+        campo = modelo._meta.get_field(raiz)
+    except FieldDoesNotExist:
+        raise ImproperlyConfigured(f"{modelo.__name__} no tiene el campo {nombre!r}")
+    if campo.null:
+        raise ImproperlyConfigured(f"{modelo.__name__}.{campo.name} admite nulos; no sirve como llave de página")
+    if campo.is_relation and not (campo.many_to_one or campo.one_to_one and campo.concrete):
+        raise ImproperlyConfigured(f"{modelo.__name__}: no se puede paginar por llave con la relación {raiz!r}")
+
+    if not campo.is_relation:
+        if resto:
+            raise ImproperlyConfigured(f"{modelo.__name__} no tiene el campo {nombre!r}")
+        return [Llave(prefijo + campo.name, campo, descendente)]
+
+    relacionado, prefijo_relacionado = campo.related_model, f"{prefijo}{campo.name}__"
+    if resto:
+        return _expandir(relacionado, resto, descendente, prefijo_relacionado)
+    llaves = []
+    for sub in relacionado._meta.ordering:
+        if not isinstance(sub, str) or sub == '?':
+            raise ImproperlyConfigured(f"{relacionado.__name__}: no se puede paginar por llave con el orden {sub!r}")
+        sub_descendente = sub.startswith('-')
+        llaves += _expandir(relacionado, sub.lstrip('-'), descendente != sub_descendente, prefijo_relacionado)
+    return llaves + [Llave(prefijo + campo.attname, campo, descendente)]
+
+
+def campos_orden(modelo, ordering=None):
+    """
+    [Llave(ruta, campo, descendente)] del orden de `modelo` más el id. Las
+    llaves foráneas siguen el orden del modelo relacionado, como en el listado
+    sin paginar (Curso por programa__area, programa__nombre, programa_id).
+    """
+    ordering = modelo._meta.ordering if ordering is None else ordering
+    llaves = []
+    for nombre in ordering:
+        if not isinstance(nombre, str) or nombre == '?':
+            raise ImproperlyConfigured(f"{modelo.__name__}: no se puede paginar por llave con el orden {nombre!r}")
+        llaves += _expandir(modelo, nombre.lstrip('-'), nombre.startswith('-'))
+    llaves = [llave for llave in llaves if not llave.campo.primary_key or '__' in llave.ruta]
+    # El id desempata en el mismo sentido que el último campo: así un índice
+    # sobre (fecha) sirve para '-fecha' sin ordenar en una tabla temporal
+    pk = modelo._meta.pk
+    llaves.append(Llave(pk.attname, pk, llaves[-1].descendente if llaves else False))
+    return llaves
+
+
+def _valor(fila, llave):
+    *relaciones, _ = llave.ruta.split('__')
+    for relacion in relaciones:
+        fila = getattr(fila, relacion)
+    return llave.campo.value_to_string(fila)
+
+
+def codificar_cursor(fila, campos, direccion, numero):
+    valores = [_valor(fila, llave) for llave in campos]
+    return signing.dumps([direccion, valores, numero], salt=SAL_CURSOR, compress=True)
+
+
+def decodificar_cursor(cursor, campos):
+    """(direccion, valores, numero) del cursor; Http404 si fue alterado o no corresponde al listado."""
+    try:
+        direccion, valores, numero = signing.loads(cursor, salt=SAL_CURSOR)
+        if direccion not in ('sig', 'ant') or len(valores) != len(campos) or not isinstance(numero, int):
+            raise ValueError
+        return direccion, [llave.campo.to_python(valor) for llave, valor in zip(campos, valores)], numero
+    except (signing.BadSignature, ValueError, TypeError):
+        raise Http404("Página no válida")
+
+
+def filtro_despues(queryset, campos, valores, hacia_atras=False):
+    """
+    Filas estrictamente después de `valores` en el orden de `campos`:
+    (a > va) OR (a = va AND b > vb) OR ... La cota inclusiva sobre el primer
+    campo deja que el motor recorra el índice desde ese punto.
+    """
+    condicion = Q()
+    iguales = {}
+    for llave, valor in zip(campos, valores):
+        mayor = llave.descendente == hacia_atras
+        condicion |= Q(**iguales, **{f"{llave.ruta}__{'gt' if mayor else 'lt'}": valor})
+        iguales[llave.ruta] = valor
+
+    primera, valor = campos[0], valores[0]
+    cota = {f"{primera.ruta}__{'gte' if primera.descendente == hacia_atras else 'lte'}": valor}
+    return queryset.filter(Q(**cota), condicion)
+
+
+def ordenar(queryset, campos, hacia_atras=False):
+    return queryset.order_by(*[
+        f"{'-' if llave.descendente != hacia_atras else ''}{llave.ruta}" for llave in campos
+    ])
+
+
+def relaciones(campos):
+    """Relaciones que recorre el orden, para traerlas con select_related."""
+    return sorted({llave.ruta.rpartition('__')[0] for llave in campos if '__' in llave.ruta})
+
+
+def contar_aproximado(queryset, limite=LIMITE_CONTEO):
+    """
+    Total de filas sin recorrer toda la tabla: en PostgreSQL, sin filtros, la
+    estimación del planificador; en los demás casos un conteo que se detiene en
+    `limite`.
+    """
+    conexion = connections[queryset.db]
+    if conexion.vendor == 'postgresql' and not queryset.query.where:
+        with conexion.cursor() as cursor:
+            cursor.execute("SELECT reltuples FROM pg_class WHERE oid = %s::regclass", [queryset.model._meta.db_table])
+            fila = cursor.fetchone()
+        if fila and fila[0] >= 0:
+            return Conteo(int(fila[0]), False)
+    total = queryset.order_by()[:limite + 1].count()
+    return Conteo(min(total, limite), total <= limite)
+
+
+class PaginadorKeyset:
+    """
+    Lo que las plantillas leen de Paginator. El total es el de
+    `contar_aproximado` y solo se calcula si la plantilla lo usa.
+    """
+
+    def __init__(self, queryset, per_page):
+        self._queryset = queryset
+        self.per_page = per_page
+
+    @cached_property
+    def count(self):
+        return contar_aproximado(self._queryset).valor
+
+    @cached_property
+    def num_pages(self):
+        return max(1, math.ceil(self.count / self.per_page))
+
+    @property
+    def page_range(self):
+        return range(1, self.num_pages + 1)
+
+
+class PaginaKeyset:
+    """
+    Página de un listado por llave con la interfaz de Page. El número de página
+    viaja en el cursor; next_page_number() y previous_page_number() sirven para
+    mostrarlo, pero los enlaces deben usar url_siguiente y url_anterior (un
+    ?page=N vuelve a la paginación por OFFSET).
+    """
+
+    def __init__(self, object_list, number, paginator, cursor_siguiente, cursor_anterior, request,
+                 parametro='cursor'):
+        self.object_list = object_list
+        self.number = number
+        self.paginator = paginator
+        self.cursor_siguiente = cursor_siguiente
+        self.cursor_anterior = cursor_anterior
+        self._request = request
+        self._parametro = parametro
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.cursor_siguiente is not None
+
+    def has_previous(self):
+        return self.cursor_anterior is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def next_page_number(self):
+        if not self.has_next():
+            raise EmptyPage("No hay más páginas")
+        return self.number + 1
+
+    def previous_page_number(self):
+        if not self.has_previous():
+            raise EmptyPage("No hay páginas anteriores")
+        return self.number - 1
+
+    def start_index(self):
+        if not self.object_list:
+            return 0
+        return (self.number - 1) * self.paginator.per_page + 1
+
+    def end_index(self):
+        return (self.number - 1) * self.paginator.per_page + len(self.object_list)
+
+    def _url(self, cursor):
+        if cursor is None:
+            return None
+        parametros = self._request.GET.copy()
+        parametros[self._parametro] = cursor
+        parametros.pop('page', None)
+        return f"?{parametros.urlencode()}"
+
+    @property
+    def url_siguiente(self):
+        return self._url(self.cursor_siguiente)
+
+    @property
+    def url_anterior(self):
+        return self._url(self.cursor_anterior)
+
+
+class PaginacionKeysetMixin:
+    """
+    Pagina un ListView por llave con ?cursor=. Si get_queryset ya trae un
+    order_by propio (por ejemplo la búsqueda por relevancia) se usa la
+    paginación normal de Django, porque ese orden no sirve de llave; también
+    con ?page=N sin cursor, para los enlaces hechos con next_page_number().
+
+    Con `conteo_aproximado = True` el contexto incluye `total_aproximado`.
+    """
+    paginate_by = 50
+    orden_keyset = None
+    conteo_aproximado = False
+    parametro_cursor = 'cursor'
+
+    def paginate_queryset(self, queryset, page_size):
+        cursor = self.request.GET.get(self.parametro_cursor)
+        if queryset.query.order_by or not cursor and self.request.GET.get(self.page_kwarg, '1') != '1':
+            return super().paginate_queryset(queryset, page_size)
+
+        campos = campos_orden(queryset.model, self.orden_keyset)
+        paginador = PaginadorKeyset(queryset, page_size)
+        # select_related() sin argumentos cambiaría las relaciones del listado por las no nulas
+        if relaciones(campos):
+            queryset = queryset.select_related(*relaciones(campos))
+        hacia_atras, numero = False, 1
+        if cursor:
+            direccion, valores, numero = decodificar_cursor(cursor, campos)
+            hacia_atras = direccion == 'ant'
+            queryset = filtro_despues(queryset, campos, valores, hacia_atras)
+
+        filas = list(ordenar(queryset, campos, hacia_atras)[:page_size + 1])
+        hay_mas = len(filas) > page_size
+        filas = filas[:page_size]
+        if hacia_atras:
+            filas.reverse()
+
+        # Al avanzar siempre hay página anterior; al retroceder, siempre siguiente
+        siguiente = anterior = None
+        if filas:
+            if hay_mas or hacia_atras:
+                siguiente = codificar_cursor(filas[-1], campos, 'sig', numero + 1)
+            if cursor and (hay_mas or not hacia_atras):
+                anterior = codificar_cursor(filas[0], campos, 'ant', max(numero - 1, 1))
+        pagina = PaginaKeyset(filas, numero, paginador, siguiente, anterior, self.request, self.parametro_cursor)
+        return None, pagina, filas, pagina.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        if self.conteo_aproximado:
+            context['total_aproximado'] = contar_aproximado(self.object_list)
+        return context
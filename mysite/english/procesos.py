@@ -0,0 +1,80 @@
+"""
+Grupos de procesos para los comandos que trabajan en paralelo
+(`procesar_tareas`, `programar_reportes`, `imprimir_comprobantes`).
+
+Los procesos se crean con 'spawn' para que no hereden la conexión abierta a la
+base de datos, y cada uno configura Django al arrancar. Como los hijos importan
+este módulo y el del comando antes de configurar Django, aquí no se importan
+los modelos y las funciones que se envían a los procesos los importan dentro.
+"""
+import logging
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+def _inicializar_proceso():
+    django.setup()
+
+
+def grupo_de_procesos(procesos):
+    return ProcessPoolExecutor(
+        procesos, mp_context=multiprocessing.get_context('spawn'), initializer=_inicializar_proceso,
+    )
+
+
+def atender(procesos, reclamar, funcion, informar, fallo, intervalo, una_vez=False, antes=None):
+    """
+    Bucle de los comandos que reclaman trabajo de la base de datos y lo
+    ejecutan en un grupo de `procesos`.
+
+    - `reclamar(n)` devuelve hasta n trabajos (tuplas de argumentos de `funcion`);
+    - `informar(trabajo, resultado)` recibe lo que devolvió `funcion`;
+    - `fallo(trabajo, error)` recibe la excepción si `funcion` falló o el
+      proceso que la ejecutaba murió;
+    - `antes()`, si se indica, se llama en cada vuelta antes de reclamar.
+
+    Si un proceso muere el grupo queda inservible (BrokenProcessPool): los
+    trabajos en curso se dan por fallidos y se crea un grupo nuevo.
+    """
+    while True:
+        en_curso = {}
+        with grupo_de_procesos(procesos) as grupo:
+            try:
+                while True:
+                    close_old_connections()
+                    if antes is not None:
+                        antes()
+                    libres = procesos - len(en_curso)
+                    if libres:
+                        for trabajo in reclamar(libres):
+                            en_curso[grupo.submit(funcion, *trabajo)] = trabajo
+
+                    if not en_curso:
+                        if una_vez:
+                            return
+                        time.sleep(intervalo)
+                        continue
+
+                    terminados, _ = wait(en_curso, timeout=intervalo, return_when=FIRST_COMPLETED)
+                    for futuro in terminados:
+                        trabajo = en_curso.pop(futuro)
+                        try:
+                            resultado = futuro.result()
+                        except BrokenProcessPool:
+                            en_curso[futuro] = trabajo
+                            raise
+                        except Exception as error:
+                            fallo(trabajo, error)
+                        else:
+                            informar(trabajo, resultado)
+            except BrokenProcessPool as error:
+                logger.error("Un proceso del grupo terminó de forma inesperada; se crea un grupo nuevo")
+                for trabajo in en_curso.values():
+                    fallo(trabajo, error)
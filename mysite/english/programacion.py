@@ -0,0 +1,115 @@
+"""
+Ejecución de los reportes programados.
+
+El comando `programar_reportes` reclama los ReporteProgramado vencidos, avanza
+su `proxima_ejecucion` en la misma transacción y genera cada reporte en un
+grupo de procesos. El reporte cubre el período completo anterior a la
+ejecución y se envía a los destinatarios en el formato de su configuración.
+"""
+import io
+
+from django.core.mail import EmailMultiAlternatives
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.html import format_html, format_html_join
+
+from .models import ReporteEconomico, ReporteProgramado
+from .reportes import escribir_reporte_excel, escribir_reporte_pdf, guardar_resumen
+
+# Adjuntos por formato de salida de ConfiguracionReporte
+ADJUNTOS = {
+    'pdf': ['pdf'],
+    'excel': ['xlsx'],
+    'ambos': ['pdf', 'xlsx'],
+    'html': [],
+}
+
+ESCRITORES = {
+    'pdf': (escribir_reporte_pdf, 'application/pdf'),
+    'xlsx': (escribir_reporte_excel, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+
+def reclamar_vencidos(limite, ahora=None):
+    """
+    Devuelve hasta `limite` tuplas (pk, programado_para) de reportes vencidos y
+    deja su próxima ejecución en el futuro. Con skip_locked varios programadores
+    pueden consultar a la vez sin esperarse; la condición sobre
+    proxima_ejecucion cubre las bases de datos sin bloqueo de filas.
+    """
+    ahora = ahora or timezone.now()
+    reclamados = []
+    with transaction.atomic():
+        vencidos = ReporteProgramado.objects.filter(
+            activo=True, proxima_ejecucion__lte=ahora,
+        ).order_by('proxima_ejecucion').select_for_update(
+            skip_locked=connection.features.has_select_for_update_skip_locked,
+        )
+        for programado in vencidos[:limite]:
+            avanzado = ReporteProgramado.objects.filter(
+                pk=programado.pk, proxima_ejecucion=programado.proxima_ejecucion,
+            ).update(proxima_ejecucion=programado.siguiente_ejecucion(ahora), ultima_ejecucion=ahora)
+            if avanzado:
+                reclamados.append((programado.pk, programado.proxima_ejecucion))
+    return reclamados
+
+
+def ejecutar_programado(pk, programado_para):
+    """Genera el reporte de la ejecución `programado_para` y lo envía por correo."""
+    programado = ReporteProgramado.objects.select_related('configuracion', 'creado_por').get(pk=pk)
+    configuracion = programado.configuracion
+    fecha_inicio, fecha_fin = programado.periodo(programado_para)
+
+    reporte = ReporteEconomico.objects.create(
+        nombre=f"{configuracion.nombre} ({fecha_inicio} a {fecha_fin})",
+        tipo_reporte=programado.frecuencia,
+        tipo_movimiento='ambos',
+        fecha_inicio=fecha_inicio,
+        fecha_fin=fecha_fin,
+        generado_por=programado.creado_por,
+        parametros={'reporte_programado': programado.pk},
+    )
+    datos = guardar_resumen(reporte)
+
+    adjuntos = []
+    for extension in ADJUNTOS[configuracion.formato_salida]:
+        escribir, tipo_contenido = ESCRITORES[extension]
+        contenido = io.BytesIO()
+        escribir(reporte, contenido)
+        adjuntos.append((f"reporte_{reporte.pk}.{extension}", contenido.getvalue(), tipo_contenido))
+
+    if adjuntos:
+        nombre, contenido, _ = adjuntos[0]
+        reporte.archivo.save(nombre, io.BytesIO(contenido))
+
+    correo = EmailMultiAlternatives(
+        subject=f"Reporte {programado.get_frecuencia_display().lower()}: {reporte.nombre}",
+        body=(
+            f"Período: {fecha_inicio} a {fecha_fin}\n"
+            f"Ingresos Totales: ${datos.total_ingresos:,.2f}\n"
+            f"Egresos Totales: ${datos.total_egresos:,.2f}\n"
+            f"Balance: ${datos.balance:,.2f}\n"
+        ),
+        to=programado.lista_destinatarios(),
+    )
+    if configuracion.formato_salida == 'html':
+        correo.attach_alternative(reporte_html(reporte, datos), 'text/html')
+    for adjunto in adjuntos:
+        correo.attach(*adjunto)
+    correo.send()
+    return reporte.pk
+
+
+def reporte_html(reporte, datos):
+    filas = [
+        ('Ingresos Totales', datos.total_ingresos),
+        ('Egresos Totales', datos.total_egresos),
+        ('Balance', datos.balance),
+        *datos.detalle_ingresos(),
+        *datos.detalle_egresos(),
+    ]
+    return format_html(
+        "<h1>{}</h1><p>Período: {} a {}</p><table>{}</table>",
+        reporte.nombre, reporte.fecha_inicio, reporte.fecha_fin,
+        format_html_join('', "<tr><td>{}</td><td>${}</td></tr>", ((nombre, f"{valor:,.2f}") for nombre, valor in filas)),
+    )
@@ -0,0 +1,244 @@
+"""
+Cálculo de los reportes económicos.
+
+Todas las cifras de un período se obtienen con una sola consulta agrupada por
+tabla (cobros, egresos y pagos), sin importar cuántos tipos o categorías
+existan. El resultado se guarda como ResumenEconomico del reporte y las
+descargas en PDF y Excel se generan a partir de ese resumen mientras el
+período no reciba movimientos nuevos.
+"""
+from collections import defaultdict
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.db.models import Sum
+from openpyxl import Workbook
+from reportlab.lib.units import cm
+from django.utils import timezone
+
+from . import diseno_pdf
+from .diseno_pdf import campos, espacio, moneda, subtitulo, tabla, titulo, totales
+from .models import Cobro, ConfiguracionInstituto, DetallePago, Egreso, LibroDiario, ResumenEconomico
+
+DESGLOSES = ('ingresos_por_tipo', 'egresos_por_tipo', 'egresos_por_categoria', 'pagos_por_metodo')
+
+# Correspondencia entre los desgloses y los campos de ResumenEconomico
+CAMPOS_INGRESOS = {
+    'matricula': 'ingresos_matriculas',
+    'pension': 'ingresos_pensiones',
+    'material': 'ingresos_materiales',
+    'certificado': 'ingresos_certificados',
+    'otros': 'ingresos_otros',
+}
+
+CAMPOS_EGRESOS = {
+    'nomina': 'egresos_nomina',
+    'arriendo': 'egresos_arriendos',
+    'servicios': 'egresos_servicios',
+    'materiales': 'egresos_materiales',
+    'equipos': 'egresos_equipos',
+    'mantenimiento': 'egresos_mantenimiento',
+    'otros': 'egresos_otros',
+}
+
+CAMPOS_METODOS_PAGO = {
+    'efectivo': 'efectivo_total',
+    'transferencia': 'transferencias_total',
+    'bancolombia': 'transferencias_total',
+    'tarjeta_credito': 'tarjetas_total',
+    'tarjeta_debito': 'tarjetas_total',
+    'nequi': 'billeteras_digitales_total',
+    'daviplata': 'billeteras_digitales_total',
+}
+
+
+@dataclass
+class DatosReporte:
+    fecha_inicio: object
+    fecha_fin: object
+    ingresos_por_tipo: dict = field(default_factory=dict)
+    egresos_por_tipo: dict = field(default_factory=dict)
+    egresos_por_categoria: dict = field(default_factory=dict)
+    pagos_por_metodo: dict = field(default_factory=dict)
+
+    @property
+    def total_ingresos(self):
+        return sum(self.ingresos_por_tipo.values(), Decimal(0))
+
+    @property
+    def total_egresos(self):
+        return sum(self.egresos_por_tipo.values(), Decimal(0))
+
+    @property
+    def balance(self):
+        return self.total_ingresos - self.total_egresos
+
+    @classmethod
+    def desde_resumen(cls, resumen):
+        reporte = resumen.reporte
+        datos = cls(fecha_inicio=reporte.fecha_inicio, fecha_fin=reporte.fecha_fin)
+        for nombre in DESGLOSES:
+            valores = resumen.desglose.get(nombre, {})
+            setattr(datos, nombre, {clave: Decimal(valor) for clave, valor in valores.items()})
+        return datos
+
+    def desglose(self):
+        """Desgloses serializables para ResumenEconomico.desglose."""
+        return {
+            nombre: {clave: str(valor) for clave, valor in getattr(self, nombre).items()}
+            for nombre in DESGLOSES
+        }
+
+    def detalle_ingresos(self):
+        """[(nombre, valor)] en el orden de Cobro.TIPO_INGRESO_CHOICES, sin los valores en cero."""
+        return _detalle(Cobro.TIPO_INGRESO_CHOICES, self.ingresos_por_tipo)
+
+    def detalle_egresos(self):
+        """[(nombre, valor)] en el orden de Egreso.CATEGORIA_DETALLADA_CHOICES, sin los valores en cero."""
+        return _detalle(Egreso.CATEGORIA_DETALLADA_CHOICES, self.egresos_por_categoria)
+
+    def campos_resumen(self):
+        """Valores listos para asignar a un ResumenEconomico."""
+        campos = defaultdict(lambda: Decimal(0))
+        for desglose, correspondencia in (
+            (self.ingresos_por_tipo, CAMPOS_INGRESOS),
+            (self.egresos_por_tipo, CAMPOS_EGRESOS),
+            (self.pagos_por_metodo, CAMPOS_METODOS_PAGO),
+        ):
+            for clave, campo in correspondencia.items():
+                campos[campo] += desglose.get(clave, 0)
+        campos['total_ingresos'] = self.total_ingresos
+        campos['total_egresos'] = self.total_egresos
+        campos['balance'] = self.balance
+        return dict(campos)
+
+
+def _detalle(choices, desglose):
+    return [(nombre, desglose[clave]) for clave, nombre in choices if desglose.get(clave, 0) > 0]
+
+
+def calcular_reporte(fecha_inicio, fecha_fin):
+    """Calcula todos los desgloses del período con tres consultas agrupadas."""
+    datos = DatosReporte(fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
+    rango = [fecha_inicio, fecha_fin]
+
+    cobros = Cobro.objects.filter(fecha__range=rango).values('tipo_ingreso').annotate(
+        total=Sum('valor_total')
+    ).order_by()
+    for fila in cobros:
+        datos.ingresos_por_tipo[fila['tipo_ingreso']] = fila['total']
+
+    egresos = Egreso.objects.filter(fecha__range=rango).values('tipo', 'categoria_detallada').annotate(
+        total=Sum('valor_total')
+    ).order_by()
+    for fila in egresos:
+        datos.egresos_por_tipo[fila['tipo']] = datos.egresos_por_tipo.get(fila['tipo'], 0) + fila['total']
+        datos.egresos_por_categoria[fila['categoria_detallada']] = (
+            datos.egresos_por_categoria.get(fila['categoria_detallada'], 0) + fila['total']
+        )
+
+    pagos = DetallePago.objects.filter(cobro__fecha__range=rango).values('metodo_pago').annotate(
+        total=Sum('valor')
+    ).order_by()
+    for fila in pagos:
+        datos.pagos_por_metodo[fila['metodo_pago']] = fila['total']
+
+    return datos
+
+
+def guardar_resumen(reporte):
+    """Calcula el reporte y lo guarda como su ResumenEconomico."""
+    # El momento se toma antes de calcular para no perder escrituras concurrentes
+    momento = timezone.now()
+    datos = calcular_reporte(reporte.fecha_inicio, reporte.fecha_fin)
+    ResumenEconomico.objects.update_or_create(
+        reporte=reporte,
+        defaults={**datos.campos_resumen(), 'desglose': datos.desglose(), 'fecha_calculo': momento},
+    )
+    return datos
+
+
+def obtener_datos_reporte(reporte):
+    """
+    Devuelve los datos del reporte desde su resumen guardado y solo los
+    recalcula si no existe resumen o si el período cambió después de calcularlo.
+    """
+    resumen = ResumenEconomico.objects.filter(reporte=reporte).first()
+    if resumen is None or LibroDiario.modificado_desde(
+        reporte.fecha_inicio, reporte.fecha_fin, resumen.fecha_calculo
+    ):
+        return guardar_resumen(reporte)
+    resumen.reporte = reporte
+    return DatosReporte.desde_resumen(resumen)
+
+
+def escribir_reporte_pdf(reporte, destino):
+    """Escribe el reporte en PDF sobre `destino` (una respuesta o un archivo)."""
+    datos = obtener_datos_reporte(reporte)
+    anchos = [11 * cm, 6 * cm]
+    contenido = [
+        titulo(f"Reporte Económico: {reporte.nombre}"),
+        campos([
+            ('Período', f"{reporte.fecha_inicio} a {reporte.fecha_fin}"),
+            ('Generado por', reporte.generado_por.get_full_name()),
+            ('Fecha generación', reporte.fecha_generacion.strftime("%Y-%m-%d %H:%M")),
+        ]),
+        espacio(),
+        subtitulo("Resumen Financiero"),
+        totales([
+            ('Ingresos Totales', datos.total_ingresos),
+            ('Egresos Totales', datos.total_egresos),
+            ('Balance', datos.balance),
+        ], destacado='Balance'),
+        subtitulo("Detalle de Ingresos"),
+        tabla(['Tipo de ingreso', 'Valor'], [(nombre, moneda(valor)) for nombre, valor in datos.detalle_ingresos()],
+              anchos=anchos, numericas=(1,)),
+        subtitulo("Detalle de Egresos"),
+        tabla(['Categoría', 'Valor'], [(nombre, moneda(valor)) for nombre, valor in datos.detalle_egresos()],
+              anchos=anchos, numericas=(1,)),
+    ]
+    instituto = diseno_pdf.texto_instituto(ConfiguracionInstituto.obtener())
+    diseno_pdf.escribir(
+        destino, [(diseno_pdf.encabezado(instituto, f"Reporte Económico: {reporte.nombre}"), contenido)],
+        titulo_pdf=reporte.nombre,
+    )
+
+
+def escribir_reporte_excel(reporte, destino):
+    """Escribe el reporte en Excel sobre `destino` (una respuesta o un archivo)."""
+    # Crear libro de Excel
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Reporte Económico"
+    
+    # Encabezados
+    ws.append(['Reporte Económico', reporte.nombre])
+    ws.append(['Período', f"{reporte.fecha_inicio} a {reporte.fecha_fin}"])
+    ws.append(['Generado por', reporte.generado_por.get_full_name()])
+    ws.append(['Fecha generación', reporte.fecha_generacion.strftime("%Y-%m-%d %H:%M")])
+    ws.append([])
+    
+    # Obtener datos
+    datos = obtener_datos_reporte(reporte)
+    
+    ws.append(['Resumen Financiero'])
+    ws.append(['Ingresos Totales', datos.total_ingresos])
+    ws.append(['Egresos Totales', datos.total_egresos])
+    ws.append(['Balance', datos.balance])
+    ws.append([])
+    
+    # Detalle ingresos
+    ws.append(['Detalle de Ingresos'])
+    ws.append(['Tipo', 'Valor'])
+    for nombre, total_tipo in datos.detalle_ingresos():
+        ws.append([nombre, total_tipo])
+    
+    ws.append([])
+    
+    # Detalle egresos
+    ws.append(['Detalle de Egresos'])
+    ws.append(['Categoría', 'Valor'])
+    for nombre, total_categoria in datos.detalle_egresos():
+        ws.append([nombre, total_categoria])
+    
+    wb.save(destino)
@@ -0,0 +1,477 @@
+"""
+Copias de seguridad de la base de datos y de MEDIA_ROOT.
+
+Cada copia es un tar comprimido (gzip, o zstd si está instalado `zstandard` y
+BACKUP_COMPRESION = 'zst') con:
+
+- la base de datos: en SQLite una copia hecha con VACUUM INTO (db.sqlite3);
+  en otros motores un JSONL por modelo (datos/<app.modelo>.jsonl) que se
+  carga con loaddata;
+- los archivos de MEDIA_ROOT: todos en una copia completa y, en una
+  incremental, solo los que cambiaron desde la copia anterior;
+- manifiesto.json: el sha256 de cada miembro y el inventario completo de
+  MEDIA_ROOT ({ruta: [sha256, tamaño, mtime_ns]}).
+
+El inventario se guarda también en Backup.manifiesto. Un archivo cuyo tamaño y
+fecha no cambiaron desde la copia anterior conserva su hash sin volver a
+leerse. Los archivos que cambiaron mientras se copiaban quedan en
+`cambiados`: su contenido en la copia puede estar a medias, y como su fecha
+ya no coincide la siguiente incremental los vuelve a llevar; los que se
+borraron después del inventario se dejan fuera de la copia y del inventario.
+Restaurar una incremental toma cada archivo de la copia más reciente
+de la cadena que lo contiene. Antes de escribir nada se verifica el sha256 del
+archivo comprimido y el de cada miembro.
+
+VACUUM INTO lee la base de una vez, en una sola transacción de lectura, a un
+archivo temporal; la API de respaldo en línea, con pausas entre pasos, vuelve a
+empezar cada vez que otra conexión escribe. Lo que se limita a
+BACKUP_LIMITE_MB_S, para que el sitio siga respondiendo, es la lectura de ese
+temporal y de los archivos al empaquetarlos.
+"""
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import tarfile
+import tempfile
+import time
+import zlib
+from pathlib import Path, PurePosixPath
+
+from django.apps import apps
+from django.conf import settings
+from django.core import serializers
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.utils import timezone
+
+from .models import Backup
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+VERSION_FORMATO = 1
+LIMITE_MB_S = 20
+TAMANO_BLOQUE = 1024 * 1024
+TAMANO_LOTE = 2000
+# Carpetas de MEDIA_ROOT que no se respaldan: las propias copias y los resultados de tareas
+EXCLUIR_MEDIA = {'backups', 'tareas'}
+MANIFIESTO = 'manifiesto.json'
+EXTENSIONES = {'gz': '.tar.gz', 'zst': '.tar.zst'}
+
+
+class RespaldoInvalido(Exception):
+    """La copia no coincide con su manifiesto o falta una copia de la cadena."""
+
+
+class Limitador:
+    """Duerme lo necesario para no pasar de `bytes_por_segundo` (0: sin límite)."""
+
+    def __init__(self, bytes_por_segundo):
+        self.tasa = bytes_por_segundo
+        self.inicio = time.monotonic()
+        self.bytes = 0
+
+    def consumir(self, cantidad):
+        if not self.tasa:
+            return
+        self.bytes += cantidad
+        adelanto = self.bytes / self.tasa - (time.monotonic() - self.inicio)
+        if adelanto > 0:
+            time.sleep(adelanto)
+
+
+class _Lector:
+    """Envuelve un archivo de lectura: calcula su sha256 y respeta el límite."""
+
+    def __init__(self, archivo, limitador=None):
+        self.archivo = archivo
+        self.limitador = limitador
+        self.hash = hashlib.sha256()
+
+    def read(self, cantidad=-1):
+        datos = self.archivo.read(cantidad)
+        self.hash.update(datos)
+        if self.limitador is not None:
+            self.limitador.consumir(len(datos))
+        return datos
+
+
+class _Escritor:
+    """Envuelve el archivo de salida para saber su sha256 y su tamaño."""
+
+    def __init__(self, archivo):
+        self.archivo = archivo
+        self.hash = hashlib.sha256()
+        self.bytes = 0
+
+    def write(self, datos):
+        self.hash.update(datos)
+        self.bytes += len(datos)
+        return self.archivo.write(datos)
+
+    def flush(self):
+        self.archivo.flush()
+
+
+def _formato():
+    formato = getattr(settings, 'BACKUP_COMPRESION', 'gz')
+    if formato == 'zst' and zstandard is None:
+        logger.warning("BACKUP_COMPRESION = 'zst' sin el paquete zstandard; se usa gzip")
+        formato = 'gz'
+    return formato
+
+
+def _formato_de(nombre):
+    return 'zst' if nombre.endswith(EXTENSIONES['zst']) else 'gz'
+
+
+def _compresor(destino, formato):
+    if formato == 'zst':
+        return zstandard.ZstdCompressor(level=3).stream_writer(destino, closefd=False)
+    return gzip.GzipFile(fileobj=destino, mode='wb', compresslevel=6)
+
+
+def _descompresor(origen, formato):
+    if formato == 'zst':
+        if zstandard is None:
+            raise RespaldoInvalido("La copia está comprimida con zstd y no está instalado el paquete zstandard")
+        return zstandard.ZstdDecompressor().stream_reader(origen, closefd=False)
+    return gzip.GzipFile(fileobj=origen, mode='rb')
+
+
+# ========================================================
+# Inventario de MEDIA_ROOT
+# ========================================================
+
+def _hash_archivo(ruta, limitador):
+    with open(ruta, 'rb') as archivo:
+        lector = _Lector(archivo, limitador)
+        while lector.read(TAMANO_BLOQUE):
+            pass
+    return lector.hash.hexdigest()
+
+
+def inventario_media(anterior=None, limitador=None):
+    """
+    {ruta: [sha256, tamaño, mtime_ns]} de los archivos de MEDIA_ROOT. Si una
+    ruta tiene en `anterior` el mismo tamaño y fecha, se reutiliza su hash.
+    """
+    anterior = anterior or {}
+    raiz = Path(settings.MEDIA_ROOT)
+    inventario = {}
+    for directorio, carpetas, archivos in os.walk(raiz):
+        relativo = PurePosixPath(Path(directorio).relative_to(raiz).as_posix())
+        if relativo == PurePosixPath('.'):
+            carpetas[:] = [carpeta for carpeta in carpetas if carpeta not in EXCLUIR_MEDIA]
+        carpetas.sort()
+        for nombre in sorted(archivos):
+            ruta = (relativo / nombre).as_posix()
+            estado = os.stat(os.path.join(directorio, nombre))
+            previo = anterior.get(ruta)
+            if previo and previo[1] == estado.st_size and previo[2] == estado.st_mtime_ns:
+                inventario[ruta] = previo
+            else:
+                inventario[ruta] = [
+                    _hash_archivo(os.path.join(directorio, nombre), limitador), estado.st_size, estado.st_mtime_ns,
+                ]
+    return inventario
+
+
+# ========================================================
+# Creación
+# ========================================================
+
+class _Completar:
+    """
+    Lee exactamente `tamano` bytes: si el archivo se acortó mientras se copiaba
+    completa con ceros, porque el tar ya anunció el tamaño del miembro.
+    """
+
+    def __init__(self, archivo, tamano):
+        self.archivo = archivo
+        self.restantes = tamano
+        self.incompleto = False
+
+    def read(self, cantidad=-1):
+        cantidad = self.restantes if cantidad < 0 else min(cantidad, self.restantes)
+        datos = self.archivo.read(cantidad)
+        if len(datos) < cantidad:
+            self.incompleto = True
+            datos += bytes(cantidad - len(datos))
+        self.restantes -= len(datos)
+        return datos
+
+
+def _agregar(tar, nombre, archivo, limitador):
+    """
+    Agrega `archivo` (abierto en binario) al tar con el tamaño y la fecha del
+    archivo abierto. Devuelve (sha256, estado antes de leerlo, cambió), donde
+    `cambió` indica que el archivo se modificó mientras se copiaba.
+    """
+    estado = os.fstat(archivo.fileno())
+    info = tarfile.TarInfo(nombre)
+    info.size = estado.st_size
+    info.mtime = estado.st_mtime
+    completo = _Completar(archivo, estado.st_size)
+    lector = _Lector(completo, limitador)
+    tar.addfile(info, lector)
+    despues = os.fstat(archivo.fileno())
+    cambio = completo.incompleto or (despues.st_size, despues.st_mtime_ns) != (estado.st_size, estado.st_mtime_ns)
+    return lector.hash.hexdigest(), estado, cambio
+
+
+def _agregar_base_datos(tar, alias, limitador, progreso):
+    """Agrega la base de datos al tar; devuelve {miembro: sha256}."""
+    conexion = connections[alias]
+    conexion.ensure_connection()
+    with tempfile.TemporaryDirectory() as temporal:
+        if conexion.vendor == 'sqlite':
+            destino = os.path.join(temporal, 'db.sqlite3')
+            conexion.connection.execute('VACUUM INTO ?', (destino,))
+            progreso(30)
+            archivos = [('db.sqlite3', destino)]
+        else:
+            archivos = []
+            modelos = serializers.sort_dependencies(
+                [(configuracion, None) for configuracion in apps.get_app_configs()], allow_cycles=True,
+            )
+            for numero, modelo in enumerate(modelos):
+                if not modelo._meta.managed or modelo._meta.proxy:
+                    continue
+                etiqueta = modelo._meta.label_lower
+                destino = os.path.join(temporal, f"{etiqueta}.jsonl")
+                with open(destino, 'w', encoding='utf-8') as salida:
+                    filas = modelo._base_manager.using(alias).order_by('pk').iterator(chunk_size=TAMANO_LOTE)
+                    serializers.serialize('jsonl', filas, stream=salida)
+                archivos.append((f"datos/{etiqueta}.jsonl", destino))
+                progreso(10 + int(40 * (numero + 1) / len(modelos)))
+
+        hashes = {}
+        for nombre, ruta in archivos:
+            with open(ruta, 'rb') as archivo:
+                hashes[nombre], _, _ = _agregar(tar, nombre, archivo, limitador)
+        return hashes
+
+
+def _sin_repetir(progreso):
+    # Con muchos archivos el porcentaje se repite; solo interesa cuando cambia
+    ultimo = None
+
+    def avisar(porcentaje):
+        nonlocal ultimo
+        if porcentaje != ultimo:
+            ultimo = porcentaje
+            progreso(porcentaje)
+    return avisar
+
+
+def crear_backup(usuario, tipo='completo', descripcion='', progreso=None, alias='default'):
+    """
+    Crea una copia 'completo' o 'incremental' y devuelve su Backup. Una
+    incremental sin copias anteriores se hace completa.
+    """
+    progreso = _sin_repetir(progreso or (lambda porcentaje: None))
+    limitador = Limitador(getattr(settings, 'BACKUP_LIMITE_MB_S', LIMITE_MB_S) * 1024 * 1024)
+    anterior = Backup.objects.exclude(manifiesto=None).order_by('-fecha', '-id').first()
+    base = anterior if tipo == 'incremental' else None
+    if base is None:
+        tipo = 'completo'
+
+    media = inventario_media(anterior.manifiesto['media'] if anterior else None, limitador)
+    if base is None:
+        incluidos = sorted(media)
+    else:
+        previos = base.manifiesto['media']
+        incluidos = sorted(ruta for ruta, datos in media.items() if ruta not in previos or previos[ruta][0] != datos[0])
+    progreso(10)
+
+    formato = _formato()
+    nombre = default_storage.get_available_name(
+        f"backups/backup_{timezone.localtime():%Y%m%d_%H%M%S}_{tipo}{EXTENSIONES[formato]}"
+    )
+    ruta = default_storage.path(nombre)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    parcial = f"{ruta}.parcial"
+    raiz = Path(settings.MEDIA_ROOT)
+    try:
+        with open(parcial, 'wb') as crudo:
+            escritor = _Escritor(crudo)
+            with _compresor(escritor, formato) as comprimido, tarfile.open(fileobj=comprimido, mode='w|') as tar:
+                base_datos = _agregar_base_datos(tar, alias, limitador, progreso)
+                cambiados, borrados = [], []
+                for numero, relativa in enumerate(incluidos):
+                    try:
+                        archivo = open(raiz / relativa, 'rb')
+                    except FileNotFoundError:
+                        # Se borró después del inventario: la copia queda como si ya no existiera
+                        logger.warning("%s se borró antes de copiarse", relativa)
+                        borrados.append(relativa)
+                        del media[relativa]
+                        continue
+                    with archivo:
+                        sha256, estado, cambio = _agregar(tar, f"media/{relativa}", archivo, limitador)
+                    # Lo que vale es lo que quedó en la copia, aunque el archivo cambiara desde el inventario
+                    media[relativa] = [sha256, estado.st_size, estado.st_mtime_ns]
+                    if cambio:
+                        logger.warning("%s cambió mientras se copiaba", relativa)
+                        cambiados.append(relativa)
+                    progreso(50 + int(45 * (numero + 1) / len(incluidos)))
+
+                incluidos = [relativa for relativa in incluidos if relativa not in borrados]
+                manifiesto = {
+                    'version': VERSION_FORMATO, 'tipo': tipo, 'base': base.pk if base else None,
+                    'motor': connections[alias].vendor, 'base_datos': base_datos,
+                    'media': media, 'incluidos': incluidos, 'cambiados': cambiados,
+                }
+                contenido = json.dumps(manifiesto, ensure_ascii=False).encode()
+                info = tarfile.TarInfo(MANIFIESTO)
+                info.size = len(contenido)
+                info.mtime = time.time()
+                tar.addfile(info, io.BytesIO(contenido))
+        os.replace(parcial, ruta)
+    except BaseException:
+        if os.path.exists(parcial):
+            os.remove(parcial)
+        raise
+
+    backup = Backup.objects.create(
+        archivo=nombre, tipo=tipo, base=base, realizado_por=usuario, manifiesto=manifiesto,
+        descripcion=descripcion or f"Copia {tipo}",
+        tamano=escritor.bytes, sha256=escritor.hash.hexdigest(),
+    )
+    progreso(100)
+    return backup
+
+
+# ========================================================
+# Verificación y restauración
+# ========================================================
+
+def cadena_de(backup):
+    """[backup, su base, la base de esa...]: las copias necesarias para restaurar `backup`."""
+    cadena = [backup]
+    while cadena[-1].base_id is not None:
+        if cadena[-1].base_id in {copia.pk for copia in cadena}:
+            raise RespaldoInvalido(f"La cadena de la copia {backup.pk} tiene un ciclo")
+        cadena.append(Backup.objects.get(pk=cadena[-1].base_id))
+    return cadena
+
+
+def _recorrer(backup, visitar=None):
+    """
+    Lee la copia de principio a fin: comprueba el sha256 del archivo y el de
+    cada miembro contra el manifiesto. `visitar(nombre, archivo)` recibe cada
+    miembro y devuelve su destino abierto, o None para solo leerlo.
+    """
+    if not backup.archivo or not os.path.exists(backup.archivo.path):
+        raise RespaldoInvalido(f"No se encuentra el archivo de la copia {backup.pk}")
+
+    hashes = {}
+    manifiesto = None
+    with open(backup.archivo.path, 'rb') as crudo:
+        lector = _Lector(crudo)
+        try:
+            with _descompresor(lector, _formato_de(backup.archivo.name)) as descomprimido, \
+                    tarfile.open(fileobj=descomprimido, mode='r|') as tar:
+                for miembro in tar:
+                    if not miembro.isfile():
+                        raise RespaldoInvalido(f"Miembro inesperado en la copia {backup.pk}: {miembro.name}")
+                    origen = tar.extractfile(miembro)
+                    if miembro.name == MANIFIESTO:
+                        manifiesto = json.loads(origen.read())
+                        continue
+                    destino = visitar(miembro.name, origen) if visitar else None
+                    contenido = _Lector(origen)
+                    with (destino or _Descartar()) as salida:
+                        while bloque := contenido.read(TAMANO_BLOQUE):
+                            salida.write(bloque)
+                    hashes[miembro.name] = contenido.hash.hexdigest()
+        except (tarfile.TarError, OSError, EOFError, ValueError, zlib.error) as error:
+            raise RespaldoInvalido(f"La copia {backup.pk} está dañada: {error}")
+        while lector.read(TAMANO_BLOQUE):
+            pass
+
+    if lector.hash.hexdigest() != backup.sha256:
+        raise RespaldoInvalido(f"El sha256 del archivo de la copia {backup.pk} no coincide")
+    if manifiesto is None:
+        raise RespaldoInvalido(f"La copia {backup.pk} no tiene manifiesto")
+    esperados = dict(manifiesto['base_datos'])
+    esperados.update({f"media/{ruta}": manifiesto['media'][ruta][0] for ruta in manifiesto['incluidos']})
+    if hashes != esperados:
+        distintos = sorted(set(hashes.items()) ^ set(esperados.items()))
+        raise RespaldoInvalido(f"La copia {backup.pk} no coincide con su manifiesto: {distintos[:5]}")
+    return manifiesto
+
+
+class _Descartar:
+    def write(self, datos):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+def _ubicar_media(cadena):
+    """{ruta: copia de la cadena que la contiene} para el inventario de la primera copia."""
+    ubicacion = {}
+    for ruta, (sha256, _, _) in cadena[0].manifiesto['media'].items():
+        for copia in cadena:
+            datos = copia.manifiesto['media'].get(ruta)
+            if datos and datos[0] == sha256 and ruta in set(copia.manifiesto['incluidos']):
+                ubicacion[ruta] = copia
+                break
+        else:
+            raise RespaldoInvalido(f"{ruta} no está en ninguna copia de la cadena de la copia {cadena[0].pk}")
+    return ubicacion
+
+
+def verificar(backup):
+    """Comprueba `backup` y las copias de las que depende; devuelve la cadena o lanza RespaldoInvalido."""
+    cadena = cadena_de(backup)
+    for copia in cadena:
+        if _recorrer(copia) != copia.manifiesto:
+            raise RespaldoInvalido(f"El manifiesto de la copia {copia.pk} no coincide con el registrado")
+    _ubicar_media(cadena)
+    return cadena
+
+
+def restaurar(backup, directorio):
+    """
+    Verifica `backup` y su cadena y escribe en `directorio` la base de datos
+    (db.sqlite3 o datos/*.jsonl) y los archivos en media/. No toca la base
+    ni el MEDIA_ROOT en uso: el reemplazo lo hace quien administra el servidor.
+    """
+    cadena = verificar(backup)
+    ubicacion = _ubicar_media(cadena)
+    destino = Path(directorio).resolve()
+    destino.mkdir(parents=True, exist_ok=True)
+
+    for copia in cadena:
+        necesarios = {f"media/{ruta}" for ruta, origen in ubicacion.items() if origen is copia}
+        if copia is backup:
+            necesarios |= set(backup.manifiesto['base_datos'])
+        if not necesarios:
+            continue
+
+        def visitar(nombre, origen, necesarios=necesarios):
+            if nombre not in necesarios:
+                return None
+            ruta = (destino / nombre).resolve()
+            if destino not in ruta.parents:
+                raise RespaldoInvalido(f"Ruta fuera del destino: {nombre}")
+            ruta.parent.mkdir(parents=True, exist_ok=True)
+            return open(ruta, 'wb')
+
+        # Se vuelve a verificar al extraer, por si el archivo cambió desde la verificación
+        _recorrer(copia, visitar)
+    return destino
@@ -0,0 +1,236 @@
+import copy
+from collections import defaultdict
+
+from django.apps import apps
+from django.contrib.auth.signals import user_logged_in, user_logged_out
+from django.db import connections, transaction
+from django.db.models.signals import (
+    m2m_changed, pre_save, post_save, pre_delete, post_delete, post_migrate, post_init,
+)
+from django.dispatch import receiver
+
+from . import auditoria, calendario, comprobantes
+from .busqueda import asegurar_indice_sqlite
+from .models import (
+    ArchivoHistorico, Auditoria, Backup, BuzonComunicado, Cobro, Consecutivo, DetalleEgreso, DetallePago, Egreso,
+    Estudiante, Evento, Factura, IndiceBusquedaEstudiante, ItemFactura, LibroDiario, ResumenEconomico, Tarea,
+)
+
+# ========================================================
+# Libro Diario
+# ========================================================
+
+def _aportes(modelo, **filtro):
+    """
+    Devuelve [(clave, valor, adicional)] con lo que aportan al libro las filas
+    de `modelo`. `adicional` es lo que leen los reportes y el libro no separa
+    (el tipo de un egreso): cambiarlo no mueve totales pero sí los desactualiza.
+    """
+    if modelo is Cobro:
+        filas = Cobro.objects.filter(**filtro).values_list('fecha', 'tipo_ingreso', 'valor_total')
+        return [
+            ({'fecha': fecha, 'tipo': 'ingreso', 'tipo_ingreso': tipo_ingreso}, valor, None)
+            for fecha, tipo_ingreso, valor in filas
+        ]
+    if modelo is DetallePago:
+        # Con la fecha del cobro, la misma con la que los reportes agrupan los pagos
+        filas = DetallePago.objects.filter(**filtro).values_list(
+            'cobro__fecha', 'cobro__tipo_ingreso', 'metodo_pago', 'valor'
+        )
+        return [
+            ({'fecha': fecha, 'tipo': 'pago', 'tipo_ingreso': tipo_ingreso, 'metodo_pago': metodo}, valor, None)
+            for fecha, tipo_ingreso, metodo, valor in filas
+        ]
+    filas = Egreso.objects.filter(**filtro).values_list(
+        'fecha', 'categoria_detallada', 'forma_pago', 'valor_total', 'tipo'
+    )
+    return [
+        ({'fecha': fecha, 'tipo': 'egreso', 'categoria_detallada': categoria, 'metodo_pago': metodo}, valor, tipo)
+        for fecha, categoria, metodo, valor, tipo in filas
+    ]
+
+def _aportes_instancia(sender, instance):
+    aportes = _aportes(sender, pk=instance.pk)
+    if sender is Cobro:
+        # Los pagos heredan el tipo de ingreso y la fecha del cobro
+        aportes += _aportes(DetallePago, cobro_id=instance.pk)
+    return aportes
+
+def _comparable(aportes):
+    return sorted((tuple(sorted(clave.items())), valor, adicional) for clave, valor, adicional in aportes)
+
+def _aplicar(anteriores, nuevos):
+    """
+    Registra en el libro la diferencia entre los aportes anteriores y los
+    nuevos. Si algo cambió aunque los totales no, las filas afectadas se
+    registran igual (con cero) para que su fecha de actualización invalide
+    los resúmenes de reportes guardados.
+    """
+    cambio = _comparable(anteriores) != _comparable(nuevos)
+    deltas = defaultdict(lambda: [0, 0])
+    for signo, aportes in ((-1, anteriores), (1, nuevos)):
+        for clave, valor, _ in aportes:
+            delta = deltas[tuple(sorted(clave.items()))]
+            delta[0] += signo * valor
+            delta[1] += signo
+    for clave, (valor, cantidad) in deltas.items():
+        if valor or cantidad or cambio:
+            LibroDiario.registrar(dict(clave), valor, cantidad)
+
+@receiver(pre_save, sender=Cobro)
+@receiver(pre_save, sender=DetallePago)
+@receiver(pre_save, sender=Egreso)
+def guardar_aportes_anteriores(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    instance._aportes_libro = _aportes_instancia(sender, instance) if instance.pk else []
+
+@receiver(post_save, sender=Cobro)
+@receiver(post_save, sender=DetallePago)
+@receiver(post_save, sender=Egreso)
+def actualizar_libro_diario(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    anteriores = getattr(instance, '_aportes_libro', [])
+    nuevos = _aportes(sender, pk=instance.pk) if created else _aportes_instancia(sender, instance)
+    _aplicar(anteriores, nuevos)
+
+@receiver(pre_delete, sender=Cobro)
+@receiver(pre_delete, sender=DetallePago)
+@receiver(pre_delete, sender=Egreso)
+def descontar_libro_diario(sender, instance, **kwargs):
+    # Los pagos de un cobro eliminado reciben su propio pre_delete en cascada
+    _aplicar(_aportes(sender, pk=instance.pk), [])
+
+
+# ========================================================
+# Búsqueda de estudiantes
+# ========================================================
+
+@receiver(post_migrate)
+def restaurar_indice_busqueda(sender, using, **kwargs):
+    # En SQLite algunas migraciones reconstruyen la tabla de estudiantes y con
+    # ella se eliminan los triggers que mantienen la tabla FTS.
+    if sender.name == 'english':
+        asegurar_indice_sqlite(connections[using])
+
+
+# ========================================================
+# Caché de comprobantes PDF
+# ========================================================
+
+# Modelo que cambia -> (comprobante, atributo con la llave del comprobante)
+COMPROBANTE_AFECTADO = {
+    Factura: ('factura', 'pk'),
+    ItemFactura: ('factura', 'factura_id'),
+    Cobro: ('cobro', 'pk'),
+    DetallePago: ('cobro', 'cobro_id'),
+    Egreso: ('egreso', 'pk'),
+    DetalleEgreso: ('egreso', 'egreso_id'),
+}
+
+@receiver(post_save, sender=Factura)
+@receiver(post_save, sender=ItemFactura)
+@receiver(post_save, sender=Cobro)
+@receiver(post_save, sender=DetallePago)
+@receiver(post_save, sender=Egreso)
+@receiver(post_save, sender=DetalleEgreso)
+@receiver(post_delete, sender=Factura)
+@receiver(post_delete, sender=ItemFactura)
+@receiver(post_delete, sender=Cobro)
+@receiver(post_delete, sender=DetallePago)
+@receiver(post_delete, sender=Egreso)
+@receiver(post_delete, sender=DetalleEgreso)
+def invalidar_comprobante(sender, instance, raw=False, using='default', **kwargs):
+    if raw:
+        return
+    tipo, atributo = COMPROBANTE_AFECTADO[sender]
+    pk = getattr(instance, atributo)
+    # Tras el commit: antes, una descarga guardaría el PDF anterior con la huella nueva
+    transaction.on_commit(lambda: comprobantes.invalidar(tipo, pk), using=using)
+
+@receiver(post_save, sender=Estudiante)
+def invalidar_comprobantes_estudiante(sender, instance, created, raw=False, update_fields=None, using='default',
+                                      **kwargs):
+    # Facturas y recibos muestran el nombre del estudiante
+    if raw or created or (update_fields is not None and not set(update_fields) & set(Estudiante.CAMPOS_BUSQUEDA)):
+        return
+    facturas = list(Factura.objects.filter(estudiante=instance).values_list('pk', flat=True))
+    cobros = list(Cobro.objects.filter(factura__estudiante=instance).values_list('pk', flat=True))
+    def invalidar():
+        comprobantes.invalidar('factura', *facturas)
+        comprobantes.invalidar('cobro', *cobros)
+    transaction.on_commit(invalidar, using=using)
+
+
+# ========================================================
+# Calendario
+# ========================================================
+
+@receiver(post_save, sender=Evento)
+@receiver(post_delete, sender=Evento)
+@receiver(m2m_changed, sender=Evento.grupos.through)
+@receiver(m2m_changed, sender=Evento.participantes.through)
+def invalidar_calendario(sender, raw=False, action='', using='default', **kwargs):
+    if raw or action.startswith('pre_'):
+        return
+    # Tras el commit: antes, otra petición podría guardar lo anterior con la versión nueva
+    transaction.on_commit(calendario.invalidar, using=using)
+
+
+# ========================================================
+# Auditoría
+# ========================================================
+
+# Tablas derivadas o de uso interno que cambian solas con cada operación
+NO_AUDITADOS = {
+    ArchivoHistorico, Auditoria, Backup, BuzonComunicado, Consecutivo, IndiceBusquedaEstudiante, LibroDiario,
+    ResumenEconomico, Tarea,
+}
+
+def _estado(instance):
+    estado = instance.__dict__.copy()
+    estado.pop('_estado_auditoria', None)
+    for campo, valor in estado.items():
+        # Un JSONField se puede modificar en el lugar: la foto no debe cambiar con la instancia
+        if isinstance(valor, (dict, list)) and not campo.startswith('_'):
+            estado[campo] = copy.deepcopy(valor)
+    return estado
+
+def guardar_estado_inicial(sender, instance, **kwargs):
+    # Solo dentro de una petición o tarea auditada; fuera de ellas solo cuesta esta comprobación
+    if auditoria.contexto_actual() is not None:
+        instance._estado_auditoria = _estado(instance)
+
+def auditar_guardado(sender, instance, created, raw=False, using='default', **kwargs):
+    if raw or auditoria.contexto_actual() is None:
+        return
+    despues = _estado(instance)
+    antes = None if created else getattr(instance, '_estado_auditoria', None)
+    instance._estado_auditoria = despues
+    if antes is None and not created:
+        # Instancia que no se cargó en este contexto: no hay con qué comparar
+        return
+    auditoria.registrar('creacion' if created else 'modificacion', instance, antes, despues, using=using)
+
+def auditar_eliminacion(sender, instance, using='default', **kwargs):
+    if auditoria.contexto_actual() is None:
+        return
+    antes = getattr(instance, '_estado_auditoria', None) or _estado(instance)
+    auditoria.registrar('eliminacion', instance, antes, None, using=using)
+
+for modelo in apps.get_app_config('english').get_models():
+    if modelo not in NO_AUDITADOS:
+        post_init.connect(guardar_estado_inicial, sender=modelo, dispatch_uid=f'auditoria_inicial_{modelo.__name__}')
+        post_save.connect(auditar_guardado, sender=modelo, dispatch_uid=f'auditoria_guardado_{modelo.__name__}')
+        post_delete.connect(auditar_eliminacion, sender=modelo, dispatch_uid=f'auditoria_eliminacion_{modelo.__name__}')
+
+@receiver(user_logged_in)
+def auditar_inicio_sesion(sender, request, user, **kwargs):
+    auditoria.registrar('login', user, contexto=auditoria.Contexto(user, auditoria.ip_de(request)))
+
+@receiver(user_logged_out)
+def auditar_cierre_sesion(sender, request, user, **kwargs):
+    if user is not None:
+        auditoria.registrar('logout', user, contexto=auditoria.Contexto(user, auditoria.ip_de(request)))
+
@@ -0,0 +1,233 @@
+"""
+Cola de tareas en segundo plano guardada en la base de datos.
+
+Las vistas crean una Tarea con `encolar` y responden de inmediato; el comando
+`procesar_tareas` reclama las tareas pendientes y las ejecuta en un grupo de
+procesos. No se necesita ningún servicio adicional a la base de datos.
+"""
+import datetime
+import io
+import logging
+import threading
+import traceback
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.files.base import ContentFile, File
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+
+from .auditoria import auditar_como
+from .buzon import repartir
+from .comprobantes import filtrar_lote, generar_lote
+from .exportaciones import ENCABEZADOS_ESTUDIANTES, exportar_xlsx, filas_estudiantes
+from .facturacion import generar_facturas_masivas
+from .models import Comunicado, ConceptoCobro, PeriodoAcademico, ReporteEconomico, Tarea
+from .respaldos import crear_backup
+from .reportes import escribir_reporte_excel, escribir_reporte_pdf
+
+logger = logging.getLogger(__name__)
+
+EJECUTORES = {}
+LATIDO_S = 30
+SIN_LATIDO_MIN = 5
+MAX_INTENTOS = 3
+
+
+def ejecutor(tipo):
+    """
+    Registra la función que ejecuta las tareas de `tipo`. La función recibe la
+    Tarea y devuelve None o una tupla (nombre_archivo, contenido), donde el
+    contenido son bytes o un archivo abierto.
+    """
+    def decorador(funcion):
+        EJECUTORES[tipo] = funcion
+        return funcion
+    return decorador
+
+
+def encolar(tipo, usuario, /, **parametros):
+    # Posicionales: los parámetros de la tarea pueden llamarse también `tipo`
+    return Tarea.objects.create(tipo=tipo, creada_por=usuario, parametros=parametros)
+
+
+def reclamar(limite=1):
+    """
+    Marca como en proceso hasta `limite` tareas pendientes y las devuelve. El
+    cambio de estado es condicional, así que si varios procesadores compiten
+    por la misma tarea solo uno la obtiene.
+    """
+    reclamadas = []
+    candidatas = Tarea.objects.filter(estado='pendiente').order_by('fecha_creacion').values_list('pk', flat=True)
+    for pk in candidatas[:limite * 2]:
+        if len(reclamadas) == limite:
+            break
+        ahora = timezone.now()
+        if Tarea.objects.filter(pk=pk, estado='pendiente').update(
+            estado='en_proceso', fecha_inicio=ahora, latido=ahora, intentos=F('intentos') + 1,
+        ):
+            reclamadas.append(pk)
+    return reclamadas
+
+
+def devolver(pk, mensaje):
+    """
+    Devuelve a la cola una tarea reclamada que no terminó (su proceso murió o
+    se quedó sin responder), o la marca como fallida si ya agotó los intentos.
+    """
+    en_proceso = Tarea.objects.filter(pk=pk, estado='en_proceso')
+    maximo = getattr(settings, 'TAREAS_MAX_INTENTOS', MAX_INTENTOS)
+    if en_proceso.filter(intentos__lt=maximo).update(estado='pendiente', fecha_inicio=None, latido=None, progreso=0):
+        logger.warning("Tarea %s devuelta a la cola: %s", pk, mensaje)
+        return 'pendiente'
+    if en_proceso.update(estado='fallida', mensaje=mensaje, fecha_fin=timezone.now()):
+        logger.error("Tarea %s fallida tras %s intentos: %s", pk, maximo, mensaje)
+        return 'fallida'
+    return None
+
+
+def reanudar_vencidas():
+    """
+    Devuelve a la cola las tareas en proceso sin latido desde hace más de
+    TAREAS_SIN_LATIDO_MIN minutos: el procesador que las reclamó se detuvo sin
+    terminarlas. Una tarea larga que sigue corriendo late cada
+    TAREAS_LATIDO_S segundos y no se toca. Devuelve cuántas.
+    """
+    minutos = getattr(settings, 'TAREAS_SIN_LATIDO_MIN', SIN_LATIDO_MIN)
+    limite = timezone.now() - datetime.timedelta(minutes=minutos)
+    vencidas = Tarea.objects.filter(estado='en_proceso', latido__lt=limite).values_list('pk', flat=True)
+    for pk in vencidas:
+        devolver(pk, f"Sin latido durante {minutos} minutos")
+    return len(vencidas)
+
+
+@contextmanager
+def _latiendo(pk, intento):
+    """Mientras dura el bloque, un hilo marca cada TAREAS_LATIDO_S segundos que la tarea sigue viva."""
+    intervalo = getattr(settings, 'TAREAS_LATIDO_S', LATIDO_S)
+    terminar = threading.Event()
+
+    def latir():
+        try:
+            while not terminar.wait(intervalo):
+                Tarea.objects.filter(pk=pk, estado='en_proceso', intentos=intento).update(latido=timezone.now())
+        except Exception:
+            logger.exception("Falló el latido de la tarea %s", pk)
+        finally:
+            connection.close()
+
+    hilo = threading.Thread(target=latir, name=f'latido-tarea-{pk}', daemon=True)
+    hilo.start()
+    try:
+        yield
+    finally:
+        terminar.set()
+        hilo.join()
+
+
+def ejecutar(pk):
+    """
+    Ejecuta la tarea y guarda su resultado, salvo que mientras tanto se haya
+    devuelto a la cola y otro procesador la haya reclamado: entonces este
+    resultado se descarta y se devuelve 'descartada'.
+    """
+    tarea = Tarea.objects.select_related('creada_por').get(pk=pk)
+    intento = tarea.intentos
+    try:
+        with _latiendo(pk, intento), auditar_como(tarea.creada_por):
+            resultado = EJECUTORES[tarea.tipo](tarea)
+        if resultado is not None:
+            nombre, contenido = resultado
+            archivo = ContentFile(contenido) if isinstance(contenido, bytes) else File(contenido)
+            tarea.resultado.save(nombre, archivo, save=False)
+            archivo.close()
+        tarea.estado = 'completada'
+        tarea.progreso = 100
+    except Exception:
+        logger.exception("Falló la tarea %s", pk)
+        tarea.estado = 'fallida'
+        tarea.mensaje = traceback.format_exc(limit=5)
+    tarea.fecha_fin = timezone.now()
+    vigente = Tarea.objects.filter(pk=pk, intentos=intento, estado__in=['pendiente', 'en_proceso']).update(
+        estado=tarea.estado, progreso=tarea.progreso, mensaje=tarea.mensaje, resultado=tarea.resultado.name or '',
+        fecha_fin=tarea.fecha_fin,
+    )
+    if not vigente:
+        logger.warning("La tarea %s la reclamó otro procesador; se descarta este resultado", pk)
+        if tarea.resultado:
+            tarea.resultado.delete(save=False)
+        return 'descartada'
+    return tarea.estado
+
+
+# ========================================================
+# Ejecutores
+# ========================================================
+
+@ejecutor('reporte_pdf')
+def _reporte_pdf(tarea):
+    reporte = ReporteEconomico.objects.select_related('generado_por').get(pk=tarea.parametros['reporte_id'])
+    contenido = io.BytesIO()
+    escribir_reporte_pdf(reporte, contenido)
+    return f"reporte_{reporte.nombre}.pdf", contenido.getvalue()
+
+
+@ejecutor('reporte_excel')
+def _reporte_excel(tarea):
+    reporte = ReporteEconomico.objects.select_related('generado_por').get(pk=tarea.parametros['reporte_id'])
+    contenido = io.BytesIO()
+    escribir_reporte_excel(reporte, contenido)
+    return f"reporte_{reporte.nombre}.xlsx", contenido.getvalue()
+
+
+@ejecutor('exportar_estudiantes')
+def _exportar_estudiantes(tarea):
+    return "estudiantes.xlsx", exportar_xlsx("Estudiantes", ENCABEZADOS_ESTUDIANTES, filas_estudiantes())
+
+
+@ejecutor('facturacion_masiva')
+def _facturacion_masiva(tarea):
+    parametros = tarea.parametros
+    creadas, omitidas = generar_facturas_masivas(
+        PeriodoAcademico.objects.get(pk=parametros['periodo_id']),
+        ConceptoCobro.objects.get(pk=parametros['concepto_id']),
+        tarea.creada_por,
+        fecha_vencimiento=parametros.get('fecha_vencimiento'),
+        porcentaje_descuento=parametros.get('porcentaje_descuento') or 0,
+    )
+    tarea.mensaje = f"{creadas} facturas generadas ({omitidas} estudiantes ya estaban facturados)"
+
+
+@ejecutor('comprobantes_lote')
+def _comprobantes_lote(tarea):
+    parametros = tarea.parametros
+    queryset = filtrar_lote(
+        parametros['tipo'], periodo=parametros.get('periodo'), estado=parametros.get('estado'),
+        desde=parametros.get('desde'), hasta=parametros.get('hasta'),
+    )
+    nombre, archivo, cantidad = generar_lote(parametros['tipo'], queryset, parametros.get('formato', 'pdf'))
+    tarea.mensaje = f"{cantidad} comprobantes"
+    return nombre, archivo
+
+
+@ejecutor('backup')
+def _backup(tarea):
+    backup = crear_backup(
+        tarea.creada_por, tarea.parametros.get('tipo', 'completo'),
+        descripcion=tarea.parametros.get('descripcion', ''), progreso=tarea.actualizar_progreso,
+    )
+    tarea.mensaje = (
+        f"{backup.get_tipo_display()}: {len(backup.manifiesto['incluidos'])} archivos de media, "
+        f"{backup.tamano / 1024 / 1024:.1f} MB"
+    )
+
+
+
+@ejecutor('comunicado')
+def _comunicado(tarea):
+    comunicado = Comunicado.objects.get(pk=tarea.parametros['comunicado_id'])
+    reparto = repartir(comunicado, progreso=tarea.actualizar_progreso)
+    tarea.mensaje = (
+        f"{reparto.total} destinatarios ({reparto.creadas} nuevos, {reparto.eliminadas} retirados)"
+    )
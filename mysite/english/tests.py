@@ -1,3 +1,2189 @@
-from django.test import TestCase
+import datetime
+import importlib
+import io
+import json
+import os
+import pathlib
+import re
+import shutil
+import sqlite3
+import tempfile
+import time
+import zipfile
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import closing
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core import mail
+from django.core.management import call_command
+from django.core.paginator import EmptyPage
+from django.core.cache import cache
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.http import HttpResponse
+from django.http import Http404
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.views.generic import ListView
+from openpyxl import Workbook, load_workbook
+from reportlab import rl_config
+
+from .models import *
+from .exportaciones import (
+    ENCABEZADOS_ESTUDIANTES, Columna, edad_en_sql, exportar_xlsx, filas_estudiantes, respuesta_exportacion
+)
+from . import archivo, auditoria, buzon, calendario, comprobantes, consultas, descargas, procesos, respaldos
+from .busqueda import asegurar_indice_sqlite, autocompletar_estudiantes, buscar_estudiantes, normalizar
+from .facturacion import FacturacionMasivaForm, calcular_valores, generar_facturas_masivas
+from .importaciones import importar_estudiantes
+from .management.commands.benchmark_pdf import factura_de_prueba
+from .paginacion import PaginacionKeysetMixin, campos_orden, filtro_despues, ordenar
+from .programacion import ejecutar_programado, reclamar_vencidos
+from .reportes import calcular_reporte, guardar_resumen, obtener_datos_reporte
+from .tareas import EJECUTORES, devolver, encolar, ejecutar, reanudar_vencidas, reclamar
+
+
+def crear_estudiante(identificacion='1000', **kwargs):
+    datos = dict(
+        tipo_identificacion='cc', identificacion=identificacion, primer_nombre='Ana',
+        primer_apellido='Pérez', fecha_nacimiento=datetime.date(2000, 1, 1), genero='femenino',
+        direccion='Calle 1', barrio='Centro', ciudad='Cali', departamento='Valle',
+        telefono_principal='3000000000', correo='ana@example.com', fecha_ingreso=datetime.date(2024, 1, 1),
+    )
+    datos.update(kwargs)
+    return Estudiante.objects.create(**datos)
+
+
+def crear_factura(estudiante, usuario, total=Decimal('100000'), **kwargs):
+    datos = dict(
+        estudiante=estudiante, fecha_vencimiento=datetime.date(2024, 2, 1),
+        subtotal=total, total=total, saldo=total, creada_por=usuario,
+    )
+    datos.update(kwargs)
+    return Factura.objects.create(**datos)
+
+
+def crear_cobro(factura, usuario, valor, fecha, tipo_ingreso='pension'):
+    return Cobro.objects.create(
+        factura=factura, fecha=fecha, valor_total=valor, saldo=0,
+        tipo_ingreso=tipo_ingreso, creado_por=usuario,
+    )
+
+
+def crear_egreso(usuario, valor, fecha, categoria='otros', tipo='otros', forma_pago='efectivo'):
+    return Egreso.objects.create(
+        tipo=tipo, concepto='Gasto', beneficiario='Proveedor', documento_soporte='DS-1',
+        fecha=fecha, valor_total=valor, forma_pago=forma_pago, categoria_detallada=categoria,
+        aprobado_por=usuario, creado_por=usuario,
+    )
+
+
+def crear_programa(codigo='ING'):
+    return Programa.objects.create(
+        codigo=codigo, nombre='Inglés', area='idiomas', descripcion='', duracion_meses=12,
+        horas_totales=200, costo_total=Decimal('1000000'), requisitos_ingreso='', certificado_otorga='B1',
+    )
+
+
+def crear_grupo(programa, codigo='A1'):
+    curso = Curso.objects.create(
+        programa=programa, codigo=f"C-{codigo}", nombre='Básico', descripcion='', horas=40,
+        orden=1, costo=Decimal('500000'),
+    )
+    return Grupo.objects.create(
+        curso=curso, codigo=codigo, jornada='tarde', horario='L-V', fecha_inicio=datetime.date(2024, 1, 1),
+        fecha_fin=datetime.date(2024, 6, 30), aula='101', cupo_maximo=80, costo=Decimal('500000'),
+    )
+
+
+def crear_periodo(nombre='2024-1'):
+    return PeriodoAcademico.objects.create(
+        nombre=nombre, fecha_inicio=datetime.date(2024, 1, 1), fecha_fin=datetime.date(2024, 6, 30),
+    )
+
+
+def crear_matricula(estudiante, grupo, periodo, usuario, **kwargs):
+    return Matricula.objects.create(
+        estudiante=estudiante, programa=grupo.curso.programa, grupo=grupo, periodo=periodo,
+        fecha_matricula=datetime.date(2024, 1, 1), fecha_fin=datetime.date(2024, 6, 30),
+        creada_por=usuario, **kwargs
+    )
+
+class ConsecutivoTests(TestCase):
+    def test_obtener_siguiente_incrementa(self):
+        Consecutivo.objects.create(tipo='facturas', prefijo='FV')
+        self.assertEqual(Consecutivo.obtener_siguiente('facturas'), 'FV0001')
+        self.assertEqual(Consecutivo.obtener_siguiente('facturas'), 'FV0002')
+
+    def test_obtener_siguiente_crea_consecutivo(self):
+        self.assertEqual(Consecutivo.obtener_siguiente('cobros'), '0001')
+        self.assertTrue(Consecutivo.objects.filter(tipo='cobros').exists())
+
+    def test_reservar_bloque_contiguo(self):
+        Consecutivo.objects.create(tipo='facturas', ultimo_numero=10)
+        bloque = Consecutivo.reservar_bloque('facturas', 5)
+        self.assertEqual(bloque, ['0011', '0012', '0013', '0014', '0015'])
+        self.assertEqual(Consecutivo.obtener_siguiente('facturas'), '0016')
+
+    def test_reservar_bloque_invalido(self):
+        with self.assertRaises(ValueError):
+            Consecutivo.reservar_bloque('facturas', 0)
+
+    def test_reinicio_anual(self):
+        anio_anterior = datetime.date.today().year - 1
+        Consecutivo.objects.create(tipo='cobros', ultimo_numero=80, anio=anio_anterior)
+        Consecutivo.objects.create(tipo='egresos', ultimo_numero=80, anio=anio_anterior, reiniciar_anual=False)
+        self.assertEqual(Consecutivo.obtener_siguiente('cobros'), '0001')
+        self.assertEqual(Consecutivo.obtener_siguiente('egresos'), '0081')
+
+
+class LibroDiarioTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('cajero')
+        self.factura = crear_factura(crear_estudiante(), self.usuario)
+        self.fecha = datetime.date(2024, 3, 15)
+
+    def fila(self, **clave):
+        return LibroDiario.objects.get(fecha=self.fecha, **clave)
+
+    def test_cobro_actualiza_libro(self):
+        cobro = crear_cobro(self.factura, self.usuario, Decimal('50000'), self.fecha)
+        crear_cobro(self.factura, self.usuario, Decimal('20000'), self.fecha)
+        fila = self.fila(tipo='ingreso', tipo_ingreso='pension')
+        self.assertEqual((fila.total, fila.cantidad), (Decimal('70000'), 2))
+
+        cobro.tipo_ingreso = 'matricula'
+        cobro.save()
+        self.assertEqual(self.fila(tipo='ingreso', tipo_ingreso='pension').total, Decimal('20000'))
+        self.assertEqual(self.fila(tipo='ingreso', tipo_ingreso='matricula').total, Decimal('50000'))
+
+        cobro.delete()
+        self.assertEqual(self.fila(tipo='ingreso', tipo_ingreso='matricula').cantidad, 0)
+
+    def test_pagos_siguen_tipo_de_cobro(self):
+        cobro = crear_cobro(self.factura, self.usuario, Decimal('50000'), self.fecha)
+        DetallePago.objects.create(
+            cobro=cobro, metodo_pago='nequi', valor=Decimal('50000'),
+            fecha=self.fecha, registrado_por=self.usuario,
+        )
+        cobro.tipo_ingreso = 'material'
+        cobro.save()
+        fila = self.fila(tipo='pago', metodo_pago='nequi', tipo_ingreso='material')
+        self.assertEqual(fila.total, Decimal('50000'))
+        self.assertEqual(self.fila(tipo='pago', metodo_pago='nequi', tipo_ingreso='pension').total, 0)
+
+        cobro.delete()
+        self.assertEqual(self.fila(tipo='pago', metodo_pago='nequi', tipo_ingreso='material').total, 0)
+
+    def test_reconstruir_coincide_con_incremental(self):
+        crear_cobro(self.factura, self.usuario, Decimal('50000'), self.fecha)
+        crear_egreso(self.usuario, Decimal('30000'), self.fecha, categoria='publicidad')
+        esperado = sorted(LibroDiario.objects.filter(cantidad__gt=0).values_list(
+            'fecha', 'tipo', 'tipo_ingreso', 'categoria_detallada', 'metodo_pago', 'total', 'cantidad'))
+        LibroDiario.reconstruir()
+        obtenido = sorted(LibroDiario.objects.values_list(
+            'fecha', 'tipo', 'tipo_ingreso', 'categoria_detallada', 'metodo_pago', 'total', 'cantidad'))
+        self.assertEqual(obtenido, esperado)
+
+    def test_totales_mes_respeta_el_anio(self):
+        crear_cobro(self.factura, self.usuario, Decimal('50000'), self.fecha)
+        crear_cobro(self.factura, self.usuario, Decimal('10000'), self.fecha.replace(year=2023))
+        crear_egreso(self.usuario, Decimal('30000'), self.fecha.replace(day=31))
+        totales = LibroDiario.totales_mes(self.fecha)
+        self.assertEqual(totales['ingreso'], Decimal('50000'))
+        self.assertEqual(totales['egreso'], Decimal('30000'))
+
+
+class ReporteEconomicoCalculoTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('contador')
+        self.factura = crear_factura(crear_estudiante(), self.usuario)
+        self.inicio = datetime.date(2024, 1, 1)
+        self.fin = datetime.date(2024, 1, 31)
+
+    def test_desgloses(self):
+        fecha = datetime.date(2024, 1, 10)
+        cobro = crear_cobro(self.factura, self.usuario, Decimal('80000'), fecha, tipo_ingreso='matricula')
+        crear_cobro(self.factura, self.usuario, Decimal('20000'), fecha, tipo_ingreso='pension')
+        crear_cobro(self.factura, self.usuario, Decimal('99999'), datetime.date(2024, 2, 1))
+        DetallePago.objects.create(
+            cobro=cobro, metodo_pago='daviplata', valor=Decimal('80000'),
+            fecha=fecha, registrado_por=self.usuario,
+        )
+        crear_egreso(self.usuario, Decimal('30000'), fecha, categoria='docente', tipo='nomina')
+        crear_egreso(self.usuario, Decimal('5000'), fecha, categoria='administrativo', tipo='nomina')
+
+        datos = calcular_reporte(self.inicio, self.fin)
+        self.assertEqual(datos.total_ingresos, Decimal('100000'))
+        self.assertEqual(datos.total_egresos, Decimal('35000'))
+        self.assertEqual(datos.balance, Decimal('65000'))
+        self.assertEqual(datos.detalle_ingresos(), [('Matrícula', Decimal('80000')), ('Pensión', Decimal('20000'))])
+        self.assertEqual(datos.detalle_egresos(), [
+            ('Pago Docentes', Decimal('30000')), ('Pago Administrativos', Decimal('5000')),
+        ])
+        campos = datos.campos_resumen()
+        self.assertEqual(campos['ingresos_matriculas'], Decimal('80000'))
+        self.assertEqual(campos['egresos_nomina'], Decimal('35000'))
+        self.assertEqual(campos['billeteras_digitales_total'], Decimal('80000'))
+        self.assertEqual(campos['efectivo_total'], 0)
+
+    def test_numero_de_consultas_constante(self):
+        fecha = datetime.date(2024, 1, 10)
+        crear_cobro(self.factura, self.usuario, Decimal('1000'), fecha)
+        with self.assertNumQueries(3):
+            calcular_reporte(self.inicio, self.fin)
+
+        for tipo, _ in Cobro.TIPO_INGRESO_CHOICES:
+            crear_cobro(self.factura, self.usuario, Decimal('1000'), fecha, tipo_ingreso=tipo)
+        for categoria, _ in Egreso.CATEGORIA_DETALLADA_CHOICES:
+            crear_egreso(self.usuario, Decimal('1000'), fecha, categoria=categoria)
+        with self.assertNumQueries(3):
+            datos = calcular_reporte(self.inicio, self.fin)
+        self.assertEqual(len(datos.detalle_egresos()), len(Egreso.CATEGORIA_DETALLADA_CHOICES))
+
+
+class ResumenEconomicoTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('contador')
+        self.factura = crear_factura(crear_estudiante(), self.usuario)
+        self.fecha = datetime.date(2024, 1, 10)
+        crear_cobro(self.factura, self.usuario, Decimal('40000'), self.fecha, tipo_ingreso='certificado')
+        crear_egreso(self.usuario, Decimal('15000'), self.fecha, categoria='seguros')
+        self.reporte = ReporteEconomico.objects.create(
+            nombre='Enero', tipo_reporte='mensual', tipo_movimiento='ambos',
+            fecha_inicio=datetime.date(2024, 1, 1), fecha_fin=datetime.date(2024, 1, 31),
+            generado_por=self.usuario,
+        )
+
+    def test_guardar_resumen(self):
+        guardar_resumen(self.reporte)
+        resumen = self.reporte.resumen
+        self.assertEqual(resumen.total_ingresos, Decimal('40000'))
+        self.assertEqual(resumen.ingresos_certificados, Decimal('40000'))
+        self.assertEqual(resumen.total_egresos, Decimal('15000'))
+        self.assertEqual(resumen.balance, Decimal('25000'))
+
+    def test_descarga_usa_resumen_guardado(self):
+        guardar_resumen(self.reporte)
+        # Una consulta para el resumen y otra para verificar que siga vigente
+        with self.assertNumQueries(2):
+            datos = obtener_datos_reporte(self.reporte)
+        self.assertEqual(datos.detalle_egresos(), [('Seguros', Decimal('15000'))])
+        self.assertEqual(datos.balance, Decimal('25000'))
+
+    def test_resumen_se_recalcula_si_cambia_el_periodo(self):
+        guardar_resumen(self.reporte)
+        crear_cobro(self.factura, self.usuario, Decimal('10000'), self.fecha)
+        self.assertEqual(obtener_datos_reporte(self.reporte).total_ingresos, Decimal('50000'))
+        self.reporte.resumen.refresh_from_db()
+        self.assertEqual(self.reporte.resumen.total_ingresos, Decimal('50000'))
+
+    def test_cambio_de_tipo_de_egreso_invalida(self):
+        egreso = crear_egreso(self.usuario, Decimal('100'), self.fecha, tipo='nomina')
+        guardar_resumen(self.reporte)
+        egreso.tipo = 'arriendo'
+        egreso.save()
+        datos = obtener_datos_reporte(self.reporte)
+        self.assertEqual(datos.egresos_por_tipo.get('arriendo'), Decimal('100'))
+        self.assertNotIn('nomina', datos.egresos_por_tipo)
+
+    def test_pago_con_fecha_fuera_del_periodo_invalida(self):
+        # Los reportes agrupan los pagos por la fecha del cobro, no la del pago
+        cobro = Cobro.objects.get()
+        pago = DetallePago.objects.create(
+            cobro=cobro, metodo_pago='efectivo', valor=Decimal('40000'),
+            fecha=datetime.date(2024, 2, 5), registrado_por=self.usuario,
+        )
+        guardar_resumen(self.reporte)
+        pago.metodo_pago = 'nequi'
+        pago.save()
+        datos = obtener_datos_reporte(self.reporte)
+        self.assertEqual(datos.pagos_por_metodo, {'nequi': Decimal('40000')})
+
+    def test_resumen_calculado_antes_del_commit_invalida(self):
+        # Otra conexión calcula el resumen después de la marca del movimiento pero antes
+        # de su commit: no lo ve, y al confirmarse el movimiento el resumen queda viejo
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            crear_cobro(self.factura, self.usuario, Decimal('10000'), self.fecha)
+            ResumenEconomico.objects.create(reporte=self.reporte, fecha_calculo=timezone.now())
+            self.assertFalse(LibroDiario.modificado_desde(self.reporte.fecha_inicio, self.reporte.fecha_fin,
+                                                          self.reporte.resumen.fecha_calculo))
+        self.assertTrue(callbacks)
+        self.assertEqual(obtener_datos_reporte(self.reporte).total_ingresos, Decimal('50000'))
+
+    def test_movimientos_fuera_del_periodo_no_invalidan(self):
+        guardar_resumen(self.reporte)
+        crear_cobro(self.factura, self.usuario, Decimal('10000'), datetime.date(2024, 3, 1))
+        with self.assertNumQueries(2):
+            obtener_datos_reporte(self.reporte)
+
+
+class ExportacionEstudiantesTests(TestCase):
+    def test_edad_en_sql_coincide_con_propiedad(self):
+        hoy = datetime.date.today()
+        for nacimiento in [datetime.date(2000, 1, 1), datetime.date(2004, 12, 31), datetime.date(2001, hoy.month, min(hoy.day, 28))]:
+            estudiante = crear_estudiante(identificacion=str(nacimiento), fecha_nacimiento=nacimiento)
+            edad = Estudiante.objects.annotate(e=edad_en_sql()).values_list('e', flat=True).get(pk=estudiante.pk)
+            self.assertEqual(edad, estudiante.edad)
+
+    def test_exportar_xlsx(self):
+        programa = crear_programa()
+        crear_estudiante(identificacion='1', segundo_nombre='María', programa_actual=programa, estado='graduado')
+        crear_estudiante(identificacion='2')
+
+        with self.assertNumQueries(1):
+            archivo = exportar_xlsx("Estudiantes", ENCABEZADOS_ESTUDIANTES, filas_estudiantes())
+        filas = list(load_workbook(archivo, read_only=True).active.iter_rows(values_only=True))
+        self.assertEqual(list(filas[0]), ENCABEZADOS_ESTUDIANTES)
+        self.assertEqual(len(filas), 3)
+        fila = next(f for f in filas[1:] if f[1] == '1')
+        self.assertEqual(fila[2], 'Ana María')
+        self.assertEqual(fila[6], 'Graduado')
+        self.assertEqual(fila[7], 'Inglés')
+
+
+class ExportacionListadosTests(TestCase):
+    columnas = [
+        Columna('Consecutivo', 'consecutivo'),
+        Columna('Identificación', 'factura__estudiante__identificacion'),
+        Columna('Tipo Ingreso', 'tipo_ingreso', Cobro.TIPO_INGRESO_CHOICES),
+        Columna('Valor Total', 'valor_total'),
+    ]
+
+    def setUp(self):
+        usuario = User.objects.create_user('contador')
+        factura = crear_factura(crear_estudiante(identificacion='777'), usuario)
+        for i in range(3):
+            crear_cobro(factura, usuario, Decimal('1000') * (i + 1), datetime.date(2024, 1, i + 1), tipo_ingreso='matricula')
+
+    def contenido(self, formato):
+        with self.assertNumQueries(1):
+            response = respuesta_exportacion(Cobro.objects.all(), self.columnas, formato, 'cobros')
+            return b''.join(response.streaming_content)
+
+    def test_csv(self):
+        lineas = self.contenido('csv').decode().splitlines()
+        self.assertEqual(lineas[0], 'Consecutivo,Identificación,Tipo Ingreso,Valor Total')
+        self.assertEqual(len(lineas), 4)
+        self.assertIn(',777,Matrícula,3000.00', lineas[1])
+
+    def test_jsonl(self):
+        filas = [json.loads(linea) for linea in self.contenido('jsonl').decode().splitlines()]
+        self.assertEqual(len(filas), 3)
+        self.assertEqual(filas[0]['Identificación'], '777')
+        self.assertEqual(filas[0]['Valor Total'], '3000.00')
+
+    def test_xlsx(self):
+        filas = list(load_workbook(io.BytesIO(self.contenido('xlsx')), read_only=True).active.iter_rows(values_only=True))
+        self.assertEqual(len(filas), 4)
+        self.assertEqual(filas[1][1:3], ('777', 'Matrícula'))
+
+
+class AsistenciaMasivaTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('docente')
+        self.grupo = crear_grupo(crear_programa())
+        periodo = crear_periodo()
+        self.estudiantes = [crear_estudiante(identificacion=str(i)) for i in range(60)]
+        for estudiante in self.estudiantes:
+            crear_matricula(estudiante, self.grupo, periodo, self.usuario)
+        self.fecha = datetime.date(2024, 2, 5)
+
+    def test_registro_en_consultas_constantes(self):
+        # SAVEPOINT, matrículas, existentes, INSERT y RELEASE
+        with self.assertNumQueries(5):
+            creadas, actualizadas = Asistencia.registrar_masiva(self.grupo, self.fecha, self.usuario)
+        self.assertEqual((creadas, actualizadas), (60, 0))
+        self.assertEqual(Asistencia.objects.filter(grupo=self.grupo, fecha=self.fecha, estado='asistio').count(), 60)
+
+    def test_reenvio_actualiza_con_estados_puntuales(self):
+        Asistencia.registrar_masiva(self.grupo, self.fecha, self.usuario)
+        ausente = self.estudiantes[3]
+        creadas, actualizadas = Asistencia.registrar_masiva(
+            self.grupo, self.fecha, self.usuario, estados={ausente.pk: 'falto'}
+        )
+        self.assertEqual((creadas, actualizadas), (0, 60))
+        self.assertEqual(Asistencia.objects.filter(fecha=self.fecha).count(), 60)
+        self.assertEqual(Asistencia.objects.get(estudiante=ausente, fecha=self.fecha).estado, 'falto')
+
+
+class FacturacionMasivaTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('tesorero')
+        self.grupo = crear_grupo(crear_programa())
+        self.periodo = crear_periodo()
+        for i in range(7):
+            crear_matricula(crear_estudiante(identificacion=str(i)), self.grupo, self.periodo, self.usuario)
+        crear_matricula(crear_estudiante(identificacion='retirado'), self.grupo, self.periodo, self.usuario, estado='retirada')
+        self.concepto = ConceptoCobro.objects.create(
+            codigo='PEN', nombre='Pensión', tipo='pension', valor=Decimal('200000'),
+            aplica_iva=True, aplica_descuento=True,
+        )
+
+    def test_genera_facturas_con_iva_y_descuento(self):
+        creadas, omitidas = generar_facturas_masivas(
+            self.periodo, self.concepto, self.usuario, porcentaje_descuento=50, tamano_lote=3,
+        )
+        self.assertEqual((creadas, omitidas), (7, 0))
+        self.assertEqual(Factura.objects.count(), 7)
+        self.assertEqual(ItemFactura.objects.count(), 7)
+        self.assertEqual(len(set(Factura.objects.values_list('consecutivo', flat=True))), 7)
+
+        # El descuento se limita al máximo de la configuración (10%) y el IVA es del 19%
+        factura = Factura.objects.first()
+        self.assertEqual(factura.descuento, Decimal('20000'))
+        self.assertEqual(factura.iva, Decimal('34200'))
+        self.assertEqual(factura.total, Decimal('214200'))
+        self.assertEqual(factura.items.get().valor_total, factura.total)
+
+    def test_descuento_negativo_no_encarece(self):
+        configuracion = ConfiguracionInstituto.obtener()
+        self.assertEqual(calcular_valores(self.concepto, configuracion, -50)[1], Decimal(0))
+
+    def test_formulario_valida_descuento_y_fecha(self):
+        datos = {'periodo_id': self.periodo.pk, 'concepto_id': self.concepto.pk}
+        form = FacturacionMasivaForm({**datos, 'porcentaje_descuento': '5', 'fecha_vencimiento': '2024-02-29'})
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.parametros(), {**datos, 'fecha_vencimiento': '2024-02-29', 'porcentaje_descuento': '5'})
+        form = FacturacionMasivaForm(datos)
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.parametros(), {**datos, 'fecha_vencimiento': None, 'porcentaje_descuento': '0'})
+        for porcentaje, fecha in [('-5', ''), ('abc', ''), ('10.5', ''), ('5', '2024-02-30'), ('5', 'mañana')]:
+            with self.subTest(porcentaje=porcentaje, fecha=fecha):
+                form = FacturacionMasivaForm({**datos, 'porcentaje_descuento': porcentaje, 'fecha_vencimiento': fecha})
+                self.assertFalse(form.is_valid())
+
+    def test_es_idempotente(self):
+        generar_facturas_masivas(self.periodo, self.concepto, self.usuario)
+        crear_matricula(crear_estudiante(identificacion='nuevo'), self.grupo, self.periodo, self.usuario)
+        creadas, omitidas = generar_facturas_masivas(self.periodo, self.concepto, self.usuario)
+        self.assertEqual((creadas, omitidas), (1, 7))
+        self.assertEqual(Factura.objects.count(), 8)
+
+    def test_consultas_no_dependen_de_la_cantidad(self):
+        for i in range(40):
+            crear_matricula(crear_estudiante(identificacion=f"extra{i}"), self.grupo, self.periodo, self.usuario)
+        ConfiguracionInstituto.objects.create(
+            nombre_instituto='Instituto', logo='logo.png', nit='1', direccion='', telefono_principal='1',
+            correo_principal='a@b.co', resolucion_autorizacion='', terminos_condiciones='', politica_privacidad='',
+        )
+        Consecutivo.objects.create(tipo='facturas')
+        # Configuración, matrículas, ya facturados, reserva de consecutivos,
+        # bloqueo del concepto y nueva comprobación del lote, un INSERT de
+        # facturas y uno de ítems, más los savepoints
+        with self.assertNumQueries(13):
+            generar_facturas_masivas(self.periodo, self.concepto, self.usuario)
+        self.assertEqual(Factura.objects.count(), 47)
+
+
+class FacturacionMasivaBloqueoTests(TransactionTestCase):
+    # Sin la transacción de TestCase, como en el procesador de tareas
+    def test_reserva_se_confirma_antes_de_insertar_el_lote(self):
+        usuario = User.objects.create_user('tesorero')
+        grupo, periodo = crear_grupo(crear_programa()), crear_periodo()
+        for i in range(5):
+            crear_matricula(crear_estudiante(identificacion=str(i)), grupo, periodo, usuario)
+        concepto = ConceptoCobro.objects.create(codigo='PEN', nombre='Pensión', tipo='pension', valor=Decimal('1000'))
+
+        reservar = Consecutivo.reservar_bloque
+        en_transaccion = []
+        def reservar_bloque(tipo, n):
+            en_transaccion.append(connection.in_atomic_block)
+            return reservar(tipo, n)
+
+        with mock.patch.object(Consecutivo, 'reservar_bloque', side_effect=reservar_bloque):
+            self.assertEqual(generar_facturas_masivas(periodo, concepto, usuario, tamano_lote=2), (5, 0))
+        self.assertEqual(en_transaccion, [False, False, False])
+
+    def test_dos_ejecuciones_cruzadas_no_duplican(self):
+        usuario = User.objects.create_user('tesorero')
+        grupo, periodo = crear_grupo(crear_programa()), crear_periodo()
+        for i in range(5):
+            crear_matricula(crear_estudiante(identificacion=str(i)), grupo, periodo, usuario)
+        concepto = ConceptoCobro.objects.create(codigo='PEN', nombre='Pensión', tipo='pension', valor=Decimal('1000'))
+
+        # La segunda ejecución corre completa después de que la primera leyó
+        # a quién facturar y antes de que inserte su primer lote
+        reservar = Consecutivo.reservar_bloque
+        segunda = []
+        def reservar_bloque(tipo, n):
+            if not segunda:
+                segunda.append(None)
+                segunda[0] = generar_facturas_masivas(periodo, concepto, usuario, tamano_lote=2)
+            return reservar(tipo, n)
+
+        with mock.patch.object(Consecutivo, 'reservar_bloque', side_effect=reservar_bloque):
+            primera = generar_facturas_masivas(periodo, concepto, usuario, tamano_lote=2)
+        self.assertEqual(segunda, [(5, 0)])
+        self.assertEqual(primera, (0, 5))
+        self.assertEqual(Factura.objects.count(), 5)
+        self.assertEqual(
+            sorted(Factura.objects.values_list('estudiante_id', flat=True)),
+            sorted(Matricula.objects.values_list('estudiante_id', flat=True)),
+        )
+        self.assertEqual(Factura.objects.count(), 5)
+
+
+class ImportacionEstudiantesTests(TestCase):
+    encabezados = [
+        'tipo_identificacion', 'identificacion', 'primer_nombre', 'primer_apellido', 'fecha_nacimiento',
+        'genero', 'direccion', 'barrio', 'ciudad', 'departamento', 'telefono_principal', 'correo',
+        'fecha_ingreso', 'programa',
+    ]
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('secretaria')
+        self.programa = crear_programa(codigo='ING')
+
+    def fila(self, identificacion, **kwargs):
+        datos = dict(
+            tipo_identificacion='cc', identificacion=identificacion, primer_nombre='Luis',
+            primer_apellido='Núñez', fecha_nacimiento='2001-05-04', genero='masculino', direccion='Cra 2',
+            barrio='Norte', ciudad='Cali', departamento='Valle', telefono_principal='3100000000',
+            correo=f"luis{identificacion}@example.com", fecha_ingreso='2024-01-15', programa='ING',
+        )
+        datos.update(kwargs)
+        return [datos[campo] for campo in self.encabezados]
+
+    def csv(self, filas):
+        lineas = [','.join(self.encabezados)] + [','.join(map(str, fila)) for fila in filas]
+        return SimpleUploadedFile('estudiantes.csv', '\n'.join(lineas).encode('utf-8'))
+
+    def test_importa_actualiza_y_reporta_errores(self):
+        crear_estudiante(identificacion='200', primer_nombre='Viejo', eps='Sura')
+        archivo = self.csv([
+            self.fila('100'),
+            self.fila('200', primer_nombre='Nuevo'),
+            self.fila('300', correo='no-es-correo'),
+            self.fila('400', programa='XXX'),
+            self.fila('500', genero='desconocido'),
+        ])
+        resultado = importar_estudiantes(archivo, self.usuario)
+
+        self.assertEqual((resultado.creados, resultado.actualizados), (1, 1))
+        self.assertEqual([fila for fila, _ in resultado.errores], [4, 5, 6])
+        self.assertIn('correo', resultado.errores[0][1])
+        self.assertIn('XXX', resultado.errores[1][1])
+        nuevo = Estudiante.objects.get(identificacion='100')
+        self.assertEqual(nuevo.programa_actual, self.programa)
+        self.assertEqual(nuevo.fecha_nacimiento, datetime.date(2001, 5, 4))
+        self.assertEqual(nuevo.creado_por, self.usuario)
+        actualizado = Estudiante.objects.get(identificacion='200')
+        self.assertEqual(actualizado.primer_nombre, 'Nuevo')
+        # Las columnas que no vienen en el archivo no se sobrescriben
+        self.assertEqual(actualizado.eps, 'Sura')
+
+    def test_consultas_por_lote(self):
+        archivo = self.csv([self.fila(str(i)) for i in range(50)])
+        # Códigos de programas y grupos, más dos consultas por cada lote de 10
+        with self.assertNumQueries(2 + 5 * 2):
+            resultado = importar_estudiantes(archivo, self.usuario, tamano_lote=10)
+        self.assertEqual(resultado.creados, 50)
+
+    def test_columnas_faltantes(self):
+        archivo = SimpleUploadedFile('estudiantes.csv', b'identificacion,primer_nombre\n1,Ana\n')
+        resultado = importar_estudiantes(archivo, self.usuario)
+        self.assertEqual(resultado.procesados, 0)
+        self.assertIn('Faltan columnas', resultado.errores[0][1])
+
+    def test_xlsx(self):
+        wb = Workbook()
+        wb.active.append(self.encabezados)
+        fila = self.fila('600')
+        fila[4] = datetime.datetime(2001, 5, 4)
+        wb.active.append(fila)
+        contenido = io.BytesIO()
+        wb.save(contenido)
+        archivo = SimpleUploadedFile('estudiantes.xlsx', contenido.getvalue())
+
+        resultado = importar_estudiantes(archivo, self.usuario)
+        self.assertEqual(resultado.creados, 1, resultado.errores)
+        self.assertEqual(Estudiante.objects.get(identificacion='600').fecha_nacimiento, datetime.date(2001, 5, 4))
+
+
+class TareasTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        ajustes = override_settings(MEDIA_ROOT=self.media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.usuario = User.objects.create_user('secretaria')
+
+    def test_reclamar_no_repite_tareas(self):
+        primera = encolar('exportar_estudiantes', self.usuario)
+        segunda = encolar('exportar_estudiantes', self.usuario)
+        self.assertEqual(reclamar(), [primera.pk])
+        self.assertEqual(reclamar(5), [segunda.pk])
+        self.assertEqual(reclamar(), [])
+        primera.refresh_from_db()
+        self.assertEqual(primera.estado, 'en_proceso')
+        self.assertIsNotNone(primera.fecha_inicio)
+
+    def test_reporte_excel_genera_archivo(self):
+        reporte = ReporteEconomico.objects.create(
+            nombre='Enero', tipo_reporte='mensual', tipo_movimiento='ambos',
+            fecha_inicio=datetime.date(2024, 1, 1), fecha_fin=datetime.date(2024, 1, 31),
+            generado_por=self.usuario,
+        )
+        tarea = encolar('reporte_excel', self.usuario, reporte_id=reporte.pk)
+        reclamar()
+        self.assertEqual(ejecutar(tarea.pk), 'completada')
+
+        tarea.refresh_from_db()
+        self.assertEqual(tarea.progreso, 100)
+        self.assertIsNotNone(tarea.fecha_fin)
+        with tarea.resultado.open('rb') as archivo:
+            hoja = load_workbook(archivo).active
+        self.assertEqual(hoja['B1'].value, 'Enero')
+
+    def test_error_marca_tarea_fallida(self):
+        tarea = encolar('reporte_pdf', self.usuario, reporte_id=999)
+        self.assertEqual(ejecutar(tarea.pk), 'fallida')
+        tarea.refresh_from_db()
+        self.assertIn('DoesNotExist', tarea.mensaje)
+        self.assertFalse(tarea.resultado)
+
+    def test_facturacion_masiva(self):
+        periodo = crear_periodo()
+        crear_matricula(crear_estudiante(), crear_grupo(crear_programa()), periodo, self.usuario)
+        concepto = ConceptoCobro.objects.create(codigo='PEN', nombre='Pensión', tipo='pension', valor=Decimal('1000'))
+        tarea = encolar('facturacion_masiva', self.usuario, periodo_id=periodo.pk, concepto_id=concepto.pk)
+
+        call_command('procesar_tareas', procesos=0, una_vez=True, stdout=io.StringIO())
+
+        tarea.refresh_from_db()
+        self.assertEqual(tarea.estado, 'completada')
+        self.assertIn('1 facturas generadas', tarea.mensaje)
+        self.assertEqual(Factura.objects.filter(periodo=periodo).count(), 1)
+
+    def test_todos_los_tipos_tienen_ejecutor(self):
+        tipos = {tipo for tipo, _ in Tarea.TIPO_CHOICES} - {'backup'}
+        self.assertEqual(tipos - set(EJECUTORES), set())
+
+    @override_settings(TAREAS_SIN_LATIDO_MIN=5, TAREAS_MAX_INTENTOS=2)
+    def test_tareas_sin_latido_vuelven_a_la_cola(self):
+        tarea = encolar('exportar_estudiantes', self.usuario)
+        larga = encolar('exportar_estudiantes', self.usuario)
+        reclamar(2)
+        hace_rato = timezone.now() - datetime.timedelta(minutes=6)
+        Tarea.objects.filter(pk=tarea.pk).update(latido=hace_rato)
+        # Empezó hace horas pero sigue latiendo: no se toca
+        Tarea.objects.filter(pk=larga.pk).update(fecha_inicio=timezone.now() - datetime.timedelta(hours=3))
+
+        self.assertEqual(reanudar_vencidas(), 1)
+        tarea.refresh_from_db()
+        self.assertEqual((tarea.estado, tarea.intentos, tarea.fecha_inicio, tarea.latido), ('pendiente', 1, None, None))
+        self.assertEqual(Tarea.objects.get(pk=larga.pk).estado, 'en_proceso')
+
+        # Segundo intento sin latido: ya no vuelve a la cola
+        self.assertEqual(reclamar(), [tarea.pk])
+        Tarea.objects.filter(pk=tarea.pk).update(latido=hace_rato)
+        reanudar_vencidas()
+        tarea.refresh_from_db()
+        self.assertEqual((tarea.estado, tarea.intentos), ('fallida', 2))
+        self.assertIn('5 minutos', tarea.mensaje)
+        self.assertIsNotNone(tarea.fecha_fin)
+
+    def test_resultado_de_un_intento_reemplazado_se_descarta(self):
+        from . import tareas
+
+        tarea = encolar('exportar_estudiantes', self.usuario)
+        reclamar()
+
+        def devuelta_y_reclamada(tarea):
+            # Mientras corre, se da por perdida y otro procesador la reclama
+            devolver(tarea.pk, 'Sin latido')
+            reclamar()
+            return 'viejo.txt', b'resultado viejo'
+
+        with mock.patch.dict(tareas.EJECUTORES, {'exportar_estudiantes': devuelta_y_reclamada}):
+            self.assertEqual(ejecutar(tarea.pk), 'descartada')
+
+        tarea.refresh_from_db()
+        self.assertEqual((tarea.estado, tarea.intentos), ('en_proceso', 2))
+        self.assertFalse(tarea.resultado)
+        self.assertEqual(os.listdir(os.path.join(self.media, 'tareas')), [])
+
+    def test_devolver_ignora_tareas_terminadas(self):
+        tarea = encolar('reporte_pdf', self.usuario, reporte_id=999)
+        reclamar()
+        ejecutar(tarea.pk)
+        self.assertIsNone(devolver(tarea.pk, 'El proceso terminó'))
+        self.assertEqual(Tarea.objects.get(pk=tarea.pk).estado, 'fallida')
+
+    def test_proceso_caido_devuelve_la_tarea(self):
+        from . import tareas
+        from .management.commands.procesar_tareas import Command
+
+        tarea = encolar('exportar_estudiantes', self.usuario)
+        reclamar()
+        comando = Command(stdout=io.StringIO())
+        comando.tareas = tareas
+        comando.fallo((tarea.pk,), BrokenProcessPool("El proceso terminó"))
+        self.assertEqual(Tarea.objects.get(pk=tarea.pk).estado, 'pendiente')
+        self.assertIn(f"Tarea {tarea.pk}: pendiente", comando.stdout.getvalue())
+
+
+class TareasLatidoTests(TransactionTestCase):
+    # El latido sale de otro hilo con su propia conexión
+    @override_settings(TAREAS_LATIDO_S=0.05)
+    def test_la_tarea_late_mientras_corre(self):
+        from . import tareas
+
+        tarea = encolar('exportar_estudiantes', User.objects.create_user('secretaria'))
+        reclamar()
+        inicial = Tarea.objects.get(pk=tarea.pk).latido
+        latidos = []
+
+        def lenta(tarea):
+            time.sleep(0.3)
+            latidos.append(Tarea.objects.get(pk=tarea.pk).latido)
+
+        with mock.patch.dict(tareas.EJECUTORES, {'exportar_estudiantes': lenta}):
+            self.assertEqual(ejecutar(tarea.pk), 'completada')
+        self.assertGreater(latidos[0], inicial)
+
+
+class ProcesosTests(SimpleTestCase):
+    def reclamar_una_vez(self, *trabajos):
+        pendientes = [list(trabajos)]
+        return lambda libres: pendientes.pop() if pendientes else []
+
+    def test_errores_no_detienen_el_bucle(self):
+        informados, fallidos = [], []
+        procesos.atender(
+            1, self.reclamar_una_vez(('7',), ('x',)), int, lambda trabajo, resultado: informados.append(resultado),
+            lambda trabajo, error: fallidos.append((trabajo, type(error))), 0.1, una_vez=True,
+        )
+        self.assertEqual(informados, [7])
+        self.assertEqual(fallidos, [(('x',), ValueError)])
+
+    def test_proceso_caido_crea_grupo_nuevo(self):
+        fallidos, vueltas = [], []
+        procesos.atender(
+            1, self.reclamar_una_vez((3,)), os._exit, None, lambda trabajo, error: fallidos.append((trabajo, type(error))),
+            0.1, una_vez=True, antes=lambda: vueltas.append(1),
+        )
+        self.assertEqual(fallidos, [((3,), BrokenProcessPool)])
+        self.assertGreater(len(vueltas), 1)
+
+
+class ReporteProgramadoTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        ajustes = override_settings(MEDIA_ROOT=self.media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.usuario = User.objects.create_user('gerente')
+        self.configuracion = ConfiguracionReporte.objects.create(
+            nombre='Financiero', tipo_reporte='mensual', formato_salida='ambos', creado_por=self.usuario,
+        )
+        self.ahora = timezone.now()
+
+    def programar(self, proxima_ejecucion, frecuencia='mensual', **kwargs):
+        return ReporteProgramado.objects.create(
+            configuracion=self.configuracion, frecuencia=frecuencia, proxima_ejecucion=proxima_ejecucion,
+            destinatarios='gerencia@instituto.co, contabilidad@instituto.co', creado_por=self.usuario, **kwargs
+        )
+
+    def test_desplazar_fechas(self):
+        fecha = datetime.date(2024, 1, 31)
+        self.assertEqual(ReporteProgramado.desplazar(fecha, 'mensual'), datetime.date(2024, 2, 29))
+        self.assertEqual(ReporteProgramado.desplazar(fecha, 'trimestral', -1), datetime.date(2023, 10, 31))
+        self.assertEqual(ReporteProgramado.desplazar(fecha, 'semanal'), datetime.date(2024, 2, 7))
+        self.assertEqual(ReporteProgramado.desplazar(fecha, 'anual'), datetime.date(2025, 1, 31))
+
+    def test_programacion_mensual_vuelve_a_su_dia_despues_de_febrero(self):
+        programado = self.programar(timezone.make_aware(datetime.datetime(2024, 1, 31, 6)))
+        self.assertEqual(programado.dia_programado, 31)
+        ejecuciones = []
+        for _ in range(3):
+            ahora = programado.proxima_ejecucion
+            reclamar_vencidos(10, ahora)
+            programado.refresh_from_db()
+            ejecuciones.append(timezone.localtime(programado.proxima_ejecucion).date())
+        self.assertEqual(ejecuciones, [datetime.date(2024, 2, 29), datetime.date(2024, 3, 31), datetime.date(2024, 4, 30)])
+
+        # Reprogramarlo cambia el día; guardarlo sin tocar la fecha no
+        programado.destinatarios = 'gerencia@instituto.co'
+        programado.save()
+        self.assertEqual(programado.dia_programado, 31)
+        programado.proxima_ejecucion = timezone.make_aware(datetime.datetime(2024, 5, 15, 6))
+        programado.save(update_fields=['proxima_ejecucion'])
+        programado.refresh_from_db()
+        self.assertEqual(programado.dia_programado, 15)
+
+    def test_reclamar_avanza_proxima_ejecucion(self):
+        vencido = self.programar(self.ahora - datetime.timedelta(days=40))
+        self.programar(self.ahora + datetime.timedelta(days=1))
+        self.programar(self.ahora - datetime.timedelta(days=1), activo=False)
+
+        reclamados = reclamar_vencidos(10, self.ahora)
+        self.assertEqual(reclamados, [(vencido.pk, vencido.proxima_ejecucion)])
+        vencido.refresh_from_db()
+        # Las ejecuciones perdidas no se repiten
+        self.assertGreater(vencido.proxima_ejecucion, self.ahora)
+        self.assertEqual(vencido.ultima_ejecucion, self.ahora)
+        self.assertEqual(reclamar_vencidos(10, self.ahora), [])
+
+    def test_consulta_usa_indice(self):
+        plan = ReporteProgramado.objects.filter(activo=True, proxima_ejecucion__lte=self.ahora).explain()
+        self.assertIn('USING INDEX reporteprog_pendientes_idx', plan)
+
+    def test_envia_reporte_del_periodo_anterior(self):
+        factura = crear_factura(crear_estudiante(), self.usuario)
+        crear_cobro(factura, self.usuario, Decimal('30000'), datetime.date(2024, 1, 15))
+        crear_cobro(factura, self.usuario, Decimal('99000'), datetime.date(2024, 2, 1))
+        programado = self.programar(timezone.make_aware(datetime.datetime(2024, 2, 1, 6)))
+
+        reporte = ReporteEconomico.objects.get(pk=ejecutar_programado(programado.pk, programado.proxima_ejecucion))
+        self.assertEqual((reporte.fecha_inicio, reporte.fecha_fin), (datetime.date(2024, 1, 1), datetime.date(2024, 1, 31)))
+        self.assertEqual(reporte.resumen.total_ingresos, Decimal('30000'))
+        self.assertTrue(reporte.archivo.name.endswith('.pdf'))
+
+        correo = mail.outbox[0]
+        self.assertEqual(correo.to, ['gerencia@instituto.co', 'contabilidad@instituto.co'])
+        self.assertEqual([nombre.rsplit('.', 1)[1] for nombre, _, _ in correo.attachments], ['pdf', 'xlsx'])
+        self.assertIn('$30,000.00', correo.body)
+
+    def test_formato_html(self):
+        self.configuracion.formato_salida = 'html'
+        self.configuracion.save()
+        programado = self.programar(self.ahora, frecuencia='diario')
+        ejecutar_programado(programado.pk, programado.proxima_ejecucion)
+        correo = mail.outbox[0]
+        self.assertEqual(correo.attachments, [])
+        self.assertIn('<table>', correo.alternatives[0][0])
+
+    def test_comando(self):
+        self.programar(self.ahora - datetime.timedelta(minutes=1), frecuencia='semanal')
+        call_command('programar_reportes', procesos=0, una_vez=True, stdout=io.StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(ReporteEconomico.objects.count(), 1)
+
+
+class ListadoPorLlave(PaginacionKeysetMixin, ListView):
+    """Un listado con el queryset de una vista, paginado como en la vista."""
+    paginate_by = 20
+
+
+def pagina_de_listado(queryset, **parametros):
+    """Las filas de la página que arma PaginacionKeysetMixin para `queryset`."""
+    vista = ListadoPorLlave(queryset=queryset, **parametros)
+    vista.setup(RequestFactory().get('/'))
+    vista.object_list = vista.get_queryset()
+    return list(vista.get_context_data()['object_list'])
+
+
+class IndicesListadosTests(TestCase):
+    """Cada filtro de los listados debe resolverse con un índice y no recorrer la tabla."""
+
+    def assertUsaIndice(self, queryset):
+        plan = queryset.explain()
+        recorridos = [linea for linea in plan.splitlines() if re.search(r'SCAN english_\w+$', linea)]
+        self.assertEqual(recorridos, [], f"{queryset.query}\n{plan}")
+
+    def assertPaginaUsaIndice(self, queryset):
+        # Se explica la consulta que ejecuta la paginación, con el orden del modelo y la llave
+        with CaptureQueriesContext(connection) as capturadas:
+            pagina_de_listado(queryset)
+        sql = capturadas.captured_queries[-1]['sql']
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            plan = [fila[-1] for fila in cursor.fetchall()]
+        # También cuenta recorrer la tabla entera por el índice del orden (SCAN ... USING INDEX)
+        recorridos = [linea for linea in plan if re.match(r'SCAN english_\w+', linea)]
+        self.assertEqual(recorridos, [], '\n'.join([sql, *plan]))
+
+    def test_consultas_de_los_listados(self):
+        # Los mismos filtros que aplica el get_queryset de cada vista sobre su consulta
+        desde, hasta = '2024-01-01', '2024-01-31'
+        listados = {
+            'estudiantes por estado': consultas.estudiantes().filter(estado='activo'),
+            'estudiantes por estado y programa': consultas.estudiantes().filter(estado='activo').filter(
+                programa_actual_id='1'),
+            'grupos por curso': consultas.grupos().filter(curso_id='1'),
+            'grupos por estado': consultas.grupos().filter(estado='en_curso'),
+            'matrículas por período': consultas.matriculas().filter(periodo_id='1'),
+            'matrículas por grupo': consultas.matriculas().filter(grupo_id='1'),
+            'asistencias por grupo y fecha': consultas.asistencias().filter(grupo_id='1').filter(fecha=desde),
+            'calificaciones por grupo y período': consultas.calificaciones().filter(grupo_id='1').filter(periodo_id='1'),
+            'facturas por estado': consultas.facturas().filter(estado='vencida'),
+            'facturas por estudiante': consultas.facturas().filter(estudiante_id='1'),
+            'cobros por fecha': consultas.cobros().filter(fecha__range=[desde, hasta]),
+            'egresos por fecha': consultas.egresos().filter(fecha__range=[desde, hasta]),
+            'egresos por fecha y tipo': consultas.egresos().filter(fecha__range=[desde, hasta]).filter(tipo='nomina'),
+            'eventos por tipo': Evento.objects.filter(tipo='academico'),
+            'documentos por estudiante y tipo': consultas.documentos_estudiante().filter(estudiante_id='1').filter(
+                tipo='cedula'),
+            'incidencias por estado': consultas.incidencias().filter(estado='abierta'),
+            'incidencias por tipo': consultas.incidencias().filter(tipo='academica'),
+            'incidencias por responsable': consultas.incidencias().filter(responsable_id='1'),
+        }
+        for nombre, queryset in listados.items():
+            with self.subTest(nombre):
+                self.assertPaginaUsaIndice(queryset)
+
+    def test_consultas_del_tablero(self):
+        # Las de DashboardView y del tablero financiero, tal como están en las vistas
+        tablero = {
+            'eventos próximos': Evento.objects.filter(fecha_inicio__gte=timezone.now()).order_by('fecha_inicio')[:5],
+            'facturas pendientes': Factura.objects.filter(estado='pendiente').order_by('fecha_vencimiento')[:10],
+        }
+        for nombre, queryset in tablero.items():
+            with self.subTest(nombre):
+                self.assertUsaIndice(queryset)
+
+    def test_facturas_pendientes_usan_indice_parcial(self):
+        plan = Factura.objects.filter(estado='pendiente').order_by('fecha_vencimiento')[:5].explain()
+        self.assertIn('factura_pendientes_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+
+class BusquedaEstudiantesTests(TestCase):
+    def setUp(self):
+        self.nunez = crear_estudiante(
+            identificacion='52100', primer_nombre='María', segundo_nombre='José',
+            primer_apellido='Gómez', segundo_apellido='Núñez',
+        )
+        self.pena = crear_estudiante(identificacion='71000', primer_nombre='Andrés', primer_apellido='Peña')
+        self.otro = crear_estudiante(identificacion='80521', primer_nombre='Nubia', primer_apellido='Castaño')
+
+    def buscar(self, q):
+        return list(buscar_estudiantes(Estudiante.objects.all(), q))
+
+    def test_normalizar(self):
+        self.assertEqual(normalizar('  Núñez, MARÍA-José '), 'nunez maria jose')
+        self.assertEqual(normalizar('C.C. 1.023.456-7, 1,5'), 'c c 10234567 15')
+        self.assertEqual(self.nunez.busqueda, '52100 maria jose gomez nunez')
+
+    def test_documento_con_puntos(self):
+        self.assertEqual(self.buscar('52.100'), [self.nunez])
+        self.pena.identificacion = '71.000'
+        self.pena.save()
+        self.assertEqual(self.buscar('71000'), [self.pena])
+
+    def test_migracion_normaliza_documentos_con_puntos(self):
+        migracion = importlib.import_module('english.migrations.0020_busqueda_documentos_con_puntos')
+        Estudiante.objects.filter(pk=self.pena.pk).update(identificacion='71.000', busqueda='71 000 andres pena')
+        migracion.normalizar_documentos(apps, None)
+        self.assertEqual(Estudiante.objects.get(pk=self.pena.pk).busqueda, '71000 andres pena')
+        self.assertEqual(self.buscar('71000'), [self.pena])
+
+    def test_sin_tildes_y_segundo_apellido(self):
+        self.assertEqual(self.buscar('nunez'), [self.nunez])
+        self.assertEqual(self.buscar('NÚÑEZ maria'), [self.nunez])
+        self.assertEqual(self.buscar('pena'), [self.pena])
+        self.assertEqual(self.buscar('peña andres'), [self.pena])
+        self.assertEqual(set(self.buscar('nu')), {self.nunez, self.otro})
+        self.assertEqual(self.buscar('---'), [])
+
+    def test_identificacion_por_prefijo_primero(self):
+        # '52' aparece como prefijo de la identificación de uno y no del otro
+        self.otro.primer_apellido = '52 Castaño'
+        self.otro.save()
+        self.assertEqual(self.buscar('52'), [self.nunez, self.otro])
+        self.assertEqual(self.buscar('805'), [self.otro])
+
+    def test_indice_sigue_los_cambios(self):
+        self.pena.primer_apellido = 'Muñoz'
+        self.pena.save(update_fields=['primer_apellido'])
+        self.assertEqual(self.buscar('pena'), [])
+        self.assertEqual(self.buscar('munoz'), [self.pena])
+        self.pena.delete()
+        self.assertEqual(self.buscar('munoz'), [])
+
+    def test_importacion_actualiza_busqueda(self):
+        archivo = SimpleUploadedFile('estudiantes.csv', (
+            'tipo_identificacion,identificacion,primer_nombre,primer_apellido,fecha_nacimiento,genero,'
+            'direccion,barrio,ciudad,departamento,telefono_principal,correo,fecha_ingreso\n'
+            'cc,52100,María Paz,Gómez,2000-01-01,femenino,Calle 1,Centro,Cali,Valle,300,m@example.com,2024-01-01\n'
+            'cc,60000,Óscar,Díaz,2000-01-01,masculino,Calle 1,Centro,Cali,Valle,300,o@example.com,2024-01-01\n'
+        ).encode('utf-8'))
+        importar_estudiantes(archivo, User.objects.create_user('secretaria'))
+
+        self.assertEqual(len(self.buscar('oscar diaz')), 1)
+        # Los nombres que no trae el archivo se conservan en la búsqueda
+        self.assertEqual(self.buscar('maria paz nunez'), [self.nunez])
+        self.assertEqual(Estudiante.objects.get(pk=self.nunez.pk).busqueda, '52100 maria paz jose gomez nunez')
+
+    def test_autocompletar(self):
+        resultados = autocompletar_estudiantes(Estudiante.objects.all(), 'nu')
+        self.assertEqual(set(resultados), {self.nunez, self.otro})
+        self.assertEqual(autocompletar_estudiantes(Estudiante.objects.all(), '805'), [self.otro])
+        self.assertEqual(autocompletar_estudiantes(Estudiante.objects.all(), ' '), [])
+
+    def test_autocompletar_no_se_limita_a_los_recientes(self):
+        # El más relevante es el más antiguo y hay cientos de coincidencias más recientes
+        Estudiante.objects.filter(pk=self.nunez.pk).update(busqueda='52100 nunez nunez')
+        Estudiante.objects.bulk_create([
+            Estudiante(
+                tipo_identificacion='cc', identificacion=f"9{i:04}", primer_nombre='Ana', primer_apellido='Núñez',
+                fecha_nacimiento=datetime.date(2000, 1, 1), genero='femenino', direccion='Calle 1', barrio='Centro',
+                ciudad='Cali', departamento='Valle', telefono_principal='300', correo='ana@example.com',
+                fecha_ingreso=datetime.date(2024, 1, 1), busqueda=f"9{i:04} ana maria nunez perez",
+            )
+            for i in range(300)
+        ])
+        self.assertEqual(autocompletar_estudiantes(Estudiante.objects.all(), 'nunez', limite=1), [self.nunez])
+
+    def test_triggers_se_restauran(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TRIGGER english_estudiante_fts_ai")
+        crear_estudiante(identificacion='99999', primer_nombre='Zoe')
+        self.assertEqual(self.buscar('zoe'), [])
+        asegurar_indice_sqlite(connection)
+        self.assertEqual(len(self.buscar('zoe')), 1)
+
+
+class NumeroConsultasTests(TestCase):
+    """Los listados hacen el mismo número de consultas con 1 o con 500 filas."""
+    FILAS = 500
+
+    @classmethod
+    def setUpTestData(cls):
+        usuario = User.objects.create_user('auditor')
+        grupo = crear_grupo(crear_programa())
+        periodo = crear_periodo()
+        docente = Docente.objects.create(
+            tipo_identificacion='cc', identificacion='D1', nombres='Laura', apellidos='Ríos', genero='femenino',
+            titulo_academico='Licenciada', especialidad='Inglés', tipo_contrato='planta',
+            fecha_vinculacion=datetime.date(2020, 1, 1), direccion='Calle 2', telefono='300', correo='l@example.com',
+        )
+        concepto = ConceptoCobro.objects.create(codigo='PEN', nombre='Pensión', tipo='pension', valor=Decimal('100'))
+        estudiantes = Estudiante.objects.bulk_create([
+            Estudiante(
+                tipo_identificacion='cc', identificacion=f"E{i}", primer_nombre='Ana', primer_apellido=f"Pérez{i}",
+                fecha_nacimiento=datetime.date(2000, 1, 1), genero='femenino', direccion='Calle 1', barrio='Centro',
+                ciudad='Cali', departamento='Valle', telefono_principal='300', correo=f"e{i}@example.com",
+                fecha_ingreso=datetime.date(2024, 1, 1), programa_actual=grupo.curso.programa, grupo_actual=grupo,
+            )
+            for i in range(cls.FILAS)
+        ])
+        fecha = datetime.date(2024, 2, 1)
+        Acudiente.objects.bulk_create([
+            Acudiente(estudiante=e, tipo_identificacion='cc', identificacion=f"A{e.pk}", nombre_completo='Acudiente',
+                      parentesco='madre', telefono='300')
+            for e in estudiantes
+        ])
+        Matricula.objects.bulk_create([
+            Matricula(consecutivo=f"M{e.pk}", estudiante=e, programa=grupo.curso.programa, grupo=grupo, periodo=periodo,
+                      fecha_matricula=fecha, fecha_fin=fecha, creada_por=usuario)
+            for e in estudiantes
+        ])
+        Asistencia.objects.bulk_create([
+            Asistencia(estudiante=e, grupo=grupo, fecha=fecha, estado='asistio', registrado_por=usuario)
+            for e in estudiantes
+        ])
+        Calificacion.objects.bulk_create([
+            Calificacion(estudiante=e, curso=grupo.curso, grupo=grupo, periodo=periodo, docente=docente)
+            for e in estudiantes
+        ])
+        ObservacionAcademica.objects.bulk_create([
+            ObservacionAcademica(estudiante=e, grupo=grupo, fecha=fecha, tipo='academica', descripcion='', docente=docente)
+            for e in estudiantes
+        ])
+        DocumentoEstudiante.objects.bulk_create([
+            DocumentoEstudiante(estudiante=e, tipo='identidad', archivo='documentos/x.pdf', subido_por=usuario)
+            for e in estudiantes
+        ])
+        Incidencia.objects.bulk_create([
+            Incidencia(titulo='Retardo', tipo='academica', descripcion='', estudiante=e, grupo=grupo, docente=docente,
+                       reportado_por=usuario, responsable=usuario)
+            for e in estudiantes
+        ])
+        facturas = Factura.objects.bulk_create([
+            Factura(consecutivo=f"F{e.pk}", estudiante=e, fecha_vencimiento=fecha, subtotal=100, total=100, saldo=100,
+                    periodo=periodo, creada_por=usuario)
+            for e in estudiantes
+        ])
+        ItemFactura.objects.bulk_create([
+            ItemFactura(factura=f, concepto=concepto, valor_unitario=100, valor_total=100) for f in facturas
+        ])
+        Cobro.objects.bulk_create([
+            Cobro(consecutivo=f"R{f.pk}", factura=f, fecha=fecha, valor_total=100, saldo=0, periodo_academico=periodo,
+                  creado_por=usuario)
+            for f in facturas
+        ])
+        cls.factura = facturas[0]
+        cls.estudiante = estudiantes[0]
+
+    # Lo que las plantillas muestran del estudiante en las filas de los listados
+    ESTUDIANTE = ('identificacion', 'nombre_completo', 'correo', 'telefono_principal', 'estado')
+
+    def recorrer(self, filas, *atributos):
+        """Lo que muestra cada fila: su __str__ y las columnas relacionadas del listado."""
+        self.assertEqual(len(filas), self.FILAS)
+        for fila in filas:
+            str(fila)
+            for atributo in atributos:
+                valor = fila
+                for parte in atributo.split('.'):
+                    valor = getattr(valor, parte)
+
+    def test_listados(self):
+        estudiante = [f'estudiante.{campo}' for campo in self.ESTUDIANTE]
+        listados = {
+            'estudiantes': (consultas.estudiantes(), 'programa_actual.nombre', 'grupo_actual', *self.ESTUDIANTE),
+            'acudientes': (consultas.acudientes(), *estudiante),
+            'matrículas': (consultas.matriculas(), 'programa.nombre', 'grupo', 'periodo.nombre', *estudiante),
+            'asistencias': (consultas.asistencias(), 'grupo', *estudiante),
+            'calificaciones': (consultas.calificaciones(), 'curso.codigo', 'grupo', 'periodo.nombre', 'docente', *estudiante),
+            'observaciones': (consultas.observaciones(), 'grupo', 'docente', *estudiante),
+            'facturas': (consultas.facturas(), 'periodo.nombre', *estudiante),
+            'cobros': (consultas.cobros(), 'factura.consecutivo', 'periodo_academico.nombre',
+                       *[f'factura.{atributo}' for atributo in estudiante]),
+            'documentos': (consultas.documentos_estudiante(), 'subido_por.username', *estudiante),
+            'incidencias': (consultas.incidencias(), 'grupo', 'docente', 'responsable.username', *estudiante),
+        }
+        for nombre, (queryset, *atributos) in listados.items():
+            with self.subTest(nombre), self.assertNumQueries(1):
+                self.recorrer(pagina_de_listado(queryset, paginate_by=self.FILAS), *atributos)
+
+    def test_exportacion_sobre_consultas(self):
+        # values_list ignora select_related y defer
+        with self.assertNumQueries(1):
+            filas = list(consultas.cobros().values_list('consecutivo', 'factura__estudiante__identificacion'))
+        self.assertEqual(len(filas), self.FILAS)
+
+    def leer_estudiante(self, estudiante):
+        """Las páginas de detalle muestran la ficha completa del estudiante."""
+        for campo in Estudiante._meta.concrete_fields:
+            getattr(estudiante, campo.attname)
+
+    def test_detalle_factura_con_items(self):
+        # Factura con estudiante y período, más los ítems con su concepto
+        with self.assertNumQueries(2):
+            factura = consultas.factura_con_items().get(pk=self.factura.pk)
+            str(factura)
+            self.leer_estudiante(factura.estudiante)
+            [item.concepto.nombre for item in factura.items.all()]
+
+    def test_detalle_cobro_con_pagos(self):
+        with self.assertNumQueries(2):
+            cobro = consultas.cobro_con_pagos().get(factura=self.factura)
+            self.leer_estudiante(cobro.factura.estudiante)
+            list(cobro.pagos.all())
+
+    def test_detalle_matricula_e_incidencia(self):
+        for consulta in (consultas.matricula_detalle, consultas.incidencia_detalle):
+            with self.subTest(consulta.__name__), self.assertNumQueries(1):
+                fila = consulta().get(estudiante=self.estudiante)
+                str(fila)
+                self.leer_estudiante(fila.estudiante)
+
+    def test_detalle_estudiante(self):
+        estudiante = consultas.estudiantes().get(pk=self.estudiante.pk)
+        with self.assertNumQueries(2):
+            [str(m) + str(m.grupo) + m.periodo.nombre for m in estudiante.matricula_set.select_related('programa', 'grupo__curso', 'periodo')]
+            [str(f) for f in estudiante.factura_set.select_related('periodo')[:10]]
+
+
+class AuditoriaPaginadaView(PaginacionKeysetMixin, ListView):
+    model = Auditoria
+    paginate_by = 7
+    conteo_aproximado = True
+
+
+class PaginacionKeysetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        usuario = User.objects.create_user('auditor')
+        Auditoria.objects.bulk_create([
+            Auditoria(usuario=usuario, tipo='otro', modelo='Estudiante', descripcion=str(i), ip='127.0.0.1')
+            for i in range(30)
+        ])
+        # Fechas repetidas para que el id tenga que desempatar
+        base = timezone.now()
+        for i, pk in enumerate(Auditoria.objects.values_list('pk', flat=True)):
+            Auditoria.objects.filter(pk=pk).update(fecha=base - datetime.timedelta(minutes=i % 4))
+        cls.esperados = list(Auditoria.objects.order_by('-fecha', '-pk').values_list('pk', flat=True))
+
+    def contexto(self, **parametros):
+        vista = AuditoriaPaginadaView()
+        vista.setup(RequestFactory().get('/auditoria/', parametros))
+        vista.object_list = vista.get_queryset()
+        return vista.get_context_data()
+
+    def recorrer(self, contexto, siguiente):
+        paginas = [[a.pk for a in contexto['page_obj']]]
+        while True:
+            pagina = contexto['page_obj']
+            cursor = pagina.cursor_siguiente if siguiente else pagina.cursor_anterior
+            if cursor is None:
+                return paginas
+            contexto = self.contexto(cursor=cursor)
+            paginas.append([a.pk for a in contexto['page_obj']])
+
+    def test_recorre_todas_las_paginas_en_ambos_sentidos(self):
+        paginas = self.recorrer(self.contexto(), siguiente=True)
+        self.assertEqual([pk for pagina in paginas for pk in pagina], self.esperados)
+        self.assertEqual([len(p) for p in paginas], [7, 7, 7, 7, 2])
+
+        ultima = self.contexto(cursor=self.contexto()['page_obj'].cursor_siguiente)
+        for _ in range(3):
+            ultima = self.contexto(cursor=ultima['page_obj'].cursor_siguiente)
+        hacia_atras = self.recorrer(ultima, siguiente=False)
+        self.assertEqual(hacia_atras[::-1], paginas)
+
+    def test_primera_pagina(self):
+        contexto = self.contexto(filtro='x')
+        pagina = contexto['page_obj']
+        self.assertTrue(contexto['is_paginated'])
+        self.assertFalse(pagina.has_previous())
+        self.assertIn('filtro=x', pagina.url_siguiente)
+        self.assertEqual(contexto['total_aproximado'], (30, True))
+
+    def test_cursor_alterado(self):
+        cursor = self.contexto()['page_obj'].cursor_siguiente
+        with self.assertRaises(Http404):
+            self.contexto(cursor=cursor[:-2] + 'xx')
+
+    def test_orden_propio_usa_paginacion_normal(self):
+        vista = AuditoriaPaginadaView()
+        vista.setup(RequestFactory().get('/auditoria/', {'page': 2}))
+        vista.object_list = Auditoria.objects.order_by('pk')
+        contexto = vista.get_context_data()
+        self.assertEqual(contexto['paginator'].count, 30)
+        self.assertEqual(contexto['page_obj'].number, 2)
+
+    def test_pagina_profunda_usa_indice(self):
+        campos = campos_orden(Auditoria)
+        fila = Auditoria.objects.order_by('-fecha', '-pk')[20]
+        queryset = ordenar(filtro_despues(Auditoria.objects.all(), campos, [fila.fecha, fila.pk]), campos)
+        plan = queryset[:50].explain()
+        self.assertIn('english_aud_fecha', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_interfaz_de_page(self):
+        pagina = self.contexto()['page_obj']
+        self.assertEqual((pagina.number, pagina.next_page_number(), pagina.start_index(), pagina.end_index()), (1, 2, 1, 7))
+        self.assertEqual((pagina.paginator.count, pagina.paginator.num_pages), (30, 5))
+        with self.assertRaises(EmptyPage):
+            pagina.previous_page_number()
+
+        segunda = self.contexto(cursor=pagina.cursor_siguiente)['page_obj']
+        self.assertEqual((segunda.number, segunda.previous_page_number(), segunda.start_index()), (2, 1, 8))
+        anterior = self.contexto(cursor=segunda.cursor_anterior)['page_obj']
+        self.assertEqual(anterior.number, 1)
+
+        # Los enlaces ?page=N usan la paginación normal
+        contexto = self.contexto(page=segunda.number)
+        self.assertEqual([a.pk for a in contexto['page_obj']], self.esperados[7:14])
+
+
+class CursoPaginadoView(PaginacionKeysetMixin, ListView):
+    model = Curso
+    paginate_by = 2
+
+
+class PaginacionKeysetRelacionesTests(TestCase):
+    def test_llave_foranea_sigue_el_orden_del_modelo_relacionado(self):
+        self.assertEqual(
+            [llave.ruta for llave in campos_orden(Curso)],
+            ['programa__area', 'programa__nombre', 'programa_id', 'orden', 'id'],
+        )
+        self.assertEqual(
+            [(llave.ruta, llave.descendente) for llave in campos_orden(Curso, ['-programa'])][:3],
+            [('programa__area', True), ('programa__nombre', True), ('programa_id', True)],
+        )
+        self.assertEqual(
+            [llave.ruta for llave in campos_orden(Calificacion)][:5],
+            ['periodo_id', 'curso__programa__area', 'curso__programa__nombre', 'curso__programa_id', 'curso__orden'],
+        )
+
+    def test_todos_los_ordenes_sirven_de_llave(self):
+        for modelo in apps.get_app_config('english').get_models():
+            with self.subTest(modelo=modelo.__name__):
+                campos_orden(modelo)
+
+    def test_recorre_en_el_orden_del_listado(self):
+        # Los ids de los programas van al revés de su nombre
+        for codigo, nombre in [('P1', 'Portugués'), ('P2', 'Francés'), ('P3', 'Alemán')]:
+            programa = crear_programa(codigo)
+            Programa.objects.filter(pk=programa.pk).update(nombre=nombre)
+            for orden in (2, 1):
+                Curso.objects.create(
+                    programa=programa, codigo=f"{codigo}-{orden}", nombre='Curso', descripcion='', horas=40,
+                    orden=orden, costo=Decimal('1'),
+                )
+        esperados = list(Curso.objects.values_list('codigo', flat=True))
+        self.assertEqual(esperados[:2], ['P3-1', 'P3-2'])
+
+        vista = CursoPaginadoView()
+        codigos, cursor = [], None
+        while True:
+            vista.setup(RequestFactory().get('/cursos/', {'cursor': cursor} if cursor else {}))
+            vista.object_list = vista.get_queryset()
+            pagina = vista.get_context_data()['page_obj']
+            codigos += [curso.codigo for curso in pagina]
+            cursor = pagina.cursor_siguiente
+            if cursor is None:
+                break
+        self.assertEqual(codigos, esperados)
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'comprobantes': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'comprobantes-pruebas'},
+})
+class ComprobantesPDFTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('tesorero')
+        cls.estudiante = crear_estudiante()
+        cls.factura = crear_factura(cls.estudiante, cls.usuario)
+        concepto = ConceptoCobro.objects.create(codigo='PEN', nombre='Pensión', tipo='pension', valor=Decimal('100000'))
+        cls.item = ItemFactura.objects.create(
+            factura=cls.factura, concepto=concepto, valor_unitario=Decimal('100000'), valor_total=Decimal('100000'),
+        )
+        cls.cobro = crear_cobro(cls.factura, cls.usuario, Decimal('50000'), datetime.date(2024, 3, 1))
+
+    def setUp(self):
+        comprobantes._cache().clear()
+
+    def descargar(self, tipo, pk, **encabezados):
+        return comprobantes.respuesta_pdf(RequestFactory().get('/pdf/', **encabezados), tipo, pk)
+
+    def test_segunda_descarga_sale_de_la_cache(self):
+        primera = self.descargar('factura', self.factura.pk)
+        self.assertEqual(primera.status_code, 200)
+        self.assertTrue(primera.content.startswith(b'%PDF'))
+        self.assertIn(f'factura_{self.factura.consecutivo}.pdf', primera['Content-Disposition'])
+        with self.assertNumQueries(0):
+            segunda = self.descargar('factura', self.factura.pk)
+        self.assertEqual(segunda.content, primera.content)
+        self.assertEqual(segunda['ETag'], primera['ETag'])
+
+    def test_etag_y_last_modified_responden_304(self):
+        primera = self.descargar('cobro', self.cobro.pk)
+        with self.assertNumQueries(0):
+            respuesta = self.descargar('cobro', self.cobro.pk, HTTP_IF_NONE_MATCH=primera['ETag'])
+        self.assertEqual(respuesta.status_code, 304)
+        self.assertEqual(respuesta['Cache-Control'], 'private, no-cache')
+        respuesta = self.descargar('cobro', self.cobro.pk, HTTP_IF_MODIFIED_SINCE=primera['Last-Modified'])
+        self.assertEqual(respuesta.status_code, 304)
+        respuesta = self.descargar('cobro', self.cobro.pk, HTTP_IF_NONE_MATCH='"otra"')
+        self.assertEqual(respuesta.status_code, 200)
+
+    def test_cambios_en_hijos_invalidan(self):
+        antes = self.descargar('factura', self.factura.pk)
+        self.item.valor_total = Decimal('90000')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.save()
+        despues = self.descargar('factura', self.factura.pk)
+        self.assertNotEqual(despues['ETag'], antes['ETag'])
+        self.assertNotEqual(despues.content, antes.content)
+
+        recibo = self.descargar('cobro', self.cobro.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            DetallePago.objects.create(
+                cobro=self.cobro, metodo_pago='efectivo', valor=Decimal('50000'), fecha=datetime.date(2024, 3, 1),
+                registrado_por=self.usuario,
+            )
+        self.assertEqual(self.descargar('cobro', self.cobro.pk, HTTP_IF_NONE_MATCH=recibo['ETag']).status_code, 200)
+
+    def test_guardar_sin_cambios_conserva_el_pdf(self):
+        antes = self.descargar('factura', self.factura.pk)
+        self.factura.save()
+        despues = self.descargar('factura', self.factura.pk)
+        self.assertEqual(despues['ETag'], antes['ETag'])
+        self.assertEqual(despues['Last-Modified'], antes['Last-Modified'])
+
+    def test_cambio_de_nombre_del_estudiante(self):
+        antes = self.descargar('cobro', self.cobro.pk)
+        self.estudiante.primer_apellido = 'Gómez'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.estudiante.save()
+        self.assertNotEqual(self.descargar('cobro', self.cobro.pk)['ETag'], antes['ETag'])
+
+    def test_invalida_al_confirmar_la_transaccion(self):
+        antes = self.descargar('factura', self.factura.pk)
+        self.item.valor_total = Decimal('90000')
+        with self.captureOnCommitCallbacks(execute=True) as pendientes:
+            self.item.save()
+            # Antes del commit la huella guardada sigue vigente: nadie cachea un PDF a medio cambiar
+            with self.assertNumQueries(0):
+                self.assertEqual(self.descargar('factura', self.factura.pk)['ETag'], antes['ETag'])
+        self.assertEqual(len(pendientes), 1)
+        self.assertNotEqual(self.descargar('factura', self.factura.pk)['ETag'], antes['ETag'])
+
+    def test_comprobante_inexistente(self):
+        with self.assertRaises(Http404):
+            self.descargar('egreso', 999)
+
+
+class ComprobantesLoteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        usuario = User.objects.create_user('tesorero')
+        cls.periodo = crear_periodo()
+        concepto = ConceptoCobro.objects.create(codigo='PEN', nombre='Pensión', tipo='pension', valor=Decimal('100'))
+        for i in range(6):
+            factura = crear_factura(
+                crear_estudiante(f"L{i}"), usuario, estado='pagada' if i % 3 == 0 else 'pendiente',
+                periodo=cls.periodo if i < 4 else None,
+            )
+            ItemFactura.objects.create(factura=factura, concepto=concepto, valor_unitario=100, valor_total=100)
+
+    def paginas(self, contenido):
+        return len(re.findall(rb'/Type /Page\b(?!s)', contenido))
+
+    def test_filtros(self):
+        self.assertEqual(comprobantes.filtrar_lote('factura', periodo=self.periodo.pk).count(), 4)
+        self.assertEqual(comprobantes.filtrar_lote('factura', periodo=self.periodo.pk, estado='pendiente').count(), 2)
+        hoy = timezone.localdate()
+        self.assertEqual(comprobantes.filtrar_lote('factura', desde=hoy, hasta=str(hoy)).count(), 6)
+        self.assertEqual(comprobantes.filtrar_lote('factura', hasta=hoy - datetime.timedelta(days=1)).count(), 0)
+        with self.assertRaises(ValueError):
+            comprobantes.filtrar_lote('egreso', periodo=self.periodo.pk)
+        with self.assertRaises(ValueError):
+            comprobantes.filtrar_lote('factura', desde='ayer')
+
+    def test_pdf_de_varias_paginas_en_pocas_consultas(self):
+        # Configuración del instituto (dentro de la transacción de la prueba no
+        # se guarda en el proceso), facturas con estudiante y período, ítems
+        with self.assertNumQueries(3):
+            nombre, archivo, cantidad = comprobantes.generar_lote('factura', comprobantes.filtrar_lote('factura'), 'pdf')
+        self.assertEqual((nombre, cantidad), ('facturas.pdf', 6))
+        self.assertEqual(self.paginas(archivo.read()), 6)
+
+    def test_zip_con_un_pdf_por_comprobante(self):
+        _, archivo, cantidad = comprobantes.generar_lote(
+            'factura', comprobantes.filtrar_lote('factura', estado='pagada'), 'zip',
+        )
+        with zipfile.ZipFile(archivo) as archivo_zip:
+            nombres = archivo_zip.namelist()
+            self.assertEqual(cantidad, 2)
+            self.assertTrue(all(re.fullmatch(r'factura_.+\.pdf', n) for n in nombres))
+            self.assertEqual(self.paginas(archivo_zip.read(nombres[0])), 1)
+
+    def test_comando(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            salida = f"{directorio}/facturas.zip"
+            out = io.StringIO()
+            call_command('imprimir_comprobantes', 'factura', salida, formato='zip', procesos=0,
+                         periodo=self.periodo.pk, stdout=out)
+            self.assertIn('4 comprobantes', out.getvalue())
+            self.assertIn('comprobantes/s', out.getvalue())
+            with zipfile.ZipFile(salida) as archivo_zip:
+                self.assertEqual(len(archivo_zip.namelist()), 4)
+
+
+class DisenoPDFTests(TestCase):
+    def textos(self, tipo, documentos):
+        """(documentos, páginas, textos dibujados) de un PDF sin comprimir."""
+        destino = io.BytesIO()
+        with mock.patch.object(rl_config, 'pageCompression', 0):
+            cantidad, paginas = comprobantes.escribir_pdf(tipo, documentos, destino)
+        textos = [t.decode('latin-1') for t in re.findall(rb'\((.*?)\) Tj', destino.getvalue())]
+        return cantidad, paginas, textos
+
+    def test_factura_larga_continua_en_otras_paginas(self):
+        cantidad, paginas, textos = self.textos('factura', [factura_de_prueba(100), factura_de_prueba(3)])
+        self.assertEqual(cantidad, 2)
+        self.assertGreater(paginas, 2)
+        # Los encabezados de la tabla se repiten en cada página con filas
+        self.assertEqual(textos.count('Concepto'), paginas - 1)
+        # La numeración vuelve a empezar con la segunda factura
+        numeros = [t for t in textos if t.startswith('P\\341gina')]
+        self.assertEqual(len(numeros), paginas)
+        self.assertEqual(numeros[-1], 'P\\341gina 1')
+        self.assertEqual(numeros[-2], f'P\\341gina {paginas - 1}')
+        self.assertIn('Concepto de cobro n\\372mero 100 del per\\355odo acad\\351mico', textos)
+
+    def test_textos_con_caracteres_especiales(self):
+        datos = factura_de_prueba(1)
+        datos['estudiante'] = 'Ana <b> & Cía'
+        _, paginas, textos = self.textos('factura', [datos])
+        self.assertEqual(paginas, 1)
+        # Se muestra tal cual, no como marcado de Paragraph
+        self.assertIn('Ana <b> & C\\355a', ''.join(textos))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ConfiguracionInstitutoTests(TransactionTestCase):
+    # Sin la transacción de TestCase, como en una petición normal
+    def setUp(self):
+        cache.clear()
+        ConfiguracionInstituto._copia_local = None
+        self.addCleanup(setattr, ConfiguracionInstituto, '_copia_local', None)
+
+    def crear(self, **campos):
+        valores = dict(
+            nombre_instituto='Instituto', logo='logo.png', nit='900123', direccion='', telefono_principal='1',
+            correo_principal='a@b.co', resolucion_autorizacion='', terminos_condiciones='', politica_privacidad='',
+        )
+        valores.update(campos)
+        return ConfiguracionInstituto.objects.create(**valores)
+
+    def test_sin_configuracion_usa_valores_por_defecto(self):
+        configuracion = ConfiguracionInstituto.obtener()
+        self.assertIsNone(configuracion.pk)
+        self.assertEqual(configuracion.iva, Decimal('19.00'))
+
+    def test_segunda_lectura_no_consulta(self):
+        self.crear()
+        self.assertEqual(ConfiguracionInstituto.obtener().nit, '900123')
+        with self.assertNumQueries(0):
+            configuracion = ConfiguracionInstituto.obtener()
+        configuracion.nit = 'cambiado'
+        self.assertEqual(ConfiguracionInstituto.obtener().nit, '900123')
+
+    def test_guardar_invalida_la_copia(self):
+        configuracion = self.crear()
+        ConfiguracionInstituto.obtener()
+        configuracion.iva = Decimal('5.00')
+        configuracion.save()
+        self.assertEqual(ConfiguracionInstituto.obtener().iva, Decimal('5.00'))
+
+    def test_otro_proceso_cambia_la_version(self):
+        self.crear()
+        ConfiguracionInstituto.obtener()
+        # Un update directo no pasa por save(): la copia sigue hasta que cambie la versión
+        ConfiguracionInstituto.objects.update(nombre_instituto='Otro')
+        self.assertEqual(ConfiguracionInstituto.obtener().nombre_instituto, 'Instituto')
+        ConfiguracionInstituto.invalidar()
+        self.assertEqual(ConfiguracionInstituto.obtener().nombre_instituto, 'Otro')
+
+    def test_una_sola_fila(self):
+        self.crear()
+        self.crear(nombre_instituto='Segundo')
+        self.assertEqual(ConfiguracionInstituto.objects.get().nombre_instituto, 'Segundo')
+        with self.assertRaises(IntegrityError):
+            ConfiguracionInstituto.objects.filter(pk=1).update(id=2)
+
+
+@override_settings(AUDITORIA_ASINCRONA=False)
+class AuditoriaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('secretaria')
+
+    def auditar(self):
+        return auditoria.auditar_como(self.usuario, ip='10.0.0.5')
+
+    def test_crear_modificar_y_eliminar(self):
+        with self.auditar(), self.captureOnCommitCallbacks(execute=True):
+            estudiante = crear_estudiante()
+            estudiante = Estudiante.objects.get(pk=estudiante.pk)
+            estudiante.ciudad = 'Palmira'
+            estudiante.save()
+            estudiante.delete()
+
+        creacion, modificacion, eliminacion = Auditoria.objects.order_by('id')
+        self.assertEqual([creacion.tipo, modificacion.tipo, eliminacion.tipo], ['creacion', 'modificacion', 'eliminacion'])
+        self.assertEqual((creacion.modelo, creacion.usuario, creacion.ip), ('Estudiante', self.usuario, '10.0.0.5'))
+        self.assertIsNone(creacion.datos_anteriores)
+        self.assertEqual(creacion.datos_nuevos['fecha_nacimiento'], '2000-01-01')
+        self.assertNotIn('busqueda', creacion.datos_nuevos)
+        self.assertEqual(modificacion.datos_anteriores, {'ciudad': 'Cali'})
+        self.assertEqual(modificacion.datos_nuevos, {'ciudad': 'Palmira'})
+        self.assertEqual(eliminacion.objeto_id, creacion.objeto_id)
+        self.assertEqual(eliminacion.datos_anteriores['ciudad'], 'Palmira')
+
+    def test_jsonfield_modificado_en_el_lugar(self):
+        reporte = ReporteEconomico.objects.create(
+            nombre='Enero', tipo_reporte='mensual', tipo_movimiento='ambos', fecha_inicio=datetime.date(2024, 1, 1),
+            fecha_fin=datetime.date(2024, 1, 31), generado_por=self.usuario, parametros={'programas': [1]},
+        )
+        with self.auditar(), self.captureOnCommitCallbacks(execute=True):
+            reporte = ReporteEconomico.objects.get(pk=reporte.pk)
+            reporte.parametros['programas'].append(2)
+            reporte.parametros['jornada'] = 'tarde'
+            reporte.save()
+
+        modificacion = Auditoria.objects.get()
+        self.assertEqual(modificacion.datos_anteriores, {'parametros': {'programas': [1]}})
+        self.assertEqual(modificacion.datos_nuevos, {'parametros': {'programas': [1, 2], 'jornada': 'tarde'}})
+
+    def test_sin_cambios_rollback_o_sin_contexto_no_registra(self):
+        crear_estudiante()
+        with self.auditar(), self.captureOnCommitCallbacks(execute=True):
+            Estudiante.objects.get().save()
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                crear_estudiante(identificacion='2000')
+                crear_estudiante(identificacion='2000')
+        self.assertFalse(Auditoria.objects.exists())
+
+    def test_middleware_toma_usuario_e_ip(self):
+        def vista(request):
+            ConceptoCobro.objects.create(codigo='MAT', nombre='Matrícula', tipo='matricula', valor=Decimal('5'))
+            return HttpResponse()
+
+        request = RequestFactory().post('/', REMOTE_ADDR='192.168.1.20')
+        request.user = self.usuario
+        with self.captureOnCommitCallbacks(execute=True):
+            auditoria.AuditoriaMiddleware(vista)(request)
+        registro = Auditoria.objects.get()
+        self.assertEqual((registro.modelo, registro.ip, registro.usuario), ('ConceptoCobro', '192.168.1.20', self.usuario))
+        self.assertEqual(registro.datos_nuevos['valor'], '5')
+        self.assertIsNone(auditoria.contexto_actual())
+
+    def test_inicio_de_sesion(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.force_login(self.usuario)
+        self.assertEqual(Auditoria.objects.get().tipo, 'login')
+
+
+@override_settings(AUDITORIA_TAMANO_LOTE=3, AUDITORIA_INTERVALO_MS=10_000)
+class EscritorAuditoriaTests(TransactionTestCase):
+    def entrada(self, usuario, numero):
+        return auditoria.Entrada(
+            usuario.pk, '127.0.0.1', 'creacion', ConceptoCobro, numero, None, {'codigo': f'C{numero}'}, timezone.now(),
+        )
+
+    def test_escribe_por_lotes_en_otro_hilo(self):
+        usuario = User.objects.create_user('tesorero')
+        escritor = auditoria.EscritorAuditoria()
+        self.addCleanup(escritor.detener)
+        for numero in range(2):
+            escritor.registrar(self.entrada(usuario, numero))
+        self.assertEqual(escritor.pendientes(), 2)
+        self.assertFalse(Auditoria.objects.exists())
+
+        # La tercera completa el lote y despierta al hilo
+        escritor.registrar(self.entrada(usuario, 2))
+        for _ in range(200):
+            if Auditoria.objects.count() == 3:
+                break
+            time.sleep(0.01)
+        self.assertEqual(Auditoria.objects.count(), 3)
+
+        # Al detenerse escribe lo que quedó, aunque no complete un lote
+        escritor.registrar(self.entrada(usuario, 3))
+        escritor.detener()
+        self.assertEqual(sorted(Auditoria.objects.values_list('objeto_id', flat=True)), [0, 1, 2, 3])
+        self.assertEqual(Auditoria.objects.get(objeto_id=3).datos_nuevos, {'codigo': 'C3'})
+
+    @override_settings(AUDITORIA_ASINCRONA=False)
+    def test_reintenta_el_lote_si_la_base_falla(self):
+        usuario = User.objects.create_user('tesorero')
+        escritor = auditoria.EscritorAuditoria()
+        falla = mock.patch.object(
+            type(Auditoria.objects.all()), 'bulk_create', side_effect=OperationalError('database is locked'),
+        )
+        with falla, self.assertLogs('english.auditoria', 'ERROR') as registro:
+            escritor.registrar(self.entrada(usuario, 0))
+            self.assertTrue(escritor.en_espera())
+            # Mientras espera no lo intenta; las entradas nuevas se suman al lote
+            escritor.registrar(self.entrada(usuario, 1))
+            self.assertEqual(escritor.pendientes(), 2)
+            escritor.vaciar(forzar=True)
+        self.assertIn('2 registros de auditoría; se reintenta en 1.0 s', registro.output[-1])
+        self.assertFalse(Auditoria.objects.exists())
+
+        self.assertEqual(escritor.vaciar(forzar=True), 2)
+        self.assertEqual((escritor.pendientes(), escritor.en_espera()), (0, False))
+        self.assertEqual(sorted(Auditoria.objects.values_list('objeto_id', flat=True)), [0, 1])
+
+    def test_descarta_solo_las_filas_rechazadas(self):
+        usuario = User.objects.create_user('tesorero')
+        escritor = auditoria.EscritorAuditoria()
+        self.addCleanup(escritor.detener)
+        with mock.patch.object(auditoria, 'INTENTOS_POR_LOTE', 1), self.assertLogs('english.auditoria', 'ERROR'):
+            escritor.registrar(self.entrada(usuario, 0))
+            # Usuario inexistente: la base rechaza el lote entero
+            escritor.registrar(self.entrada(User(pk=usuario.pk + 100), 1))
+            self.assertEqual(escritor.vaciar(forzar=True), 0)
+            self.assertEqual(escritor.pendientes(), 2)
+            # Fila por fila solo se pierde la rechazada
+            self.assertEqual(escritor.vaciar(forzar=True), 1)
+        self.assertEqual(escritor.pendientes(), 0)
+        self.assertEqual(list(Auditoria.objects.values_list('objeto_id', flat=True)), [0])
+
+
+class ArchivoHistoricoTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        ajustes = override_settings(MEDIA_ROOT=self.media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.usuario = User.objects.create_user('coordinador')
+        self.grupo = crear_grupo(crear_programa())
+        self.ana = crear_estudiante()
+        self.luis = crear_estudiante(identificacion='2000', primer_nombre='Luis')
+        self.corte = datetime.date(2024, 1, 1)
+
+    def asistencia(self, estudiante, fecha):
+        return Asistencia.objects.create(
+            estudiante=estudiante, grupo=self.grupo, fecha=fecha, estado='asistio', registrado_por=self.usuario,
+        )
+
+    def test_archiva_por_anio_y_busca_en_el_archivo(self):
+        for fecha in (datetime.date(2022, 3, 1), datetime.date(2022, 3, 2), datetime.date(2023, 5, 1)):
+            self.asistencia(self.ana, fecha)
+        reciente = self.asistencia(self.ana, self.corte)
+
+        resultado = archivo.archivar('asistencia', self.corte, tamano_parte=1)
+        self.assertEqual((resultado.filas, resultado.partes), (3, 3))
+        self.assertEqual(list(Asistencia.objects.all()), [reciente])
+        partes = ArchivoHistorico.objects.order_by('fecha_desde')
+        self.assertEqual([parte.anio for parte in partes], [2022, 2022, 2023])
+        self.assertEqual(partes[0].claves, {'estudiante_id': [self.ana.pk], 'grupo_id': [self.grupo.pk]})
+        self.assertTrue(partes[0].archivo.name.endswith('.jsonl.gz'))
+
+        filas = list(archivo.buscar('asistencia', estudiante_id=self.ana.pk))
+        self.assertEqual([fila['fecha'] for fila in filas], ['2022-03-01', '2022-03-02', '2023-05-01'])
+        self.assertEqual(filas[0]['estado'], 'asistio')
+        desde_2023 = archivo.buscar('asistencia', desde=datetime.date(2022, 3, 2), hasta=datetime.date(2023, 12, 31))
+        self.assertEqual(len(list(desde_2023)), 2)
+        # Luis no aparece en el resumen de ninguna parte: no se abre ningún archivo
+        with mock.patch.object(archivo, 'leer') as leer:
+            self.assertEqual(list(archivo.buscar('asistencia', estudiante_id=self.luis.pk)), [])
+        leer.assert_not_called()
+
+        # Volver a archivar no encuentra nada nuevo
+        self.assertEqual(archivo.archivar('asistencia', self.corte).filas, 0)
+
+    def test_seguimientos_de_incidencias_abiertas_se_quedan(self):
+        abierta = Incidencia.objects.create(titulo='A', tipo='otra', descripcion='', reportado_por=self.usuario)
+        cerrada = Incidencia.objects.create(
+            titulo='B', tipo='otra', descripcion='', reportado_por=self.usuario, estado='cerrada',
+        )
+        for incidencia in (abierta, cerrada):
+            SeguimientoIncidencia.objects.create(incidencia=incidencia, descripcion='Llamada', usuario=self.usuario)
+        SeguimientoIncidencia.objects.update(fecha=timezone.make_aware(datetime.datetime(2022, 6, 1, 10)))
+
+        self.assertEqual(archivo.archivar('seguimiento', self.corte).filas, 1)
+        self.assertEqual(SeguimientoIncidencia.objects.get().incidencia, abierta)
+        fila, = archivo.buscar('seguimiento', desde=datetime.date(2022, 6, 1), hasta=datetime.date(2022, 6, 1))
+        self.assertEqual(fila['incidencia_id'], cerrada.pk)
+
+    def test_si_falla_el_borrado_las_filas_se_quedan(self):
+        self.asistencia(self.ana, datetime.date(2022, 3, 1))
+        with mock.patch('django.db.models.query.QuerySet._raw_delete', side_effect=IntegrityError), \
+                self.assertRaises(IntegrityError):
+            archivo.archivar('asistencia', self.corte)
+        self.assertEqual(Asistencia.objects.count(), 1)
+        self.assertFalse(ArchivoHistorico.objects.exists())
+        self.assertEqual(list(pathlib.Path(self.media).rglob('*.gz')), [])
+
+
+@override_settings(BACKUP_LIMITE_MB_S=0)
+class RespaldosTests(TransactionTestCase):
+    # VACUUM INTO no se puede ejecutar dentro de la transacción abierta de TestCase
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        ajustes = override_settings(MEDIA_ROOT=self.media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.usuario = User.objects.create_user('admin')
+        crear_estudiante()
+        self.escribir('estudiantes/fotos/ana.jpg', b'foto de ana')
+        self.escribir('documentos/estudiantes/acta.pdf', b'%PDF acta')
+        self.escribir('tareas/estudiantes.xlsx', b'resultado de una tarea')
+
+    def escribir(self, ruta, contenido):
+        destino = pathlib.Path(self.media, ruta)
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        destino.write_bytes(contenido)
+        return destino
+
+    def restaurado(self, backup):
+        destino = pathlib.Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, destino, ignore_errors=True)
+        return respaldos.restaurar(backup, destino)
+
+    def test_copia_completa_y_restauracion(self):
+        backup = respaldos.crear_backup(self.usuario)
+        self.assertEqual(backup.tipo, 'completo')
+        self.assertTrue(backup.archivo.name.endswith('.tar.gz'))
+        # Los resultados de tareas no se respaldan
+        self.assertEqual(backup.manifiesto['incluidos'], ['documentos/estudiantes/acta.pdf', 'estudiantes/fotos/ana.jpg'])
+
+        destino = self.restaurado(backup)
+        self.assertEqual((destino / 'media/estudiantes/fotos/ana.jpg').read_bytes(), b'foto de ana')
+        with closing(sqlite3.connect(destino / 'db.sqlite3')) as copia:
+            self.assertEqual(copia.execute("SELECT primer_nombre FROM english_estudiante").fetchall(), [('Ana',)])
+
+    def test_incremental_solo_lleva_lo_que_cambio(self):
+        completa = respaldos.crear_backup(self.usuario)
+        self.escribir('estudiantes/fotos/ana.jpg', b'foto nueva de ana')
+        self.escribir('estudiantes/fotos/luis.jpg', b'foto de luis')
+        # Cambia la fecha pero no el contenido: no se vuelve a copiar
+        os.utime(pathlib.Path(self.media, 'documentos/estudiantes/acta.pdf'), ns=(1, 1))
+
+        incremental = respaldos.crear_backup(self.usuario, 'incremental')
+        self.assertEqual((incremental.tipo, incremental.base), ('incremental', completa))
+        self.assertEqual(incremental.manifiesto['incluidos'], ['estudiantes/fotos/ana.jpg', 'estudiantes/fotos/luis.jpg'])
+        self.assertLess(incremental.tamano, completa.tamano + 1024)
+
+        destino = self.restaurado(incremental)
+        self.assertEqual((destino / 'media/estudiantes/fotos/ana.jpg').read_bytes(), b'foto nueva de ana')
+        self.assertEqual((destino / 'media/documentos/estudiantes/acta.pdf').read_bytes(), b'%PDF acta')
+
+    def test_copia_danada_no_se_restaura(self):
+        backup = respaldos.crear_backup(self.usuario)
+        ruta = pathlib.Path(backup.archivo.path)
+        datos = bytearray(ruta.read_bytes())
+        datos[len(datos) // 2] ^= 0xFF
+        ruta.write_bytes(bytes(datos))
+
+        destino = pathlib.Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, destino, ignore_errors=True)
+        with self.assertRaises(respaldos.RespaldoInvalido):
+            respaldos.restaurar(backup, destino)
+        self.assertEqual(list(destino.iterdir()), [])
+
+    def test_incremental_sin_su_base(self):
+        completa = respaldos.crear_backup(self.usuario)
+        self.escribir('estudiantes/fotos/luis.jpg', b'foto de luis')
+        incremental = respaldos.crear_backup(self.usuario, 'incremental')
+        os.remove(completa.archivo.path)
+        with self.assertRaisesRegex(respaldos.RespaldoInvalido, f"copia {completa.pk}"):
+            respaldos.verificar(incremental)
+
+    def test_archivo_que_crece_despues_del_inventario(self):
+        inventario = respaldos.inventario_media
+
+        def y_crece(*args, **kwargs):
+            resultado = inventario(*args, **kwargs)
+            self.escribir('estudiantes/fotos/ana.jpg', b'foto de ana, ahora mucho mas grande')
+            return resultado
+
+        with mock.patch.object(respaldos, 'inventario_media', y_crece):
+            backup = respaldos.crear_backup(self.usuario)
+        self.assertEqual(backup.manifiesto['cambiados'], [])
+        self.assertEqual(backup.manifiesto['media']['estudiantes/fotos/ana.jpg'][1], 35)
+        destino = self.restaurado(backup)
+        self.assertEqual((destino / 'media/estudiantes/fotos/ana.jpg').read_bytes(), b'foto de ana, ahora mucho mas grande')
+
+    def test_archivo_que_cambia_mientras_se_copia(self):
+        acta = pathlib.Path(self.media, 'documentos/estudiantes/acta.pdf')
+        leer = respaldos._Completar.read
+
+        def acortar_y_leer(completar, cantidad=-1):
+            if completar.archivo.name == str(acta):
+                os.truncate(acta, 2)
+            return leer(completar, cantidad)
+
+        with mock.patch.object(respaldos._Completar, 'read', acortar_y_leer), self.assertLogs('english.respaldos'):
+            backup = respaldos.crear_backup(self.usuario)
+        self.assertEqual(backup.manifiesto['cambiados'], ['documentos/estudiantes/acta.pdf'])
+        # El tar sigue siendo válido y la siguiente incremental vuelve a llevar el archivo
+        respaldos.verificar(backup)
+        incremental = respaldos.crear_backup(self.usuario, 'incremental')
+        self.assertEqual(incremental.manifiesto['incluidos'], ['documentos/estudiantes/acta.pdf'])
+        self.assertEqual((self.restaurado(incremental) / 'media/documentos/estudiantes/acta.pdf').read_bytes(), b'%P')
+
+    def test_archivo_borrado_despues_del_inventario(self):
+        inventario = respaldos.inventario_media
+
+        def y_se_borra(*args, **kwargs):
+            resultado = inventario(*args, **kwargs)
+            os.remove(pathlib.Path(self.media, 'documentos/estudiantes/acta.pdf'))
+            return resultado
+
+        with mock.patch.object(respaldos, 'inventario_media', y_se_borra), self.assertLogs('english.respaldos'):
+            backup = respaldos.crear_backup(self.usuario)
+        self.assertEqual(backup.manifiesto['incluidos'], ['estudiantes/fotos/ana.jpg'])
+        self.assertEqual(list(backup.manifiesto['media']), ['estudiantes/fotos/ana.jpg'])
+        destino = self.restaurado(backup)
+        self.assertFalse((destino / 'media/documentos/estudiantes/acta.pdf').exists())
+        self.assertEqual((destino / 'media/estudiantes/fotos/ana.jpg').read_bytes(), b'foto de ana')
+
+    def test_escrituras_de_otra_conexion_durante_la_copia(self):
+        # Otra conexión escribe mientras se empaqueta la base: la copia no vuelve a empezar y es la del VACUUM
+        agregar, consumir = respaldos._agregar, respaldos.Limitador.consumir
+        otra = sqlite3.connect(connection.settings_dict['NAME'], uri=True)
+        self.addCleanup(otra.close)
+        empaquetando, escrituras = [], []
+
+        def marcar_y_agregar(tar, nombre, archivo, limitador):
+            empaquetando.append(nombre)
+            return agregar(tar, nombre, archivo, limitador)
+
+        def escribir_y_consumir(limitador, cantidad):
+            if empaquetando == ['db.sqlite3'] and len(escrituras) < 5:
+                with otra:
+                    otra.execute("UPDATE english_estudiante SET primer_nombre = ?", (f"Ana {len(escrituras)}",))
+                escrituras.append(cantidad)
+            consumir(limitador, cantidad)
+
+        with mock.patch.object(respaldos, '_agregar', marcar_y_agregar), \
+                mock.patch.object(respaldos.Limitador, 'consumir', escribir_y_consumir):
+            backup = respaldos.crear_backup(self.usuario)
+        self.assertEqual(len(escrituras), 5)
+        self.assertEqual(Estudiante.objects.get().primer_nombre, 'Ana 4')
+        with closing(sqlite3.connect(self.restaurado(backup) / 'db.sqlite3')) as copia:
+            self.assertEqual(copia.execute("SELECT primer_nombre FROM english_estudiante").fetchall(), [('Ana',)])
+
+    def test_tarea_de_backup(self):
+        tarea = encolar('backup', self.usuario, tipo='incremental')
+        self.assertEqual(ejecutar(tarea.pk), 'completada')
+        tarea.refresh_from_db()
+        self.assertEqual(tarea.progreso, 100)
+        # Sin copias anteriores la incremental se hace completa
+        self.assertEqual(Backup.objects.get().tipo, 'completo')
+
+
+
+class DescargasTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        ajustes = override_settings(MEDIA_ROOT=self.media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.tarea = encolar('exportar_estudiantes', User.objects.create_user('secretaria'))
+        self.tarea.resultado.save('estudiantes.xlsx', ContentFile(b'0123456789'))
+        self.factory = RequestFactory()
+
+    def descargar(self, **cabeceras):
+        return descargas.respuesta_archivo(self.factory.get('/', **cabeceras), self.tarea.resultado)
+
+    def contenido(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_archivo_completo(self):
+        response = self.descargar()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.contenido(response), b'0123456789')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertIn('attachment', response['Content-Disposition'])
+        self.assertTrue(response['ETag'])
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+
+    def test_rangos(self):
+        casos = [
+            ('bytes=2-5', b'2345', 'bytes 2-5/10'),
+            ('bytes=-3', b'789', 'bytes 7-9/10'),
+            ('bytes=7-', b'789', 'bytes 7-9/10'),
+            ('bytes=8-50', b'89', 'bytes 8-9/10'),
+        ]
+        for rango, esperado, content_range in casos:
+            with self.subTest(rango=rango):
+                response = self.descargar(HTTP_RANGE=rango)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(self.contenido(response), esperado)
+                self.assertEqual(response['Content-Range'], content_range)
+                self.assertEqual(response['Content-Length'], str(len(esperado)))
+
+    def test_rango_fuera_del_archivo(self):
+        response = self.descargar(HTTP_RANGE='bytes=100-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_if_range_vencido_envia_todo(self):
+        etag = self.descargar()['ETag']
+        self.assertEqual(self.descargar(HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE=etag).status_code, 206)
+        response = self.descargar(HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"otro"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.contenido(response), b'0123456789')
+
+    def test_no_modificado(self):
+        etag = self.descargar()['ETag']
+        response = self.descargar(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_archivo_inexistente(self):
+        os.remove(self.tarea.resultado.path)
+        with self.assertRaises(Http404):
+            self.descargar()
+
+    @override_settings(DESCARGAS_BACKEND='x-accel-redirect', DESCARGAS_ACCEL_PREFIJO='/protegido/')
+    def test_x_accel_redirect(self):
+        response = self.descargar(HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/protegido/' + self.tarea.resultado.name)
+        self.assertEqual(response.content, b'')
+        self.assertIn('estudiantes', response['Content-Disposition'])
+
+
+class CalendarioTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.usuario = User.objects.create_user('coordinacion')
+        self.grupo = crear_grupo(crear_programa())
+        self.factory = RequestFactory()
+
+    def crear_evento(self, titulo, inicio, dias=1, **campos):
+        fecha_inicio = timezone.make_aware(datetime.datetime.combine(inicio, datetime.time(8)))
+        valores = dict(
+            titulo=titulo, tipo='academico', descripcion='', lugar='Aula 1', creado_por=self.usuario,
+            fecha_inicio=fecha_inicio, fecha_fin=fecha_inicio + datetime.timedelta(days=dias),
+        )
+        valores.update(campos)
+        return Evento.objects.create(**valores)
+
+    def feed(self, start='2024-03-01', end='2024-04-01', **parametros):
+        cabeceras = {clave: parametros.pop(clave) for clave in list(parametros) if clave.startswith('HTTP_')}
+        request = self.factory.get('/', {'start': start, 'end': end, **parametros}, **cabeceras)
+        return calendario.respuesta_feed(request)
+
+    def titulos(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [evento['title'] for evento in json.loads(b''.join(response.streaming_content))]
+
+    def test_solo_eventos_que_se_cruzan_con_la_ventana(self):
+        self.crear_evento('Febrero', datetime.date(2024, 2, 10))
+        self.crear_evento('Desde febrero', datetime.date(2024, 2, 25), dias=10)
+        self.crear_evento('Marzo', datetime.date(2024, 3, 15))
+        self.crear_evento('Abril', datetime.date(2024, 4, 1))
+        with self.assertNumQueries(1):
+            self.assertEqual(self.titulos(self.feed()), ['Desde febrero', 'Marzo'])
+
+    def test_proyeccion_compacta(self):
+        evento = self.crear_evento('Reunión', datetime.date(2024, 3, 5), tipo='reunion', prioridad='alta')
+        datos = json.loads(b''.join(self.feed().streaming_content))
+        self.assertEqual(datos, [{
+            'id': evento.pk, 'title': 'Reunión', 'start': evento.fecha_inicio.isoformat(),
+            'end': evento.fecha_fin.isoformat(), 'tipo': 'reunion', 'prioridad': 'alta',
+        }])
+
+    def test_filtros(self):
+        otro = User.objects.create_user('docente')
+        del_grupo = self.crear_evento('Del grupo', datetime.date(2024, 3, 5))
+        del_grupo.grupos.add(self.grupo)
+        del_grupo.participantes.add(self.usuario, otro)
+        self.crear_evento('Cultural', datetime.date(2024, 3, 6), tipo='cultural')
+        self.assertEqual(self.titulos(self.feed(tipo=['cultural', 'reunion'])), ['Cultural'])
+        self.assertEqual(self.titulos(self.feed(grupo=self.grupo.pk)), ['Del grupo'])
+        # Dos participantes coinciden con el filtro y el evento aparece una vez
+        self.assertEqual(self.titulos(self.feed(participante=[self.usuario.pk, otro.pk])), ['Del grupo'])
+
+    def test_ventana_invalida(self):
+        for parametros in (
+            {'start': 'ayer'}, {'start': '2024-04-01'}, {'end': '2026-01-01'}, {'tipo': 'fiesta'}, {'grupo': 'x'},
+        ):
+            with self.subTest(parametros=parametros):
+                self.assertEqual(self.feed(**parametros).status_code, 400)
+
+    def test_zona_horaria_de_fullcalendar(self):
+        self.crear_evento('Marzo', datetime.date(2024, 3, 15))
+        # Sin codificar, el '+' de la zona horaria llega como espacio
+        response = self.feed(start='2024-03-01T00:00:00 01:00', end='2024-04-01T00:00:00-05:00')
+        self.assertEqual(self.titulos(response), ['Marzo'])
+
+    def test_etag_sin_consultas_hasta_que_cambia_un_evento(self):
+        evento = self.crear_evento('Marzo', datetime.date(2024, 3, 15))
+        etag = self.feed()['ETag']
+        with self.assertNumQueries(0):
+            respuesta = self.feed(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((respuesta.status_code, respuesta['Cache-Control']), (304, 'private, no-cache'))
+        self.assertNotEqual(self.feed(end='2024-04-02')['ETag'], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            evento.grupos.add(self.grupo)
+        self.assertEqual(self.feed(HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag = self.feed()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            evento.delete()
+        response = self.feed(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(self.titulos(response), [])
+
+    def test_indice_de_la_ventana(self):
+        consulta = str(calendario.eventos(timezone.now(), timezone.now()).explain())
+        self.assertIn('english_eve_fecha_i_5a3ce7_idx', consulta)
+
+
+class BuzonComunicadoTests(TestCase):
+    def setUp(self):
+        self.autor = User.objects.create_user('rectoria')
+        self.grupo = crear_grupo(crear_programa())
+        otro_grupo = crear_grupo(self.grupo.curso.programa, codigo='B1')
+        periodo = crear_periodo()
+        # Las cuentas se reconocen por el correo, sin distinguir mayúsculas
+        self.ana = User.objects.create_user('ana', email='Ana@Example.com')
+        self.luis = User.objects.create_user('luis', email='luis@example.com')
+        self.laura = User.objects.create_user('laura', email='laura@instituto.edu')
+        self.sin_perfil = User.objects.create_user('visitante', email='visitante@example.com')
+        User.objects.create_user('retirado', email='retirado@example.com', is_active=False)
+        crear_matricula(crear_estudiante('1', correo='ana@example.com'), self.grupo, periodo, self.autor)
+        crear_matricula(crear_estudiante('2', correo='luis@example.com'), otro_grupo, periodo, self.autor)
+        crear_estudiante('3', correo='retirado@example.com')
+        self.grupo.docente = Docente.objects.create(
+            tipo_identificacion='cc', identificacion='D1', nombres='Laura', apellidos='Ríos', genero='femenino',
+            titulo_academico='Licenciada', especialidad='Inglés', tipo_contrato='planta',
+            fecha_vinculacion=datetime.date(2020, 1, 1), direccion='Calle 2', telefono='300',
+            correo='laura@gmail.com', correo_institucional='LAURA@instituto.edu',
+        )
+        self.grupo.save()
+
+    def comunicado(self, destinatarios, grupos=(), usuarios=(), expira=None, titulo='Aviso'):
+        comunicado = Comunicado.objects.create(
+            titulo=titulo, contenido='...', destinatarios=destinatarios, publicado_por=self.autor,
+            fecha_expiracion=expira or timezone.localdate() + datetime.timedelta(days=10),
+        )
+        comunicado.grupos_destino.set(grupos)
+        comunicado.usuarios_destino.set(usuarios)
+        return comunicado
+
+    def recibieron(self, comunicado):
+        return set(comunicado.entregas.values_list('usuario__username', flat=True))
+
+    def test_destinatarios(self):
+        casos = [
+            (('todos',), {'rectoria', 'ana', 'luis', 'laura', 'visitante'}),
+            (('estudiantes',), {'ana', 'luis'}),
+            (('docentes',), {'laura'}),
+            (('estudiantes', [self.grupo]), {'ana'}),
+            (('todos', [self.grupo]), {'ana', 'laura'}),
+            (('personalizado', [], [self.sin_perfil]), {'visitante'}),
+            (('personalizado', [self.grupo], [self.sin_perfil]), {'ana', 'laura', 'visitante'}),
+            (('docentes', [], [self.luis]), {'laura', 'luis'}),
+        ]
+        for argumentos, esperados in casos:
+            with self.subTest(argumentos=argumentos):
+                comunicado = self.comunicado(*argumentos)
+                reparto = buzon.repartir(comunicado)
+                self.assertEqual(self.recibieron(comunicado), esperados)
+                self.assertEqual((reparto.creadas, reparto.total), (len(esperados), len(esperados)))
+
+    def test_repartir_de_nuevo_solo_aplica_la_diferencia(self):
+        comunicado = self.comunicado('estudiantes')
+        buzon.repartir(comunicado)
+        buzon.marcar_leido(self.ana, comunicado)
+
+        comunicado.destinatarios = 'todos'
+        comunicado.fecha_expiracion += datetime.timedelta(days=5)
+        comunicado.save()
+        comunicado.grupos_destino.set([self.grupo])
+        reparto = buzon.repartir(comunicado)
+        self.assertEqual((reparto.creadas, reparto.eliminadas), (1, 1))
+        self.assertEqual(self.recibieron(comunicado), {'ana', 'laura'})
+        entrega = comunicado.entregas.get(usuario=self.ana)
+        self.assertTrue(entrega.leido)
+        self.assertEqual(entrega.fecha_expiracion, comunicado.fecha_expiracion)
+        self.assertEqual(buzon.repartir(comunicado), (0, 0, 2))
+
+    def test_bandeja_y_no_leidos(self):
+        hoy = timezone.localdate()
+        primero = self.comunicado('estudiantes', titulo='Primero')
+        segundo = self.comunicado('estudiantes', titulo='Segundo')
+        vencido = self.comunicado('estudiantes', titulo='Vencido', expira=hoy - datetime.timedelta(days=1))
+        for comunicado in (primero, segundo, vencido):
+            buzon.repartir(comunicado)
+
+        with self.assertNumQueries(1):
+            titulos = [entrega.comunicado.titulo for entrega in buzon.bandeja(self.ana)[:20]]
+        self.assertEqual(titulos, ['Segundo', 'Primero'])
+        self.assertEqual(buzon.no_leidos(self.ana), 2)
+        self.assertEqual(buzon.marcar_leido(self.ana, segundo), 1)
+        self.assertEqual(buzon.marcar_leido(self.ana, segundo), 0)
+        self.assertEqual(buzon.no_leidos(self.ana), 1)
+        self.assertEqual(buzon.no_leidos(self.luis), 2)
+
+        self.assertEqual(buzon.purgar_vencidos(), 2)
+        self.assertFalse(vencido.entregas.exists())
+        self.assertEqual(BuzonComunicado.objects.count(), 4)
+
+    def test_tarea_reparte_el_comunicado(self):
+        comunicado = self.comunicado('docentes', usuarios=[self.ana])
+        tarea = encolar('comunicado', self.autor, comunicado_id=comunicado.pk)
+        reclamar()
+        self.assertEqual(ejecutar(tarea.pk), 'completada')
+        tarea.refresh_from_db()
+        self.assertEqual(tarea.mensaje, "2 destinatarios (2 nuevos, 0 retirados)")
+        self.assertEqual(self.recibieron(comunicado), {'ana', 'laura'})
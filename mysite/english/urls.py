@@ -14,6 +14,7 @@ urlpatterns = [
     
     # Personas
     path('estudiantes/', views.EstudianteListView.as_view(), name='estudiante_list'),
+    path('estudiantes/autocompletar/', views.EstudianteAutocompletarView.as_view(), name='estudiante_autocompletar'),
     path('estudiantes/nuevo/', views.EstudianteCreateView.as_view(), name='estudiante_create'),
     path('estudiantes/<int:pk>/', views.EstudianteDetailView.as_view(), name='estudiante_detail'),
     path('estudiantes/<int:pk>/editar/', views.EstudianteUpdateView.as_view(), name='estudiante_update'),
@@ -28,6 +29,7 @@ urlpatterns = [
     path('facturas/<int:pk>/editar/', views.FacturaUpdateView.as_view(), name='factura_update'),
     path('facturas/<int:pk>/eliminar/', views.FacturaDeleteView.as_view(), name='factura_delete'),
     path('facturas/<int:pk>/pdf/', views.FacturaPDFView.as_view(), name='factura_pdf'),
+    path('comprobantes/<str:tipo>/lote/', views.ComprobantesLoteView.as_view(), name='comprobantes_lote'),
     
     # ... (patrones similares para cobros, egresos, etc.)
     
@@ -39,10 +41,22 @@ urlpatterns = [
     path('reportes/economicos/<int:pk>/pdf/', views.ReporteEconomicoPDFView.as_view(), name='reporte_pdf'),
     path('reportes/economicos/<int:pk>/excel/', views.ReporteEconomicoExcelView.as_view(), name='reporte_excel'),
     
+    # Comunicados
+    path('comunicados/buzon/', views.ComunicadoBuzonView.as_view(), name='comunicado_buzon'),
+    
+    # Calendario
+    path('eventos/calendario/', views.EventoCalendarView.as_view(), name='evento_calendar'),
+    path('eventos/calendario/eventos.json', views.EventoCalendarioFeedView.as_view(), name='evento_calendar_feed'),
+    
     # ... (otros patrones de URL)
     
     # Utilerías
     path('exportar/estudiantes/excel/', views.ExportarEstudiantesExcelView.as_view(), name='exportar_estudiantes_excel'),
     path('importar/estudiantes/', views.ImportarEstudiantesView.as_view(), name='importar_estudiantes'),
     path('generar/facturas-masivas/', views.GenerarFacturasMasivasView.as_view(), name='generar_facturas_masivas'),
+    
+    # Tareas en segundo plano
+    path('tareas/', views.TareaListView.as_view(), name='tarea_list'),
+    path('tareas/<int:pk>/', views.TareaDetailView.as_view(), name='tarea_detail'),
+    path('tareas/<int:pk>/descargar/', views.TareaDownloadView.as_view(), name='tarea_download'),
 ]
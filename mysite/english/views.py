@@ -1,29 +1,41 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.views import View
 from django.views.generic import (
     ListView, CreateView, UpdateView, DeleteView, DetailView, TemplateView, FormView
 )
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth.views import LoginView, LogoutView, PasswordChangeView
-from django.http import HttpResponse, JsonResponse, FileResponse
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse, FileResponse, Http404
 from django.utils import timezone
-from django.db.models import Sum, Count, Q
+from django.db.models import ProtectedError, Sum, Count, Q
 from django.contrib import messages
 from django.core.exceptions import PermissionDenied
 from django.conf import settings
 import csv
 import io
 import os
-from datetime import datetime
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
+from datetime import datetime, timedelta
 from openpyxl import Workbook
 from django.template.loader import get_template
 from xhtml2pdf import pisa
 
 from .models import *
 from .forms import *
+from . import buzon, calendario, consultas
+from .busqueda import autocompletar_estudiantes, buscar_estudiantes
+from .descargas import respuesta_archivo
+from .comprobantes import (
+    COMPROBANTES, FORMATOS_LOTE, LIMITE_EN_LINEA, filtrar_lote, generar_lote, respuesta_pdf
+)
+from .facturacion import FacturacionMasivaForm
+from .importaciones import importar_estudiantes
+from .paginacion import PaginacionKeysetMixin
+from .reportes import escribir_reporte_excel, escribir_reporte_pdf, guardar_resumen
+from .tareas import encolar
+from .exportaciones import (
+    ENCABEZADOS_ESTUDIANTES, Columna, ExportacionMixin, exportar_xlsx, filas_estudiantes
+)
 
 # ========================================================
 # Módulo 1: Autenticación y Perfil de Usuario
@@ -44,12 +56,9 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         context['total_estudiantes'] = Estudiante.objects.count()
         context['total_docentes'] = Docente.objects.count()
         context['total_grupos'] = Grupo.objects.count()
-        context['ingresos_mes'] = Cobro.objects.filter(
-            fecha__month=timezone.now().month
-        ).aggregate(Sum('valor_total'))['valor_total__sum'] or 0
-        context['egresos_mes'] = Egreso.objects.filter(
-            fecha__month=timezone.now().month
-        ).aggregate(Sum('valor_total'))['valor_total__sum'] or 0
+        totales_mes = LibroDiario.totales_mes(timezone.localdate())
+        context['ingresos_mes'] = totales_mes['ingreso']
+        context['egresos_mes'] = totales_mes['egreso']
         context['eventos_proximos'] = Evento.objects.filter(
             fecha_inicio__gte=timezone.now()
         ).order_by('fecha_inicio')[:5]
@@ -76,8 +85,9 @@ class CambiarPasswordView(LoginRequiredMixin, PasswordChangeView):
 # ========================================================
 
 # Estudiantes
-class EstudianteListView(LoginRequiredMixin, ListView):
+class EstudianteListView(LoginRequiredMixin, PaginacionKeysetMixin, ListView):
     model = Estudiante
+    queryset = consultas.estudiantes()
     template_name = 'personas/estudiante_list.html'
     context_object_name = 'estudiantes'
     paginate_by = 20
@@ -88,16 +98,13 @@ class EstudianteListView(LoginRequiredMixin, ListView):
         estado = self.request.GET.get('estado')
         programa = self.request.GET.get('programa')
         
-        if q:
-            queryset = queryset.filter(
-                Q(primer_nombre__icontains=q) |
-                Q(primer_apellido__icontains=q) |
-                Q(identificacion__icontains=q)
-            )
         if estado:
             queryset = queryset.filter(estado=estado)
         if programa:
             queryset = queryset.filter(programa_actual_id=programa)
+        if q:
+            # Sin tildes ni mayúsculas, por prefijos de palabra y ordenado por relevancia
+            queryset = buscar_estudiantes(queryset, q)
         return queryset
     
     def get_context_data(self, **kwargs):
@@ -105,6 +112,16 @@ class EstudianteListView(LoginRequiredMixin, ListView):
         context['programas'] = Programa.objects.all()
         return context
 
+class EstudianteAutocompletarView(LoginRequiredMixin, View):
+    def get(self, request):
+        estudiantes = autocompletar_estudiantes(Estudiante.objects.all(), request.GET.get('q', ''))
+        return JsonResponse({
+            'resultados': [
+                {'id': e.pk, 'identificacion': e.identificacion, 'nombre': e.nombre_completo}
+                for e in estudiantes
+            ]
+        })
+
 class EstudianteCreateView(LoginRequiredMixin, CreateView):
     model = Estudiante
     form_class = EstudianteForm
@@ -117,14 +134,16 @@ class EstudianteCreateView(LoginRequiredMixin, CreateView):
 
 class EstudianteDetailView(LoginRequiredMixin, DetailView):
     model = Estudiante
+    queryset = consultas.estudiantes()
     template_name = 'personas/estudiante_detail.html'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['acudientes'] = self.object.acudientes.all()
-        context['matriculas'] = self.object.matricula_set.all()
+        context['matriculas'] = self.object.matricula_set.select_related('programa', 'grupo__curso', 'periodo')
         context['documentos'] = self.object.documentos.all()
-        context['facturas'] = Factura.objects.filter(estudiante=self.object)[:10]
+        # Por el manager inverso las facturas ya tienen al estudiante
+        context['facturas'] = self.object.factura_set.select_related('periodo')[:10]
         return context
 
 class EstudianteUpdateView(LoginRequiredMixin, UpdateView):
@@ -139,7 +158,7 @@ class EstudianteDeleteView(LoginRequiredMixin, DeleteView):
     success_url = reverse_lazy('estudiante_list')
 
 # Docentes
-class DocenteListView(LoginRequiredMixin, ListView):
+class DocenteListView(LoginRequiredMixin, PaginacionKeysetMixin, ListView):
     model = Docente
     template_name = 'personas/docente_list.html'
     context_object_name = 'docentes'
@@ -167,8 +186,9 @@ class DocenteDeleteView(LoginRequiredMixin, DeleteView):
     success_url = reverse_lazy('docente_list')
 
 # Acudientes
-class AcudienteListView(LoginRequiredMixin, ListView):
+class AcudienteListView(LoginRequiredMixin, PaginacionKeysetMixin, ListView):
     model = Acudiente
+    queryset = consultas.acudientes()
     template_name = 'personas/acudiente_list.html'
     context_object_name = 'acudientes'
     paginate_by = 20
@@ -209,7 +229,7 @@ class AcudienteDeleteView(LoginRequiredMixin, DeleteView):
 # ========================================================
 
 # Programas Académicos
-class ProgramaListView(LoginRequiredMixin, ListView):
+class ProgramaListView(LoginRequiredMixin, PaginacionKeysetMixin, ListView):
     model = Programa
     template_name = 'academicas/programa_list.html'
     context_object_name = 'programas'
@@ -236,7 +256,7 @@ class ProgramaDeleteView(LoginRequiredMixin, DeleteView):
     success_url = reverse_lazy('programa_list')
 
 # Cursos
-class CursoListView(LoginRequiredMixin, ListView):
+class CursoListView(LoginRequiredMixin, PaginacionKeysetMixin, ListView):
     model = Curso
     template_name = 'academicas/curso_list.html'
     context_object_name = 'cursos'
@@ -244,8 +264,8 @@ class CursoListView(LoginRequiredMixin, ListView):
     def get_queryset(self):
         programa_id = self.request.GET.get('programa_id')
         if programa_id:
-            return Curso.objects.filter(programa_id=programa_id)
-        return Curso.objects.all()
+            return consultas.cursos().filter(programa_id=programa_id)
+        return consultas.cursos()
 
 class CursoCreateView(LoginRequiredMixin, CreateView):
     model = Curso
@@ -269,7 +289,7 @@ class CursoDeleteView(LoginRequiredMixin, DeleteView):
     success_url = reverse_lazy('curso_list')
 
 # Grupos
-class GrupoListView(LoginRequiredMixin, ListView):
+class GrupoListView(LoginRequiredMixin, PaginacionKeysetMixin, ListView):
     model = Grupo
     template_name = 'academicas/grupo_list.html'
     context_object_name = 'grupos'
@@ -278,7 +298,7 @@ class GrupoListView(LoginRequiredMixin, ListView):
         curso_id = self.request.GET.get('curso_id')
         estado = self.request.GET.get('estado')
         
-        queryset = Grupo.objects.all()
+        queryset = consultas.grupos()
         if curso_id:
             queryset = queryset.filter(curso_id=curso_id)
         if estado:
@@ -293,6 +313,7 @@ class GrupoCreateView(LoginRequiredMixin, CreateView):
 
 class GrupoDetailView(LoginRequiredMixin, DetailView):
     model = Grupo
+    queryset = consultas.grupos()
     template_name = 'academicas/grupo_detail.html'
     
     def get_context_data(self, **kwargs):
@@ -312,7 +333,7 @@ class GrupoDeleteView(LoginRequiredMixin, DeleteView):
     success_url = reverse_lazy('grupo_list')
 
 # Periodos Académicos
-class PeriodoAcademicoListView(LoginRequiredMixin, ListView):
+class PeriodoAcademicoListView(LoginRequiredMixin, PaginacionKeysetMixin, ListView):
     model = PeriodoAcademico
     template_name = 'academicas/periodo_list.html'
     context_object_name = 'periodos'
@@ -335,16 +356,28 @@ class PeriodoAcademicoDeleteView(LoginRequiredMixin, DeleteView):
     success_url = reverse_lazy('periodo_list')
 
 # Matrículas
-class MatriculaListView(LoginRequiredMixin, ListView):
+class MatriculaListView(LoginRequiredMixin, PaginacionKeysetMixin, ExportacionMixin, ListView):
     model = Matricula
     template_name = 'academicas/matricula_list.html'
     context_object_name = 'matriculas'
+    columnas_exportacion = [
+        Columna('Consecutivo', 'consecutivo'),
+        Columna('Identificación', 'estudiante__identificacion'),
+        Columna('Apellido', 'estudiante__primer_apellido'),
+        Columna('Nombre', 'estudiante__primer_nombre'),
+        Columna('Programa', 'programa__nombre'),
+        Columna('Grupo', 'grupo__codigo'),
+        Columna('Período', 'periodo__nombre'),
+        Columna('Fecha Matrícula', 'fecha_matricula'),
+        Columna('Fecha Fin', 'fecha_fin'),
+        Columna('Estado', 'estado', Matricula.ESTADO_CHOICES),
+    ]
     
     def get_queryset(self):
         periodo_id = self.request.GET.get('periodo_id')
         grupo_id = self.request.GET.get('grupo_id')
         
-        queryset = Matricula.objects.all()
+        queryset = consultas.matriculas()
         if periodo_id:
             queryset = queryset.filter(periodo_id=periodo_id)
         if grupo_id:
@@ -365,6 +398,7 @@ class MatriculaCreateView(LoginRequiredMixin, CreateView):
 
 class MatriculaDetailView(LoginRequiredMixin, DetailView):
     model = Matricula
+    queryset = consultas.matricula_detalle()
     template_name = 'academicas/matricula_detail.html'
 
 class MatriculaUpdateView(LoginRequiredMixin, UpdateView):
@@ -381,16 +415,27 @@ class MatriculaDeleteView(LoginRequiredMixin, DeleteView):
     success_url = reverse_lazy('matricula_list')
 
 # Asistencias
-class AsistenciaListView(LoginRequiredMixin, ListView):
+class AsistenciaListView(LoginRequiredMixin, PaginacionKeysetMixin, ExportacionMixin, ListView):
     model = Asistencia
     template_name = 'academicas/asistencia_list.html'
     context_object_name = 'asistencias'
+    conteo_aproximado = True
+    columnas_exportacion = [
+        Columna('Fecha', 'fecha'),
+        Columna('Grupo', 'grupo__codigo'),
+        Columna('Identificación', 'estudiante__identificacion'),
+        Columna('Apellido', 'estudiante__primer_apellido'),
+        Columna('Nombre', 'estudiante__primer_nombre'),
+        Columna('Estado', 'estado', Asistencia.ESTADO_CHOICES),
+        Columna('Hora Llegada', 'hora_llegada'),
+        Columna('Observaciones', 'observaciones'),
+    ]
     
     def get_queryset(self):
         grupo_id = self.request.GET.get('grupo_id')
         fecha = self.request.GET.get('fecha')
         
-        queryset = Asistencia.objects.all()
+        queryset = consultas.asistencias()
         if grupo_id:
             queryset = queryset.filter(grupo_id=grupo_id)
         if fecha:
@@ -428,31 +473,47 @@ class AsistenciaMasivaCreateView(LoginRequiredMixin, FormView):
     def form_valid(self, form):
         grupo = form.cleaned_data['grupo']
         fecha = form.cleaned_data['fecha']
-        estudiantes = grupo.matricula_set.values_list('estudiante', flat=True)
         
-        for estudiante_id in estudiantes:
-            Asistencia.objects.create(
-                estudiante_id=estudiante_id,
-                grupo=grupo,
-                fecha=fecha,
-                estado='asistio',
-                registrado_por=self.request.user
-            )
+        # Estados puntuales enviados como estado_<id del estudiante>
+        estados_validos = dict(Asistencia.ESTADO_CHOICES)
+        estados = {
+            int(clave[len('estado_'):]): valor
+            for clave, valor in self.request.POST.items()
+            if clave.startswith('estado_') and clave[len('estado_'):].isdigit() and valor in estados_validos
+        }
         
-        messages.success(self.request, f"Asistencia registrada para {len(estudiantes)} estudiantes")
+        creadas, actualizadas = Asistencia.registrar_masiva(grupo, fecha, self.request.user, estados)
+        
+        messages.success(
+            self.request,
+            f"Asistencia registrada para {creadas + actualizadas} estudiantes "
+            f"({creadas} nuevas, {actualizadas} actualizadas)"
+        )
         return super().form_valid(form)
 
 # Calificaciones
-class CalificacionListView(LoginRequiredMixin, ListView):
+class CalificacionListView(LoginRequiredMixin, PaginacionKeysetMixin, ExportacionMixin, ListView):
     model = Calificacion
     template_name = 'academicas/calificacion_list.html'
     context_object_name = 'calificaciones'
+    columnas_exportacion = [
+        Columna('Período', 'periodo__nombre'),
+        Columna('Curso', 'curso__codigo'),
+        Columna('Grupo', 'grupo__codigo'),
+        Columna('Identificación', 'estudiante__identificacion'),
+        Columna('Apellido', 'estudiante__primer_apellido'),
+        Columna('Nombre', 'estudiante__primer_nombre'),
+        Columna('Nota 1', 'nota1'),
+        Columna('Nota 2', 'nota2'),
+        Columna('Nota 3', 'nota3'),
+        Columna('Nota Final', 'nota_final'),
+    ]
     
     def get_queryset(self):
         grupo_id = self.request.GET.get('grupo_id')
         periodo_id = self.request.GET.get('periodo_id')
         
-        queryset = Calificacion.objects.all()
+        queryset = consultas.calificaciones()
         if grupo_id:
             queryset = queryset.filter(grupo_id=grupo_id)
         if periodo_id:
@@ -477,8 +538,9 @@ class CalificacionDeleteView(LoginRequiredMixin, DeleteView):
     success_url = reverse_lazy('calificacion_list')
 
 # Observaciones Académicas
-class ObservacionAcademicaListView(LoginRequiredMixin, ListView):
+class ObservacionAcademicaListView(LoginRequiredMixin, PaginacionKeysetMixin, ListView):
     model = ObservacionAcademica
+    queryset = consultas.observaciones()
     template_name = 'academicas/observacion_list.html'
     context_object_name = 'observaciones'
 
@@ -504,7 +566,7 @@ class ObservacionAcademicaDeleteView(LoginRequiredMixin, DeleteView):
 # ========================================================
 
 # Conceptos de Cobro
-class ConceptoCobroListView(LoginRequiredMixin, ListView):
+class ConceptoCobroListView(LoginRequiredMixin, PaginacionKeysetMixin, ListView):
     model = ConceptoCobro
     template_name = 'financieras/conceptocobro_list.html'
     context_object_name = 'conceptos'
@@ -527,16 +589,30 @@ class ConceptoCobroDeleteView(LoginRequiredMixin, DeleteView):
     success_url = reverse_lazy('conceptocobro_list')
 
 # Facturas
-class FacturaListView(LoginRequiredMixin, ListView):
+class FacturaListView(LoginRequiredMixin, PaginacionKeysetMixin, ExportacionMixin, ListView):
     model = Factura
     template_name = 'financieras/factura_list.html'
     context_object_name = 'facturas'
+    columnas_exportacion = [
+        Columna('Consecutivo', 'consecutivo'),
+        Columna('Identificación', 'estudiante__identificacion'),
+        Columna('Apellido', 'estudiante__primer_apellido'),
+        Columna('Nombre', 'estudiante__primer_nombre'),
+        Columna('Fecha Emisión', 'fecha_emision'),
+        Columna('Fecha Vencimiento', 'fecha_vencimiento'),
+        Columna('Estado', 'estado', Factura.ESTADO_CHOICES),
+        Columna('Subtotal', 'subtotal'),
+        Columna('Descuento', 'descuento'),
+        Columna('IVA', 'iva'),
+        Columna('Total', 'total'),
+        Columna('Saldo', 'saldo'),
+    ]
     
     def get_queryset(self):
         estado = self.request.GET.get('estado')
         estudiante_id = self.request.GET.get('estudiante_id')
         
-        queryset = Factura.objects.all()
+        queryset = consultas.facturas()
         if estado:
             queryset = queryset.filter(estado=estado)
         if estudiante_id:
@@ -555,6 +631,7 @@ class FacturaCreateView(LoginRequiredMixin, CreateView):
 
 class FacturaDetailView(LoginRequiredMixin, DetailView):
     model = Factura
+    queryset = consultas.factura_con_items()
     template_name = 'financieras/factura_detail.html'
 
 class FacturaUpdateView(LoginRequiredMixin, UpdateView):
@@ -570,56 +647,31 @@ class FacturaDeleteView(LoginRequiredMixin, DeleteView):
 
 class FacturaPDFView(LoginRequiredMixin, View):
     def get(self, request, pk):
-        factura = get_object_or_404(Factura, pk=pk)
-        
-        # Crear respuesta PDF
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="factura_{factura.consecutivo}.pdf"'
-        
-        # Crear PDF
-        p = canvas.Canvas(response, pagesize=letter)
-        width, height = letter
-        
-        # Configuración
-        p.setFont("Helvetica-Bold", 14)
-        p.drawString(100, height - 100, f"FACTURA: {factura.consecutivo}")
-        p.setFont("Helvetica", 12)
-        p.drawString(100, height - 130, f"Estudiante: {factura.estudiante.nombre_completo}")
-        p.drawString(100, height - 150, f"Fecha Emisión: {factura.fecha_emision}")
-        p.drawString(100, height - 170, f"Fecha Vencimiento: {factura.fecha_vencimiento}")
-        
-        # Tabla de ítems
-        p.drawString(100, height - 200, "Concepto")
-        p.drawString(300, height - 200, "Valor")
-        
-        y = height - 220
-        for item in factura.items.all():
-            p.drawString(100, y, item.concepto.nombre)
-            p.drawString(300, y, f"${item.valor_total:,.2f}")
-            y -= 20
-        
-        # Totales
-        p.drawString(100, y - 40, f"Subtotal: ${factura.subtotal:,.2f}")
-        p.drawString(100, y - 60, f"Descuento: ${factura.descuento:,.2f}")
-        p.drawString(100, y - 80, f"IVA: ${factura.iva:,.2f}")
-        p.drawString(100, y - 100, f"TOTAL: ${factura.total:,.2f}")
-        p.drawString(100, y - 120, f"Saldo: ${factura.saldo:,.2f}")
-        
-        p.showPage()
-        p.save()
-        return response
+        return respuesta_pdf(request, 'factura', pk)
 
 # Cobros
-class CobroListView(LoginRequiredMixin, ListView):
+class CobroListView(LoginRequiredMixin, PaginacionKeysetMixin, ExportacionMixin, ListView):
     model = Cobro
     template_name = 'financieras/cobro_list.html'
     context_object_name = 'cobros'
+    conteo_aproximado = True
+    columnas_exportacion = [
+        Columna('Consecutivo', 'consecutivo'),
+        Columna('Factura', 'factura__consecutivo'),
+        Columna('Identificación', 'factura__estudiante__identificacion'),
+        Columna('Fecha', 'fecha'),
+        Columna('Tipo Ingreso', 'tipo_ingreso', Cobro.TIPO_INGRESO_CHOICES),
+        Columna('Estado', 'estado', Cobro.ESTADO_CHOICES),
+        Columna('Valor Total', 'valor_total'),
+        Columna('Saldo', 'saldo'),
+        Columna('Período', 'periodo_academico__nombre'),
+    ]
     
     def get_queryset(self):
         fecha_inicio = self.request.GET.get('fecha_inicio')
         fecha_fin = self.request.GET.get('fecha_fin')
         
-        queryset = Cobro.objects.all()
+        queryset = consultas.cobros()
         if fecha_inicio and fecha_fin:
             queryset = queryset.filter(fecha__range=[fecha_inicio, fecha_fin])
         return queryset
@@ -636,6 +688,7 @@ class CobroCreateView(LoginRequiredMixin, CreateView):
 
 class CobroDetailView(LoginRequiredMixin, DetailView):
     model = Cobro
+    queryset = consultas.cobro_con_pagos()
     template_name = 'financieras/cobro_detail.html'
 
 class CobroUpdateView(LoginRequiredMixin, UpdateView):
@@ -651,38 +704,7 @@ class CobroDeleteView(LoginRequiredMixin, DeleteView):
 
 class CobroPDFView(LoginRequiredMixin, View):
     def get(self, request, pk):
-        cobro = get_object_or_404(Cobro, pk=pk)
-        
-        # Crear respuesta PDF
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="recibo_{cobro.consecutivo}.pdf"'
-        
-        # Crear PDF
-        p = canvas.Canvas(response, pagesize=letter)
-        width, height = letter
-        
-        # Configuración
-        p.setFont("Helvetica-Bold", 14)
-        p.drawString(100, height - 100, f"RECIBO DE COBRO: {cobro.consecutivo}")
-        p.setFont("Helvetica", 12)
-        p.drawString(100, height - 130, f"Factura: {cobro.factura.consecutivo}")
-        p.drawString(100, height - 150, f"Estudiante: {cobro.factura.estudiante.nombre_completo}")
-        p.drawString(100, height - 170, f"Fecha: {cobro.fecha}")
-        
-        # Totales
-        p.drawString(100, height - 200, f"Valor Total: ${cobro.valor_total:,.2f}")
-        p.drawString(100, height - 220, f"Saldo: ${cobro.saldo:,.2f}")
-        
-        # Detalles de pago
-        p.drawString(100, height - 250, "Detalles de Pagos:")
-        y = height - 270
-        for pago in cobro.pagos.all():
-            p.drawString(120, y, f"{pago.get_metodo_pago_display()}: ${pago.valor:,.2f}")
-            y -= 20
-        
-        p.showPage()
-        p.save()
-        return response
+        return respuesta_pdf(request, 'cobro', pk)
 
 # Detalles de Pago
 class DetallePagoCreateView(LoginRequiredMixin, CreateView):
@@ -713,17 +735,28 @@ class DetallePagoDeleteView(LoginRequiredMixin, DeleteView):
         return reverse_lazy('cobro_detail', kwargs={'pk': self.object.cobro.pk})
 
 # Egresos
-class EgresoListView(LoginRequiredMixin, ListView):
+class EgresoListView(LoginRequiredMixin, PaginacionKeysetMixin, ExportacionMixin, ListView):
     model = Egreso
     template_name = 'financieras/egreso_list.html'
     context_object_name = 'egresos'
+    columnas_exportacion = [
+        Columna('Consecutivo', 'consecutivo'),
+        Columna('Fecha', 'fecha'),
+        Columna('Tipo', 'tipo', Egreso.TIPO_CHOICES),
+        Columna('Categoría', 'categoria_detallada', Egreso.CATEGORIA_DETALLADA_CHOICES),
+        Columna('Concepto', 'concepto'),
+        Columna('Beneficiario', 'beneficiario'),
+        Columna('Documento Soporte', 'documento_soporte'),
+        Columna('Forma de Pago', 'forma_pago', DetallePago.METODO_PAGO_CHOICES),
+        Columna('Valor Total', 'valor_total'),
+    ]
     
     def get_queryset(self):
         fecha_inicio = self.request.GET.get('fecha_inicio')
         fecha_fin = self.request.GET.get('fecha_fin')
         tipo = self.request.GET.get('tipo')
         
-        queryset = Egreso.objects.all()
+        queryset = consultas.egresos()
         if fecha_inicio and fecha_fin:
             queryset = queryset.filter(fecha__range=[fecha_inicio, fecha_fin])
         if tipo:
@@ -743,6 +776,7 @@ class EgresoCreateView(LoginRequiredMixin, CreateView):
 
 class EgresoDetailView(LoginRequiredMixin, DetailView):
     model = Egreso
+    queryset = consultas.egreso_con_detalles()
     template_name = 'financieras/egreso_detail.html'
 
 class EgresoUpdateView(LoginRequiredMixin, UpdateView):
@@ -758,42 +792,38 @@ class EgresoDeleteView(LoginRequiredMixin, DeleteView):
 
 class EgresoPDFView(LoginRequiredMixin, View):
     def get(self, request, pk):
-        egreso = get_object_or_404(Egreso, pk=pk)
-        
-        # Crear respuesta PDF
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="egreso_{egreso.consecutivo}.pdf"'
-        
-        # Crear PDF
-        p = canvas.Canvas(response, pagesize=letter)
-        width, height = letter
-        
-        # Configuración
-        p.setFont("Helvetica-Bold", 14)
-        p.drawString(100, height - 100, f"COMPROBANTE DE EGRESO: {egreso.consecutivo}")
-        p.setFont("Helvetica", 12)
-        p.drawString(100, height - 130, f"Concepto: {egreso.concepto}")
-        p.drawString(100, height - 150, f"Beneficiario: {egreso.beneficiario}")
-        p.drawString(100, height - 170, f"Fecha: {egreso.fecha}")
-        p.drawString(100, height - 190, f"Valor Total: ${egreso.valor_total:,.2f}")
-        
-        # Detalles
-        p.drawString(100, height - 220, "Detalles:")
-        y = height - 240
-        for detalle in egreso.detalles.all():
-            p.drawString(120, y, f"{detalle.descripcion}: {detalle.cantidad} x ${detalle.valor_unitario:,.2f} = ${detalle.valor_total:,.2f}")
-            y -= 20
-        
-        p.showPage()
-        p.save()
-        return response
+        return respuesta_pdf(request, 'egreso', pk)
+
+class ComprobantesLoteView(LoginRequiredMixin, View):
+    """Facturas, recibos o egresos filtrados en un solo PDF (?formato=zip: un PDF por comprobante)."""
+    def get(self, request, tipo):
+        if tipo not in COMPROBANTES:
+            raise Http404
+        filtros = {campo: request.GET.get(campo) or None for campo in ('periodo', 'estado', 'desde', 'hasta')}
+        formato = request.GET.get('formato') if request.GET.get('formato') in FORMATOS_LOTE else 'pdf'
+        try:
+            queryset = filtrar_lote(tipo, **filtros)
+        except ValueError as error:
+            return HttpResponseBadRequest(str(error))
+        
+        if request.GET.get('segundo_plano') or queryset.count() > LIMITE_EN_LINEA:
+            tarea = encolar('comprobantes_lote', request.user, tipo=tipo, formato=formato, **filtros)
+            return redirigir_a_tarea(request, tarea)
+        nombre, archivo, _ = generar_lote(tipo, queryset, formato)
+        return FileResponse(archivo, as_attachment=True, filename=nombre, content_type=FORMATOS_LOTE[formato])
 
 # ========================================================
 # Módulo 5: Gestión Institucional
 # ========================================================
 
 # Eventos
-class EventoListView(LoginRequiredMixin, ListView):
+def rango_fechas(fecha_inicio, fecha_fin):
+    """Convierte dos fechas 'AAAA-MM-DD' en el intervalo [inicio, fin + 1 día) de la zona local."""
+    desde = datetime.strptime(fecha_inicio, '%Y-%m-%d')
+    hasta = datetime.strptime(fecha_fin, '%Y-%m-%d') + timedelta(days=1)
+    return timezone.make_aware(desde), timezone.make_aware(hasta)
+
+class EventoListView(LoginRequiredMixin, PaginacionKeysetMixin, ListView):
     model = Evento
     template_name = 'institucionales/evento_list.html'
     context_object_name = 'eventos'
@@ -807,7 +837,9 @@ class EventoListView(LoginRequiredMixin, ListView):
         if tipo:
             queryset = queryset.filter(tipo=tipo)
         if fecha_inicio and fecha_fin:
-            queryset = queryset.filter(fecha_inicio__date__range=[fecha_inicio, fecha_fin])
+            # Rango de fechas y horas en lugar de __date para que use el índice de fecha_inicio
+            desde, hasta = rango_fechas(fecha_inicio, fecha_fin)
+            queryset = queryset.filter(fecha_inicio__gte=desde, fecha_inicio__lt=hasta)
         return queryset
 
 class EventoCreateView(LoginRequiredMixin, CreateView):
@@ -840,25 +872,33 @@ class EventoCalendarView(LoginRequiredMixin, TemplateView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        eventos = Evento.objects.all()
-        context['eventos_json'] = [
-            {
-                'title': e.titulo,
-                'start': e.fecha_inicio.isoformat(),
-                'end': e.fecha_fin.isoformat(),
-                'url': reverse('evento_detail', args=[e.id])
-            }
-            for e in eventos
-        ]
+        # Los eventos los pide el calendario por ventana visible
+        context['feed_url'] = reverse('evento_calendar_feed')
+        context['detalle_url'] = reverse('evento_detail', args=[0])
+        context['tipos'] = Evento.TIPO_CHOICES
+        context['grupos'] = Grupo.objects.all()
         return context
 
+class EventoCalendarioFeedView(LoginRequiredMixin, View):
+    def get(self, request):
+        return calendario.respuesta_feed(request)
+
 # Comunicados
-class ComunicadoListView(LoginRequiredMixin, ListView):
+class ComunicadoListView(LoginRequiredMixin, PaginacionKeysetMixin, ListView):
     model = Comunicado
+    queryset = consultas.comunicados()
     template_name = 'institucionales/comunicado_list.html'
     context_object_name = 'comunicados'
 
-class ComunicadoCreateView(LoginRequiredMixin, CreateView):
+class RepartirComunicadoMixin:
+    """Tras guardar (con grupos y usuarios destino) reparte el comunicado a los buzones en segundo plano."""
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        encolar('comunicado', self.request.user, comunicado_id=self.object.pk)
+        messages.info(self.request, "El comunicado llegará a los buzones de los destinatarios en unos momentos.")
+        return response
+
+class ComunicadoCreateView(LoginRequiredMixin, RepartirComunicadoMixin, CreateView):
     model = Comunicado
     form_class = ComunicadoForm
     template_name = 'institucionales/comunicado_form.html'
@@ -871,8 +911,27 @@ class ComunicadoCreateView(LoginRequiredMixin, CreateView):
 class ComunicadoDetailView(LoginRequiredMixin, DetailView):
     model = Comunicado
     template_name = 'institucionales/comunicado_detail.html'
+    
+    def get_object(self, queryset=None):
+        comunicado = super().get_object(queryset)
+        buzon.marcar_leido(self.request.user, comunicado)
+        return comunicado
+
+class ComunicadoBuzonView(LoginRequiredMixin, PaginacionKeysetMixin, ListView):
+    """Comunicados vigentes del usuario, desde su buzón (ver buzon.py)."""
+    template_name = 'institucionales/comunicado_buzon.html'
+    context_object_name = 'entregas'
+    paginate_by = 20
+    
+    def get_queryset(self):
+        return buzon.bandeja(self.request.user)
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['no_leidos'] = buzon.no_leidos(self.request.user)
+        return context
 
-class ComunicadoUpdateView(LoginRequiredMixin, UpdateView):
+class ComunicadoUpdateView(LoginRequiredMixin, RepartirComunicadoMixin, UpdateView):
     model = Comunicado
     form_class = ComunicadoForm
     template_name = 'institucionales/comunicado_form.html'
@@ -884,8 +943,9 @@ class ComunicadoDeleteView(LoginRequiredMixin, DeleteView):
     success_url = reverse_lazy('comunicado_list')
 
 # Documentos Institucionales
-class DocumentoInstitucionalListView(LoginRequiredMixin, ListView):
+class DocumentoInstitucionalListView(LoginRequiredMixin, PaginacionKeysetMixin, ListView):
     model = DocumentoInstitucional
+    queryset = consultas.documentos_institucionales()
     template_name = 'institucionales/documentoinstitucional_list.html'
     context_object_name = 'documentos'
 
@@ -902,8 +962,7 @@ class DocumentoInstitucionalCreateView(LoginRequiredMixin, CreateView):
 class DocumentoInstitucionalDownloadView(LoginRequiredMixin, View):
     def get(self, request, pk):
         documento = get_object_or_404(DocumentoInstitucional, pk=pk)
-        file_path = documento.archivo.path
-        return FileResponse(open(file_path, 'rb'), as_attachment=True)
+        return respuesta_archivo(request, documento.archivo)
 
 class DocumentoInstitucionalDeleteView(LoginRequiredMixin, DeleteView):
     model = DocumentoInstitucional
@@ -915,7 +974,7 @@ class DocumentoInstitucionalDeleteView(LoginRequiredMixin, DeleteView):
 # ========================================================
 
 # Documentos de Estudiantes
-class DocumentoEstudianteListView(LoginRequiredMixin, ListView):
+class DocumentoEstudianteListView(LoginRequiredMixin, PaginacionKeysetMixin, ListView):
     model = DocumentoEstudiante
     template_name = 'soporte/documentoestudiante_list.html'
     context_object_name = 'documentos'
@@ -924,7 +983,7 @@ class DocumentoEstudianteListView(LoginRequiredMixin, ListView):
         estudiante_id = self.request.GET.get('estudiante_id')
         tipo = self.request.GET.get('tipo')
         
-        queryset = DocumentoEstudiante.objects.all()
+        queryset = consultas.documentos_estudiante()
         if estudiante_id:
             queryset = queryset.filter(estudiante_id=estudiante_id)
         if tipo:
@@ -944,8 +1003,7 @@ class DocumentoEstudianteCreateView(LoginRequiredMixin, CreateView):
 class DocumentoEstudianteDownloadView(LoginRequiredMixin, View):
     def get(self, request, pk):
         documento = get_object_or_404(DocumentoEstudiante, pk=pk)
-        file_path = documento.archivo.path
-        return FileResponse(open(file_path, 'rb'), as_attachment=True)
+        return respuesta_archivo(request, documento.archivo)
 
 class DocumentoEstudianteDeleteView(LoginRequiredMixin, DeleteView):
     model = DocumentoEstudiante
@@ -953,7 +1011,7 @@ class DocumentoEstudianteDeleteView(LoginRequiredMixin, DeleteView):
     success_url = reverse_lazy('documentoestudiante_list')
 
 # Incidencias
-class IncidenciaListView(LoginRequiredMixin, ListView):
+class IncidenciaListView(LoginRequiredMixin, PaginacionKeysetMixin, ListView):
     model = Incidencia
     template_name = 'soporte/incidencia_list.html'
     context_object_name = 'incidencias'
@@ -963,7 +1021,7 @@ class IncidenciaListView(LoginRequiredMixin, ListView):
         tipo = self.request.GET.get('tipo')
         responsable = self.request.GET.get('responsable')
         
-        queryset = Incidencia.objects.all()
+        queryset = consultas.incidencias()
         if estado:
             queryset = queryset.filter(estado=estado)
         if tipo:
@@ -984,11 +1042,12 @@ class IncidenciaCreateView(LoginRequiredMixin, CreateView):
 
 class IncidenciaDetailView(LoginRequiredMixin, DetailView):
     model = Incidencia
+    queryset = consultas.incidencia_detalle()
     template_name = 'soporte/incidencia_detail.html'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['seguimientos'] = self.object.seguimientos.all()
+        context['seguimientos'] = consultas.seguimientos(self.object)
         return context
 
 class IncidenciaUpdateView(LoginRequiredMixin, UpdateView):
@@ -1036,8 +1095,9 @@ class SeguimientoIncidenciaDeleteView(LoginRequiredMixin, DeleteView):
 # Módulo 7: Reportes Económicos
 # ========================================================
 
-class ReporteEconomicoListView(LoginRequiredMixin, ListView):
+class ReporteEconomicoListView(LoginRequiredMixin, PaginacionKeysetMixin, ListView):
     model = ReporteEconomico
+    queryset = consultas.reportes()
     template_name = 'reportes/reporte_list.html'
     context_object_name = 'reportes'
 
@@ -1049,7 +1109,9 @@ class ReporteEconomicoCreateView(LoginRequiredMixin, CreateView):
     
     def form_valid(self, form):
         form.instance.generado_por = self.request.user
-        return super().form_valid(form)
+        response = super().form_valid(form)
+        guardar_resumen(self.object)
+        return response
 
 class ReporteEconomicoDetailView(LoginRequiredMixin, DetailView):
     model = ReporteEconomico
@@ -1063,116 +1125,30 @@ class ReporteEconomicoDeleteView(LoginRequiredMixin, DeleteView):
 class ReporteEconomicoPDFView(LoginRequiredMixin, View):
     def get(self, request, pk):
         reporte = get_object_or_404(ReporteEconomico, pk=pk)
+        if request.GET.get('segundo_plano'):
+            return redirigir_a_tarea(request, encolar('reporte_pdf', request.user, reporte_id=reporte.pk))
         
         # Crear respuesta PDF
         response = HttpResponse(content_type='application/pdf')
         response['Content-Disposition'] = f'attachment; filename="reporte_{reporte.nombre}.pdf"'
-        
-        # Crear PDF
-        p = canvas.Canvas(response, pagesize=letter)
-        width, height = letter
-        
-        # Encabezado
-        p.setFont("Helvetica-Bold", 16)
-        p.drawString(100, height - 50, f"Reporte Económico: {reporte.nombre}")
-        p.setFont("Helvetica", 12)
-        p.drawString(100, height - 80, f"Período: {reporte.fecha_inicio} a {reporte.fecha_fin}")
-        p.drawString(100, height - 100, f"Generado por: {reporte.generado_por.get_full_name()}")
-        p.drawString(100, height - 120, f"Fecha generación: {reporte.fecha_generacion}")
-        
-        # Obtener datos
-        cobros = Cobro.objects.filter(fecha__range=[reporte.fecha_inicio, reporte.fecha_fin])
-        egresos = Egreso.objects.filter(fecha__range=[reporte.fecha_inicio, reporte.fecha_fin])
-        
-        # Resumen
-        total_ingresos = cobros.aggregate(Sum('valor_total'))['valor_total__sum'] or 0
-        total_egresos = egresos.aggregate(Sum('valor_total'))['valor_total__sum'] or 0
-        balance = total_ingresos - total_egresos
-        
-        p.drawString(100, height - 160, "Resumen Financiero:")
-        p.drawString(120, height - 180, f"Ingresos Totales: ${total_ingresos:,.2f}")
-        p.drawString(120, height - 200, f"Egresos Totales: ${total_egresos:,.2f}")
-        p.drawString(120, height - 220, f"Balance: ${balance:,.2f}")
-        
-        # Detalle ingresos por tipo
-        p.drawString(100, height - 260, "Detalle de Ingresos:")
-        y = height - 280
-        for tipo, nombre in Cobro.TIPO_INGRESO_CHOICES:
-            total_tipo = cobros.filter(tipo_ingreso=tipo).aggregate(Sum('valor_total'))['valor_total__sum'] or 0
-            if total_tipo > 0:
-                p.drawString(120, y, f"{nombre}: ${total_tipo:,.2f}")
-                y -= 20
-        
-        # Detalle egresos por categoría
-        p.drawString(100, y - 40, "Detalle de Egresos:")
-        y -= 60
-        for categoria, nombre in Egreso.CATEGORIA_DETALLADA_CHOICES:
-            total_categoria = egresos.filter(categoria_detallada=categoria).aggregate(Sum('valor_total'))['valor_total__sum'] or 0
-            if total_categoria > 0:
-                p.drawString(120, y, f"{nombre}: ${total_categoria:,.2f}")
-                y -= 20
-        
-        p.showPage()
-        p.save()
+        escribir_reporte_pdf(reporte, response)
         return response
 
 class ReporteEconomicoExcelView(LoginRequiredMixin, View):
     def get(self, request, pk):
         reporte = get_object_or_404(ReporteEconomico, pk=pk)
-        
-        # Crear libro de Excel
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Reporte Económico"
-        
-        # Encabezados
-        ws.append(['Reporte Económico', reporte.nombre])
-        ws.append(['Período', f"{reporte.fecha_inicio} a {reporte.fecha_fin}"])
-        ws.append(['Generado por', reporte.generado_por.get_full_name()])
-        ws.append(['Fecha generación', reporte.fecha_generacion.strftime("%Y-%m-%d %H:%M")])
-        ws.append([])
-        
-        # Obtener datos
-        cobros = Cobro.objects.filter(fecha__range=[reporte.fecha_inicio, reporte.fecha_fin])
-        egresos = Egreso.objects.filter(fecha__range=[reporte.fecha_inicio, reporte.fecha_fin])
-        
-        # Resumen
-        total_ingresos = cobros.aggregate(Sum('valor_total'))['valor_total__sum'] or 0
-        total_egresos = egresos.aggregate(Sum('valor_total'))['valor_total__sum'] or 0
-        balance = total_ingresos - total_egresos
-        
-        ws.append(['Resumen Financiero'])
-        ws.append(['Ingresos Totales', total_ingresos])
-        ws.append(['Egresos Totales', total_egresos])
-        ws.append(['Balance', balance])
-        ws.append([])
-        
-        # Detalle ingresos
-        ws.append(['Detalle de Ingresos'])
-        ws.append(['Tipo', 'Valor'])
-        for tipo, nombre in Cobro.TIPO_INGRESO_CHOICES:
-            total_tipo = cobros.filter(tipo_ingreso=tipo).aggregate(Sum('valor_total'))['valor_total__sum'] or 0
-            if total_tipo > 0:
-                ws.append([nombre, total_tipo])
-        
-        ws.append([])
-        
-        # Detalle egresos
-        ws.append(['Detalle de Egresos'])
-        ws.append(['Categoría', 'Valor'])
-        for categoria, nombre in Egreso.CATEGORIA_DETALLADA_CHOICES:
-            total_categoria = egresos.filter(categoria_detallada=categoria).aggregate(Sum('valor_total'))['valor_total__sum'] or 0
-            if total_categoria > 0:
-                ws.append([nombre, total_categoria])
+        if request.GET.get('segundo_plano'):
+            return redirigir_a_tarea(request, encolar('reporte_excel', request.user, reporte_id=reporte.pk))
         
         # Guardar respuesta
         response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
         response['Content-Disposition'] = f'attachment; filename="reporte_{reporte.nombre}.xlsx"'
-        wb.save(response)
+        escribir_reporte_excel(reporte, response)
         return response
 
-class ReporteProgramadoListView(LoginRequiredMixin, ListView):
+class ReporteProgramadoListView(LoginRequiredMixin, PaginacionKeysetMixin, ListView):
     model = ReporteProgramado
+    queryset = consultas.reportes_programados()
     template_name = 'reportes/reporteprogramado_list.html'
     context_object_name = 'reportes_programados'
 
@@ -1208,9 +1184,9 @@ class ConfiguracionInstitutoUpdateView(LoginRequiredMixin, UpdateView):
     success_url = reverse_lazy('dashboard')
     
     def get_object(self):
-        return ConfiguracionInstituto.objects.first()
+        return ConfiguracionInstituto.obtener()
 
-class ConsecutivoListView(LoginRequiredMixin, ListView):
+class ConsecutivoListView(LoginRequiredMixin, PaginacionKeysetMixin, ListView):
     model = Consecutivo
     template_name = 'configuracion/consecutivo_list.html'
     context_object_name = 'consecutivos'
@@ -1221,37 +1197,49 @@ class ConsecutivoUpdateView(LoginRequiredMixin, UpdateView):
     template_name = 'configuracion/consecutivo_form.html'
     success_url = reverse_lazy('consecutivo_list')
 
-class AuditoriaListView(LoginRequiredMixin, ListView):
+class AuditoriaListView(LoginRequiredMixin, PaginacionKeysetMixin, ListView):
     model = Auditoria
+    queryset = consultas.auditorias()
     template_name = 'auditoria/auditoria_list.html'
     context_object_name = 'registros_auditoria'
+    conteo_aproximado = True
     paginate_by = 50
 
 class AuditoriaDetailView(LoginRequiredMixin, DetailView):
     model = Auditoria
+    queryset = consultas.auditorias()
     template_name = 'auditoria/auditoria_detail.html'
 
-class BackupListView(LoginRequiredMixin, ListView):
+class BackupListView(LoginRequiredMixin, PaginacionKeysetMixin, ListView):
     model = Backup
+    queryset = consultas.backups()
     template_name = 'backup/backup_list.html'
     context_object_name = 'backups'
 
 class BackupCreateView(LoginRequiredMixin, View):
+    """La copia se hace en segundo plano (ver respaldos.py); tipo 'completo' o 'incremental'."""
     def post(self, request):
-        # Lógica para crear backup
-        # ...
-        messages.success(request, "Copia de seguridad creada exitosamente")
-        return redirect('backup_list')
+        tipo = request.POST.get('tipo') if request.POST.get('tipo') in ('completo', 'incremental') else 'completo'
+        tarea = encolar('backup', request.user, tipo=tipo, descripcion=request.POST.get('descripcion', ''))
+        return redirigir_a_tarea(request, tarea)
 
 class BackupDownloadView(LoginRequiredMixin, View):
     def get(self, request, pk):
         backup = get_object_or_404(Backup, pk=pk)
-        return FileResponse(open(backup.archivo.path, 'rb'), as_attachment=True)
+        return respuesta_archivo(request, backup.archivo)
 
 class BackupDeleteView(LoginRequiredMixin, DeleteView):
     model = Backup
     template_name = 'backup/backup_confirm_delete.html'
     success_url = reverse_lazy('backup_list')
+    
+    def form_valid(self, form):
+        # Las copias incrementales necesitan su base para restaurarse
+        try:
+            return super().form_valid(form)
+        except ProtectedError:
+            messages.error(self.request, "Esta copia es la base de copias incrementales; elimine primero esas copias.")
+            return redirect('backup_list')
 
 # ========================================================
 # Módulo 9: Vistas Adicionales
@@ -1259,41 +1247,19 @@ class BackupDeleteView(LoginRequiredMixin, DeleteView):
 
 class ExportarEstudiantesExcelView(LoginRequiredMixin, View):
     def get(self, request):
-        # Crear libro de Excel
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Estudiantes"
-        
-        # Encabezados
-        headers = [
-            'ID', 'Identificación', 'Nombres', 'Apellidos', 'Fecha Nacimiento', 'Edad',
-            'Estado', 'Programa', 'Grupo', 'Dirección', 'Teléfono', 'Correo'
-        ]
-        ws.append(headers)
-        
-        # Datos
-        estudiantes = Estudiante.objects.all().select_related('programa_actual', 'grupo_actual')
-        for e in estudiantes:
-            ws.append([
-                e.id,
-                e.identificacion,
-                f"{e.primer_nombre} {e.segundo_nombre or ''}",
-                f"{e.primer_apellido} {e.segundo_apellido or ''}",
-                e.fecha_nacimiento,
-                e.edad,
-                e.get_estado_display(),
-                e.programa_actual.nombre if e.programa_actual else '',
-                e.grupo_actual.codigo if e.grupo_actual else '',
-                e.direccion,
-                e.telefono_principal,
-                e.correo
-            ])
+        if request.GET.get('segundo_plano'):
+            return redirigir_a_tarea(request, encolar('exportar_estudiantes', request.user))
         
-        # Guardar respuesta
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        response['Content-Disposition'] = 'attachment; filename="estudiantes.xlsx"'
-        wb.save(response)
-        return response
+        # El libro se escribe en modo solo escritura sobre un archivo temporal
+        archivo = exportar_xlsx("Estudiantes", ENCABEZADOS_ESTUDIANTES, filas_estudiantes())
+        return FileResponse(
+            archivo,
+            as_attachment=True,
+            filename="estudiantes.xlsx",
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        )
+
+MAX_ERRORES_IMPORTACION = 20
 
 class ImportarEstudiantesView(LoginRequiredMixin, FormView):
     template_name = 'importar/estudiantes_form.html'
@@ -1302,23 +1268,32 @@ class ImportarEstudiantesView(LoginRequiredMixin, FormView):
     
     def form_valid(self, form):
         archivo = form.cleaned_data['archivo']
-        # Lógica para procesar el archivo e importar estudiantes
-        # ...
-        messages.success(self.request, "Estudiantes importados exitosamente")
+        resultado = importar_estudiantes(archivo, self.request.user)
+        
+        messages.success(
+            self.request,
+            f"Estudiantes importados exitosamente: {resultado.creados} nuevos, "
+            f"{resultado.actualizados} actualizados"
+        )
+        for fila, error in resultado.errores[:MAX_ERRORES_IMPORTACION]:
+            messages.warning(self.request, f"Fila {fila}: {error}")
+        if len(resultado.errores) > MAX_ERRORES_IMPORTACION:
+            messages.warning(
+                self.request,
+                f"... y {len(resultado.errores) - MAX_ERRORES_IMPORTACION} filas más con errores"
+            )
         return super().form_valid(form)
 
 class GenerarFacturasMasivasView(LoginRequiredMixin, View):
     def post(self, request):
-        periodo_id = request.POST.get('periodo_id')
-        concepto_id = request.POST.get('concepto_id')
-        
-        periodo = get_object_or_404(PeriodoAcademico, pk=periodo_id)
-        concepto = get_object_or_404(ConceptoCobro, pk=concepto_id)
+        # Se valida aquí: un error dentro de la tarea llegaría cuando el usuario ya vio "encolada"
+        form = FacturacionMasivaForm(request.POST)
+        if not form.is_valid():
+            return HttpResponseBadRequest(form.errors.as_text())
         
-        # Lógica para generar facturas masivas
-        # ...
-        messages.success(request, "Facturas generadas exitosamente")
-        return redirect('factura_list')
+        # La facturación se ejecuta en segundo plano con procesar_tareas
+        tarea = encolar('facturacion_masiva', request.user, **form.parametros())
+        return redirigir_a_tarea(request, tarea)
 
 class DashboardFinancieroView(LoginRequiredMixin, TemplateView):
     template_name = 'dashboard/financiero.html'
@@ -1326,19 +1301,10 @@ class DashboardFinancieroView(LoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Resumen mensual
-        hoy = timezone.now()
-        primer_dia_mes = hoy.replace(day=1)
-        ultimo_dia_mes = hoy.replace(day=28) + timezone.timedelta(days=4)
-        ultimo_dia_mes = ultimo_dia_mes - timezone.timedelta(days=ultimo_dia_mes.day)
-        
-        ingresos = Cobro.objects.filter(
-            fecha__range=[primer_dia_mes, ultimo_dia_mes]
-        ).aggregate(Sum('valor_total'))['valor_total__sum'] or 0
-        
-        egresos = Egreso.objects.filter(
-            fecha__range=[primer_dia_mes, ultimo_dia_mes]
-        ).aggregate(Sum('valor_total'))['valor_total__sum'] or 0
+        # Resumen mensual (desde el libro diario preagregado)
+        totales_mes = LibroDiario.totales_mes(timezone.localdate())
+        ingresos = totales_mes['ingreso']
+        egresos = totales_mes['egreso']
         
         balance = ingresos - egresos
         
@@ -1359,3 +1325,47 @@ class DashboardFinancieroView(LoginRequiredMixin, TemplateView):
         
         return context
 
+# ========================================================
+# Módulo 10: Tareas en Segundo Plano
+# ========================================================
+
+def redirigir_a_tarea(request, tarea):
+    messages.info(request, f"{tarea.get_tipo_display()} en proceso. Puede seguir su avance en esta página.")
+    return redirect('tarea_detail', pk=tarea.pk)
+
+class TareaListView(LoginRequiredMixin, PaginacionKeysetMixin, ListView):
+    model = Tarea
+    template_name = 'tareas/tarea_list.html'
+    context_object_name = 'tareas'
+    paginate_by = 20
+    
+    def get_queryset(self):
+        return Tarea.objects.filter(creada_por=self.request.user)
+
+class TareaDetailView(LoginRequiredMixin, DetailView):
+    model = Tarea
+    template_name = 'tareas/tarea_detail.html'
+    
+    def get_queryset(self):
+        return Tarea.objects.filter(creada_por=self.request.user)
+    
+    def render_to_response(self, context, **response_kwargs):
+        # Consulta de avance desde la página (?formato=json)
+        if self.request.GET.get('formato') == 'json':
+            tarea = self.object
+            return JsonResponse({
+                'id': tarea.pk,
+                'tipo': tarea.tipo,
+                'estado': tarea.estado,
+                'progreso': tarea.progreso,
+                'mensaje': tarea.mensaje if tarea.estado != 'fallida' else "La tarea falló",
+                'descarga': reverse('tarea_download', args=[tarea.pk]) if tarea.resultado else None,
+            })
+        return super().render_to_response(context, **response_kwargs)
+
+class TareaDownloadView(LoginRequiredMixin, View):
+    def get(self, request, pk):
+        tarea = get_object_or_404(Tarea, pk=pk, creada_por=request.user, estado='completada')
+        if not tarea.resultado:
+            raise Http404("La tarea no generó ningún archivo")
+        return respuesta_archivo(request, tarea.resultado)
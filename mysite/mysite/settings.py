@@ -46,6 +46,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'english.auditoria.AuditoriaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -82,6 +83,23 @@ DATABASES = {
 }
 
 
+# Caché. Los PDF de facturas, recibos y egresos se guardan en disco para que
+# todos los procesos del servidor los compartan
+
+CACHES = {
+    # Compartida entre procesos: ahí vive la versión de la configuración del instituto
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'general',
+    },
+    'comprobantes': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'comprobantes',
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -118,6 +136,46 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Archivos generados por la aplicación (resultados de tareas, respaldos)
+
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Auditoría: el hilo escribe cada AUDITORIA_TAMANO_LOTE entradas o cada
+# AUDITORIA_INTERVALO_MS milisegundos; con AUDITORIA_ASINCRONA = False se
+# escribe cada entrada en el momento
+
+AUDITORIA_ASINCRONA = True
+AUDITORIA_TAMANO_LOTE = 200
+AUDITORIA_INTERVALO_MS = 250
+
+# Archivo histórico: `archivar_historicos` saca de las tablas las filas con
+# más de estos días (ver english/archivo.py)
+
+ARCHIVO_HORIZONTE_DIAS = 730
+
+# Copias de seguridad (english/respaldos.py): compresión 'gz' o 'zst' (requiere
+# el paquete zstandard) y límite de lectura para no saturar el disco
+
+BACKUP_COMPRESION = 'gz'
+BACKUP_LIMITE_MB_S = 20
+
+# Descargas de documentos y copias (english/descargas.py): 'django',
+# 'x-sendfile' o 'x-accel-redirect' (nginx, con una location `internal`
+# DESCARGAS_ACCEL_PREFIJO que apunta a MEDIA_ROOT)
+
+DESCARGAS_BACKEND = 'django'
+DESCARGAS_ACCEL_PREFIJO = '/protegido/'
+
+# Cola de tareas (english/tareas.py): el procesador marca cada
+# TAREAS_LATIDO_S segundos que sigue con la tarea; una tarea en proceso sin
+# latido por más de TAREAS_SIN_LATIDO_MIN minutos se devuelve a la cola,
+# hasta TAREAS_MAX_INTENTOS veces; después queda fallida
+
+TAREAS_LATIDO_S = 30
+TAREAS_SIN_LATIDO_MIN = 5
+TAREAS_MAX_INTENTOS = 3
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 